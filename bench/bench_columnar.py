@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+bench/bench_columnar.py — Columnar sidecar round trip on the demo layers
+
+Builds the demo's baseline and modified layers on a synthetic network per
+--kinds (synthetic Overpass response -> osm_fetch features -> the example
+scenario delta, written with their sidecars as osm_fetch.py / delta_apply.py
+do), or takes them from an existing kit with --kit. For each layer, and for
+a compact re-write of it, checks that:
+
+  - the sidecar written next to the GeoJSON is current (open_sidecar)
+  - it decodes to the GeoJSON byte for byte (columnar.round_trip_error)
+  - a fresh temporary encoding does too (what columnar.py --check runs),
+    without writing anything next to the GeoJSON
+
+and that content the format cannot reproduce exactly (MultiPolygon, 3D or
+integer coordinates) gets no sidecar: write_sidecar() returns
+None and removes a stale one, and open_sidecar() ignores a sidecar whose
+GeoJSON has changed. Reports encode / decode time and sizes.
+
+Exits 1 on any failure.
+
+Usage:
+  python3 bench/bench_columnar.py [--kinds grid organic] [--ways 20000] [--seed 1]
+  python3 bench/bench_columnar.py --kit artifacts/<RUN_ID>/city_demo_kit
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.join(HERE, "..")
+sys.path.insert(0, os.path.join(REPO, "scripts"))
+sys.path.insert(0, HERE)
+
+import synth  # noqa: E402
+from bench_routing import build_layers  # noqa: E402
+from columnar import open_sidecar, round_trip_error, sidecar_path, write_sidecar  # noqa: E402
+from geojson_writer import write_feature_collection  # noqa: E402
+
+EXAMPLE_DELTA = os.path.join(REPO, "inputs", "scenario_delta.example.json")
+LAYERS = ("baseline", "modified")
+
+# Valid GeoJSON the sidecar cannot reproduce byte for byte
+UNREPRODUCIBLE = {
+    "MultiPolygon": {"type": "MultiPolygon", "coordinates": [[[[13.0, 52.0], [13.1, 52.0], [13.1, 52.1], [13.0, 52.0]]]]},
+    "3D coordinates": {"type": "LineString", "coordinates": [[13.0, 52.0, 34.5], [13.1, 52.1, 35.0]]},
+    "integer coordinates": {"type": "LineString", "coordinates": [[13, 52], [13.1, 52.1]]},
+}
+
+
+def check_layer(path: str, failures: List[str]) -> str:
+    """Sidecar checks for one written layer; returns a report line."""
+    name = os.path.join(*path.split(os.sep)[-3:])
+    reader = open_sidecar(path)
+    if reader is None:
+        failures.append(f"{name}: no current sidecar")
+        return f"  {name}: no sidecar"
+    reader.close()
+    t0 = time.perf_counter()
+    error = round_trip_error(path, sidecar_path(path))
+    decode_s = time.perf_counter() - t0
+    if error:
+        failures.append(f"{name}: sidecar round trip: {error}")
+    listing = set(os.listdir(os.path.dirname(path)))
+    t0 = time.perf_counter()
+    error = round_trip_error(path)
+    check_s = time.perf_counter() - t0
+    if error:
+        failures.append(f"{name}: --check round trip: {error}")
+    if set(os.listdir(os.path.dirname(path))) != listing:
+        failures.append(f"{name}: --check wrote next to the GeoJSON")
+    size, side = os.path.getsize(path), os.path.getsize(sidecar_path(path))
+    return (f"  {name}: {size / 1e6:.1f} MB GeoJSON, {side / 1e6:.1f} MB sidecar; decode + compare {decode_s:.2f}s, "
+            f"encode + decode + compare {check_s:.2f}s")
+
+
+def compact_copy(path: str) -> str:
+    """path re-written compact (the GEOJSON_COMPACT layout) with its own sidecar."""
+    with open(path, "r", encoding="utf-8") as f:
+        fc = json.load(f)
+    out = path.replace(".geojson", "_compact.geojson")
+    extra = {k: v for k, v in fc.items() if k not in ("type", "features")}
+    write_sidecar(out, fc, write_feature_collection(out, fc["features"], extra, indent=None))
+    return out
+
+
+def check_unreproducible(tmp: str, good_sidecar: str, failures: List[str]) -> None:
+    """No sidecar (and no stale one left behind) for content the format cannot reproduce."""
+    for what, geometry in UNREPRODUCIBLE.items():
+        path = os.path.join(tmp, "odd.geojson")
+        fc: Dict[str, Any] = {"type": "FeatureCollection", "features": [
+            {"type": "Feature", "properties": {"highway": "service"}, "geometry": geometry},
+        ]}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(fc, f, indent=2)
+        shutil.copyfile(good_sidecar, sidecar_path(path))  # stale sidecar from another file
+        with contextlib.redirect_stderr(io.StringIO()):
+            written = write_sidecar(path, fc)
+        if written is not None or os.path.exists(sidecar_path(path)):
+            failures.append(f"{what}: sidecar written or stale sidecar kept")
+        if not (round_trip_error(path) or "").startswith("not representable"):
+            failures.append(f"{what}: --check did not report it as not representable")
+        print(f"  {what}: no sidecar")
+
+    # A sidecar is ignored once its GeoJSON changes
+    path = os.path.join(tmp, "edited.geojson")
+    fc = {"type": "FeatureCollection", "features": [
+        {"type": "Feature", "properties": {"highway": "service"},
+         "geometry": {"type": "LineString", "coordinates": [[13.0, 52.0], [13.1, 52.1]]}},
+    ]}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(fc, f, indent=2)
+    write_sidecar(path, fc)
+    fc["features"][0]["properties"]["highway"] = "residential"
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(fc, f, indent=2)
+    reader = open_sidecar(path)
+    if reader is not None:
+        reader.close()
+        failures.append("open_sidecar() used a sidecar whose GeoJSON changed")
+    print("  edited GeoJSON: stale sidecar ignored")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Columnar sidecar round trip on the demo layers")
+    ap.add_argument("--kit", help="Check an existing kit's derived/osm_{baseline,modified}.geojson instead")
+    ap.add_argument("--kinds", nargs="+", choices=synth.KINDS, default=list(synth.KINDS))
+    ap.add_argument("--ways", type=int, default=20_000)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    with open(EXAMPLE_DELTA, "r", encoding="utf-8") as f:
+        delta = json.load(f)
+
+    failures: List[str] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.kit:
+            # Compact copies go to tmp so the kit is left untouched
+            layers = []
+            for layer in LAYERS:
+                path = os.path.join(args.kit, "derived", f"osm_{layer}.geojson")
+                if os.path.exists(path):
+                    print(check_layer(path, failures))
+                    layers.append(path)
+                else:
+                    failures.append(f"{path} missing")
+            for path in layers:
+                copy = os.path.join(tmp, os.path.basename(path))
+                shutil.copyfile(path, copy)
+                print(check_layer(compact_copy(copy), failures))
+        else:
+            for kind in args.kinds:
+                out = os.path.join(tmp, kind)
+                os.makedirs(out)
+                t0 = time.perf_counter()
+                _, stats = build_layers(out, kind, args.ways, args.seed, lambda _: delta)
+                print(f"{kind}: {stats['ways']} ways, baseline + modified layers built in {time.perf_counter() - t0:.1f}s")
+                for layer in LAYERS:
+                    path = os.path.join(out, "derived", f"osm_{layer}.geojson")
+                    print(check_layer(path, failures))
+                    print(check_layer(compact_copy(path), failures))
+        print("Unreproducible content:")
+        good = next(os.path.join(root, name) for root, _, names in os.walk(tmp)
+                    for name in names if name.endswith(".ckcol"))
+        check_unreproducible(tmp, good, failures)
+
+    if failures:
+        for f in failures:
+            print(f"❌ {f}", file=sys.stderr)
+        return 1
+    print("✅ bench_columnar: every layer round-trips byte for byte; unreproducible content gets no sidecar")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+bench/bench_geodesy.py — geodesy.py accuracy vs Vincenty's inverse formula + batch throughput
+
+Accuracy:
+  - vincenty_inverse() against the published Flinders Peak -> Buninyong
+    example (Vincenty 1975): 54 972.271 m, azimuths 306°52'05.37" / 127°10'25.07"
+  - vincenty_inverse() and segment_lengths() against GeographicLib
+    (Karney 2013) on ten pairs from 144 m to 15 350 km, so the formula
+    under test is not its own only reference
+  - segment_lengths() against vincenty_inverse() on random segments of
+    10 m .. 50 km anywhere between 80°S and 80°N (worst relative error per
+    class), including a class just below LONG_SEGMENT_M whose samples must
+    all stay on the tangent-plane side of it
+  - bearings() against the Vincenty azimuth at the segment midpoint
+  - way_lengths() against summed segment lengths
+
+Throughput: segment_lengths / bearings / way_lengths over a random-walk
+polyline of --segments segments, with NumPy (when installed) and pure Python.
+
+Exits 1 when an accuracy check fails (tangent-plane relative error over 1e-6,
+Vincenty-range error over 1e-9, published example off by more than 1 mm,
+GeographicLib distances off by more than 0.1 mm or 1e-6 of the length).
+
+Usage:
+  python3 bench/bench_geodesy.py [--segments 1000000] [--samples 2000] [--seed 1]
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from array import array
+from typing import Callable, List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import geodesy  # noqa: E402
+from geodesy import LONG_SEGMENT_M, bearings, meters_to_degrees, segment_lengths, vincenty_inverse, way_lengths  # noqa: E402
+
+# The fourth class sits just below the tangent-plane cutoff, where its error is largest
+CLASSES_M = [10, 100, 1_000, round(0.99 * LONG_SEGMENT_M), 20_000, 50_000]
+STREET_TOLERANCE = 1e-6
+VINCENTY_TOLERANCE = 1e-9
+REFERENCE_TOLERANCE_M = 1e-4
+
+# (lat1, lon1, lat2, lon2, s12 m, azi1, azi2) from GeographicLib 2.1 Geodesic.WGS84.Inverse
+# (Karney 2013, accurate to 15 nm); the first is GeodSolve's documented JFK -> LHR example
+GEOGRAPHICLIB = [
+    (40.6, -73.8, 51.6, -0.5, 5_551_759.400319, 51.198882846, 107.821776736),
+    (1.36, 103.99, 40.64, -73.78, 15_347_512.940513, -2.512159792, -176.694226522),
+    (-33.9, 18.4, -34.6, -58.4, 6_885_481.263538, -114.583261705, -66.479718921),
+    (60.17, 24.94, 59.44, 24.75, 82_024.655821, -172.447457471, -172.611681398),
+    (0.0, 0.0, 0.0, 1.0, 111_319.490793, 90.0, 90.0),
+    (0.0, 0.0, 1.0, 0.0, 110_574.388558, 0.0, 0.0),
+    (89.5, 0.0, 89.5, 180.0, 111_693.950897, 0.0, 180.0),
+    (-80.0, 45.0, -79.96, 45.2, 5_920.514006, 41.126245310, 40.929295877),
+    (52.5, 13.4, 52.52, 13.43, 3_016.913388, 42.453270866, 42.477074654),
+    (35.0, 139.0, 35.001, 139.001, 143.670601, 39.449017148, 39.449590731),
+]
+
+
+def dms(d: int, m: int, s: float) -> float:
+    return math.copysign(abs(d) + m / 60 + s / 3600, d)
+
+
+def published_example() -> List[str]:
+    """Vincenty (1975), Flinders Peak -> Buninyong; returns failures."""
+    lat1, lon1 = dms(-37, 57, 3.72030), dms(144, 25, 29.52440)
+    lat2, lon2 = dms(-37, 39, 10.15610), dms(143, 55, 35.38390)
+    s, a1, a2 = vincenty_inverse(lon1, lat1, lon2, lat2)
+    want_a1, want_a2 = dms(306, 52, 5.37), (dms(127, 10, 25.07) + 180.0) % 360.0
+    print(f"Flinders Peak -> Buninyong: {s:.4f} m (published 54972.271), "
+          f"azimuths {a1:.6f} / {a2:.6f} (published {want_a1:.6f} / {want_a2:.6f})")
+    failures = []
+    if abs(s - 54_972.271) > 1e-3:
+        failures.append(f"published distance off by {abs(s - 54_972.271) * 1000:.2f} mm")
+    if abs(a1 - want_a1) > 1e-5 or abs(a2 - want_a2) > 1e-5:
+        failures.append("published azimuths differ")
+    return failures
+
+
+def geographiclib_rows() -> List[str]:
+    """vincenty_inverse() and segment_lengths() against GEOGRAPHICLIB; returns failures."""
+    failures = []
+    worst_v = worst_s = worst_az = 0.0
+    for lat1, lon1, lat2, lon2, want, az1, az2 in GEOGRAPHICLIB:
+        s, a1, a2 = vincenty_inverse(lon1, lat1, lon2, lat2)
+        seg = segment_lengths([lon1, lat1, lon2, lat2])[0]
+        az = max(abs((a - w + 180.0) % 360.0 - 180.0) for a, w in ((a1, az1), (a2, az2)))
+        worst_v, worst_s, worst_az = max(worst_v, abs(s - want)), max(worst_s, abs(seg - want)), max(worst_az, az)
+        if abs(s - want) > REFERENCE_TOLERANCE_M:
+            failures.append(f"vincenty_inverse {want:.3f} m pair off by {abs(s - want) * 1000:.3f} mm")
+        if abs(seg - want) > max(REFERENCE_TOLERANCE_M, STREET_TOLERANCE * want):
+            failures.append(f"segment_lengths {want:.3f} m pair off by {abs(seg - want) * 1000:.3f} mm")
+        if az > 1e-6:
+            failures.append(f"vincenty_inverse {want:.3f} m pair azimuths off by {az:.2e}°")
+    print(f"GeographicLib ({len(GEOGRAPHICLIB)} pairs, 144 m .. 15 348 km): vincenty_inverse worst "
+          f"{worst_v * 1000:.3f} mm, segment_lengths worst {worst_s * 1000:.3f} mm, azimuths worst {worst_az:.1e}°")
+    return failures
+
+
+def random_segment(rng: random.Random, length_m: float) -> Tuple[float, float, float, float]:
+    lat = rng.uniform(-80.0, 80.0)
+    lon = rng.uniform(-180.0, 180.0)
+    b = rng.uniform(0.0, 2 * math.pi)
+    dlon, dlat = meters_to_degrees(lat, length_m)
+    lat2 = max(-85.0, min(85.0, lat + dlat * math.cos(b)))
+    lon2 = lon + dlon * math.sin(b)
+    if lon2 > 180.0:
+        lon2 -= 360.0  # crosses the antimeridian now and then
+    return lon, lat, lon2, lat2
+
+
+def accuracy(samples: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    failures = []
+    print(f"{'segment':>10}  {'worst rel. error':>16}  {'worst abs. error':>16}  {'worst bearing error':>19}")
+    for length in CLASSES_M:
+        flat = array("d")
+        refs, mid_az = [], []
+        for _ in range(samples):
+            lon1, lat1, lon2, lat2 = random_segment(rng, length)
+            # Two-point "polylines" back to back; only even segments are real
+            flat.extend((lon1, lat1, lon2, lat2))
+            refs.append(vincenty_inverse(lon1, lat1, lon2, lat2)[0])
+            # Bearing reference: azimuth at the midpoint (the tangent-plane bearing is measured there)
+            mlat = (lat1 + lat2) / 2
+            mlon = lon1 + ((lon2 - lon1 + 540.0) % 360.0 - 180.0) / 2
+            mid_az.append(vincenty_inverse(mlon, mlat, lon2, lat2)[1])
+        got = segment_lengths(flat)[0::2]
+        az = bearings(flat)[0::2]
+        rel = max(abs(g - r) / r for g, r in zip(got, refs) if r > 0)
+        ab = max(abs(g - r) for g, r in zip(got, refs))
+        berr = max(abs((a - m + 180.0) % 360.0 - 180.0) for a, m in zip(az, mid_az))
+        print(f"{length:>9}m  {rel:>16.2e}  {ab * 1000:>13.3f} mm  {berr:>17.5f}°")
+        plane = length < LONG_SEGMENT_M
+        limit = STREET_TOLERANCE if plane else VINCENTY_TOLERANCE
+        if rel > limit:
+            failures.append(f"{length} m segments: relative error {rel:.2e} over {limit:.0e}")
+        if any((r < LONG_SEGMENT_M) != plane for r in refs):
+            failures.append(f"{length} m segments: samples on both sides of LONG_SEGMENT_M")
+
+    flat = array("d", (v for _ in range(50) for v in random_segment(rng, 200.0)))
+    offsets = list(range(0, len(flat) // 2 + 1, 4))
+    seg = segment_lengths(flat)
+    want = [sum(seg[j] for j in range(offsets[i], offsets[i + 1] - 1)) for i in range(len(offsets) - 1)]
+    if any(abs(a - b) > 1e-6 for a, b in zip(way_lengths(flat, offsets), want)):
+        failures.append("way_lengths differs from summed segment lengths")
+    return failures
+
+
+def random_walk(n: int, seed: int) -> array:
+    rng = random.Random(seed)
+    flat = array("d")
+    lon, lat = 13.4, 52.5
+    for _ in range(n + 1):
+        lon += rng.uniform(-2e-4, 2e-4)
+        lat += rng.uniform(-2e-4, 2e-4)
+        flat.append(lon)
+        flat.append(lat)
+    return flat
+
+
+def rate(n: int, fn: Callable[[], object], repeat: int = 3) -> float:
+    best = math.inf
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return n / best / 1e6
+
+
+def throughput(segments: int, seed: int) -> None:
+    flat = random_walk(segments, seed)
+    offsets = array("q", range(0, segments + 1, 8))
+    offsets.append(segments + 1)
+    backends = [("numpy", True)] if geodesy.np is not None else []
+    backends.append(("pure Python", False))
+    saved = geodesy.USE_NUMPY
+    try:
+        for name, use_numpy in backends:
+            geodesy.USE_NUMPY = use_numpy
+            print(f"{name:<12} segment_lengths {rate(segments, lambda: segment_lengths(flat)):6.2f} M/s   "
+                  f"bearings {rate(segments, lambda: bearings(flat)):6.2f} M/s   "
+                  f"way_lengths {rate(segments, lambda: way_lengths(flat, offsets)):6.2f} M segments/s")
+    finally:
+        geodesy.USE_NUMPY = saved
+    if geodesy.np is None:
+        print("(NumPy not installed: pure Python only)")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="geodesy.py accuracy and throughput")
+    ap.add_argument("--segments", type=int, default=1_000_000, help="Polyline length for the throughput bench")
+    ap.add_argument("--samples", type=int, default=2_000, help="Random segments per length class")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    failures = published_example()
+    failures += geographiclib_rows()
+    print()
+    failures += accuracy(args.samples, args.seed)
+    print()
+    throughput(args.segments, args.seed)
+    if failures:
+        for f in failures:
+            print(f"❌ {f}", file=sys.stderr)
+        return 1
+    print("\n✅ bench_geodesy: all accuracy checks passed")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+bench/bench_geojson_write.py — GeoJSON write throughput + peak RSS per writer
+
+Each mode runs in a fresh subprocess that builds the same FeatureCollection
+(synthetic street grid, default 100k ways, or --geojson), then writes it:
+
+  json.dumps   old osm_fetch.py path: whole document as one string, then write_text
+  json.dump    old delta_apply.py path: indenting pure-Python encoder into the file
+  stream       geojson_writer indent=2 (byte-identical to the two above)
+  compact      geojson_writer indent=None
+
+Reported per mode: wall time, MB/s of output, output size, and how far peak RSS
+grew over the already-loaded collection while writing. The stream output is
+checked byte-for-byte against json.dumps.
+
+Usage:
+  python3 bench/bench_geojson_write.py [--ways 100000] [--geojson path] [--repeat 3]
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "scripts"))
+sys.path.insert(0, HERE)
+
+import geojson_writer  # noqa: E402  (imported up front: import cost stays outside the timed region)
+
+MODES = ["json.dumps", "json.dump", "stream", "compact"]
+HIGHWAYS = ["residential", "primary", "secondary", "tertiary", "service", "footway"]
+
+
+def build(ways: int, geojson: str) -> Dict[str, Any]:
+    if geojson:
+        with open(geojson, "r", encoding="utf-8") as f:
+            return json.load(f)
+    from bench_spatial import synthetic_network
+
+    feats = synthetic_network(ways)
+    for i, feat in enumerate(feats):
+        feat["properties"].update(
+            highway=HIGHWAYS[i % len(HIGHWAYS)], name=f"Straße {i % 997}", maxspeed=None if i % 3 else "30"
+        )
+    return {"type": "FeatureCollection", "features": feats}
+
+
+def write(mode: str, fc: Dict[str, Any], path: str) -> None:
+    if mode == "json.dumps":
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(fc, indent=2, ensure_ascii=False))
+    elif mode == "json.dump":
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(fc, f, indent=2, ensure_ascii=False)
+    else:
+        geojson_writer.write_feature_collection(path, fc["features"], indent=2 if mode == "stream" else None)
+
+
+def peak_rss_kb(reset: bool = False) -> int:
+    """
+    Peak RSS in KB. On Linux the high-water mark is reset first when asked, so the
+    peak of building the collection does not hide the writer's; elsewhere ru_maxrss.
+    """
+    try:
+        if reset:
+            with open("/proc/self/clear_refs", "w") as f:
+                f.write("5")
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def child(args: argparse.Namespace) -> int:
+    fc = build(args.ways, args.geojson)
+    rss0 = peak_rss_kb(reset=True)
+    t0 = time.perf_counter()
+    write(args.child, fc, args.out)
+    wall = time.perf_counter() - t0
+    rss1 = peak_rss_kb()
+    with open(args.out, "rb") as f:
+        sha = hashlib.sha256(f.read()).hexdigest()
+    print(json.dumps({"wall_s": wall, "rss_growth_kb": rss1 - rss0, "rss_kb": rss1, "bytes": os.path.getsize(args.out), "sha256": sha}))
+    return 0
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="GeoJSON writer throughput / peak RSS")
+    ap.add_argument("--ways", type=int, default=100_000)
+    ap.add_argument("--geojson", default="", help="Benchmark an existing FeatureCollection instead")
+    ap.add_argument("--repeat", type=int, default=3, help="runs per mode (best wall time, max RSS reported)")
+    ap.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    ap.add_argument("--out", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.child:
+        return child(args)
+
+    results: Dict[str, List[Dict[str, Any]]] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in MODES:
+            for _ in range(args.repeat):
+                cmd = [sys.executable, __file__, "--child", mode, "--out", os.path.join(tmp, "out.geojson"),
+                       "--ways", str(args.ways), "--geojson", args.geojson]
+                res = subprocess.run(cmd, check=True, capture_output=True, text=True)
+                results.setdefault(mode, []).append(json.loads(res.stdout))
+
+    print(f"{'mode':<12}{'wall s':>9}{'MB/s':>9}{'out MB':>9}{'peak RSS +MB':>14}{'peak RSS MB':>13}")
+    for mode, runs in results.items():
+        wall = min(r["wall_s"] for r in runs)
+        size = runs[0]["bytes"] / 1e6
+        growth = max(r["rss_growth_kb"] for r in runs) / 1024
+        peak = max(r["rss_kb"] for r in runs) / 1024
+        print(f"{mode:<12}{wall:>9.2f}{size / wall:>9.1f}{size:>9.1f}{growth:>14.1f}{peak:>13.1f}")
+
+    stable = all(len({r["sha256"] for r in runs}) == 1 for runs in results.values())
+    same = results["stream"][0]["sha256"] == results["json.dumps"][0]["sha256"] == results["json.dump"][0]["sha256"]
+    print(f"byte-stable across runs: {stable}; stream == json.dumps == json.dump: {same}")
+    return 0 if stable and same else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
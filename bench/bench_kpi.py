@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+bench/bench_kpi.py — KPI aggregation throughput and scaling on simulated trajectories
+
+Builds the simulation bench's network (bench_simulate.py: routing-bench
+layers plus --zones curb zones), then for each --actors count simulates
+--duration seconds (NumPy stepping when installed) and times kpi.compute()
+per backend. Rows per second should stay roughly flat as the actor count
+grows (the spatial hash keeps conflict checks near-linear); the last column
+is the time per row relative to the smallest run.
+
+Checks (exit 1 on failure):
+  - both backends give the same counts (float totals within 1e-6 relative)
+  - on the smallest run, the conflict events and exposure per actor pair
+    equal an all-pairs reference computed step by step without the hash,
+    and the pedestrian delay is the crossing waits in the actor table (to a
+    step per wait)
+  - on a two-car synthetic delivery (one dwelling inside a curb zone, one
+    outside it), each backend reports the inside car's dwell and delivery
+    and counts the other as stopped outside, and pedestrian delay as n/a
+    (the run has no crossing waits)
+
+Usage:
+  python3 bench/bench_kpi.py [--kind organic] [--ways 10000] [--actors 1250 2500 5000 10000]
+      [--duration 3600] [--zones 4] [--backends numpy python] [--seed 1]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from array import array
+from typing import Any, Dict, List, Set, Tuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "scripts"))
+sys.path.insert(0, HERE)
+
+import kpi  # noqa: E402
+import simulate  # noqa: E402
+import synth  # noqa: E402
+from bench_routing import build_layers  # noqa: E402
+from bench_simulate import delta_with_zones  # noqa: E402
+from columnar import write_sections  # noqa: E402
+from geodesy import meters_to_degrees  # noqa: E402
+
+
+def simulate_dir(graph_file: str, out: str, actors: int, duration: float, seed: int) -> int:
+    """simulate.py's defaults for `actors` over duration seconds into out; returns the trajectory rows."""
+    args = argparse.Namespace(
+        actors=actors, mix=simulate.DEFAULT_MIX, duration=duration, dt=1.0, start="08:00", delivery_share=0.5,
+        dwell=300.0, crossing_wait=simulate.CROSSING_WAIT_S, chunk_steps=300, landmarks=4, seed=seed,
+    )
+    return simulate.run(graph_file, out, args)["rows"]
+
+
+def crossing_waits(sim_dir: str, duration: float) -> Tuple[int, float]:
+    """(waits, seconds within the simulated period) of the pedestrians' crossing waits in the actor table."""
+    actors, table = simulate.read_sections(os.path.join(sim_dir, "actors.cksim"), simulate.ACTORS_MAGIC)
+    ped = actors["actor_types"].index("pedestrian")
+    offsets, t, edge, speed = (table[c] for c in ("point_offsets", "point_t", "point_edge", "point_speed_ms"))
+    waits, seconds = 0, 0.0
+    for a, typ in enumerate(table["actor_type"]):
+        if typ != ped:
+            continue
+        for i in range(offsets[a], offsets[a + 1] - 1):
+            if edge[i] >= 0 and speed[i] == 0:
+                waits += 1
+                seconds += max(0.0, min(t[i + 1], duration) - min(t[i], duration))
+    return waits, seconds
+
+
+def all_pairs_reference(sim_dir: str, radius: float, moving: float) -> Dict[str, Tuple[int, int]]:
+    """Conflict (events, exposure steps) per actor-type pair by checking every pair of rows at each step."""
+    with open(os.path.join(sim_dir, "sim.json"), "r", encoding="utf-8") as f:
+        sim = json.load(f)
+    actors, table = simulate.read_sections(os.path.join(sim_dir, "actors.cksim"), simulate.ACTORS_MAGIC)
+    agg = kpi.KpiAggregator(sim, actors, table, radius, moving)  # origin + scale only
+    types, actor_type = actors["actor_types"], table["actor_type"]
+    out: Dict[str, List[int]] = {}
+    previous: Set[Tuple[int, int]] = set()
+    prev_step = -2
+    for _, cols in simulate.iter_trajectories(sim_dir):
+        if agg.origin is None and len(cols["step"]):
+            agg._set_origin(cols["lon"][0], cols["lat"][0])
+        ox, oy = agg.origin  # type: ignore[misc]
+        mx, my = agg.scale
+        rows = list(zip(cols["step"], cols["actor"], cols["lon"], cols["lat"], cols["speed_ms"]))
+        k = 0
+        while k < len(rows):
+            s = rows[k][0]
+            end = k
+            while end < len(rows) and rows[end][0] == s:
+                end += 1
+            group = [(a, actor_type[a], (lon - ox) * mx, (lat - oy) * my, v) for _, a, lon, lat, v in rows[k:end]]
+            pairs = set()
+            for i in range(len(group)):
+                ai, ti, xi, yi, vi = group[i]
+                for j in range(i + 1, len(group)):
+                    aj, tj, xj, yj, vj = group[j]
+                    if ti == tj or (vi <= moving and vj <= moving):
+                        continue
+                    dx, dy = xj - xi, yj - yi
+                    if dx * dx + dy * dy <= radius * radius:
+                        pair = (min(ai, aj), max(ai, aj))
+                        pairs.add(pair)
+                        name = f"{types[min(ti, tj)]}/{types[max(ti, tj)]}"
+                        counts = out.setdefault(name, [0, 0])
+                        counts[1] += 1
+                        if prev_step != s - 1 or pair not in previous:
+                            counts[0] += 1
+            previous, prev_step = pairs, s
+            k = end
+    return {name: (e, x) for name, (e, x) in out.items()}
+
+
+def delivery_dir(out: str, dwell_s: float = 60.0) -> None:
+    """Two cars driving 100 m east in 20 s, then dwelling dwell_s: one in a 10 m curb zone, one 50 m north of it."""
+    lon, lat = 13.4, 52.5
+    dlon, dlat = meters_to_degrees(lat, 1.0)
+    rings = [[[lon + dx * 5 * dlon, lat + dy * 5 * dlat] for dx, dy in ((-1, -1), (1, -1), (1, 1), (-1, 1), (-1, -1))]]
+    cols = {name: array(tc) for name, tc in (
+        ("actor_type", "b"), ("delivery", "b"), ("zone", "h"), ("origin", "i"), ("destination", "i"),
+        ("depart_s", "d"), ("arrive_s", "d"), ("end_s", "d"), ("route_m", "d"), ("point_offsets", "q"),
+        ("point_lon", "d"), ("point_lat", "d"), ("point_t", "d"), ("point_edge", "i"), ("point_speed_ms", "f"),
+    )}
+    cols["point_offsets"].append(0)
+    for north in (0.0, 50.0):
+        y = lat + north * dlat
+        for name, value in (
+            ("actor_type", list(simulate.ACTOR_MODES).index("car")), ("delivery", 1), ("zone", 0), ("origin", 0),
+            ("destination", 1), ("depart_s", 0.0), ("arrive_s", 20.0), ("end_s", 20.0 + dwell_s), ("route_m", 100.0),
+        ):
+            cols[name].append(value)
+        for x, t, edge, speed in ((lon - 100 * dlon, 0.0, 0, 5.0), (lon, 20.0, -1, 0.0), (lon, 20.0 + dwell_s, -1, 0.0)):
+            cols["point_lon"].append(x)
+            cols["point_lat"].append(y)
+            cols["point_t"].append(t)
+            cols["point_edge"].append(edge)
+            cols["point_speed_ms"].append(speed)
+        cols["point_offsets"].append(len(cols["point_t"]))
+    zones = [{"centroid": [lon, lat], "rings": rings, "zone_type": "loading", "hours": "08:00-18:00"}]
+    header = {"format": "citykit-sim-actors", "version": simulate.VERSION, "actors": 2,
+              "actor_types": list(simulate.ACTOR_MODES), "curb_zones": zones}
+    os.makedirs(out)
+    write_sections(os.path.join(out, "actors.cksim"), header, cols, simulate.ACTORS_MAGIC, simulate.VERSION)
+    duration = 40.0 + dwell_s
+    stepped = simulate.simulate(cols, out, duration, 1.0, 300)
+    simulate.write_index(out, {
+        "format": "citykit-simulation", "version": simulate.VERSION, "graph": "synthetic", "start": "08:00",
+        "duration_s": duration, "dt_s": 1.0, "seed": 0, "actors": {"requested": 2, "simulated": 2, "by_type": {}},
+        "curb_zones": zones, "actor_table": "actors.cksim", **stepped,
+    })
+
+
+def check_delivery(result: Dict[str, Any], dwell_s: float = 60.0) -> List[str]:
+    """Differences from what delivery_dir()'s two cars should give."""
+    zone, deliveries = result["curb_zones"][0], result["deliveries"]
+    want = {"dwell_s": dwell_s, "vehicles": 1, "deliveries": 1, "completed": 1, "outside_zone": 1}
+    got = {"dwell_s": zone["dwell_s"], "vehicles": zone["vehicles"], "deliveries": zone["deliveries"],
+           "completed": deliveries["completed"], "outside_zone": deliveries["outside_zone"]}
+    diffs = [f"{k}: {got[k]} != {v}" for k, v in want.items() if got[k] != v]
+    if result["pedestrian_delay"]["lost_s"] is not None:
+        diffs.append("pedestrian delay measured without crossing waits")
+    return diffs
+
+
+def compare(a: Any, b: Any, path: str = "") -> List[str]:
+    """Differences between two KPI results (floats within 1e-6 relative)."""
+    if isinstance(a, dict) and isinstance(b, dict):
+        diffs = []
+        for key in sorted(set(a) | set(b)):
+            if key != "backend":
+                diffs += compare(a.get(key), b.get(key), f"{path}.{key}")
+        return diffs
+    if isinstance(a, list) and isinstance(b, list) and len(a) == len(b):
+        return [d for i, (x, y) in enumerate(zip(a, b)) for d in compare(x, y, f"{path}[{i}]")]
+    if isinstance(a, float) and isinstance(b, float):
+        return [] if abs(a - b) <= 1e-6 * max(1.0, abs(a)) + 0.05 else [f"{path}: {a} != {b}"]
+    return [] if a == b else [f"{path}: {a!r} != {b!r}"]
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="KPI aggregation throughput and scaling")
+    ap.add_argument("--kind", choices=synth.KINDS, default="organic")
+    ap.add_argument("--ways", type=int, default=10_000)
+    ap.add_argument("--actors", type=int, nargs="+", default=[1_250, 2_500, 5_000, 10_000])
+    ap.add_argument("--duration", type=float, default=3600.0)
+    ap.add_argument("--zones", type=int, default=4)
+    ap.add_argument("--backends", nargs="+", choices=["numpy", "python"], default=["numpy", "python"])
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    backends = [b for b in args.backends if b == "python" or kpi.np is not None]
+    if len(backends) < len(args.backends):
+        print("(NumPy not installed: pure Python only)")
+
+    failures: List[str] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        graph_file, stats = build_layers(tmp, args.kind, args.ways, args.seed, delta_with_zones(args.zones, args.seed))
+        print(f"Network: {args.kind}, {stats['ways']} ways -> {stats['vertices']} vertices, {stats['edges']} edges "
+              f"(layers + graph built in {time.perf_counter() - t0:.1f}s)")
+        print(f"{'actors':>7} {'rows':>11}  {'backend':<8} {'seconds':>8} {'M rows/s':>9} {'conflicts':>9}  {'per row vs first':>16}")
+        first: Dict[str, float] = {}
+        sim_saved, kpi_saved = simulate.USE_NUMPY, kpi.USE_NUMPY
+        try:
+            for n, actors in enumerate(sorted(args.actors)):
+                sim_dir = os.path.join(tmp, f"sim-{actors}")
+                rows = simulate_dir(graph_file, sim_dir, actors, args.duration, args.seed)
+                results = {}
+                for backend in backends:
+                    kpi.USE_NUMPY = backend == "numpy"
+                    t0 = time.perf_counter()
+                    results[backend] = kpi.compute(sim_dir)
+                    sec = time.perf_counter() - t0
+                    per_row = sec / max(1, rows)
+                    first.setdefault(backend, per_row)
+                    print(f"{actors:>7} {rows:>11,}  {backend:<8} {sec:>8.2f} {rows / sec / 1e6:>9.2f} "
+                          f"{results[backend]['conflicts']['events']:>9}  {per_row / first[backend]:>15.2f}x")
+                if len(results) > 1:
+                    diffs = compare(results[backends[0]], results[backends[1]])
+                    if diffs:
+                        failures.append(f"{actors} actors: backends differ: {'; '.join(diffs[:5])}")
+                if n == 0:
+                    t0 = time.perf_counter()
+                    ref = all_pairs_reference(sim_dir, kpi.CONFLICT_RADIUS_M, kpi.MOVING_MS)
+                    got = {name: (v["events"], round(v["exposure_s"])) for name, v in results[backends[0]]["conflicts"]["by_pair"].items()}
+                    print(f"        all-pairs reference: {sum(e for e, _ in ref.values())} conflicts "
+                          f"({time.perf_counter() - t0:.1f}s)")
+                    if got != ref:
+                        failures.append(f"conflicts differ from the all-pairs reference: {got} != {ref}")
+                    waits, wait_s = crossing_waits(sim_dir, args.duration)
+                    lost_s = results[backends[0]]["pedestrian_delay"]["lost_s"]
+                    print(f"        pedestrian delay: {lost_s:,} s lost, {waits} crossing waits of {wait_s:,.0f} s")
+                    if not lost_s or abs(lost_s - wait_s) > waits * 1.0:
+                        failures.append(f"pedestrian delay {lost_s} s is not the {wait_s:.0f} s of crossing waits")
+                shutil.rmtree(sim_dir)
+
+            sim_dir = os.path.join(tmp, "delivery")
+            delivery_dir(sim_dir)
+            for backend in backends:
+                kpi.USE_NUMPY = backend == "numpy"
+                diffs = check_delivery(kpi.compute(sim_dir))
+                if diffs:
+                    failures.append(f"synthetic delivery ({backend}): {'; '.join(diffs)}")
+            print(f"Synthetic delivery: dwell inside the zone counted, stop outside it not ({', '.join(backends)})")
+        finally:
+            simulate.USE_NUMPY, kpi.USE_NUMPY = sim_saved, kpi_saved
+
+    if failures:
+        for f in failures:
+            print(f"❌ {f}", file=sys.stderr)
+        return 1
+    print(f"✅ bench_kpi: {', '.join(backends)} agree, conflicts match the all-pairs reference, curb deliveries and crossing waits counted")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+bench/bench_osm_fetch.py — osm_fetch.py's sources on one synthetic network: Overpass tiles, OSM extracts
+
+Serves a synthetic network (bench/synth.py) from a local http.server stub that
+answers osm_fetch.py's query the way Overpass does: the ways touching the
+query's bbox (osm_xml.coords_touch_bbox, segments crossing it included) and
+all their nodes, nodes then ways by id. The same network is also written as
+OSM XML. Then runs osm_fetch.py for a corridor inside the network:
+
+  single    OVERPASS_TILES=1x1
+  tiled     OVERPASS_TILES=--tiles, the centre tile failing --retries times
+            before it answers (per-tile retry with backoff)
+  streamed  the same grid with OVERPASS_STREAM=1
+  abort     the same grid with one tile always failing while another hangs:
+            osm_fetch.py must exit 2 without waiting for the hung request
+  extract   OSM_EXTRACT=network.osm (no server)
+  extracts  OSM_EXTRACT=a directory of two .osm.gz files (nodes / ways)
+
+Checks (exit 1 on failure):
+  - tiled, streamed and extract output equal the single fetch byte for byte
+    (derived/osm_baseline.geojson, .ckcol, .noderefs)
+  - the failing tile took --retries + 1 attempts (stub request count and
+    provenance), every other tile one
+  - the aborted run exits 2 within ABORT_LIMIT_S
+
+Usage:
+  python3 bench/bench_osm_fetch.py [--kind organic] [--ways 3000] [--tiles 3x3] [--retries 2] [--seed 1]
+"""
+
+from __future__ import annotations
+
+import argparse
+import filecmp
+import gzip
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+from urllib.parse import parse_qs
+from xml.sax.saxutils import quoteattr
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS = os.path.join(HERE, "..", "scripts")
+sys.path.insert(0, SCRIPTS)
+sys.path.insert(0, HERE)
+
+import synth  # noqa: E402
+from osm_fetch import split_bbox  # noqa: E402
+from osm_xml import coords_touch_bbox  # noqa: E402
+
+OUTPUTS = ("derived/osm_baseline.geojson", "derived/osm_baseline.ckcol", "derived/osm_baseline.noderefs")
+ABORT_LIMIT_S = 10.0
+HANG_S = 60.0
+BBOX_RE = re.compile(r'way\["highway"\]\(([^)]*)\)')
+
+BBox = Tuple[float, float, float, float]  # query order: min_lat, min_lon, max_lat, max_lon
+
+
+class StubOverpass(ThreadingHTTPServer):
+    """Overpass stand-in on 127.0.0.1 for one network; fail / hang are keyed by query bbox."""
+
+    daemon_threads = True
+
+    def __init__(self, elements: List[Dict[str, Any]]) -> None:
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.nodes = {el["id"]: el for el in elements if el["type"] == "node"}
+        self.ways = [el for el in elements if el["type"] == "way"]
+        self.coords = [[(self.nodes[n]["lon"], self.nodes[n]["lat"]) for n in w["nodes"]] for w in self.ways]
+        self.fail: Dict[BBox, int] = {}  # bbox -> failures left (-1 = always)
+        self.hang: Set[BBox] = set()
+        self.requests: Dict[BBox, int] = {}
+        self.release = threading.Event()
+        self.lock = threading.Lock()
+
+    @property
+    def endpoint(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/api/interpreter"
+
+    def answer(self, bbox: BBox) -> bytes:
+        min_lat, min_lon, max_lat, max_lon = bbox
+        aoi = (min_lon, min_lat, max_lon, max_lat)
+        ways = [w for w, c in zip(self.ways, self.coords) if coords_touch_bbox(c, aoi)]
+        ids = sorted({n for w in ways for n in w["nodes"]})
+        elements = [self.nodes[n] for n in ids] + sorted(ways, key=lambda w: w["id"])
+        return json.dumps({"version": 0.6, "generator": "citykit bench stub", "elements": elements}).encode("utf-8")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: StubOverpass
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0)).decode("utf-8")
+        match = BBOX_RE.search(parse_qs(body).get("data", [""])[0])
+        if match is None:
+            self.send_error(400, "no bbox in query")
+            return
+        bbox = tuple(float(v) for v in match.group(1).split(","))
+        stub = self.server
+        with stub.lock:
+            stub.requests[bbox] = stub.requests.get(bbox, 0) + 1
+            left = stub.fail.get(bbox, 0)
+            if left > 0:
+                stub.fail[bbox] = left - 1
+        if bbox in stub.hang:
+            stub.release.wait(HANG_S)
+            self.close_connection = True  # never answers
+            return
+        if left:
+            self.send_error(503, "stub: tile failing on purpose")
+            return
+        data = stub.answer(bbox)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+def osm_xml(elements: List[Dict[str, Any]]) -> Iterator[str]:
+    """Elements as the lines of an .osm file (as a planet extract writes them)."""
+    yield "<?xml version='1.0' encoding='UTF-8'?>\n<osm version=\"0.6\" generator=\"citykit bench\">\n"
+    for el in elements:
+        if el["type"] == "node":
+            yield f'  <node id="{el["id"]}" lat="{el["lat"]!r}" lon="{el["lon"]!r}"/>\n'
+            continue
+        yield f'  <way id="{el["id"]}">\n'
+        yield "".join(f'    <nd ref="{n}"/>\n' for n in el["nodes"])
+        yield "".join(f"    <tag k={quoteattr(k)} v={quoteattr(v)}/>\n" for k, v in (el.get("tags") or {}).items())
+        yield "  </way>\n"
+    yield "</osm>\n"
+
+
+def write_extracts(tmp: str, elements: List[Dict[str, Any]]) -> Tuple[str, str]:
+    """(network.osm, directory of nodes.osm.gz + ways.osm.gz) holding elements."""
+    path = os.path.join(tmp, "network.osm")
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(osm_xml(elements))
+    split = os.path.join(tmp, "extract")
+    os.makedirs(split)
+    for name, kind in (("nodes", "node"), ("ways", "way")):
+        with gzip.open(os.path.join(split, f"{name}.osm.gz"), "wt", encoding="utf-8") as f:
+            f.writelines(osm_xml([el for el in elements if el["type"] == kind]))
+    return path, split
+
+
+def tile_bboxes(bbox: Dict[str, float], rows: int, cols: int) -> List[BBox]:
+    """osm_fetch.split_bbox's tiles as query bboxes (same arithmetic, so the same floats)."""
+    return [(t["min_lat"], t["min_lon"], t["max_lat"], t["max_lon"]) for t in split_bbox(bbox, rows, cols)]
+
+
+def run_fetch(out: str, corridor: str, endpoint: str, tiles: str, retries: int,
+              extra: Optional[Dict[str, str]] = None) -> Tuple[int, float, str]:
+    """osm_fetch.py into out; returns (exit code, seconds, stderr)."""
+    env = {k: v for k, v in os.environ.items() if not k.startswith(("OVERPASS_", "OSM_", "CITYKIT_"))}
+    env.update({
+        "CORRIDOR": corridor, "OSM_OUT_DIR": out, "OVERPASS_ENDPOINT": endpoint, "OVERPASS_TILES": tiles,
+        "OVERPASS_RETRIES": str(retries), "OVERPASS_BACKOFF": "0.05", "OVERPASS_CACHE_TTL": "0",
+        "OVERPASS_WORKERS": "9", "OVERPASS_TIMEOUT": str(int(HANG_S)), "GEOJSON_COMPACT": "0",
+    })
+    env.update(extra or {})
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, os.path.join(SCRIPTS, "osm_fetch.py")], env=env,
+                          capture_output=True, text=True)
+    return proc.returncode, time.perf_counter() - t0, proc.stderr
+
+
+def differing(a: str, b: str) -> List[str]:
+    return [name for name in OUTPUTS if not filecmp.cmp(os.path.join(a, name), os.path.join(b, name), shallow=False)]
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Tiled Overpass fetches against a local stub server")
+    ap.add_argument("--kind", choices=synth.KINDS, default="organic")
+    ap.add_argument("--ways", type=int, default=3_000)
+    ap.add_argument("--tiles", default="3x3", help="ROWSxCOLS grid of the tiled runs")
+    ap.add_argument("--retries", type=int, default=2, help="OVERPASS_RETRIES; the centre tile fails this often")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    rows, cols = (int(v) for v in args.tiles.lower().split("x"))
+    if rows * cols < 2:
+        print("ERROR: --tiles needs at least two tiles", file=sys.stderr)
+        return 1
+
+    elements = list(synth.elements(args.kind, args.ways, args.seed))
+    lons = [el["lon"] for el in elements if el["type"] == "node"]
+    lats = [el["lat"] for el in elements if el["type"] == "node"]
+    # A corridor inside the network, so ways cross its edges as well as the tiles'
+    x0, x1, y0, y1 = min(lons), max(lons), min(lats), max(lats)
+    bbox = {
+        "min_lat": round(y0 + 0.1 * (y1 - y0), 6), "min_lon": round(x0 + 0.1 * (x1 - x0), 6),
+        "max_lat": round(y1 - 0.1 * (y1 - y0), 6), "max_lon": round(x1 - 0.1 * (x1 - x0), 6),
+    }
+    tiles = tile_bboxes(bbox, rows, cols)
+    centre = tiles[len(tiles) // 2]
+
+    failures: List[str] = []
+    server = StubOverpass(elements)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            corridor = os.path.join(tmp, "corridor.json")
+            with open(corridor, "w", encoding="utf-8") as f:
+                json.dump({"schema_version": "0.1", "name": "bench corridor", "aoi": {"type": "bbox", **bbox}}, f)
+            print(f"Network: {args.kind}, {len(server.ways)} ways; corridor {bbox}")
+
+            single = os.path.join(tmp, "single")
+            code, sec, err = run_fetch(single, corridor, server.endpoint, "1x1", args.retries)
+            if code != 0:
+                print(err, file=sys.stderr)
+                print(f"❌ single fetch exited {code}", file=sys.stderr)
+                return 1
+            with open(os.path.join(single, "derived", "osm_baseline.geojson"), "r", encoding="utf-8") as f:
+                features = len(json.load(f)["features"])
+            print(f"  single    1x1: {features} features in {sec:.2f}s")
+
+            for name, extra in (("tiled", {}), ("streamed", {"OVERPASS_STREAM": "1"})):
+                server.requests.clear()
+                server.fail = {centre: args.retries}
+                out = os.path.join(tmp, name)
+                code, sec, err = run_fetch(out, corridor, server.endpoint, args.tiles, args.retries, extra)
+                if code != 0:
+                    failures.append(f"{name} fetch exited {code}: {err.strip().splitlines()[-1:]}")
+                    continue
+                with open(os.path.join(out, "provenance", "osm_query.json"), "r", encoding="utf-8") as f:
+                    records = json.load(f)["tiling"]["tiles"]
+                attempts = [r["attempts"] for r in records]
+                want = [args.retries + 1 if t == centre else 1 for t in tiles]
+                print(f"  {name:<9} {args.tiles}: {len(records)} tiles in {sec:.2f}s, attempts {attempts}")
+                if attempts != want or [server.requests.get(t, 0) for t in tiles] != want:
+                    failures.append(f"{name}: attempts {attempts} / requests "
+                                    f"{[server.requests.get(t, 0) for t in tiles]}, expected {want}")
+                diff = differing(single, out)
+                if diff:
+                    failures.append(f"{name} output differs from the single fetch: {', '.join(diff)}")
+
+            # One tile fails for good while another hangs: exit 2 without waiting for the hung one
+            server.fail = {tiles[0]: -1}
+            server.hang = {tiles[-1]}
+            code, sec, err = run_fetch(os.path.join(tmp, "abort"), corridor, server.endpoint, args.tiles, 1)
+            server.release.set()
+            print(f"  abort     {args.tiles}: exit {code} after {sec:.2f}s (a hung tile waits up to {HANG_S:g}s)")
+            if code != 2:
+                failures.append(f"aborted fetch exited {code}, expected 2")
+            if sec > ABORT_LIMIT_S:
+                failures.append(f"aborted fetch took {sec:.1f}s: waited for the tiles in flight")
+
+            # The same network read from OSM XML instead of the server (which would fail every query now)
+            for name, extract in zip(("extract", "extracts"), write_extracts(tmp, elements)):
+                out = os.path.join(tmp, name)
+                code, sec, err = run_fetch(out, corridor, server.endpoint, "1x1", 0, {"OSM_EXTRACT": extract})
+                print(f"  {name:<9} {os.path.basename(extract)}: exit {code} in {sec:.2f}s")
+                if code != 0:
+                    failures.append(f"{name} fetch exited {code}: {err.strip().splitlines()[-1:]}")
+                    continue
+                diff = differing(single, out)
+                if diff:
+                    failures.append(f"{name} output differs from the Overpass fetch: {', '.join(diff)}")
+    finally:
+        server.release.set()
+        server.shutdown()
+        server.server_close()
+
+    if failures:
+        for f in failures:
+            print(f"❌ {f}", file=sys.stderr)
+        return 1
+    print(f"✅ bench_osm_fetch: {args.tiles} tiles (plain and streamed) and OSM extracts match the single fetch "
+          "byte for byte; per-tile retries and fail-fast abort work")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+bench/bench_osm_parse.py — Peak RSS + wall time: json.loads/build_features vs osm_stream
+
+Generates a synthetic Overpass JSON response (grid network, default 100k ways),
+then parses it in a fresh subprocess per path so ru_maxrss is not shared:
+
+  - loads:  resp.read() + json.loads + osm_fetch.build_features (current path)
+  - stream: osm_stream.iter_elements + FeatureBuilder (OVERPASS_STREAM=1 path)
+
+Both paths must produce the same features (compared by sha256 of the JSON).
+
+Usage:
+  python3 bench/bench_osm_parse.py [--ways 100000] [--nodes-per-way 6]
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts")
+
+
+def write_synthetic_response(path: str, ways: int, nodes_per_way: int, seed: int = 42) -> int:
+    """Write an Overpass-style response (nodes by id, then ways by id). Returns byte size."""
+    rng = random.Random(seed)
+    segs = nodes_per_way - 1
+    # Square grid of n x n nodes: 2 * n * ((n - 1) // segs) ways >= requested
+    n = int((ways * segs / 2) ** 0.5) + segs + 1
+    rows = cols = n
+
+    def nid(r: int, c: int) -> int:
+        return 1 + r * cols + c
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{\n  "version": 0.6,\n  "generator": "citykit bench",\n  "elements": [\n')
+        first = True
+        for r in range(rows):
+            for c in range(cols):
+                el = {"type": "node", "id": nid(r, c), "lat": 52.5 + r * 1e-4, "lon": 13.4 + c * 1e-4}
+                f.write(("" if first else ",\n") + json.dumps(el))
+                first = False
+        way_id = 10_000_000
+        emitted = 0
+        highways = ["residential", "primary", "secondary", "footway", "cycleway", "service"]
+        for r in range(rows):
+            for c0 in range(0, cols - segs, segs):
+                if emitted >= ways:
+                    break
+                way_id += 1
+                emitted += 1
+                el = {
+                    "type": "way",
+                    "id": way_id,
+                    "nodes": [nid(r, c0 + k) for k in range(nodes_per_way)],
+                    "tags": {"highway": rng.choice(highways), "name": f"Street {r}"},
+                }
+                f.write(",\n" + json.dumps(el))
+        for c in range(cols):
+            for r0 in range(0, rows - segs, segs):
+                if emitted >= ways:
+                    break
+                way_id += 1
+                emitted += 1
+                el = {
+                    "type": "way",
+                    "id": way_id,
+                    "nodes": [nid(r0 + k, c) for k in range(nodes_per_way)],
+                    "tags": {"highway": rng.choice(highways), "surface": "asphalt"},
+                }
+                f.write(",\n" + json.dumps(el))
+        f.write("\n  ]\n}\n")
+    return os.path.getsize(path)
+
+
+def run_child(mode: str, path: str) -> None:
+    sys.path.insert(0, SCRIPTS_DIR)
+    t0 = time.perf_counter()
+    if mode == "loads":
+        from osm_fetch import build_features
+
+        with open(path, "rb") as fp:
+            raw = fp.read().decode("utf-8")
+        features = build_features(json.loads(raw))
+    else:
+        from osm_stream import FeatureBuilder, iter_elements
+
+        builder = FeatureBuilder()
+        with open(path, "rb") as fp:
+            for el in iter_elements(fp):
+                builder.add(el)
+        features = builder.finish()
+    wall = time.perf_counter() - t0
+    digest = hashlib.sha256(json.dumps(features).encode("utf-8")).hexdigest()
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"mode": mode, "wall_s": wall, "peak_rss_kb": rss_kb, "features": len(features), "sha256": digest}))
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Benchmark Overpass response parsing paths")
+    ap.add_argument("--ways", type=int, default=100_000)
+    ap.add_argument("--nodes-per-way", type=int, default=6)
+    ap.add_argument("--child", choices=["loads", "stream"], help=argparse.SUPPRESS)
+    ap.add_argument("--input", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        run_child(args.child, args.input)
+        return 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "overpass.json")
+        size = write_synthetic_response(path, args.ways, args.nodes_per_way)
+        print(f"synthetic response: {args.ways} ways, {size / 1e6:.1f} MB")
+
+        results = []
+        for mode in ("loads", "stream"):
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", mode, "--input", path],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            results.append(json.loads(out))
+
+    print(f"{'mode':<8} {'wall_s':>8} {'peak_rss_MB':>12} {'features':>9}")
+    for r in results:
+        print(f"{r['mode']:<8} {r['wall_s']:>8.2f} {r['peak_rss_kb'] / 1024:>12.1f} {r['features']:>9}")
+
+    if results[0]["sha256"] != results[1]["sha256"]:
+        print("ERROR: parse paths produced different features", file=sys.stderr)
+        return 1
+    print("features identical: yes")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+bench/bench_package_kit.py — Kit packaging: zip -qr vs zipfile vs package_kit.py
+
+Builds a throwaway kit (synthetic network GeoJSON of ~--mb MB plus its
+modified copy, a random --video-mb MB "mp4" and the small JSON files) and packs it with:
+
+  zip -qr          old demo.sh path when the zip CLI exists (skipped otherwise)
+  zipfile          old demo.sh fallback: ZIP_DEFLATED over rglob, one thread
+  package_kit      scripts/package_kit.py with 1 worker and with --workers
+
+Reported per packer: wall time, zip size, and whether two packs of the same kit
+(after touching every file) are byte-identical.
+
+Usage:
+  python3 bench/bench_package_kit.py [--mb 100] [--video-mb 50] [--workers N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+from typing import Callable, Dict
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "scripts"))
+sys.path.insert(0, HERE)
+
+from bench_viz_encode import curvy_network  # noqa: E402
+from geojson_writer import write_feature_collection  # noqa: E402
+from package_kit import pack_kit  # noqa: E402
+
+
+def build_kit(kit: Path, mb: int, video_mb: int) -> None:
+    for sub in ["derived", "multiview", "labels", "pcd_groundtruth", "pcd_pseudo"]:
+        (kit / sub).mkdir(parents=True, exist_ok=True)
+    feats = curvy_network(max(1000, mb * 1000))
+    write_feature_collection(str(kit / "derived" / "osm_baseline.geojson"), feats)
+    for f in feats[::3]:
+        f["properties"]["maxspeed_kph"] = 20
+    write_feature_collection(str(kit / "derived" / "osm_modified.geojson"), feats)
+    with open(kit / "multiview" / "robot_front.mp4", "wb") as f:
+        for _ in range(video_mb):
+            f.write(os.urandom(1 << 20))
+    for name in ["scenario.json", "dataset_manifest.json", "actors.json"]:
+        (kit / name).write_text('{"schema_version": "0.2"}\n', encoding="utf-8")
+
+
+def zip_cli(kit: Path, out: Path) -> None:
+    subprocess.run(["zip", "-qr", str(out), kit.name], cwd=kit.parent, check=True)
+
+
+def zipfile_fallback(kit: Path, out: Path) -> None:
+    with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        for p in kit.rglob("*"):
+            arc = f"{kit.name}/" + p.relative_to(kit).as_posix()
+            if p.is_dir():
+                z.writestr(arc + "/", "")
+            else:
+                z.write(p, arc)
+
+
+def sha(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Kit packaging throughput and determinism")
+    ap.add_argument("--mb", type=int, default=100, help="approx. size of each GeoJSON layer")
+    ap.add_argument("--video-mb", type=int, default=50)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = ap.parse_args()
+
+    packers: Dict[str, Callable[[Path, Path], None]] = {}
+    if shutil.which("zip"):
+        packers["zip -qr"] = zip_cli
+    packers["zipfile"] = zipfile_fallback
+    packers["package_kit -w1"] = lambda kit, out: pack_kit(str(kit), str(out), workers=1)
+    packers[f"package_kit -w{args.workers}"] = lambda kit, out: pack_kit(str(kit), str(out), workers=args.workers)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        kit = Path(tmp) / "city_demo_kit"
+        build_kit(kit, args.mb, args.video_mb)
+        total = sum(p.stat().st_size for p in kit.rglob("*") if p.is_file())
+        print(f"kit: {total / 1e6:.0f} MB ({os.cpu_count()} CPUs)")
+        print(f"{'packer':<18}{'seconds':>9}{'MB/s':>8}{'zip MB':>9}{'repeatable':>12}")
+        for name, pack in packers.items():
+            first, second = Path(tmp) / "a.zip", Path(tmp) / "b.zip"
+            for p in (first, second):
+                if p.exists():
+                    p.unlink()
+            t0 = time.perf_counter()
+            pack(kit, first)
+            seconds = time.perf_counter() - t0
+            time.sleep(1.1)  # move mtimes past zip's 2-second DOS resolution
+            for p in kit.rglob("*"):
+                os.utime(p)
+            pack(kit, second)
+            same = sha(first) == sha(second)
+            print(f"{name:<18}{seconds:>9.2f}{total / 1e6 / seconds:>8.0f}{first.stat().st_size / 1e6:>9.1f}{str(same):>12}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
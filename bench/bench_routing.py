@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+bench/bench_routing.py — Routing queries per second on synthetic street networks
+
+Builds a synthetic network (bench/synth.py), its baseline and modified layers
+(set_speed_limit on residential streets + a corridor geofence, as in the
+example delta) and their road graphs, then on the modified graph, per mode:
+
+  dijkstra      plain one-to-one Dijkstra (the reference answer)
+  astar         bidirectional A*, distance / top speed potential
+  alt           bidirectional A* with --landmarks ALT landmarks (preprocessing timed separately)
+  matrix        --matrix x --matrix many-to-many, in pairs per second
+  isochrone     one 600 s isochrone per query
+
+Every astar / alt answer is checked against dijkstra (same travel time within
+1e-9 relative); the bench exits 1 on a mismatch.
+
+Usage:
+  python3 bench/bench_routing.py [--kind organic] [--ways 10000] [--queries 200]
+      [--modes car foot] [--landmarks 8] [--matrix 50] [--at 08:00] [--seed 1]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "scripts"))
+sys.path.insert(0, HERE)
+
+import synth  # noqa: E402
+from columnar import write_sidecar  # noqa: E402
+from delta_apply import LazySpatialIndex, modified_collection, write_geojson  # noqa: E402
+from geojson_writer import write_feature_collection  # noqa: E402
+from osm_fetch import build_features  # noqa: E402
+from noderefs import noderefs_path, write_node_refs  # noqa: E402
+from road_graph import RoadGraph, build  # noqa: E402
+from routing import INF, Router, graph_geofences  # noqa: E402
+from tag_selector import TagIndex  # noqa: E402
+
+DELTA = {
+    "schema_version": "0.1",
+    "name": "bench routing delta",
+    "ops": [
+        {"op": "set_speed_limit", "target": {"selector": "highway=residential"}, "value_kph": 20},
+        {"op": "add_geofence", "where": {"type": "corridor_aoi"}, "allowed_hours": "06:00-22:00"},
+    ],
+}
+
+
+def build_layers(
+    tmp: str, kind: str, ways: int, seed: int, delta: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    """Write baseline + modified GeoJSON/sidecars/graphs under tmp; returns (modified graph path, synth stats).
+
+    delta(stats) returns the delta to apply (default: DELTA).
+    """
+    raw = os.path.join(tmp, "net.json")
+    stats = synth.write_overpass(raw, kind, ways, seed)
+    with open(raw, "r", encoding="utf-8") as f:
+        osm_data = json.load(f)
+    os.remove(raw)
+    refs: Dict[int, List[int]] = {}
+    features = build_features(osm_data, refs)
+    del osm_data
+
+    derived = os.path.join(tmp, "derived")
+    baseline = os.path.join(derived, "osm_baseline.geojson")
+    sha256 = write_feature_collection(baseline, features, indent=2, ensure_ascii=True)
+    write_sidecar(baseline, {"type": "FeatureCollection", "features": features}, sha256)
+    write_node_refs(noderefs_path(baseline), refs, {"path": "osm_baseline.geojson", "sha256": sha256})
+    del refs
+
+    delta_path = os.path.join(tmp, "delta.json")
+    with open(delta_path, "w", encoding="utf-8") as f:
+        json.dump(delta(stats) if delta is not None else DELTA, f)
+    modified = os.path.join(derived, "osm_modified.geojson")
+    fc, _ = modified_collection(features, delta_path, tuple(stats["bbox"]), TagIndex(features), LazySpatialIndex(features))
+    write_sidecar(modified, fc, write_geojson(modified, fc))
+    del fc, features
+    header = build(modified)
+    stats.update(vertices=header["vertices"], edges=header["edges"])
+    return os.path.join(derived, "osm_modified.ckgraph"), stats
+
+
+def qps(n: int, fn: Callable[[], Any]) -> Tuple[float, Any]:
+    t0 = time.perf_counter()
+    out = fn()
+    dt = time.perf_counter() - t0
+    return (n / dt if dt > 0 else float("inf")), out
+
+
+def bench_mode(graph: RoadGraph, path: str, mode: str, args: argparse.Namespace) -> Tuple[List[Tuple[str, str]], int]:
+    fences = graph_geofences(path, graph)
+    t0 = time.perf_counter()
+    plain = Router(graph, mode, at=args.at, geofences=fences)
+    setup_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    alt = Router(graph, mode, at=args.at, geofences=fences, landmarks=args.landmarks)
+    alt_s = time.perf_counter() - t0
+
+    used = [v for v in range(graph.vertices) if plain.offsets[v + 1] > plain.offsets[v]]
+    rng = random.Random(f"{args.seed}:{mode}")
+    pairs = [(rng.choice(used), rng.choice(used)) for _ in range(args.queries)]
+
+    rate_d, ref = qps(len(pairs), lambda: [plain._dijkstra(s, [t]).get(t, INF) for s, t in pairs])
+    rows = [(f"{mode}: router setup", f"{setup_s:.3f} s"), (f"{mode}: dijkstra", f"{rate_d:,.0f} q/s")]
+    mismatches = 0
+    for name, router in (("astar", plain), (f"alt ({args.landmarks} landmarks)", alt)):
+        rate, got = qps(len(pairs), lambda r=router: [r.route(s, t) for s, t in pairs])
+        for want, r in zip(ref, got):
+            have = r["seconds"] if r is not None else INF
+            if want != have and abs(want - have) > 1e-9 * max(1.0, want):
+                mismatches += 1
+        rows.append((f"{mode}: {name}", f"{rate:,.0f} q/s ({rate / rate_d:.1f}x dijkstra)"))
+    rows.insert(2, (f"{mode}: alt preprocessing", f"{alt_s:.3f} s"))
+
+    m = min(args.matrix, len(used))
+    src, dst = rng.sample(used, m), rng.sample(used, m)
+    rate, _ = qps(m * m, lambda: plain.matrix(src, dst))
+    rows.append((f"{mode}: matrix {m}x{m}", f"{rate:,.0f} pairs/s"))
+    origins = [s for s, _ in pairs[: max(1, args.queries // 10)]]
+    rate, _ = qps(len(origins), lambda: [plain.isochrone(s, [600.0]) for s in origins])
+    rows.append((f"{mode}: isochrone 600 s", f"{rate:,.1f} q/s"))
+    return rows, mismatches
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Routing QPS on synthetic street networks")
+    ap.add_argument("--kind", choices=synth.KINDS, default="organic")
+    ap.add_argument("--ways", type=int, default=10_000)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--modes", nargs="+", default=["car", "foot"])
+    ap.add_argument("--landmarks", type=int, default=8)
+    ap.add_argument("--matrix", type=int, default=50, help="Origins (and destinations) of the matrix bench")
+    ap.add_argument("--at", default="08:00", help="Time of day (geofence allowed_hours)")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        path, stats = build_layers(tmp, args.kind, args.ways, args.seed)
+        print(f"Network: {args.kind}, {stats['ways']} ways -> {stats['vertices']} vertices, {stats['edges']} edges "
+              f"(layers + graph built in {time.perf_counter() - t0:.1f}s)")
+        mismatches = 0
+        with RoadGraph(path) as graph:
+            for mode in args.modes:
+                rows, bad = bench_mode(graph, path, mode, args)
+                mismatches += bad
+                for name, value in rows:
+                    print(f"  {name:<36} {value}")
+
+    if mismatches:
+        print(f"❌ {mismatches} route(s) differ from Dijkstra", file=sys.stderr)
+        return 1
+    print(f"✅ bench_routing: every A*/ALT answer matches Dijkstra ({args.queries} queries per mode)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
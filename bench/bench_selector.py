@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+bench/bench_selector.py — set_speed_limit scaling: linear scan vs TagIndex
+
+For each (features, ops) size, applies the same list of selector ops twice:
+
+  - linear: every op scans every feature (the pre-index behaviour)
+  - index:  one TagIndex per baseline, each op answered by posting lookups
+
+Both runs must leave identical properties behind.
+
+Usage:
+  python3 bench/bench_selector.py [--features 10000 100000] [--ops 10 50]
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import gc
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+from delta_apply import apply_set_speed_limit  # noqa: E402
+from tag_selector import TagIndex, matches, parse  # noqa: E402
+
+HIGHWAYS = ["residential", "primary", "secondary", "tertiary", "service", "footway", "cycleway", "living_street"]
+SURFACES = [None, "asphalt", "paving_stones", "sett", "gravel"]
+
+
+def synthetic_features(n: int, seed: int = 7) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    return [
+        {
+            "type": "Feature",
+            "properties": {
+                "osm_id": 1000 + i,
+                "highway": rng.choice(HIGHWAYS),
+                "surface": rng.choice(SURFACES),
+                "oneway": rng.choice([None, "yes", "no"]),
+                "name": f"Street {rng.randrange(max(1, n // 20))}",
+            },
+            "geometry": {"type": "LineString", "coordinates": [[13.4, 52.5], [13.41, 52.51]]},
+        }
+        for i in range(n)
+    ]
+
+
+def synthetic_selectors(m: int, n: int, seed: int = 11) -> List[str]:
+    """Mix of broad class selectors and street-level ones (the common case in real deltas)."""
+    rng = random.Random(seed)
+    out = []
+    for _ in range(m):
+        hw = "|".join(rng.sample(HIGHWAYS, rng.randint(1, 2)))
+        shape = rng.randint(0, 7)
+        if shape >= 4:
+            out.append(f"name=Street {rng.randrange(max(1, n // 20))}&highway!=footway")
+            continue
+        if shape == 0:
+            out.append(f"highway={hw}")
+        elif shape == 1:
+            out.append(f"highway={hw}&oneway!=yes")
+        elif shape == 2:
+            out.append(f"highway={hw}&surface=*")
+        else:
+            out.append(f"surface={rng.choice(SURFACES[1:])}&highway!=footway")
+    return out
+
+
+def linear_apply(features: List[Dict[str, Any]], selector: str, value_kph: int) -> int:
+    clauses = parse(selector)
+    changed = 0
+    for feat in features:
+        props = feat.get("properties") or {}
+        if matches(clauses, props):
+            props["maxspeed_kph"] = int(value_kph)
+            da = props.get("delta_applied")
+            if not isinstance(da, list):
+                da = []
+            if "set_speed_limit" not in da:
+                da.append("set_speed_limit")
+            props["delta_applied"] = da
+            feat["properties"] = props
+            changed += 1
+    return changed
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Benchmark selector ops: linear scan vs inverted index")
+    ap.add_argument("--features", type=int, nargs="+", default=[10_000, 100_000])
+    ap.add_argument("--ops", type=int, nargs="+", default=[10, 50])
+    args = ap.parse_args()
+
+    print(f"{'features':>9} {'ops':>5} {'linear_s':>9} {'index_s':>9} {'speedup':>8}")
+    for n in args.features:
+        base = synthetic_features(n)
+        for m in args.ops:
+            selectors = synthetic_selectors(m, n)
+
+            lin = copy.deepcopy(base)
+            gc.collect()
+            t0 = time.perf_counter()
+            for k, sel in enumerate(selectors):
+                linear_apply(lin, sel, 10 + k)
+            t_lin = time.perf_counter() - t0
+
+            idx_feats = copy.deepcopy(base)
+            gc.collect()
+            t0 = time.perf_counter()
+            index = TagIndex(idx_feats)
+            for k, sel in enumerate(selectors):
+                apply_set_speed_limit(idx_feats, sel, 10 + k, index)
+            t_idx = time.perf_counter() - t0
+
+            if lin != idx_feats:
+                print(f"ERROR: results differ at features={n} ops={m}", file=sys.stderr)
+                return 1
+            print(f"{n:>9} {m:>5} {t_lin:>9.3f} {t_idx:>9.3f} {t_lin / t_idx:>7.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
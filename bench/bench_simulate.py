@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+bench/bench_simulate.py — Actor simulation throughput on a synthetic street network
+
+Builds a synthetic network with the routing bench's layers (bench_routing.py)
+plus --zones snapped curb zones, then plans --actors trips on the modified
+graph and steps them over --duration simulated seconds, per stepping backend
+(NumPy when installed, pure Python). Reports planning time (routing), step
+time, trajectory rows per second and bytes written.
+
+Checks: both backends write byte-identical chunks, --samples random rows match
+simulate.position_at() (the schedule interpolated directly), and every delivery
+dwells inside its curb zone unless the zone records that no street of the
+actor's mode crosses it; exits 1 otherwise.
+
+Usage:
+  python3 bench/bench_simulate.py [--kind organic] [--ways 10000] [--actors 10000] [--duration 3600]
+      [--dt 1] [--zones 4] [--backends numpy python] [--samples 2000] [--seed 1]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Tuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "scripts"))
+sys.path.insert(0, HERE)
+
+import simulate  # noqa: E402
+import synth  # noqa: E402
+from bench_routing import DELTA, build_layers  # noqa: E402
+from columnar import SectionReader  # noqa: E402
+from geodesy import distance_m  # noqa: E402
+from road_graph import RoadGraph  # noqa: E402
+from spatial_index import _point_in_rings  # noqa: E402
+
+Row = Tuple[int, int, float, float, float, int]
+
+
+def delta_with_zones(zones: int, seed: int) -> Any:
+    """The routing bench's delta plus `zones` snapped curb zones at seeded points inside the network's bbox."""
+    def delta(stats: Dict[str, Any]) -> Dict[str, Any]:
+        x0, y0, x1, y1 = stats["bbox"]
+        rng = random.Random(seed)
+        ops = list(DELTA["ops"])
+        for _ in range(zones):
+            near = [x0 + (x1 - x0) * rng.uniform(0.2, 0.8), y0 + (y1 - y0) * rng.uniform(0.2, 0.8)]
+            ops.append({"op": "add_curb_zone", "where": {"near": near, "radius_m": 20, "snap": True},
+                        "type": "loading", "hours": "08:00-18:00"})
+        return {**DELTA, "ops": ops}
+    return delta
+
+
+def sample_rows(out_dir: str, n: int, seed: int) -> List[Row]:
+    """n seeded random trajectory rows across the chunks."""
+    rng = random.Random(seed)
+    paths = simulate.trajectory_chunks(out_dir)
+    rows: List[Row] = []
+    for i, path in enumerate(paths):
+        with SectionReader(path, simulate.TRAJ_MAGIC, simulate.VERSION) as r:
+            total = r.header["rows"]
+            picks = rng.sample(range(total), min(total, n // len(paths) + (i < n % len(paths))))
+            cols = [r.column(c) for c, _ in simulate._ChunkWriter.COLUMNS]
+            rows.extend(tuple(col[k] for col in cols) for k in picks)  # type: ignore[misc]
+            del cols
+    return rows
+
+
+def dwell_outside(header: Dict[str, Any], cols: Dict[str, Any]) -> Tuple[int, int]:
+    """(deliveries dwelling outside a zone their mode has an in-zone stop for, deliveries at a fallback vertex)."""
+    outside = fallback = 0
+    offsets = cols["point_offsets"]
+    for a, delivery in enumerate(cols["delivery"]):
+        if not delivery:
+            continue
+        zone = header["curb_zones"][cols["zone"][a]]
+        stop = zone["stops"][simulate.ACTOR_MODES[header["actor_types"][cols["actor_type"][a]]]]
+        if not stop["in_zone"]:
+            fallback += 1
+            continue
+        p = offsets[a + 1] - 1
+        rings = [[(x, y) for x, y in ring] for ring in zone["rings"]]
+        if not _point_in_rings(cols["point_lon"][p], cols["point_lat"][p], rings):
+            outside += 1
+    return outside, fallback
+
+
+def same_files(a: str, b: str) -> bool:
+    names = sorted(os.listdir(a))
+    if names != sorted(os.listdir(b)):
+        return False
+    for name in names:
+        with open(os.path.join(a, name), "rb") as fa, open(os.path.join(b, name), "rb") as fb:
+            while True:
+                x, y = fa.read(1 << 20), fb.read(1 << 20)
+                if x != y:
+                    return False
+                if not x:
+                    break
+    return True
+
+
+def dir_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Actor simulation throughput")
+    ap.add_argument("--kind", choices=synth.KINDS, default="organic")
+    ap.add_argument("--ways", type=int, default=10_000)
+    ap.add_argument("--actors", type=int, default=10_000)
+    ap.add_argument("--duration", type=float, default=3600.0)
+    ap.add_argument("--dt", type=float, default=1.0)
+    ap.add_argument("--zones", type=int, default=4, help="Curb zones added by the delta")
+    ap.add_argument("--backends", nargs="+", choices=["numpy", "python"], default=["numpy", "python"])
+    ap.add_argument("--samples", type=int, default=2_000, help="Rows checked against position_at()")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    backends = [b for b in args.backends if b == "python" or simulate.np is not None]
+    if len(backends) < len(args.backends):
+        print("(NumPy not installed: pure Python only)")
+
+    failures: List[str] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        path, stats = build_layers(tmp, args.kind, args.ways, args.seed, delta_with_zones(args.zones, args.seed))
+        print(f"Network: {args.kind}, {stats['ways']} ways -> {stats['vertices']} vertices, {stats['edges']} edges "
+              f"(layers + graph built in {time.perf_counter() - t0:.1f}s)")
+
+        with RoadGraph(path) as graph:
+            t0 = time.perf_counter()
+            header, cols = simulate.plan(graph, path, args.actors, simulate.parse_mix(simulate.DEFAULT_MIX),
+                                         args.duration, seed=args.seed)
+            plan_s = time.perf_counter() - t0
+        deliveries = sum(c["deliveries"] for c in header["by_type"].values())
+        print(f"  plan      {header['actors']}/{args.actors} actors routed, {deliveries} deliveries to "
+              f"{len(header['curb_zones'])} curb zones, {header['points']:,} route points in {plan_s:.1f}s "
+              f"({header['actors'] / plan_s:,.0f} actors/s)")
+        outside, fallback = dwell_outside(header, cols)
+        print(f"  curb      {deliveries - outside - fallback} deliveries dwell inside their zone, "
+              f"{fallback} at a fallback vertex (no street of their mode crosses the zone)")
+        if outside:
+            failures.append(f"{outside} deliveries dwell outside their curb zone")
+
+        reference = None
+        saved = simulate.USE_NUMPY
+        try:
+            for backend in backends:
+                simulate.USE_NUMPY = backend == "numpy"
+                out = os.path.join(tmp, f"sim-{backend}")
+                os.makedirs(out)
+                t0 = time.perf_counter()
+                stepped = simulate.simulate(cols, out, args.duration, args.dt, 300)
+                step_s = time.perf_counter() - t0
+                simulate.write_index(out, {"chunks": stepped["chunks"]})
+                print(f"  {backend:<8}  {stepped['steps']} steps, {stepped['rows']:,} rows in {step_s:.1f}s "
+                      f"({stepped['rows'] / step_s / 1e6:.2f} M rows/s, {dir_bytes(out) / 1e6:.0f} MB in "
+                      f"{len(stepped['chunks'])} chunks); plan + step {plan_s + step_s:.0f}s")
+                if reference is None:
+                    reference = out
+                    bad = 0
+                    for step, actor, lon, lat, _, _ in sample_rows(out, args.samples, args.seed):
+                        want = simulate.position_at(cols, actor, step * args.dt)
+                        if want is None or distance_m(lon, lat, *want) > 1e-3:
+                            bad += 1
+                    if bad:
+                        failures.append(f"{bad} of {args.samples} sampled rows differ from position_at()")
+                else:
+                    if not same_files(reference, out):
+                        failures.append(f"{backend} trajectories differ from {backends[0]}")
+                    shutil.rmtree(out)
+        finally:
+            simulate.USE_NUMPY = saved
+
+    if failures:
+        for f in failures:
+            print(f"❌ {f}", file=sys.stderr)
+        return 1
+    print(f"✅ bench_simulate: {', '.join(backends)} agree with the schedule ({args.samples} rows sampled)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+bench/bench_spatial.py — SpatialIndex correctness vs brute force + query latency
+
+Builds a synthetic jittered street grid (default 100k ways), then for a batch
+of random query points/polygons checks every SpatialIndex answer against a
+brute-force scan over all segments:
+
+  - near_point(lon, lat, r)   same feature set
+  - near_polygon(rings, r)    same feature set
+  - nearest(lon, lat)         same distance (ties may pick either way)
+
+and reports build time plus median / p99 latency per query type.
+
+Usage:
+  python3 bench/bench_spatial.py [--ways 100000] [--queries 500] [--cell-m auto]
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+from spatial_index import SpatialIndex, _point_in_rings, _seg_dist2, _seg_seg_dist2  # noqa: E402
+
+STEP_DEG = 1e-4  # ~7-11 m between grid vertices around 52.5N
+
+
+def synthetic_network(ways: int, nodes_per_way: int = 6, seed: int = 3) -> List[Dict[str, Any]]:
+    """Square grid of horizontal + vertical ways with per-vertex jitter."""
+    rng = random.Random(seed)
+    segs = nodes_per_way - 1
+    n = int((ways * segs / 2) ** 0.5) + segs + 1
+    jitter = [[(rng.uniform(-0.3, 0.3) * STEP_DEG, rng.uniform(-0.3, 0.3) * STEP_DEG) for _ in range(n)] for _ in range(n)]
+
+    def vertex(r: int, c: int) -> List[float]:
+        jx, jy = jitter[r][c]
+        return [13.4 + c * STEP_DEG + jx, 52.5 + r * STEP_DEG + jy]
+
+    feats: List[Dict[str, Any]] = []
+    for horizontal in (True, False):
+        for a in range(n):
+            for b0 in range(0, n - segs, segs):
+                if len(feats) >= ways:
+                    return feats
+                coords = [vertex(a, b) if horizontal else vertex(b, a) for b in range(b0, b0 + segs + 1)]
+                feats.append({
+                    "type": "Feature",
+                    "properties": {"osm_id": 1 + len(feats)},
+                    "geometry": {"type": "LineString", "coordinates": coords},
+                })
+    return feats
+
+
+def all_segments(idx: SpatialIndex) -> List[Tuple[int, float, float, float, float]]:
+    return [(idx.seg_feature[s], idx.ax[s], idx.ay[s], idx.bx[s], idx.by[s]) for s in range(len(idx.seg_feature))]
+
+
+def brute_near_point(segs, idx: SpatialIndex, lon: float, lat: float, r: float) -> List[int]:
+    px, py = idx.project(lon, lat)
+    return sorted({f for f, ax, ay, bx, by in segs if _seg_dist2(px, py, ax, ay, bx, by)[0] <= r * r})
+
+
+def brute_near_polygon(segs, idx: SpatialIndex, rings, r: float) -> List[int]:
+    prings = [[idx.project(c[0], c[1]) for c in ring] for ring in rings]
+    edges = [(ring[i], ring[i + 1]) for ring in prings for i in range(len(ring) - 1)]
+    out = set()
+    for f, ax, ay, bx, by in segs:
+        if f in out:
+            continue
+        if _point_in_rings(ax, ay, prings) or _point_in_rings(bx, by, prings):
+            out.add(f)
+        elif any(_seg_seg_dist2((ax, ay), (bx, by), c, d) <= r * r for c, d in edges):
+            out.add(f)
+    return sorted(out)
+
+
+def brute_nearest(segs, idx: SpatialIndex, lon: float, lat: float) -> float:
+    px, py = idx.project(lon, lat)
+    return math.sqrt(min(_seg_dist2(px, py, ax, ay, bx, by)[0] for _, ax, ay, bx, by in segs))
+
+
+def random_polygon(rng: random.Random, lon: float, lat: float, size_deg: float) -> List[List[List[float]]]:
+    k = rng.randint(3, 7)
+    angles = sorted(rng.uniform(0, 2 * math.pi) for _ in range(k))
+    ring = [[lon + math.cos(a) * size_deg * rng.uniform(0.4, 1.0), lat + math.sin(a) * size_deg * rng.uniform(0.4, 1.0)] for a in angles]
+    return [ring + [ring[0]]]
+
+
+def pct(samples: List[float], q: float) -> float:
+    s = sorted(samples)
+    return s[min(len(s) - 1, int(q * len(s)))]
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="SpatialIndex vs brute force")
+    ap.add_argument("--ways", type=int, default=100_000)
+    ap.add_argument("--queries", type=int, default=500)
+    ap.add_argument("--checks", type=int, default=20, help="queries also verified by brute force")
+    ap.add_argument("--cell-m", type=float, default=None, help="grid cell size (default: auto)")
+    args = ap.parse_args()
+
+    feats = synthetic_network(args.ways)
+    t0 = time.perf_counter()
+    idx = SpatialIndex(feats, cell_m=args.cell_m)
+    build_s = time.perf_counter() - t0
+    print(f"{len(feats)} ways, {len(idx.seg_feature)} segments, {len(idx.cells)} cells of {idx.cell_m:.1f} m; build {build_s:.2f}s")
+
+    lons = [c[0] for f in feats for c in f["geometry"]["coordinates"]]
+    lats = [c[1] for f in feats for c in f["geometry"]["coordinates"]]
+    rng = random.Random(99)
+    queries = [
+        (rng.uniform(min(lons), max(lons)), rng.uniform(min(lats), max(lats)), rng.choice([10.0, 40.0, 100.0]))
+        for _ in range(args.queries)
+    ]
+    polygons = [(random_polygon(rng, lon, lat, 3 * STEP_DEG), r / 4) for lon, lat, r in queries]
+
+    segs = all_segments(idx)
+    mismatches = 0
+    for i in range(min(args.checks, len(queries))):
+        lon, lat, r = queries[i]
+        if idx.near_point(lon, lat, r) != brute_near_point(segs, idx, lon, lat, r):
+            mismatches += 1
+        rings, pr = polygons[i]
+        if idx.near_polygon(rings, pr) != brute_near_polygon(segs, idx, rings, pr):
+            mismatches += 1
+        hit = idx.nearest(lon, lat)
+        if hit is None or abs(hit[1] - brute_nearest(segs, idx, lon, lat)) > 1e-9:
+            mismatches += 1
+    print(f"brute-force checks: {min(args.checks, len(queries))} x 3 query types, {mismatches} mismatches")
+
+    timings: Dict[str, List[float]] = {"near_point r=10": [], "near_point r=40": [], "near_point r=100": [], "near_polygon": [], "nearest": []}
+    hits = 0
+    for (lon, lat, r), (rings, pr) in zip(queries, polygons):
+        t = time.perf_counter()
+        hits += len(idx.near_point(lon, lat, r))
+        timings[f"near_point r={r:.0f}"].append(time.perf_counter() - t)
+        t = time.perf_counter()
+        idx.near_polygon(rings, pr)
+        timings["near_polygon"].append(time.perf_counter() - t)
+        t = time.perf_counter()
+        idx.nearest(lon, lat)
+        timings["nearest"].append(time.perf_counter() - t)
+
+    print(f"{'query':<20}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, samples in timings.items():
+        print(f"{name:<20}{pct(samples, 0.5) * 1e3:>10.3f}{pct(samples, 0.99) * 1e3:>10.3f}")
+    print(f"mean near_point hits: {hits / len(queries):.1f}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
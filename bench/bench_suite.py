@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+bench/bench_suite.py — Kit pipeline hot paths at city scale, compared with a stored baseline
+
+For each synthetic network (bench/synth.py: grid and organic) and scale
+(default 1k, 10k and 100k ways; add 1000000 to --scales for 1M, which needs
+several GB of RAM), a fresh subprocess times:
+
+  json_load            json.load of the Overpass response
+  build_features       osm_fetch.build_features
+  write_baseline       baseline GeoJSON + .ckcol sidecar, as osm_fetch.py writes them
+  spatial_index        SpatialIndex build (done once, by the first spatial op)
+  op:<name>            each delta op below on its own copy-on-write view, with a fresh TagIndex
+  delta_write          the whole delta (modified_collection) + modified GeoJSON/sidecar write
+  road_graph           road_graph.build of the modified layer (baseline node refs)
+  build_viz            build_viz.py --embed on the resulting kit (subprocess), and its
+  build_viz:<section>    load / encode / write sections (scripts/metrics.py)
+
+Every bench runs --repeat times; the fastest run is kept. Results go to
+--out as JSON (default .cache/bench/latest.json). When a baseline exists
+(default .cache/bench/baseline.json; --save-baseline writes one from this
+run) every bench is compared with it, and one that is both --tolerance
+slower (default 0.25 = 25%) and --min-delta seconds slower (default 0.01) is
+reported as a regression. Baselines are only comparable on the same machine.
+
+Usage:
+  python3 bench/bench_suite.py [--kinds grid organic] [--scales 1000 10000 100000]
+      [--repeat 3] [--seed 1] [--out PATH] [--baseline PATH] [--save-baseline]
+      [--tolerance 0.25] [--min-delta 0.01]
+
+Exit codes:
+  0 = no regression (or no baseline)
+  1 = at least one bench regressed
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, "..")
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+sys.path.insert(0, HERE)
+
+import metrics  # noqa: E402
+import synth  # noqa: E402
+
+SCHEMA = "citykit-bench/1"
+DEFAULT_OUT = os.path.join(ROOT, ".cache", "bench", "latest.json")
+DEFAULT_BASELINE = os.path.join(ROOT, ".cache", "bench", "baseline.json")
+
+# (bench name, delta op); near targets resolve against the network's bbox
+DELTA_OPS: List[Tuple[str, Dict[str, Any]]] = [
+    ("set_speed_limit", {"op": "set_speed_limit", "target": {"selector": "highway=residential"}, "value_kph": 20}),
+    ("set_speed_limit:multi", {
+        "op": "set_speed_limit",
+        "target": {"selector": "highway=primary|secondary|tertiary&cycleway=*"},
+        "value_kph": 30,
+    }),
+    ("set_speed_limit:near", {
+        "op": "set_speed_limit",
+        "target": {"selector": "highway=residential", "near": "corridor_centerline", "radius_m": 300},
+        "value_kph": 10,
+    }),
+    ("add_curb_zone:snap", {
+        "op": "add_curb_zone",
+        "where": {"near": "corridor_centerline", "radius_m": 40, "snap": True, "selector": "highway=residential"},
+        "type": "loading",
+        "hours": "08:00-18:00",
+    }),
+    ("add_geofence", {"op": "add_geofence", "where": {"type": "corridor_aoi"}, "allowed_hours": "06:00-22:00"}),
+]
+
+
+def timed(repeat: int, fn: Callable[[], Any], setup: Optional[Callable[[], Any]] = None) -> Tuple[Dict[str, Any], Any]:
+    """Fastest of `repeat` runs of fn(setup()) (or fn()): ({wall_s, cpu_s}, last result)."""
+    best: Optional[Dict[str, Any]] = None
+    result = None
+    for _ in range(repeat):
+        arg = setup() if setup is not None else None
+        meter = metrics.Meter()
+        result = fn(arg) if setup is not None else fn()
+        rec = meter.stop()
+        if best is None or rec["wall_s"] < best["wall_s"]:
+            best = rec
+    assert best is not None
+    return {"wall_s": best["wall_s"], "cpu_s": best["cpu_s"]}, result
+
+
+def run_child(path: str, bbox: List[float], repeat: int) -> Dict[str, Any]:
+    """All benches on one network; runs in its own process so peak RSS is per scale."""
+    from columnar import write_sidecar
+    from delta_apply import FeatureView, LazySpatialIndex, apply_delta, modified_collection, write_geojson
+    from geojson_writer import write_feature_collection
+    from osm_fetch import build_features
+    from noderefs import noderefs_path, write_node_refs
+    from road_graph import build as build_road_graph
+    from spatial_index import SpatialIndex
+    from tag_selector import TagIndex
+
+    results: List[Dict[str, Any]] = []
+
+    def add(name: str, rec: Dict[str, Any], **counts: Any) -> None:
+        results.append({"bench": name, **rec, **counts})
+
+    def load() -> Any:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    rec, osm_data = timed(repeat, load)
+    add("json_load", rec)
+    node_refs: Dict[int, List[int]] = {}
+    rec, features = timed(repeat, lambda: build_features(osm_data, node_refs))
+    add("build_features", rec, features=len(features))
+    del osm_data
+
+    with tempfile.TemporaryDirectory() as kit:
+        derived = os.path.join(kit, "derived")
+        baseline_path = os.path.join(derived, "osm_baseline.geojson")
+
+        def write_baseline() -> str:
+            sha256 = write_feature_collection(baseline_path, features, indent=2, ensure_ascii=True)
+            write_sidecar(baseline_path, {"type": "FeatureCollection", "features": features}, sha256)
+            return sha256
+
+        rec, sha256 = timed(repeat, write_baseline)
+        add("write_baseline", rec, bytes=os.path.getsize(baseline_path))
+        write_node_refs(noderefs_path(baseline_path), node_refs, {"path": "osm_baseline.geojson", "sha256": sha256})
+        del node_refs
+
+        rec, spatial = timed(repeat, lambda: SpatialIndex(features))
+        add("spatial_index", rec)
+
+        bb = tuple(bbox)
+        for name, op in DELTA_OPS:
+            def fresh() -> Tuple[Any, Any]:
+                view = FeatureView(features)
+                return view, TagIndex(view)
+
+            def apply(state: Tuple[Any, Any]) -> Tuple[int, int]:
+                view, index = state
+                overlays, _ = apply_delta(view, [op], bb, index, lambda: spatial)
+                return len(view.copies), len(overlays)
+
+            rec, (changed, overlays) = timed(repeat, apply, fresh)
+            add(f"op:{name}", rec, features_changed=changed, overlays=overlays)
+
+        delta_path = os.path.join(kit, "delta.json")
+        with open(delta_path, "w", encoding="utf-8") as f:
+            json.dump({"schema_version": "0.1", "name": "bench delta", "ops": [op for _, op in DELTA_OPS]}, f)
+        modified_path = os.path.join(derived, "osm_modified.geojson")
+
+        def delta_write() -> int:
+            fc, _ = modified_collection(features, delta_path, bb, TagIndex(features), LazySpatialIndex(features))
+            write_sidecar(modified_path, fc, write_geojson(modified_path, fc))
+            return len(fc["features"])
+
+        rec, n = timed(repeat, delta_write)
+        add("delta_write", rec, features=n)
+
+        rec, graph = timed(repeat, lambda: build_road_graph(modified_path))
+        add("road_graph", rec, vertices=graph["vertices"], edges=graph["edges"])
+
+        best: Optional[Dict[str, Any]] = None
+        metrics_out = os.path.join(kit, "metrics.jsonl")
+        for _ in range(repeat):
+            if os.path.exists(metrics_out):
+                os.remove(metrics_out)
+            subprocess.run(
+                [sys.executable, os.path.join(ROOT, "scripts", "build_viz.py"), "--kit", kit, "--embed"],
+                check=True, capture_output=True,
+                env=dict(os.environ, CITYKIT_PROFILE="1", CITYKIT_METRICS_OUT=metrics_out),
+            )
+            with open(metrics_out, "r", encoding="utf-8") as f:
+                viz = json.loads(f.read().splitlines()[-1])
+            if best is None or viz["wall_s"] < best["wall_s"]:
+                best = viz
+        assert best is not None
+        add("build_viz", {"wall_s": best["wall_s"], "cpu_s": best["cpu_s"]},
+            html_bytes=os.path.getsize(os.path.join(kit, "viz", "overview.html")))
+        for s in best["sections"]:
+            add(f"build_viz:{s['name']}", {"wall_s": s["wall_s"], "cpu_s": s["cpu_s"]})
+
+    return {"peak_rss_mb": metrics.peak_rss_mb(), "results": results}
+
+
+def compare(
+    results: List[Dict[str, Any]], baseline: Dict[str, Any], tolerance: float, min_delta: float
+) -> List[Dict[str, Any]]:
+    """Annotate results with the baseline's wall_s and change; returns the regressions."""
+    base = {(r["kind"], r["ways"], r["bench"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for r in results:
+        b = base.get((r["kind"], r["ways"], r["bench"]))
+        if b is None or not b.get("wall_s"):
+            continue
+        r["baseline_wall_s"] = b["wall_s"]
+        r["change"] = round(r["wall_s"] / b["wall_s"] - 1, 3)
+        if r["change"] > tolerance and r["wall_s"] - b["wall_s"] >= min_delta:
+            r["regression"] = True
+            regressions.append(r)
+    return regressions
+
+
+def git_rev() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "-C", ROOT, "rev-parse", "--short", "HEAD"], capture_output=True, text=True)
+    except OSError:
+        return None
+    return out.stdout.strip() or None
+
+
+def write_json(path: str, data: Dict[str, Any]) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+        f.write("\n")
+    os.replace(tmp, path)
+
+
+def print_table(results: List[Dict[str, Any]], has_baseline: bool) -> None:
+    head = f"{'network':<9}{'ways':>9}  {'bench':<24}{'wall s':>9}{'cpu s':>9}"
+    print(head + (f"{'baseline s':>12}{'change':>9}" if has_baseline else ""))
+    for r in results:
+        line = f"{r['kind']:<9}{r['ways']:>9}  {r['bench']:<24}{r['wall_s']:>9.3f}{r['cpu_s']:>9.3f}"
+        if "baseline_wall_s" in r:
+            line += f"{r['baseline_wall_s']:>12.3f}{r['change']:>+9.0%}"
+            if r.get("regression"):
+                line += "  ⚠️ slower"
+        print(line)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Benchmark the kit scripts on synthetic networks")
+    ap.add_argument("--kinds", nargs="+", choices=synth.KINDS, default=list(synth.KINDS))
+    ap.add_argument("--scales", nargs="+", type=int, default=[1_000, 10_000, 100_000], help="Ways per network")
+    ap.add_argument("--repeat", type=int, default=3, help="Runs per bench; the fastest is kept")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--out", default=DEFAULT_OUT, help="Results JSON")
+    ap.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline results JSON to compare with")
+    ap.add_argument("--save-baseline", action="store_true", help="Also write this run's results as the baseline")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before a regression (0.25 = 25%%)")
+    ap.add_argument("--min-delta", type=float, default=0.01, help="Ignore slowdowns smaller than this many seconds")
+    ap.add_argument("--child", help=argparse.SUPPRESS)
+    ap.add_argument("--bbox", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    repeat = max(1, args.repeat)
+
+    if args.child:
+        print(json.dumps(run_child(args.child, json.loads(args.bbox), repeat)))
+        return 0
+
+    networks: List[Dict[str, Any]] = []
+    results: List[Dict[str, Any]] = []
+    t0 = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        for kind in args.kinds:
+            for ways in args.scales:
+                path = os.path.join(tmp, f"{kind}-{ways}.json")
+                stats = synth.write_overpass(path, kind, ways, args.seed)
+                out = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--child", path, "--bbox", json.dumps(stats["bbox"]),
+                     "--repeat", str(repeat)],
+                    check=True, capture_output=True, text=True,
+                ).stdout
+                child = json.loads(out)
+                os.remove(path)
+                networks.append({**stats, "peak_rss_mb": child["peak_rss_mb"]})
+                results += [{"kind": kind, "ways": ways, **r} for r in child["results"]]
+                done = {r["bench"]: r["wall_s"] for r in child["results"]}
+                print(f"⏱️ {kind} {ways} ways ({stats['nodes']} nodes, {stats['bytes'] / 1e6:.1f} MB): "
+                      f"build_features {done['build_features']:.3f}s, delta {done['delta_write']:.3f}s, "
+                      f"build_viz {done['build_viz']:.3f}s, {child['peak_rss_mb']:.0f} MB peak")
+
+    baseline = None
+    if os.path.exists(args.baseline) and os.path.abspath(args.baseline) != os.path.abspath(args.out):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance, args.min_delta) if baseline else []
+
+    report = {
+        "schema": SCHEMA,
+        "generated_at_utc": datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z"),
+        "git_rev": git_rev(),
+        "host": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "params": {"seed": args.seed, "repeat": repeat, "tolerance": args.tolerance, "min_delta": args.min_delta},
+        "baseline": {"path": args.baseline, "generated_at_utc": baseline.get("generated_at_utc"),
+                     "git_rev": baseline.get("git_rev")} if baseline else None,
+        "networks": networks,
+        "results": results,
+    }
+    write_json(args.out, report)
+    print()
+    print_table(results, baseline is not None)
+    print(f"\n✅ bench_suite: {len(results)} benches in {time.perf_counter() - t0:.0f}s -> {args.out}")
+    if baseline and baseline.get("host") != report["host"]:
+        print(f"⚠️ bench_suite: baseline was recorded on another host ({baseline.get('host')})", file=sys.stderr)
+    if baseline and baseline.get("params", {}).get("seed") != args.seed:
+        print("⚠️ bench_suite: baseline used another --seed; networks differ", file=sys.stderr)
+    if args.save_baseline:
+        plain = [{k: v for k, v in r.items() if k not in ("baseline_wall_s", "change", "regression")} for r in results]
+        write_json(args.baseline, {**{k: v for k, v in report.items() if k != "baseline"}, "results": plain})
+        print(f"✅ bench_suite: baseline saved -> {args.baseline}")
+    if regressions:
+        print(f"❌ bench_suite: {len(regressions)} regression(s) over {args.tolerance:.0%}:", file=sys.stderr)
+        for r in regressions:
+            print(f"   {r['kind']} {r['ways']} {r['bench']}: {r['baseline_wall_s']:.3f}s -> {r['wall_s']:.3f}s",
+                  file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+bench/bench_viz_encode.py — overview.html size / build time, raw GeoJSON vs compact encoding
+
+Builds a throwaway kit from a synthetic network (curved ways between grid
+junctions, OSM-like tags; default 20k ways) or --geojson, applies the example
+delta with delta_apply.py, then runs build_viz.py --embed with
+--encoding geojson and --encoding compact and reports:
+
+  - overview.html size and build time per encoding
+  - modified-layer payload: full compact encoding vs diff over the baseline
+  - vertices drawn per zoom (compact encoding)
+  - measured visual error per zoom: max distance from an original vertex to the
+    drawn line, in screen pixels and metres (viz_encode.measure_error)
+
+Usage:
+  python3 bench/bench_viz_encode.py [--ways 20000] [--geojson path] [--error-sample 5000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import collections
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+
+from columnar import load_feature_collection  # noqa: E402
+from geojson_writer import write_feature_collection  # noqa: E402
+from viz_encode import decode_collection, decode_ints, diff_collection, encode_collection, measure_error  # noqa: E402
+
+HIGHWAYS = ["residential"] * 5 + ["service"] * 2 + ["tertiary", "secondary", "primary", "footway", "cycleway"]
+
+
+def curvy_network(ways: int, interior: int = 8, seed: int = 7) -> List[Dict[str, Any]]:
+    """Grid of junctions ~75 m apart; each way bows sideways by up to ~8 m through `interior` vertices."""
+    rng = random.Random(seed)
+    dlon, dlat = 0.0011, 0.00068
+    n = int(math.sqrt(ways / 2)) + 2
+    feats: List[Dict[str, Any]] = []
+
+    def junction(r: int, c: int) -> List[float]:
+        return [round(13.38 + c * dlon, 7), round(52.50 + r * dlat, 7)]
+
+    for horizontal in (True, False):
+        for a in range(n):
+            for b in range(n - 1):
+                if len(feats) >= ways:
+                    return feats
+                p, q = (junction(a, b), junction(a, b + 1)) if horizontal else (junction(b, a), junction(b + 1, a))
+                bow = rng.uniform(-8, 8) / 111_000
+                coords = [p]
+                for k in range(1, interior + 1):
+                    t = k / (interior + 1)
+                    off = bow * math.sin(math.pi * t) + rng.gauss(0, 0.3) / 111_000
+                    x = p[0] + (q[0] - p[0]) * t + (0 if horizontal else off)
+                    y = p[1] + (q[1] - p[1]) * t + (off if horizontal else 0)
+                    coords.append([round(x, 7), round(y, 7)])
+                coords.append(q)
+                feats.append({
+                    "type": "Feature",
+                    "properties": {
+                        "osm_id": 100_000_000 + len(feats) * 3,
+                        "highway": rng.choice(HIGHWAYS),
+                        "footway": None,
+                        "cycleway": rng.choice([None, None, "lane"]),
+                        "name": f"Street {a}" if horizontal else f"Avenue {a}",
+                        "surface": rng.choice([None, "asphalt", "paving_stones"]),
+                        "oneway": rng.choice([None, None, "yes"]),
+                    },
+                    "geometry": {"type": "LineString", "coordinates": coords},
+                })
+    return feats
+
+
+def build_viz(kit: str, encoding: str) -> Dict[str, float]:
+    t0 = time.perf_counter()
+    subprocess.run(
+        [sys.executable, os.path.join(ROOT, "scripts", "build_viz.py"), "--kit", kit, "--embed", "--encoding", encoding],
+        check=True, capture_output=True,
+    )
+    return {"seconds": time.perf_counter() - t0, "bytes": os.path.getsize(os.path.join(kit, "viz", "overview.html"))}
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Viewer payload: raw GeoJSON vs compact encoding")
+    ap.add_argument("--ways", type=int, default=20_000)
+    ap.add_argument("--geojson", default="", help="Use an existing baseline FeatureCollection instead")
+    ap.add_argument("--error-sample", type=int, default=5000, help="features checked by measure_error (0 = all)")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as kit:
+        derived = os.path.join(kit, "derived")
+        baseline_path = os.path.join(derived, "osm_baseline.geojson")
+        if args.geojson:
+            baseline = load_feature_collection(args.geojson)
+        else:
+            baseline = {"type": "FeatureCollection", "features": curvy_network(args.ways)}
+        write_feature_collection(baseline_path, baseline["features"])
+        subprocess.run(
+            [sys.executable, os.path.join(ROOT, "scripts", "delta_apply.py"), "--baseline", baseline_path,
+             "--delta", os.path.join(ROOT, "inputs", "scenario_delta.example.json"),
+             "--corridor", os.path.join(ROOT, "inputs", "corridor.example.json"),
+             "--out", os.path.join(derived, "osm_modified.geojson")],
+            check=True, capture_output=True,
+        )
+        feats = baseline["features"]
+        verts = sum(len(f["geometry"]["coordinates"]) for f in feats if (f.get("geometry") or {}).get("type") == "LineString")
+        print(f"{len(feats)} ways, {verts} vertices")
+
+        raw = build_viz(kit, "geojson")
+        compact = build_viz(kit, "compact")
+        print(f"{'encoding':<10}{'overview.html MB':>18}{'build s':>10}")
+        print(f"{'geojson':<10}{raw['bytes'] / 1e6:>18.2f}{raw['seconds']:>10.2f}")
+        print(f"{'compact':<10}{compact['bytes'] / 1e6:>18.2f}{compact['seconds']:>10.2f}")
+        print(f"size ratio: {raw['bytes'] / compact['bytes']:.1f}x smaller")
+
+        modified = load_feature_collection(os.path.join(derived, "osm_modified.geojson"))
+        full = len(json.dumps(encode_collection(modified), separators=(",", ":")))
+        diff = diff_collection(baseline, modified)
+        if diff is not None:
+            patched = len(decode_ints(diff["patch"]["osm_id"]))
+            diffed = len(json.dumps(diff, separators=(",", ":")))
+            print(f"modified layer: {full / 1e6:.2f} MB encoded in full, {diffed / 1e6:.3f} MB as a diff ({patched} ways patched)")
+
+    sample = feats if args.error_sample <= 0 else feats[: args.error_sample]
+    payload = encode_collection({"type": "FeatureCollection", "features": sample})
+    decoded = decode_collection(payload)["features"]
+    drawn = collections.Counter()
+    for f in decoded:
+        for z in (f["geometry"].get("ck_zooms") or []):
+            drawn[z] += 1
+    errors = measure_error(sample, payload)
+    sample_verts = sum(len(f["geometry"]["coordinates"]) for f in sample if f["geometry"]["type"] == "LineString")
+    print(f"\nmeasured on {len(sample)} ways ({sample_verts} vertices):")
+    print(f"{'zoom':<6}{'vertices drawn':>16}{'max err px':>12}{'max err m':>11}")
+    cumulative = 0
+    for z, err in errors.items():
+        cumulative += drawn[z]
+        print(f"{z:<6}{cumulative:>16}{err['px']:>12.3f}{err['m']:>11.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
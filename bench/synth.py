@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+bench/synth.py — Seeded synthetic street networks as Overpass JSON (stdlib-only)
+
+Two kinds, both deterministic for a given (kind, ways, seed) and written as a
+stream, so 1M-way networks never sit in memory as a whole:
+
+  grid     Manhattan grid of straight ways (nodes_per_way vertices, ~20 m
+           apart), junctions shared by the crossing streets
+  organic  districts of ~130 ways, each a rotated, jittered lattice
+           clipped to a blob, with random missing blocks, footpath diagonals
+           and bowed ways; district centres are joined by arterials
+
+Tags are OSM-like and consistent along a street (highway class, name,
+surface, oneway, cycleway/footway, maxspeed), roughly the mix of a
+European inner city. Ids: nodes from 1, ways from 10_000_000.
+
+Usage:
+  python3 bench/synth.py --kind organic --ways 100000 --out net.json [--seed 1]
+
+  (in a bench)
+  stats = synth.write_overpass(path, "organic", 100_000)   # -> bytes, nodes, ways, bbox
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import random
+from typing import Any, Dict, Iterator, List, Tuple
+
+KINDS = ("grid", "organic")
+ORIGIN = (13.30, 52.45)  # lon, lat of the south-west corner
+WAY_ID0 = 10_000_000
+M_PER_DEG_LAT = 111_320.0
+
+HIGHWAYS = [
+    ("residential", 50), ("service", 12), ("tertiary", 9), ("unclassified", 6), ("footway", 8),
+    ("living_street", 4), ("secondary", 5), ("cycleway", 3), ("primary", 3),
+]
+NAMES = ["Linden", "Birken", "Eichen", "Ahorn", "Kastanien", "Ulmen", "Weiden", "Pappel", "Erlen", "Buchen",
+         "Rosen", "Tulpen", "Mohn", "Flieder", "Garten", "Mühlen", "Kirch", "Schul", "Wald", "See"]
+SUFFIXES = ["straße", "weg", "allee", "gasse", "ring", "damm"]
+SPEEDS = {"primary": "50", "secondary": "50", "tertiary": "50", "residential": "30", "living_street": "walk"}
+
+
+def _pick(rng: random.Random, weighted: List[Tuple[str, int]]) -> str:
+    return rng.choices([v for v, _ in weighted], weights=[w for _, w in weighted])[0]
+
+
+def street_tags(rng: random.Random, number: int, highway: str = "") -> Dict[str, str]:
+    """Tags for one street; every way of the street carries them."""
+    highway = highway or _pick(rng, HIGHWAYS)
+    tags = {"highway": highway}
+    if highway == "footway":
+        if rng.random() < 0.4:
+            tags["footway"] = "sidewalk"
+    elif highway == "cycleway":
+        tags["surface"] = "asphalt"
+    else:
+        if highway != "service":
+            tags["name"] = f"{NAMES[number % len(NAMES)]}{SUFFIXES[(number // len(NAMES)) % len(SUFFIXES)]}"
+            if number >= len(NAMES) * len(SUFFIXES):
+                tags["name"] += f" {number // (len(NAMES) * len(SUFFIXES))}"
+        tags["surface"] = rng.choices(["asphalt", "paving_stones", "sett", "concrete"], weights=[70, 15, 10, 5])[0]
+        if highway in ("residential", "service") and rng.random() < 0.15:
+            tags["oneway"] = "yes"
+        if highway in ("primary", "secondary", "tertiary") and rng.random() < 0.5:
+            tags["cycleway"] = rng.choice(["lane", "track", "shared_lane"])
+        if highway in SPEEDS and rng.random() < 0.6:
+            tags["maxspeed"] = SPEEDS[highway]
+    return tags
+
+
+def _deg(lat: float, dx_m: float, dy_m: float) -> Tuple[float, float]:
+    return dx_m / (M_PER_DEG_LAT * math.cos(math.radians(lat))), dy_m / M_PER_DEG_LAT
+
+
+def grid_network(ways: int, seed: int = 1, nodes_per_way: int = 6) -> Iterator[Dict[str, Any]]:
+    """Elements of a square grid network: all nodes, then horizontal and vertical ways."""
+    rng = random.Random(f"grid:{seed}")
+    segs = nodes_per_way - 1
+    n = int((ways * segs / 2) ** 0.5) + segs + 1
+    dlon, dlat = _deg(ORIGIN[1], 20.0, 20.0)
+    for r in range(n):
+        for c in range(n):
+            yield {"type": "node", "id": 1 + r * n + c,
+                   "lat": round(ORIGIN[1] + r * dlat, 7), "lon": round(ORIGIN[0] + c * dlon, 7)}
+    emitted = 0
+    for horizontal in (True, False):
+        for a in range(n):
+            tags = street_tags(rng, a * 2 + (0 if horizontal else 1))
+            for b0 in range(0, n - segs, segs):
+                if emitted >= ways:
+                    return
+                nodes = [1 + a * n + b if horizontal else 1 + b * n + a for b in range(b0, b0 + segs + 1)]
+                yield {"type": "way", "id": WAY_ID0 + emitted, "nodes": nodes, "tags": dict(tags)}
+                emitted += 1
+
+
+DISTRICT_PITCH_M = 1_000.0
+LATTICE = 12  # junctions per lattice side before clipping
+NODE_STRIDE = 100_000  # node ids per district
+_CENTRE = (LATTICE // 2) * LATTICE + LATTICE // 2  # centre junction, offset from the district's first node id
+
+
+def _district_centre(seed: int, k: int, cols: int) -> Tuple[float, float]:
+    rng = random.Random(f"organic:{seed}:{k}:centre")
+    dx, dy = rng.uniform(-150, 150), rng.uniform(-150, 150)
+    row, col = divmod(k, cols)
+    dlon, dlat = _deg(ORIGIN[1], (col + 0.5) * DISTRICT_PITCH_M + dx, (row + 0.5) * DISTRICT_PITCH_M + dy)
+    return ORIGIN[0] + dlon, ORIGIN[1] + dlat
+
+
+def _bowed(rng: random.Random, a: Tuple[float, float], b: Tuple[float, float], interior: int, bow: float) -> List[Tuple[float, float]]:
+    """Interior points of a quadratic curve from a to b, bulging sideways by bow x length."""
+    mx, my = (a[0] + b[0]) / 2, (a[1] + b[1]) / 2
+    cx, cy = mx - (b[1] - a[1]) * bow, my + (b[0] - a[0]) * bow
+    pts = []
+    for i in range(1, interior + 1):
+        t = i / (interior + 1)
+        u = 1 - t
+        pts.append((u * u * a[0] + 2 * u * t * cx + t * t * b[0], u * u * a[1] + 2 * u * t * cy + t * t * b[1]))
+    return pts
+
+
+def _district(seed: int, k: int, cols: int) -> Tuple[Dict[int, Tuple[float, float]], List[Tuple[List[int], Dict[str, str]]]]:
+    """Nodes {id: (lon, lat)} and ways [(node ids, tags)] of district k; arterials go to the west and south neighbours."""
+    rng = random.Random(f"organic:{seed}:{k}")
+    base = 1 + k * NODE_STRIDE
+    centre = _district_centre(seed, k, cols)
+    theta = rng.uniform(0, math.pi / 2)
+    spacing = rng.uniform(70, 110)
+    radius = LATTICE / 2 * spacing * rng.uniform(0.8, 1.05)
+    cos_t, sin_t = math.cos(theta), math.sin(theta)
+    m_lon, m_lat = _deg(centre[1], 1.0, 1.0)
+    half = LATTICE // 2
+
+    nodes: Dict[int, Tuple[float, float]] = {}
+    junction: Dict[Tuple[int, int], int] = {}
+    for i in range(LATTICE):
+        for j in range(LATTICE):
+            if (i, j) == (half, half):
+                x = y = 0.0
+            else:
+                x = (j - half + rng.uniform(-0.2, 0.2)) * spacing
+                y = (i - half + rng.uniform(-0.2, 0.2)) * spacing
+                if math.hypot(x, y) > radius * rng.uniform(0.85, 1.0):
+                    continue
+            nid = base + i * LATTICE + j
+            nodes[nid] = (centre[0] + (x * cos_t - y * sin_t) * m_lon, centre[1] + (x * sin_t + y * cos_t) * m_lat)
+            junction[(i, j)] = nid
+    next_id = base + LATTICE * LATTICE
+
+    ways: List[Tuple[List[int], Dict[str, str]]] = []
+
+    def add_way(a: int, b: int, tags: Dict[str, str], interior: int, bow: float) -> None:
+        nonlocal next_id
+        ids = [a]
+        for p in _bowed(rng, nodes[a], nodes[b], interior, bow):
+            nodes[next_id] = p
+            ids.append(next_id)
+            next_id += 1
+        ids.append(b)
+        ways.append((ids, tags))
+
+    street_no = k * 2 * LATTICE
+    for horizontal in (True, False):
+        for a in range(LATTICE):
+            tags = street_tags(rng, street_no)
+            street_no += 1
+            for b in range(LATTICE - 1):
+                p, q = ((a, b), (a, b + 1)) if horizontal else ((b, a), (b + 1, a))
+                if p in junction and q in junction and rng.random() < 0.82:
+                    add_way(junction[p], junction[q], tags, rng.randint(1, 6), rng.uniform(-0.12, 0.12))
+    for i in range(LATTICE - 1):
+        for j in range(LATTICE - 1):
+            p, q = (i, j), (i + 1, j + 1)
+            if p in junction and q in junction and rng.random() < 0.06:
+                add_way(junction[p], junction[q], street_tags(rng, 0, "footway"), rng.randint(1, 3), rng.uniform(-0.2, 0.2))
+
+    row, col = divmod(k, cols)
+    neighbours = ([k - 1] if col > 0 else []) + ([k - cols] if row > 0 else [])
+    for other in neighbours:
+        nodes[1 + other * NODE_STRIDE + _CENTRE] = _district_centre(seed, other, cols)
+        tags = street_tags(rng, street_no, rng.choice(["primary", "secondary"]))
+        street_no += 1
+        add_way(base + _CENTRE, 1 + other * NODE_STRIDE + _CENTRE, tags, 12, rng.uniform(-0.08, 0.08))
+    return nodes, ways
+
+
+def organic_network(ways: int, seed: int = 1) -> Iterator[Dict[str, Any]]:
+    """Elements of an organic network, district by district (each district's nodes, then its ways)."""
+    per_district = 130  # rough, only used to lay the districts out in a square
+    cols = max(1, math.ceil(math.sqrt(ways / per_district)))
+    emitted = 0
+    k = 0
+    while emitted < ways:
+        nodes, dways = _district(seed, k, cols)
+        dways = dways[: ways - emitted]
+        # Neighbour centres were written with their own district
+        own = range(1 + k * NODE_STRIDE, 1 + (k + 1) * NODE_STRIDE)
+        used = sorted({n for ids, _ in dways for n in ids if n in own} | {own[0] + _CENTRE})
+        for nid in used:
+            lon, lat = nodes[nid]
+            yield {"type": "node", "id": nid, "lat": round(lat, 7), "lon": round(lon, 7)}
+        for ids, tags in dways:
+            yield {"type": "way", "id": WAY_ID0 + emitted, "nodes": ids, "tags": dict(tags)}
+            emitted += 1
+        k += 1
+
+
+def elements(kind: str, ways: int, seed: int = 1) -> Iterator[Dict[str, Any]]:
+    if kind == "grid":
+        return grid_network(ways, seed)
+    if kind == "organic":
+        return organic_network(ways, seed)
+    raise ValueError(f"Unknown network kind {kind!r} (expected one of {', '.join(KINDS)})")
+
+
+def write_overpass(path: str, kind: str, ways: int, seed: int = 1) -> Dict[str, Any]:
+    """Write an Overpass JSON response. Returns {bytes, nodes, ways, bbox: [min_lon, min_lat, max_lon, max_lat]}."""
+    counts = {"node": 0, "way": 0}
+    min_lon = min_lat = math.inf
+    max_lon = max_lat = -math.inf
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{\n  "version": 0.6,\n  "generator": "citykit bench/synth.py",\n  "elements": [\n')
+        sep = ""
+        for el in elements(kind, ways, seed):
+            counts[el["type"]] += 1
+            if el["type"] == "node":
+                min_lon, max_lon = min(min_lon, el["lon"]), max(max_lon, el["lon"])
+                min_lat, max_lat = min(min_lat, el["lat"]), max(max_lat, el["lat"])
+            f.write(sep + json.dumps(el, separators=(",", ":")))
+            sep = ",\n"
+        f.write("\n  ]\n}\n")
+    return {
+        "kind": kind, "seed": seed, "bytes": os.path.getsize(path), "nodes": counts["node"], "ways": counts["way"],
+        "bbox": [min_lon, min_lat, max_lon, max_lat],
+    }
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Write a synthetic street network as Overpass JSON")
+    ap.add_argument("--kind", choices=KINDS, default="organic")
+    ap.add_argument("--ways", type=int, default=10_000)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--out", required=True, help="Output path (.json)")
+    args = ap.parse_args()
+    stats = write_overpass(args.out, args.kind, args.ways, args.seed)
+    print(f"✅ synth: {stats['ways']} ways, {stats['nodes']} nodes, {stats['bytes'] / 1e6:.1f} MB -> {args.out}")
+    print(f"   bbox: {', '.join(f'{v:.5f}' for v in stats['bbox'])}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -5,7 +5,15 @@ scripts/build_viz.py — Stdlib-only Leaflet viewer builder
 Writes a single-file HTML viewer into <KIT_DIR>/viz/overview.html
 Modes:
 - default: loads GeoJSON via fetch("../derived/osm_*.geojson")
-- --embed: embeds GeoJSON inline (file:// compatible)
+- --embed: embeds both layers inline (file:// compatible); by default in the compact
+  encoding of viz_encode.py (per-zoom simplified, quantized, decoded client-side)
+  with the modified layer as a property patch over the baseline geometries;
+  --encoding geojson embeds the GeoJSON as-is
+- --tiles: cuts baseline/modified ways into a z/x/y pyramid under <KIT_DIR>/viz/tiles/
+  (see viz_tiles.py); the viewer loads only the tiles in view (file:// compatible).
+  Use this for city-scale networks where --embed makes the HTML too large.
+
+CITYKIT_PROFILE=1 records load / encode / write metrics (see metrics.py).
 """
 
 import argparse
@@ -13,6 +21,11 @@ import os
 import json
 from datetime import datetime, timezone
 
+import metrics
+from columnar import load_feature_collection
+from viz_encode import diff_collection, encode_collection
+from viz_tiles import parse_zooms, write_tiles
+
 HTML_TEMPLATE = """<!doctype html>
 <html lang="en">
 <head>
@@ -100,6 +113,7 @@ HTML_TEMPLATE = """<!doctype html>
         Speed limits (if present) are shown as thicker lines on modified layer.
       </div>
     </div>
+    <div id="zoomHint" class="meta" style="display:none;"></div>
     <div id="warn" class="warn" style="display:none;"></div>
   </div>
   <script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js" integrity="sha256-20nQCchB9co0qIjJZRGuk2/Z9VM+kNiyxNV1lvTlZBo=" crossorigin="" ></script>
@@ -109,6 +123,7 @@ HTML_TEMPLATE = """<!doctype html>
     const VIEWER_MODE = "{viewer_mode}";
     const BASELINE_URL = "../derived/osm_baseline.geojson";
     const MODIFIED_URL = "../derived/osm_modified.geojson";
+    const TILES_URL = "tiles";
 
     // Embedded data (present when VIEWER_MODE === "embedded")
     window.__BASELINE_GEOJSON = {baseline_embedded};
@@ -187,6 +202,196 @@ HTML_TEMPLATE = """<!doctype html>
       }}
     }}
 
+    // Tiled mode: tiles/*.js are JSONP scripts calling __ckTile / __ckTileIndex
+    const tileData = {{}};
+    const tileWaiters = {{}};
+    let tileIndex = null;
+
+    window.__ckTile = function (key, data) {{
+      tileData[key] = data;
+      (tileWaiters[key] || []).forEach(resolve => resolve(data));
+      delete tileWaiters[key];
+    }};
+
+    function loadScript(src) {{
+      return new Promise((resolve, reject) => {{
+        const s = document.createElement("script");
+        s.src = src;
+        s.onload = resolve;
+        s.onerror = () => reject(new Error(`Failed to load ${{src}}`));
+        document.head.appendChild(s);
+      }});
+    }}
+
+    function loadTile(key) {{
+      if (key in tileData) return Promise.resolve(tileData[key]);
+      if (tileWaiters[key]) return new Promise(resolve => tileWaiters[key].push(resolve));
+      const p = new Promise(resolve => {{ tileWaiters[key] = [resolve]; }});
+      loadScript(`${{TILES_URL}}/${{key}}.js`).catch(e => {{
+        warn(e.message);
+        window.__ckTile(key, null);
+      }});
+      return p;
+    }}
+
+    const tiledLayers = {{
+      baseline: {{ style: styleBaseline, shown: {{}} }},
+      modified: {{ style: styleModified, shown: {{}} }},
+    }};
+
+    function visibleTileKeys() {{
+      const z = Math.min(tileIndex.max_zoom, Math.floor(map.getZoom()));
+      const hint = document.getElementById("zoomHint");
+      if (z < tileIndex.min_zoom) {{
+        hint.style.display = "block";
+        hint.textContent = `Zoom in to load ways (tiles from z${{tileIndex.min_zoom}}).`;
+        return [];
+      }}
+      hint.style.display = "none";
+      const b = map.getBounds();
+      const nw = map.project(b.getNorthWest(), z).divideBy(256).floor();
+      const se = map.project(b.getSouthEast(), z).divideBy(256).floor();
+      const keys = [];
+      for (let x = nw.x; x <= se.x; x++) {{
+        for (let y = nw.y; y <= se.y; y++) keys.push(`${{z}}/${{x}}/${{y}}`);
+      }}
+      return keys;
+    }}
+
+    function refreshTiles() {{
+      const keys = visibleTileKeys();
+      const wanted = new Set(keys);
+      for (const [name, t] of Object.entries(tiledLayers)) {{
+        for (const key of Object.keys(t.shown)) {{
+          if (wanted.has(key)) continue;
+          if (t.shown[key] !== "pending") t.group.removeLayer(t.shown[key]);
+          delete t.shown[key];
+        }}
+        for (const key of keys) {{
+          if (t.shown[key] || !t.available.has(key)) continue;
+          t.shown[key] = "pending";
+          loadTile(`${{name}}/${{key}}`).then(data => {{
+            if (t.shown[key] !== "pending") return;  // scrolled away meanwhile
+            t.shown[key] = L.geoJSON(data, {{ style: t.style, onEachFeature }});
+            t.group.addLayer(t.shown[key]);
+          }});
+        }}
+      }}
+    }}
+
+    async function initTiled() {{
+      await loadScript(`${{TILES_URL}}/index.js`);
+      if (!tileIndex) throw new Error("tiles/index.js did not register a tile index");
+      for (const [name, t] of Object.entries(tiledLayers)) {{
+        t.available = new Set(tileIndex.tiles[name] || []);
+        t.group = L.layerGroup();
+      }}
+      if (tiledLayers.baseline.available.size) baselineLayer = tiledLayers.baseline.group.addTo(map);
+      if (tiledLayers.modified.available.size) modifiedLayer = tiledLayers.modified.group.addTo(map);
+      const overlays = await loadTile("overlays");
+      if (overlays && overlays.features.length) {{
+        overlayLayer = L.geoJSON(overlays, {{ style: styleOverlay, onEachFeature }}).addTo(map);
+      }}
+      const bb = tileIndex.bounds;
+      if (bb) map.fitBounds([[bb[1], bb[0]], [bb[3], bb[2]]], {{ padding: [20, 20] }});
+      else map.setView([52.5200, 13.4050], 16);
+      map.on("moveend", refreshTiles);
+      refreshTiles();
+    }}
+
+    window.__ckTileIndex = function (index) {{
+      tileIndex = index;
+    }};
+
+    // Compact embedded encoding (scripts/viz_encode.py): polyline-varint strings of
+    // (dlon, dlat, zoom) triples per LineString + property columns
+    function ckDecodeInts(str) {{
+      const out = [];
+      let r = 0, s = 1;
+      for (let i = 0; i < str.length; i++) {{
+        const b = str.charCodeAt(i) - 63;
+        r += (b & 31) * s;  // arithmetic, not bit ops: osm_id deltas exceed 32 bits
+        s *= 32;
+        if (b < 32) {{
+          out.push(r % 2 ? -(r + 1) / 2 : r / 2);
+          r = 0;
+          s = 1;
+        }}
+      }}
+      return out;
+    }}
+
+    function ckDecode(payload) {{
+      const n = payload.count;
+      const scale = Math.pow(10, payload.precision);
+      const props = [];
+      for (let i = 0; i < n; i++) props.push({{}});
+      for (const col of payload.props) {{
+        if (col.delta !== undefined) {{
+          let v = 0;
+          ckDecodeInts(col.delta).forEach((d, i) => {{ v += d; props[i][col.k] = v; }});
+        }} else {{
+          ckDecodeInts(col.idx).forEach((j, i) => {{ if (j) props[i][col.k] = col.values[j - 1]; }});
+        }}
+      }}
+      const features = payload.geoms.map((g, i) => {{
+        if (typeof g !== "string") return {{ type: "Feature", properties: props[i], geometry: g }};
+        const ints = ckDecodeInts(g);
+        const coords = [], zooms = [];
+        let x = 0, y = 0;
+        for (let k = 0; k < ints.length; k += 3) {{
+          x += ints[k];
+          y += ints[k + 1];
+          coords.push([x / scale, y / scale]);
+          zooms.push(payload.min_zoom + ints[k + 2]);
+        }}
+        return {{ type: "Feature", properties: props[i], geometry: {{ type: "LineString", coordinates: coords }}, ckZooms: zooms }};
+      }});
+      return Object.assign({{ type: "FeatureCollection", features }}, payload.meta || {{}});
+    }}
+
+    // Modified layer stored as a diff (viz_encode.diff_collection): patch baseline
+    // properties by osm_id, share its geometries, append new ways + overlays
+    function ckApplyDiff(base, diff) {{
+      const ids = s => {{ let v = 0; return ckDecodeInts(s).map(d => (v += d)); }};
+      const patchIds = ids(diff.patch.osm_id);
+      const changes = ckDecode({{
+        count: patchIds.length, props: diff.patch.props, geoms: patchIds.map(() => null), precision: 0, min_zoom: 0
+      }});
+      const patch = new Map(patchIds.map((id, i) => [id, changes.features[i].properties]));
+      const unset = new Map(diff.unset);
+      const drop = new Set(ids(diff.drop));
+      const features = [];
+      for (const f of base.features) {{
+        const id = f.properties.osm_id;
+        if (drop.has(id)) continue;
+        const props = Object.assign({{}}, f.properties, patch.get(id) || {{}});
+        (unset.get(id) || []).forEach(k => delete props[k]);
+        features.push({{ type: "Feature", properties: props, geometry: f.geometry, ckZooms: f.ckZooms }});
+      }}
+      const extra = ckDecode(diff.extra);
+      extra.features = features.concat(extra.features);
+      return extra;
+    }}
+
+    // Draw only the vertices each way needs at the current zoom
+    function applyZoomDetail() {{
+      const z = Math.round(map.getZoom());
+      [baselineLayer, modifiedLayer].forEach(layer => {{
+        if (!layer || !layer.eachLayer) return;
+        layer.eachLayer(l => {{
+          const f = l.feature;
+          if (!f || !f.ckZooms || !l.setLatLngs) return;
+          const c = f.geometry.coordinates;
+          const latlngs = [];
+          for (let i = 0; i < c.length; i++) {{
+            if (f.ckZooms[i] <= z) latlngs.push([c[i][1], c[i][0]]);
+          }}
+          l.setLatLngs(latlngs);
+        }});
+      }});
+    }}
+
     function splitOverlaysFromModified(layer) {{
       const overlays = [];
       const main = [];
@@ -226,6 +431,8 @@ HTML_TEMPLATE = """<!doctype html>
           }} else {{
             warn("Modified not embedded.");
           }}
+        }} else if (VIEWER_MODE === "tiled") {{
+          await initTiled();
         }} else {{
           // fetch mode (older behavior)
           try {{
@@ -258,7 +465,15 @@ HTML_TEMPLATE = """<!doctype html>
         warn(`Viewer init error: ${{e.message}}`);
       }}
 
-      fitToLayers([baselineLayer, modifiedLayer, overlayLayer]);
+      if (VIEWER_MODE !== "tiled") {{
+        fitToLayers([baselineLayer, modifiedLayer, overlayLayer]);
+      }} else if (!tileIndex) {{
+        map.setView([52.5200, 13.4050], 16);
+      }}
+      if (VIEWER_MODE === "embedded") {{
+        applyZoomDetail();
+        map.on("zoomend", applyZoomDetail);
+      }}
 
       // Toggles
       const tb = document.getElementById("toggleBaseline");
@@ -293,16 +508,57 @@ HTML_TEMPLATE = """<!doctype html>
 def _read_geojson_if_exists(path: str):
     if not os.path.exists(path):
         return None
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    # Memory-maps the .ckcol sidecar when it is current, else parses the GeoJSON
+    return load_feature_collection(path)
+
+
+def _js_call(fn, *args):
+    """JS call expression with JSON arguments (strings are passed through as JS expressions)."""
+    parts = []
+    for a in args:
+        if isinstance(a, str):
+            parts.append(a)
+        else:
+            # "<\/" is the same JSON string, and a tag value can no longer close the <script> early
+            parts.append(json.dumps(a, separators=(",", ":"), ensure_ascii=False).replace("</", "<\\/"))
+    return f"{fn}({','.join(parts)})"
+
+
+def _load_layers(kit_dir):
+    """(baseline, modified) FeatureCollections from the kit; None for a missing layer."""
+    with metrics.section("load") as m:
+        baseline = _read_geojson_if_exists(os.path.join(kit_dir, "derived", "osm_baseline.geojson"))
+        modified = _read_geojson_if_exists(os.path.join(kit_dir, "derived", "osm_modified.geojson"))
+        m["baseline_features"] = len((baseline or {}).get("features") or [])
+        m["modified_features"] = len((modified or {}).get("features") or [])
+    return baseline, modified
+
+
+def _encoded(fc, precision):
+    """JS expression decoding fc's compact payload in the viewer ("null" when fc is missing)."""
+    if fc is None:
+        return "null"
+    return _js_call("ckDecode", encode_collection(fc, precision))
 
 
 def main():
     ap = argparse.ArgumentParser(description="Build Leaflet viewer for demo kit")
     ap.add_argument("--kit", required=True, help="Path to city_demo_kit directory (inside artifacts/run_id)")
     ap.add_argument("--run-id", default="", help="Optional run_id for display")
-    ap.add_argument("--embed", action="store_true", help="Embed GeoJSON inline (file:// compatible)")
+    mode = ap.add_mutually_exclusive_group()
+    mode.add_argument("--embed", action="store_true", help="Embed GeoJSON inline (file:// compatible)")
+    mode.add_argument("--tiles", action="store_true", help="Write a z/x/y tile pyramid under viz/tiles/ (file:// compatible)")
+    ap.add_argument("--tile-zooms", default="14-16", help="Tile pyramid zoom range MIN-MAX (default 14-16)")
+    ap.add_argument(
+        "--encoding", choices=["compact", "geojson"], default="compact",
+        help="--embed payload: compact (simplified + quantized, see viz_encode.py) or raw GeoJSON",
+    )
+    ap.add_argument("--precision", type=int, default=6, help="Compact encoding: coordinate decimals (default 6)")
     args = ap.parse_args()
+    try:
+        zmin, zmax = parse_zooms(args.tile_zooms)
+    except ValueError as e:
+        ap.error(str(e))
 
     kit_dir = args.kit
     os.makedirs(os.path.join(kit_dir, "viz"), exist_ok=True)
@@ -324,17 +580,37 @@ def main():
 
     generated_at = datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
 
-    viewer_mode = "embedded" if args.embed else "fetch"
+    viewer_mode = "embedded" if args.embed else "tiled" if args.tiles else "fetch"
     baseline_embedded = "null"
     modified_embedded = "null"
 
     if args.embed:
-        baseline_path = os.path.join(kit_dir, "derived", "osm_baseline.geojson")
-        modified_path = os.path.join(kit_dir, "derived", "osm_modified.geojson")
-        baseline = _read_geojson_if_exists(baseline_path)
-        modified = _read_geojson_if_exists(modified_path)
-        baseline_embedded = json.dumps(baseline) if baseline is not None else "null"
-        modified_embedded = json.dumps(modified) if modified is not None else "null"
+        baseline, modified = _load_layers(kit_dir)
+        with metrics.section("encode", encoding=args.encoding):
+            if args.encoding == "compact":
+                baseline_embedded = _encoded(baseline, args.precision)
+                diff = None
+                if baseline is not None and modified is not None:
+                    diff = diff_collection(baseline, modified, args.precision)
+                if diff is not None:
+                    modified_embedded = _js_call("ckApplyDiff", "window.__BASELINE_GEOJSON", diff)
+                else:
+                    modified_embedded = _encoded(modified, args.precision)
+            else:
+                baseline_embedded = json.dumps(baseline) if baseline is not None else "null"
+                modified_embedded = json.dumps(modified) if modified is not None else "null"
+
+    tiles_note = ""
+    if args.tiles:
+        baseline, modified = _load_layers(kit_dir)
+        with metrics.section("tiles") as m:
+            layers = {"baseline": (baseline or {}).get("features") or []}
+            modified_features = (modified or {}).get("features") or []
+            layers["modified"] = [f for f in modified_features if not (f.get("properties") or {}).get("feature_type")]
+            overlays = [f for f in modified_features if (f.get("properties") or {}).get("feature_type")]
+            counts = write_tiles(os.path.join(kit_dir, "viz", "tiles"), layers, overlays, zmin, zmax)
+            m.update(baseline_tiles=counts["baseline"], modified_tiles=counts["modified"])
+        tiles_note = f", {counts['baseline']} baseline + {counts['modified']} modified tiles at z{zmin}-{zmax}"
 
     html = HTML_TEMPLATE.format(
         run_id=run_id,
@@ -345,11 +621,13 @@ def main():
     )
 
     out_path = os.path.join(kit_dir, "viz", "overview.html")
-    with open(out_path, "w", encoding="utf-8") as f:
-        f.write(html)
+    with metrics.section("write") as m:
+        with open(out_path, "w", encoding="utf-8") as f:
+            f.write(html)
+        m["html_bytes"] = os.path.getsize(out_path)
 
-    print(f"✅ build_viz: wrote viewer to {out_path} (mode={viewer_mode})")
+    print(f"✅ build_viz: wrote viewer to {out_path} (mode={viewer_mode}{tiles_note})")
 
 
 if __name__ == "__main__":
-    main()
+    metrics.run_main("build_viz", main)
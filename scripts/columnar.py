@@ -0,0 +1,559 @@
+#!/usr/bin/env python3
+"""
+columnar.py — Binary columnar sidecar for GeoJSON road networks (stdlib-only)
+
+GeoJSON stays the interchange artifact; next to each derived/osm_*.geojson
+we write a <name>.ckcol file that downstream scripts memory-map instead of
+re-parsing JSON.
+
+Layout (little/native-endian, every section 8-byte aligned):
+
+  b"CKCOL\\0" + u16 version      8 bytes
+  u64 header length               8 bytes
+  header JSON                     column directory, dictionaries, metadata
+  sections                        flat arrays
+
+Columns:
+  coords          float64  interleaved lon,lat for every vertex
+  coord_offsets   int64    vertex offset of each part (ring/line), len = parts + 1
+  part_offsets    int64    part offset of each feature, len = features + 1
+  geom_type       int32    dictionary code (LineString, Polygon, Point, ...), -1 = null
+  feature_shape   int32    dictionary code of the feature's top-level key order
+  prop_shape      int32    dictionary code of the feature's property key order
+  prop:<key>      int32    dictionary code of the value (highway, surface, oneway, ...),
+                           -1 = key absent
+                  int64    raw value for high-cardinality integer keys (osm_id),
+                           INT64_ABSENT = key absent
+
+The source GeoJSON's sha256 is recorded in the header; open_sidecar() only
+returns a reader when it still matches, so a stale sidecar is never used.
+
+CLI:
+  python3 scripts/columnar.py derived/osm_baseline.geojson
+    (re)writes the sidecar next to the GeoJSON
+  python3 scripts/columnar.py --check derived/osm_baseline.geojson
+    verifies a byte-identical GeoJSON round trip through a temporary
+    sidecar; writes nothing next to the GeoJSON (exit 1 on mismatch)
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import gc
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+MAGIC = b"CKCOL\x00"
+VERSION = 1
+SUFFIX = ".ckcol"
+INT64_ABSENT = -(2 ** 63)
+
+_GEOM_DEPTH = {"Point": 0, "LineString": 1, "MultiPoint": 1, "Polygon": 2, "MultiLineString": 2}
+
+
+def sidecar_path(geojson_path: str) -> str:
+    """derived/osm_baseline.geojson -> derived/osm_baseline.ckcol"""
+    base, ext = os.path.splitext(geojson_path)
+    return (base if ext == ".geojson" else geojson_path) + SUFFIX
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _is_float_pair(c: Any) -> bool:
+    return (
+        isinstance(c, (list, tuple))
+        and len(c) == 2
+        and type(c[0]) is float
+        and type(c[1]) is float
+    )
+
+
+class _Absent:
+    __slots__ = ()
+
+
+_ABSENT = _Absent()
+
+
+class _Dict:
+    """Insertion-ordered dictionary encoder for JSON values."""
+
+    def __init__(self) -> None:
+        self.values: List[Any] = []
+        self._index: Dict[Any, int] = {}
+
+    def code(self, value: Any) -> int:
+        # Scalars key on (type, value) so 1, 1.0 and True stay distinct;
+        # containers key on their JSON text
+        if isinstance(value, (list, dict)):
+            key: Any = json.dumps(value, ensure_ascii=False)
+        else:
+            key = (type(value), value)
+        idx = self._index.get(key)
+        if idx is None:
+            idx = len(self.values)
+            self._index[key] = idx
+            self.values.append(value)
+        return idx
+
+
+def encode(fc: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, array]]:
+    """
+    Encode a FeatureCollection into (header, columns).
+
+    Raises ValueError for content the format cannot reproduce exactly
+    (MultiPolygon, 3D or integer coordinates, unusual key orders).
+    """
+    features = fc.get("features")
+    if fc.get("type") != "FeatureCollection" or not isinstance(features, list):
+        raise ValueError("expected a GeoJSON FeatureCollection")
+    if list(fc.keys())[:2] != ["type", "features"]:
+        raise ValueError("FeatureCollection keys must start with type, features")
+
+    coords = array("d")
+    coord_offsets = array("q", [0])
+    part_offsets = array("q", [0])
+    geom_type = array("i")
+    feature_shape = array("i")
+    prop_shape = array("i")
+
+    geom_types = _Dict()
+    feature_shapes = _Dict()
+    prop_shapes = _Dict()
+    prop_values: Dict[str, List[Any]] = {}
+    n = len(features)
+
+    for i, feat in enumerate(features):
+        if not isinstance(feat, dict) or feat.get("type") != "Feature":
+            raise ValueError(f"feature {i} is not a GeoJSON Feature")
+        if set(feat.keys()) - {"type", "properties", "geometry"}:
+            raise ValueError(f"feature {i} has unsupported top-level keys")
+        feature_shape.append(feature_shapes.code(list(feat.keys())))
+
+        geom = feat.get("geometry")
+        if geom is None:
+            geom_type.append(-1)
+        else:
+            gtype = geom.get("type")
+            if gtype not in _GEOM_DEPTH or list(geom.keys()) != ["type", "coordinates"]:
+                raise ValueError(f"feature {i}: unsupported geometry {gtype!r}")
+            geom_type.append(geom_types.code(gtype))
+            depth = _GEOM_DEPTH[gtype]
+            c = geom["coordinates"]
+            parts = [[c]] if depth == 0 else ([c] if depth == 1 else c)
+            for part in parts:
+                for pt in part:
+                    if not _is_float_pair(pt):
+                        raise ValueError(f"feature {i}: coordinates must be 2D float pairs")
+                    coords.append(pt[0])
+                    coords.append(pt[1])
+                coord_offsets.append(len(coords) // 2)
+        part_offsets.append(len(coord_offsets) - 1)
+
+        props = feat.get("properties")
+        if props is None:
+            prop_shape.append(-1)
+            continue
+        prop_shape.append(prop_shapes.code(list(props.keys())))
+        for k, v in props.items():
+            col = prop_values.get(k)
+            if col is None:
+                col = prop_values[k] = [_ABSENT] * n
+            col[i] = v
+
+    columns: Dict[str, array] = {
+        "coords": coords,
+        "coord_offsets": coord_offsets,
+        "part_offsets": part_offsets,
+        "geom_type": geom_type,
+        "feature_shape": feature_shape,
+        "prop_shape": prop_shape,
+    }
+    prop_meta: Dict[str, Any] = {}
+    for k, values in prop_values.items():
+        present = [v for v in values if v is not _ABSENT]
+        distinct = len(set(v for v in present if isinstance(v, int)))
+        if (
+            present
+            and all(type(v) is int and v != INT64_ABSENT and -(2 ** 63) < v < 2 ** 63 for v in present)
+            and distinct > n // 2
+        ):
+            columns[f"prop:{k}"] = array("q", (INT64_ABSENT if v is _ABSENT else v for v in values))
+            prop_meta[k] = {"kind": "int64"}
+        else:
+            enc = _Dict()
+            columns[f"prop:{k}"] = array("i", (-1 if v is _ABSENT else enc.code(v) for v in values))
+            prop_meta[k] = {"kind": "dict", "dictionary": enc.values}
+
+    header = {
+        "format": "citykit-columnar",
+        "version": VERSION,
+        "byteorder": sys.byteorder,
+        "count": n,
+        "collection": {k: v for k, v in fc.items() if k not in ("type", "features")},
+        "geom_types": geom_types.values,
+        "feature_shapes": feature_shapes.values,
+        "prop_shapes": prop_shapes.values,
+        "props": prop_meta,
+    }
+    return header, columns
+
+
+def write_columnar(path: str, fc: Dict[str, Any], source: Optional[Dict[str, Any]] = None) -> None:
+    """Encode fc and write it atomically (temp file + rename) to path."""
+    header, columns = encode(fc)
+    if source:
+        header["source"] = source
+    write_sections(path, header, columns)
+
+
+def write_sections(
+    path: str, header: Dict[str, Any], columns: Dict[str, array], magic: bytes = MAGIC, version: int = VERSION
+) -> None:
+    """
+    Write the container (magic + version, header JSON, 8-byte aligned arrays) atomically.
+    Also used by road_graph.py for its own files; header["columns"] and ["byteorder"] are filled in here.
+    """
+    header["byteorder"] = sys.byteorder
+    # Lay out sections after the header; header size depends on the offsets,
+    # so iterate until it is stable (converges in at most a couple of rounds).
+    layout: Dict[str, Dict[str, Any]] = {}
+    header_len = 0
+    while True:
+        offset = _align(16 + header_len)
+        for name, arr in columns.items():
+            layout[name] = {"typecode": arr.typecode, "offset": offset, "length": len(arr)}
+            offset = _align(offset + len(arr) * arr.itemsize)
+        header["columns"] = layout
+        raw_header = json.dumps(header, ensure_ascii=False).encode("utf-8")
+        if len(raw_header) == header_len:
+            break
+        header_len = len(raw_header)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".ckcol.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(magic + struct.pack("<H", version))
+            f.write(struct.pack("<Q", header_len))
+            f.write(raw_header)
+            for name, arr in columns.items():
+                f.write(b"\0" * (layout[name]["offset"] - f.tell()))
+                arr.tofile(f)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def write_sidecar(geojson_path: str, fc: Dict[str, Any], sha256: Optional[str] = None) -> Optional[str]:
+    """
+    Write the sidecar for an already-written GeoJSON file.
+
+    sha256 is the file's digest when the caller already has it (the streaming
+    writer does), saving a re-read of the file. Returns the sidecar path, or None (with a warning) when fc uses features
+    the columnar format cannot reproduce exactly.
+    """
+    path = sidecar_path(geojson_path)
+    source = {
+        "path": os.path.basename(geojson_path),
+        "bytes": os.path.getsize(geojson_path),
+        "sha256": sha256 or file_sha256(geojson_path),
+    }
+    try:
+        write_columnar(path, fc, source)
+    except ValueError as e:
+        print(f"WARN: no columnar sidecar for {geojson_path}: {e}", file=sys.stderr)
+        if os.path.exists(path):
+            os.unlink(path)  # never leave a stale sidecar behind
+        return None
+    return path
+
+
+class SectionReader:
+    """Memory-mapped file written by write_sections(); columns are zero-copy memoryviews."""
+
+    def __init__(self, path: str, magic: bytes = MAGIC, version: int = VERSION) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[: len(magic)] != magic:
+            self._mm.close()
+            raise ValueError(f"{path}: not a {magic.rstrip(bytes(1)).decode()} file")
+        (found,) = struct.unpack("<H", self._mm[6:8])
+        if found != version:
+            self._mm.close()
+            raise ValueError(f"{path}: unsupported version {found}")
+        (header_len,) = struct.unpack("<Q", self._mm[8:16])
+        self.header: Dict[str, Any] = json.loads(self._mm[16 : 16 + header_len].decode("utf-8"))
+        if self.header.get("byteorder") != sys.byteorder:
+            self._mm.close()
+            raise ValueError(f"{path}: written on a {self.header.get('byteorder')}-endian host")
+        self._buf = memoryview(self._mm)
+        self._cols: Dict[str, memoryview] = {}
+
+    def close(self) -> None:
+        self._cols.clear()
+        self._buf.release()
+        self._mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def column(self, name: str) -> memoryview:
+        col = self._cols.get(name)
+        if col is None:
+            meta = self.header["columns"][name]
+            itemsize = array(meta["typecode"]).itemsize
+            start = meta["offset"]
+            col = self._buf[start : start + meta["length"] * itemsize].cast(meta["typecode"])
+            self._cols[name] = col
+        return col
+
+
+class ColumnarReader(SectionReader):
+    """Memory-mapped view of a .ckcol file; columns are zero-copy memoryviews."""
+
+    def __init__(self, path: str) -> None:
+        super().__init__(path)
+        self.count: int = self.header["count"]
+
+    @property
+    def collection(self) -> Dict[str, Any]:
+        """FeatureCollection-level metadata (e.g. applied_ops from delta_apply.py)."""
+        return self.header["collection"]
+
+    def prop_keys(self) -> List[str]:
+        return list(self.header["props"].keys())
+
+    def prop_kind(self, key: str) -> Optional[str]:
+        meta = self.header["props"].get(key)
+        return meta["kind"] if meta else None
+
+    def dictionary(self, key: str) -> List[Any]:
+        """Distinct values of a dictionary-encoded property (index = code)."""
+        return self.header["props"][key]["dictionary"]
+
+    def prop_codes(self, key: str) -> memoryview:
+        """Per-feature codes (dict kind, -1 = absent) or raw values (int64 kind)."""
+        return self.column(f"prop:{key}")
+
+    def prop_value(self, key: str, i: int) -> Any:
+        meta = self.header["props"].get(key)
+        if meta is None:
+            return None
+        v = self.column(f"prop:{key}")[i]
+        if meta["kind"] == "int64":
+            return None if v == INT64_ABSENT else v
+        return None if v < 0 else meta["dictionary"][v]
+
+    def geometry(self, i: int) -> Optional[Dict[str, Any]]:
+        gcode = self.column("geom_type")[i]
+        if gcode < 0:
+            return None
+        gtype = self.header["geom_types"][gcode]
+        coords = self.column("coords")
+        coff = self.column("coord_offsets")
+        poff = self.column("part_offsets")
+        parts = []
+        for p in range(poff[i], poff[i + 1]):
+            flat = coords[coff[p] * 2 : coff[p + 1] * 2].tolist()
+            parts.append(list(map(list, zip(flat[0::2], flat[1::2]))))
+        depth = _GEOM_DEPTH[gtype]
+        c: Any = parts[0][0] if depth == 0 else (parts[0] if depth == 1 else parts)
+        return {"type": gtype, "coordinates": c}
+
+    def properties(self, i: int) -> Optional[Dict[str, Any]]:
+        scode = self.column("prop_shape")[i]
+        if scode < 0:
+            return None
+        props_meta = self.header["props"]
+        out: Dict[str, Any] = {}
+        for k in self.header["prop_shapes"][scode]:
+            meta = props_meta[k]
+            v = self.column(f"prop:{k}")[i]
+            if meta["kind"] == "int64":
+                out[k] = v
+            else:
+                val = meta["dictionary"][v]
+                # Dictionary entries are shared between features; hand out copies of containers
+                out[k] = copy.deepcopy(val) if isinstance(val, (list, dict)) else val
+        return out
+
+    def feature(self, i: int) -> Dict[str, Any]:
+        feat: Dict[str, Any] = {}
+        for k in self.header["feature_shapes"][self.column("feature_shape")[i]]:
+            if k == "type":
+                feat[k] = "Feature"
+            elif k == "properties":
+                feat[k] = self.properties(i)
+            else:
+                feat[k] = self.geometry(i)
+        return feat
+
+    def iter_features(self) -> Iterator[Dict[str, Any]]:
+        """Materialize every feature; bulk-converts columns once instead of per feature."""
+        flat = self.column("coords").tolist()
+        coff = self.column("coord_offsets").tolist()
+        poff = self.column("part_offsets").tolist()
+        gcodes = self.column("geom_type").tolist()
+        fshape = self.column("feature_shape").tolist()
+        pshape = self.column("prop_shape").tolist()
+        geom_types = self.header["geom_types"]
+        feature_shapes = self.header["feature_shapes"]
+        prop_shapes = self.header["prop_shapes"]
+        cols = {}
+        for k, meta in self.header["props"].items():
+            values = self.column(f"prop:{k}").tolist()
+            cols[k] = (values, None if meta["kind"] == "int64" else meta["dictionary"])
+
+        for i in range(self.count):
+            geom = None
+            gcode = gcodes[i]
+            if gcode >= 0:
+                gtype = geom_types[gcode]
+                parts = []
+                for p in range(poff[i], poff[i + 1]):
+                    a, b = coff[p] * 2, coff[p + 1] * 2
+                    parts.append([flat[j : j + 2] for j in range(a, b, 2)])
+                depth = _GEOM_DEPTH[gtype]
+                geom = {"type": gtype, "coordinates": parts[0][0] if depth == 0 else (parts[0] if depth == 1 else parts)}
+
+            props = None
+            if pshape[i] >= 0:
+                props = {}
+                for k in prop_shapes[pshape[i]]:
+                    values, dictionary = cols[k]
+                    v = values[i] if dictionary is None else dictionary[values[i]]
+                    props[k] = copy.deepcopy(v) if isinstance(v, (list, dict)) else v
+
+            feat: Dict[str, Any] = {}
+            for k in feature_shapes[fshape[i]]:
+                feat[k] = "Feature" if k == "type" else (props if k == "properties" else geom)
+            yield feat
+
+    def to_feature_collection(self) -> Dict[str, Any]:
+        # Building ~10 containers per feature triggers the cyclic GC over and over
+        # while the heap grows; nothing created here can form a cycle, so pause it.
+        was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            fc: Dict[str, Any] = {"type": "FeatureCollection", "features": list(self.iter_features())}
+        finally:
+            if was_enabled:
+                gc.enable()
+        fc.update(copy.deepcopy(self.collection))
+        return fc
+
+
+def open_sidecar(geojson_path: str) -> Optional[ColumnarReader]:
+    """Return a reader for geojson_path's sidecar if it exists and matches the GeoJSON, else None."""
+    path = sidecar_path(geojson_path)
+    if not os.path.exists(path) or not os.path.exists(geojson_path):
+        return None
+    try:
+        reader = ColumnarReader(path)
+    except (OSError, ValueError) as e:
+        print(f"WARN: ignoring columnar sidecar {path}: {e}", file=sys.stderr)
+        return None
+    source = reader.header.get("source") or {}
+    if source.get("bytes") != os.path.getsize(geojson_path) or source.get("sha256") != file_sha256(geojson_path):
+        reader.close()
+        return None
+    return reader
+
+
+def load_feature_collection(geojson_path: str) -> Any:
+    """Load a FeatureCollection, from the memory-mapped sidecar when it is current, else from JSON."""
+    reader = open_sidecar(geojson_path)
+    if reader is not None:
+        with reader:
+            return reader.to_feature_collection()
+    with open(geojson_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def round_trip_error(geojson_path: str, sidecar: Optional[str] = None) -> Optional[str]:
+    """
+    None when the sidecar decodes to geojson_path byte for byte, else why it does not.
+
+    sidecar defaults to a temporary encoding of the file (nothing is written
+    next to it). The decoded collection is serialized the way the file was:
+    indent=2 or compact, ASCII-escaped when the file is pure ASCII.
+    """
+    with open(geojson_path, "rb") as f:
+        raw = f.read()
+    with tempfile.TemporaryDirectory(prefix="ckcol-check-") as tmp:
+        if sidecar is None:
+            sidecar = os.path.join(tmp, "check" + SUFFIX)
+            try:
+                write_columnar(sidecar, json.loads(raw), {"path": os.path.basename(geojson_path)})
+            except ValueError as e:
+                return f"not representable: {e}"
+        with ColumnarReader(sidecar) as reader:
+            fc = reader.to_feature_collection()
+    if raw.startswith(b"{\n"):
+        text = json.dumps(fc, indent=2, ensure_ascii=raw.isascii())
+    else:
+        text = json.dumps(fc, separators=(",", ":"), ensure_ascii=raw.isascii())
+    data = text.encode("utf-8")
+    if data == raw:
+        return None
+    at = next((i for i, (a, b) in enumerate(zip(data, raw)) if a != b), min(len(data), len(raw)))
+    return f"decoded GeoJSON differs at byte {at} ({len(data)} vs {len(raw)} bytes)"
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Write/verify columnar sidecars for GeoJSON files")
+    ap.add_argument("geojson", nargs="+", help="GeoJSON FeatureCollection path(s)")
+    ap.add_argument("--check", action="store_true",
+                    help="Only verify the round trip through a temporary sidecar (writes nothing)")
+    args = ap.parse_args()
+
+    status = 0
+    for path in args.geojson:
+        if args.check:
+            error = round_trip_error(path)
+            if error:
+                print(f"ERROR: {path}: {error}", file=sys.stderr)
+                status = 1
+            else:
+                print(f"✅ columnar: {path} — round trip identical")
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            fc = json.load(f)
+        out = write_sidecar(path, fc)
+        if out is None:
+            status = 1
+            continue
+        print(f"✅ columnar: wrote {out} ({os.path.getsize(out)} bytes, {len(fc['features'])} features)")
+    return status
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
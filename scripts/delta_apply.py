@@ -9,22 +9,56 @@ Inputs:
 
 Output:
   --out derived/osm_modified.geojson
+  (+ derived/osm_modified.ckcol columnar sidecar; a current baseline sidecar is read instead of the JSON)
+  Streamed feature by feature to a temp file and renamed into place (see geojson_writer.py);
+  --compact drops the indentation (smaller, faster to write; not patchable by --incremental)
+
+Batch mode:
+  --delta a.json b.json ... --out-dir derived/batch [--workers N]
+  Loads the baseline once and writes derived/batch/osm_modified.<delta name>.geojson per
+  delta. Each delta is applied to a copy-on-write FeatureView, so only the features it
+  touches are copied; with --workers > 1 deltas run in forked processes that share the
+  parsed baseline, tag postings and spatial grid.
+
+Incremental mode:
+  --incremental (single --delta/--out) records per-op fingerprints and affected osm_ids
+  in the output ("op_tracking"); later runs re-evaluate only new/edited ops and patch the
+  previous output in place of a full recompute (see delta_incremental.py).
 
 Behavior:
-  - Applies set_speed_limit by tag selector (e.g., "highway=residential") to baseline features
-  - Adds overlay polygons for add_geofence (AOI bbox) and add_curb_zone (bbox center square)
+  - Applies set_speed_limit by tag selector to baseline features; selectors support
+    key=v1|v2, key!=v, key=* and '&' conjunctions (see tag_selector.py), answered
+    from an inverted index built once per baseline
+  - target.near + target.radius_m restricts set_speed_limit to ways within radius_m
+    of a point or polygon (see spatial_index.py; the grid is built on first use)
+  - Adds overlay polygons for add_geofence (AOI bbox) and add_curb_zone (square around
+    where.near, default bbox center; snapped to the nearest way when where.snap is true)
   - Deterministic ordering: baseline order preserved; overlays appended in ops order
+
+Metrics:
+  CITYKIT_PROFILE=1 records baseline load, each op (features written, overlays added)
+  and output writes (see metrics.py). In batch mode with --workers > 1 only the
+  parent's sections are recorded.
 """
 
 from __future__ import annotations
 
 import argparse
 import json
-import math
+import multiprocessing
 import os
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Tuple, Optional
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import metrics
+from columnar import load_feature_collection, write_sidecar
+from geodesy import bearings, distance_m, segment_lengths, square_around
+from geojson_writer import write_feature_collection
+from spatial_index import SpatialIndex
+from tag_selector import TagIndex, keys as selector_keys
 
 
 def read_json(path: str) -> Any:
@@ -33,22 +67,14 @@ def read_json(path: str) -> Any:
         return json.load(f)
 
 
-def write_json(path: str, obj: Any) -> None:
-    """Write JSON file with directory creation."""
-    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(obj, f, indent=2, ensure_ascii=False)
-
-
-def parse_selector(selector: str) -> Tuple[str, str]:
-    """Parse simple 'key=value' selector."""
-    if "=" not in selector:
-        raise ValueError(f"Unsupported selector (expected key=value): {selector}")
-    k, v = selector.split("=", 1)
-    k, v = k.strip(), v.strip()
-    if not k or not v:
-        raise ValueError(f"Invalid selector: {selector}")
-    return k, v
+def write_geojson(path: str, fc: Dict[str, Any], compact: bool = False) -> str:
+    """
+    Stream a FeatureCollection to path, atomically, with directory creation.
+    Bytes match json.dump(fc, indent=2, ensure_ascii=False) unless compact.
+    Returns the file's sha256.
+    """
+    extra = {k: v for k, v in fc.items() if k not in ("type", "features")}
+    return write_feature_collection(path, fc["features"], extra, indent=None if compact else 2)
 
 
 def corridor_bbox(corridor: Dict[str, Any]) -> Tuple[float, float, float, float]:
@@ -75,17 +101,41 @@ def bbox_center(
     return (min_lon + max_lon) / 2.0, (min_lat + max_lat) / 2.0
 
 
-def meters_to_degrees(lat_deg: float, meters: float) -> Tuple[float, float]:
+def parse_near(
+    near: Any, bbox: Tuple[float, float, float, float]
+) -> Tuple[str, Any]:
     """
-    Very rough conversion. Good enough for an overlay polygon in v0.2.
-    
-    1 deg latitude ~ 111,320 m
-    longitude degrees shrink by cos(latitude)
+    Resolve a where.near / target.near value.
+
+    Accepts "corridor_centerline" (bbox center, the default), a [lon, lat] pair,
+    or a GeoJSON Point / Polygon geometry. Returns ("point", (lon, lat)) or
+    ("polygon", rings).
     """
-    dlat = meters / 111_320.0
-    cos_lat = max(0.1, math.cos(math.radians(lat_deg)))
-    dlon = meters / (111_320.0 * cos_lat)
-    return dlon, dlat
+    if near is None or near == "corridor_centerline":
+        return "point", bbox_center(*bbox)
+    if isinstance(near, dict):
+        if near.get("type") == "Point":
+            near = near.get("coordinates")
+        elif near.get("type") == "Polygon":
+            rings = near.get("coordinates")
+            if isinstance(rings, list) and rings and all(isinstance(r, list) and len(r) >= 4 for r in rings):
+                return "polygon", [[(float(c[0]), float(c[1])) for c in r] for r in rings]
+            raise ValueError("near Polygon needs closed rings of at least 4 positions")
+    if (
+        isinstance(near, (list, tuple))
+        and len(near) == 2
+        and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in near)
+    ):
+        return "point", (float(near[0]), float(near[1]))
+    raise ValueError(f"Unsupported near (expected corridor_centerline, [lon, lat], Point or Polygon): {near!r}")
+
+
+def near_anchor(kind: str, value: Any) -> Tuple[float, float]:
+    """Single anchor point for a resolved near: the point itself, or the polygon's outer-ring vertex mean."""
+    if kind == "point":
+        return value
+    ring = value[0][:-1] if value[0][0] == value[0][-1] else value[0]
+    return sum(c[0] for c in ring) / len(ring), sum(c[1] for c in ring) / len(ring)
 
 
 def polygon_from_bbox(
@@ -107,13 +157,10 @@ def polygon_from_bbox(
 
 
 def square_polygon_around_point(
-    lon: float, lat: float, radius_m: float
+    lon: float, lat: float, radius_m: float, bearing_deg: float = 0.0
 ) -> Dict[str, Any]:
-    """Create a square polygon with side length 2*radius_m centered at (lon, lat)."""
-    dlon, dlat = meters_to_degrees(lat, radius_m)
-    min_lon, max_lon = lon - dlon, lon + dlon
-    min_lat, max_lat = lat - dlat, lat + dlat
-    return polygon_from_bbox(min_lon, min_lat, max_lon, max_lat)
+    """Create a square polygon with side length 2*radius_m centered at (lon, lat), turned bearing_deg clockwise."""
+    return {"type": "Polygon", "coordinates": [square_around(lon, lat, radius_m, bearing_deg)]}
 
 
 def feature_collection(
@@ -126,29 +173,89 @@ def feature_collection(
     return fc
 
 
+class FeatureView:
+    """
+    Copy-on-write view over baseline features.
+
+    Reads fall through to the shared baseline; mutable(i) copies one feature
+    (new feature + properties dicts, geometry shared) the first time an op
+    writes to it. Many deltas can therefore be applied to one parsed baseline,
+    each paying only for the features it touches. Property values are shared
+    with the baseline too: ops must replace them, not mutate them in place.
+    """
+
+    def __init__(self, base: Any) -> None:
+        self.base = base
+        self.copies: Dict[int, Dict[str, Any]] = {}
+        self.writes: Optional[Set[int]] = None  # positions written since reset (see apply_delta)
+
+    def __len__(self) -> int:
+        return len(self.base)
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        feat = self.copies.get(i)
+        return self.base[i] if feat is None else feat
+
+    def __iter__(self):
+        copies = self.copies
+        for i, feat in enumerate(self.base):
+            yield copies.get(i, feat)
+
+    def mutable(self, i: int) -> Dict[str, Any]:
+        if self.writes is not None:
+            self.writes.add(i)
+        feat = self.copies.get(i)
+        if feat is None:
+            feat = dict(self.base[i])
+            feat["properties"] = dict(feat.get("properties") or {})
+            self.copies[i] = feat
+        return feat
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        return list(self)
+
+
 def apply_set_speed_limit(
-    features: List[Dict[str, Any]], selector: str, value_kph: int
+    features: Any,
+    selector: Optional[str],
+    value_kph: int,
+    index: Optional[TagIndex] = None,
+    within: Optional[List[int]] = None,
 ) -> int:
-    """Apply set_speed_limit op to matching features. Returns count of changed features."""
-    key, val = parse_selector(selector)
+    """Apply set_speed_limit op to matching features. Returns count of changed features.
+    
+    features is a list (modified in place) or a FeatureView (touched features are copied).
+    Pass the same TagIndex for every op on a baseline so postings are built once.
+    `within` (feature positions, e.g. from a SpatialIndex query) further restricts
+    the selector matches; with selector None it is the whole target.
+    """
+    if index is None:
+        index = TagIndex(features)
+    if selector is None:
+        targets = sorted(within or ())
+    elif within is None:
+        targets = index.select(selector)
+    else:
+        allowed = set(within)
+        targets = [i for i in index.select(selector) if i in allowed]
     changed = 0
     
-    for feat in features:
+    for i in targets:
+        feat = features.mutable(i) if isinstance(features, FeatureView) else features[i]
         props = feat.get("properties") or {}
-        if props.get(key) == val:
-            props["maxspeed_kph"] = int(value_kph)
-            
-            # Track delta application
-            da = props.get("delta_applied")
-            if not isinstance(da, list):
-                da = []
-            if "set_speed_limit" not in da:
-                da.append("set_speed_limit")
-            props["delta_applied"] = da
-            
-            feat["properties"] = props
-            changed += 1
+        props["maxspeed_kph"] = int(value_kph)
+        
+        # Track delta application (new list: the old one may be shared with the baseline)
+        da = props.get("delta_applied")
+        da = list(da) if isinstance(da, list) else []
+        if "set_speed_limit" not in da:
+            da.append("set_speed_limit")
+        props["delta_applied"] = da
+        
+        feat["properties"] = props
+        changed += 1
     
+    index.invalidate("maxspeed_kph", "delta_applied")
     return changed
 
 
@@ -171,154 +278,480 @@ def build_curb_zone_feature(
     zone_type: str,
     hours: str,
     radius_m: float,
+    center: Optional[Tuple[float, float]] = None,
+    snap: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, Any]:
-    """Build curb zone overlay feature."""
-    lon_c, lat_c = bbox_center(min_lon, min_lat, max_lon, max_lat)
-    geom = square_polygon_around_point(lon_c, lat_c, radius_m)
+    """Build curb zone overlay feature (centered on the bbox unless center is given; aligned with a snapped way)."""
+    if center is None:
+        center = bbox_center(min_lon, min_lat, max_lon, max_lat)
+    lon_c, lat_c = center
+    geom = square_polygon_around_point(lon_c, lat_c, radius_m, (snap or {}).get("snap_bearing_deg") or 0.0)
     
-    return {
-        "type": "Feature",
-        "geometry": geom,
-        "properties": {
-            "feature_type": "curb_zone",
-            "zone_type": zone_type,
-            "hours": hours,
-            "radius_m": radius_m,
-            "source": "scenario_delta",
-        },
+    props: Dict[str, Any] = {
+        "feature_type": "curb_zone",
+        "zone_type": zone_type,
+        "hours": hours,
+        "radius_m": radius_m,
+        "source": "scenario_delta",
     }
+    if snap:
+        props.update(snap)
+    return {"type": "Feature", "geometry": geom, "properties": props}
+
+
+def snap_to_way(
+    features: Any,
+    spatial: Any,
+    lon: float,
+    lat: float,
+    eligible: Optional[List[int]] = None,
+    max_distance_m: Optional[float] = None,
+) -> Optional[Tuple[Tuple[float, float], Dict[str, Any]]]:
+    """
+    Snap (lon, lat) onto the nearest eligible baseline way.
 
-
-def main() -> int:
-    """Main entry point."""
-    ap = argparse.ArgumentParser(description="Apply delta ops to OSM baseline")
-    ap.add_argument("--baseline", required=True, help="Path to baseline GeoJSON FeatureCollection")
-    ap.add_argument("--delta", required=True, help="Path to scenario delta JSON")
-    ap.add_argument("--corridor", required=True, help="Path to corridor JSON (bbox AOI)")
-    ap.add_argument("--out", required=True, help="Path to output modified GeoJSON")
-    args = ap.parse_args()
+    Returns (snapped point, properties to record) or None when no eligible way
+    lies within max_distance_m.
+    """
+    allowed = None if eligible is None else set(eligible).__contains__
+    hit = spatial.nearest(lon, lat, eligible=allowed, max_radius_m=max_distance_m)
+    if hit is None:
+        return None
+    pos, dist, (s_lon, s_lat) = hit
+    feat = features[pos]
+    osm_id = (feat.get("properties") or {}).get("osm_id")
+    snap = {"snapped_to_osm_id": osm_id, "snap_distance_m": round(dist, 2)}
+    # Direction of the way where the point landed: the segment the point lies on (least detour)
+    coords = (feat.get("geometry") or {}).get("coordinates") or []
+    flat = [v for c in coords for v in (float(c[0]), float(c[1]))]
+    seg_lengths = segment_lengths(flat)
+    if len(seg_lengths):
+        detour = [
+            distance_m(flat[2 * i], flat[2 * i + 1], s_lon, s_lat)
+            + distance_m(s_lon, s_lat, flat[2 * i + 2], flat[2 * i + 3]) - seg_lengths[i]
+            for i in range(len(seg_lengths))
+        ]
+        i = detour.index(min(detour))
+        snap["snap_bearing_deg"] = round(bearings(flat[2 * i : 2 * i + 4])[0] % 180.0, 1)
+    return (round(s_lon, 7), round(s_lat, 7)), snap
+
+
+def _radius(value: Any, default: float = 40.0) -> float:
+    try:
+        return float(value)
+    except Exception:
+        return default
+
+
+def query_near(spatial: Any, kind: str, value: Any, radius_m: float) -> List[int]:
+    """Positions of ways within radius_m of a resolved near (see parse_near)."""
+    if kind == "polygon":
+        return spatial.near_polygon(value, radius_m)
+    return spatial.near_point(value[0], value[1], radius_m)
+
+
+class LazySpatialIndex:
+    """SpatialIndex over baseline geometry, built on the first spatial op only."""
+
+    def __init__(self, features: List[Dict[str, Any]]) -> None:
+        self.features = features
+        self.index: Any = None
+
+    def __call__(self) -> Any:
+        if self.index is None:
+            self.index = SpatialIndex(self.features)
+        return self.index
+
+
+def _apply_op(
+    view: FeatureView,
+    op: Any,
+    bbox: Tuple[float, float, float, float],
+    index: TagIndex,
+    get_spatial: Callable[[], Any],
+    overlays: List[Dict[str, Any]],
+    ops_applied: List[Dict[str, Any]],
+) -> None:
+    """Apply one delta op: writes go through view.mutable(), overlays and applied_ops entries are appended."""
+    min_lon, min_lat, max_lon, max_lat = bbox
     
-    # Load baseline
-    if not os.path.exists(args.baseline):
-        print(f"ERROR: baseline not found: {args.baseline}", file=sys.stderr)
-        return 2
+    if not isinstance(op, dict):
+        return
     
-    baseline = read_json(args.baseline)
-    if baseline.get("type") != "FeatureCollection":
-        print("ERROR: baseline must be a GeoJSON FeatureCollection", file=sys.stderr)
-        return 2
+    op_name = op.get("op")
     
-    features = baseline.get("features")
-    if not isinstance(features, list):
-        print("ERROR: baseline.features must be a list", file=sys.stderr)
-        return 2
+    if op_name == "set_speed_limit":
+        target = op.get("target") or {}
+        selector = target.get("selector")
+        near = target.get("near")
+        value_kph = op.get("value_kph")
+        
+        if (isinstance(selector, str) or near is not None) and isinstance(value_kph, (int, float)):
+            entry: Dict[str, Any] = {
+                "op": "set_speed_limit",
+                "selector": selector if isinstance(selector, str) else None,
+                "value_kph": int(value_kph),
+            }
+            within = None
+            if near is not None:
+                radius_m_f = _radius(target.get("radius_m", 40))
+                try:
+                    kind, value = parse_near(near, bbox)
+                except ValueError as e:
+                    ops_applied.append({"op": "set_speed_limit", "status": "skipped", "reason": str(e)})
+                    return
+                within = query_near(get_spatial(), kind, value, radius_m_f)
+                entry.update({"near": near, "radius_m": radius_m_f})
+            changed = apply_set_speed_limit(view, entry["selector"], int(value_kph), index, within)
+            entry["features_changed"] = changed
+            ops_applied.append(entry)
+        else:
+            ops_applied.append(
+                {"op": "set_speed_limit", "status": "skipped", "reason": "missing selector or value_kph"}
+            )
+    
+    elif op_name == "add_geofence":
+        allowed_hours = op.get("allowed_hours", "")
+        if not isinstance(allowed_hours, str) or not allowed_hours:
+            allowed_hours = "unspecified"
+        
+        overlays.append(build_geofence_feature(min_lon, min_lat, max_lon, max_lat, allowed_hours))
+        ops_applied.append({"op": "add_geofence", "allowed_hours": allowed_hours})
+    
+    elif op_name == "add_curb_zone":
+        zone_type = op.get("type", "loading")
+        hours = op.get("hours", "unspecified")
+        where = op.get("where") or {}
+        radius_m_f = _radius(where.get("radius_m", 40))
+        
+        try:
+            kind, value = parse_near(where.get("near"), bbox)
+        except ValueError as e:
+            ops_applied.append({"op": "add_curb_zone", "status": "skipped", "reason": str(e)})
+            return
+        center = near_anchor(kind, value)
+        
+        snap: Optional[Dict[str, Any]] = None
+        if where.get("snap") is True:
+            eligible = index.select(where["selector"]) if isinstance(where.get("selector"), str) else None
+            max_m = where.get("snap_max_m")
+            snapped = snap_to_way(
+                view, get_spatial(), center[0], center[1], eligible,
+                float(max_m) if isinstance(max_m, (int, float)) else None,
+            )
+            if snapped is None:
+                snap = {"snapped_to_osm_id": None}
+            else:
+                center, snap = snapped
+        
+        overlays.append(
+            build_curb_zone_feature(
+                min_lon, min_lat, max_lon, max_lat, str(zone_type), str(hours), radius_m_f, center, snap
+            )
+        )
+        entry = {"op": "add_curb_zone", "zone_type": str(zone_type), "hours": str(hours), "radius_m": radius_m_f}
+        if where.get("near", "corridor_centerline") != "corridor_centerline" or snap is not None:
+            entry["center"] = [center[0], center[1]]
+        if snap:
+            entry.update(snap)
+        ops_applied.append(entry)
+    
+    else:
+        # Ignore unknown ops (future-proof)
+        if isinstance(op_name, str):
+            ops_applied.append({"op": op_name, "status": "ignored"})
+
+
+def apply_delta(
+    view: FeatureView,
+    ops: List[Any],
+    bbox: Tuple[float, float, float, float],
+    index: TagIndex,
+    get_spatial: Callable[[], Any],
+    tracking: Optional[List[Dict[str, Any]]] = None,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Apply delta ops to a copy-on-write view. Returns (overlays, applied_ops entries).
+    
+    With a tracking list, one {"positions", "overlays", "applied"} entry is appended
+    per op (feature positions it wrote, overlays and applied_ops entries it added)
+    for incremental re-application.
+    """
+    overlays: List[Dict[str, Any]] = []
+    ops_applied: List[Dict[str, Any]] = []
+    
+    for i, op in enumerate(ops):
+        n_overlays, n_applied = len(overlays), len(ops_applied)
+        view.writes = set()
+        op_name = op.get("op") if isinstance(op, dict) else None
+        with metrics.section(f"{i}:{op_name}", bucket="ops") as m:
+            _apply_op(view, op, bbox, index, get_spatial, overlays, ops_applied)
+            m["features_changed"] = len(view.writes)
+            m["overlays"] = len(overlays) - n_overlays
+        if tracking is not None:
+            tracking.append({
+                "positions": sorted(view.writes),
+                "overlays": len(overlays) - n_overlays,
+                "applied": len(ops_applied) - n_applied,
+            })
+        view.writes = None
     
+    return overlays, ops_applied
+
+
+def _utc_now() -> str:
+    return datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
+
+
+def output_metadata(
+    ops_count: int,
+    ops_applied: List[Dict[str, Any]],
+    baseline_count: int,
+    modified_count: int,
+    op_tracking: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """FeatureCollection-level metadata of a modified output."""
+    extra: Dict[str, Any] = {
+        "generated_by": "delta_apply.py",
+        "generated_at_utc": _utc_now(),
+        "delta_ops_count": ops_count,
+        "applied_ops": ops_applied,
+    }
+    if op_tracking is not None:
+        extra["op_tracking"] = op_tracking
+    extra.update({
+        "baseline_feature_count": baseline_count,
+        "modified_feature_count": modified_count,
+        "notes": [
+            "Overlays are annotations; they do not modify routing/topology.",
+            "This output is intended for visualization and iteration (v0.2).",
+        ],
+    })
+    return extra
+
+
+def modified_collection(
+    features: List[Dict[str, Any]],
+    delta_path: str,
+    bbox: Optional[Tuple[float, float, float, float]],
+    base_index: TagIndex,
+    get_spatial: Callable[[], Any],
+    tracking_base: Optional[Dict[str, Any]] = None,
+) -> Tuple[Dict[str, Any], Optional[int]]:
+    """
+    Build the modified FeatureCollection for one delta over a shared baseline.
+
+    The baseline list is never mutated. Returns (collection, overlay count),
+    with None for the count when the delta file is missing. Raises ValueError
+    for malformed deltas.
+
+    With tracking_base (baseline fingerprint + bbox, see delta_incremental.py)
+    the metadata also gets "op_tracking": per-op fingerprints and affected
+    osm_ids, which a later --incremental run patches from.
+    """
     # If delta missing, output baseline unchanged (but still valid)
-    if not os.path.exists(args.delta):
+    if not os.path.exists(delta_path):
         extra = {
             "generated_by": "delta_apply.py",
-            "generated_at_utc": datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z"),
+            "generated_at_utc": _utc_now(),
             "delta_ops_count": 0,
             "applied_ops": [],
             "baseline_feature_count": len(features),
             "modified_feature_count": len(features),
             "notes": ["delta file missing; output equals baseline"],
         }
-        write_json(args.out, feature_collection(features, extra))
-        return 0
+        return feature_collection(features, extra), None
     
-    delta = read_json(args.delta)
+    delta = read_json(delta_path)
     ops = delta.get("ops", [])
     if not isinstance(ops, list):
-        print("ERROR: delta.ops must be a list", file=sys.stderr)
-        return 2
+        raise ValueError("delta.ops must be a list")
+    if bbox is None:
+        raise ValueError("corridor bbox required")
     
-    # Load corridor bbox
-    corridor = read_json(args.corridor)
-    min_lon, min_lat, max_lon, max_lat = corridor_bbox(corridor)
+    view = FeatureView(features)
+    tracking: Optional[List[Dict[str, Any]]] = None if tracking_base is None else []
+    overlays, ops_applied = apply_delta(view, ops, bbox, TagIndex(view, parent=base_index), get_spatial, tracking)
     
-    # Apply ops
-    overlays: List[Dict[str, Any]] = []
-    ops_applied: List[Dict[str, Any]] = []
+    # Build output: baseline features (possibly modified) + overlays
+    out_features = view.to_list() + overlays
     
-    for op in ops:
-        if not isinstance(op, dict):
+    op_tracking = None
+    if tracking_base is not None and tracking is not None:
+        from delta_incremental import op_fingerprint
+        op_tracking = dict(tracking_base)
+        op_tracking["ops"] = [
+            {
+                "fingerprint": op_fingerprint(op),
+                "affected_osm_ids": [(features[i].get("properties") or {}).get("osm_id") for i in t["positions"]],
+                "overlays": t["overlays"],
+                "applied": t["applied"],
+            }
+            for op, t in zip(ops, tracking)
+        ]
+    
+    extra = output_metadata(len(ops), ops_applied, len(features), len(out_features), op_tracking)
+    return feature_collection(out_features, extra), len(overlays)
+
+
+# Batch state, set once in the parent before workers fork so they share the parsed baseline
+_BATCH: Dict[str, Any] = {}
+
+
+def run_delta(delta_path: str, out_path: str) -> Dict[str, Any]:
+    """Apply one delta against the batch baseline and write its output + sidecar."""
+    try:
+        out_fc, overlays = modified_collection(
+            _BATCH["features"], delta_path, _BATCH["bbox"], _BATCH["index"], _BATCH["spatial"], _BATCH.get("tracking")
+        )
+    except (OSError, ValueError) as e:
+        return {"delta": delta_path, "out": out_path, "error": str(e)}
+    with metrics.section("write", out=os.path.basename(out_path)) as m:
+        sha256 = write_geojson(out_path, out_fc, _BATCH.get("compact", False))
+        write_sidecar(out_path, out_fc, sha256)
+        m["features"] = len(out_fc["features"])
+    return {"delta": delta_path, "out": out_path, "features": len(out_fc["features"]), "overlays": overlays}
+
+
+def batch_out_path(out_dir: str, delta_path: str) -> str:
+    """derived/batch/osm_modified.<delta name>.geojson for inputs/<delta name>.json"""
+    name = os.path.basename(delta_path)
+    if name.endswith(".json"):
+        name = name[: -len(".json")]
+    return os.path.join(out_dir, f"osm_modified.{name}.geojson")
+
+
+def prewarm(delta_paths: List[str]) -> None:
+    """Build the baseline postings / spatial grid every delta will need, once, before forking."""
+    index, keys, spatial = _BATCH["index"], set(), False
+    for path in delta_paths:
+        try:
+            ops = read_json(path).get("ops", [])
+        except (OSError, ValueError, AttributeError):
             continue
+        for op in ops if isinstance(ops, list) else []:
+            if not isinstance(op, dict):
+                continue
+            for part in (op.get("target"), op.get("where")):
+                if not isinstance(part, dict):
+                    continue
+                if isinstance(part.get("selector"), str):
+                    try:
+                        keys |= selector_keys(part["selector"])
+                    except ValueError:
+                        pass
+                spatial = spatial or part.get("near") not in (None, "corridor_centerline") or part.get("snap") is True
+    index.warm(sorted(keys))
+    if spatial:
+        _BATCH["spatial"]()
+
+
+def run_batch(jobs: List[Tuple[str, str]], workers: int) -> List[Dict[str, Any]]:
+    """Run (delta, out) jobs in order, across forked worker processes when workers > 1."""
+    if workers > 1 and len(jobs) > 1:
+        if "fork" in multiprocessing.get_all_start_methods():
+            prewarm([d for d, _ in jobs])
+            ctx = multiprocessing.get_context("fork")
+            with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), mp_context=ctx) as pool:
+                return list(pool.map(run_delta, *zip(*jobs)))
+        print("⚠️ delta_apply: fork unavailable; running batch in-process", file=sys.stderr)
+    return [run_delta(d, o) for d, o in jobs]
+
+
+def main() -> int:
+    """Main entry point."""
+    ap = argparse.ArgumentParser(description="Apply delta ops to OSM baseline")
+    ap.add_argument("--baseline", required=True, help="Path to baseline GeoJSON FeatureCollection")
+    ap.add_argument(
+        "--delta", required=True, nargs="+",
+        help="Path to scenario delta JSON (several paths: batch over one baseline load)",
+    )
+    ap.add_argument("--corridor", required=True, help="Path to corridor JSON (bbox AOI)")
+    out = ap.add_mutually_exclusive_group(required=True)
+    out.add_argument("--out", help="Path to output modified GeoJSON (single delta)")
+    out.add_argument("--out-dir", help="Batch output dir: one osm_modified.<delta name>.geojson per delta")
+    ap.add_argument("--workers", type=int, default=1, help="Batch worker processes (default 1: in-process)")
+    ap.add_argument(
+        "--incremental", action="store_true",
+        help="Record per-op tracking in --out and, on later runs, re-apply only changed ops by patching it",
+    )
+    ap.add_argument("--compact", action="store_true", help="Write outputs without indentation")
+    args = ap.parse_args()
+    
+    if args.out and len(args.delta) > 1:
+        ap.error("several --delta files need --out-dir")
+    if args.incremental and not args.out:
+        ap.error("--incremental needs a single --delta with --out")
+    if args.incremental and args.compact:
+        ap.error("--incremental patches indented output; drop --compact")
+    if args.out_dir:
+        jobs = [(d, batch_out_path(args.out_dir, d)) for d in args.delta]
+        outs = [o for _, o in jobs]
+        if len(set(outs)) != len(outs):
+            ap.error("--delta files must have distinct names in batch mode")
+    else:
+        jobs = [(args.delta[0], args.out)]
+    
+    # Load baseline
+    if not os.path.exists(args.baseline):
+        print(f"ERROR: baseline not found: {args.baseline}", file=sys.stderr)
+        return 2
+    
+    tracking = None
+    if args.incremental and os.path.exists(args.delta[0]):
+        # Imported here: delta_incremental imports this module
+        from delta_incremental import patch_output, tracking_base
         
-        op_name = op.get("op")
-        
-        if op_name == "set_speed_limit":
-            target = op.get("target") or {}
-            selector = target.get("selector")
-            value_kph = op.get("value_kph")
-            
-            if isinstance(selector, str) and isinstance(value_kph, (int, float)):
-                changed = apply_set_speed_limit(features, selector, int(value_kph))
-                ops_applied.append(
-                    {
-                        "op": "set_speed_limit",
-                        "selector": selector,
-                        "value_kph": int(value_kph),
-                        "features_changed": changed,
-                    }
-                )
-            else:
-                ops_applied.append(
-                    {"op": "set_speed_limit", "status": "skipped", "reason": "missing selector or value_kph"}
-                )
-        
-        elif op_name == "add_geofence":
-            allowed_hours = op.get("allowed_hours", "")
-            if not isinstance(allowed_hours, str) or not allowed_hours:
-                allowed_hours = "unspecified"
-            
-            overlays.append(build_geofence_feature(min_lon, min_lat, max_lon, max_lat, allowed_hours))
-            ops_applied.append({"op": "add_geofence", "allowed_hours": allowed_hours})
-        
-        elif op_name == "add_curb_zone":
-            zone_type = op.get("type", "loading")
-            hours = op.get("hours", "unspecified")
-            where = op.get("where") or {}
-            radius_m = where.get("radius_m", 40)
-            
-            try:
-                radius_m_f = float(radius_m)
-            except Exception:
-                radius_m_f = 40.0
-            
-            overlays.append(
-                build_curb_zone_feature(min_lon, min_lat, max_lon, max_lat, str(zone_type), str(hours), radius_m_f)
-            )
-            ops_applied.append(
-                {"op": "add_curb_zone", "zone_type": str(zone_type), "hours": str(hours), "radius_m": radius_m_f}
+        t0 = time.perf_counter()
+        bbox = corridor_bbox(read_json(args.corridor))
+        summary, reason = patch_output(args.baseline, args.delta[0], bbox, args.out)
+        if summary is not None:
+            print(
+                f"✅ delta_apply: patched {summary['patched_features']} features "
+                f"({summary['reused_ops']} ops reused, {summary['evaluated_ops']} re-evaluated) "
+                f"in {(time.perf_counter() - t0) * 1000:.0f} ms; {summary['features']} features in {args.out}"
             )
-        
-        else:
-            # Ignore unknown ops (future-proof)
-            if isinstance(op_name, str):
-                ops_applied.append({"op": op_name, "status": "ignored"})
+            return 0
+        print(f"delta_apply: full recompute ({reason})")
+        tracking = tracking_base(args.baseline, bbox)
     
-    # Build output: baseline features (possibly modified) + overlays
-    out_features = list(features) + overlays
+    with metrics.section("load_baseline") as m:
+        baseline = load_feature_collection(args.baseline)
+        m["features"] = len(baseline.get("features") or [])
+    if baseline.get("type") != "FeatureCollection":
+        print("ERROR: baseline must be a GeoJSON FeatureCollection", file=sys.stderr)
+        return 2
     
-    extra = {
-        "generated_by": "delta_apply.py",
-        "generated_at_utc": datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z"),
-        "delta_ops_count": len(ops),
-        "applied_ops": ops_applied,
-        "baseline_feature_count": len(features),
-        "modified_feature_count": len(out_features),
-        "notes": [
-            "Overlays are annotations; they do not modify routing/topology.",
-            "This output is intended for visualization and iteration (v0.2).",
-        ],
-    }
+    features = baseline.get("features")
+    if not isinstance(features, list):
+        print("ERROR: baseline.features must be a list", file=sys.stderr)
+        return 2
+    
+    # Load corridor bbox (only needed once a delta file exists)
+    bbox = None
+    if any(os.path.exists(d) for d in args.delta):
+        bbox = corridor_bbox(read_json(args.corridor))
+    
+    _BATCH.update(
+        features=features, bbox=bbox, index=TagIndex(features), spatial=LazySpatialIndex(features), tracking=tracking,
+        compact=args.compact,
+    )
     
-    write_json(args.out, feature_collection(out_features, extra))
-    print(f"✅ delta_apply: wrote {len(out_features)} features ({len(overlays)} overlays) to {args.out}")
+    t0 = time.perf_counter()
+    failed = 0
+    for res in run_batch(jobs, max(1, args.workers)):
+        if "error" in res:
+            failed += 1
+            print(f"ERROR: {res['delta']}: {res['error']}", file=sys.stderr)
+        elif res["overlays"] is not None:
+            if len(jobs) == 1:
+                metrics.count(features=res["features"], overlays=res["overlays"])
+            print(f"✅ delta_apply: wrote {res['features']} features ({res['overlays']} overlays) to {res['out']}")
+    if len(jobs) > 1:
+        print(f"✅ delta_apply: batch of {len(jobs)} deltas ({failed} failed) in {time.perf_counter() - t0:.2f}s")
     
-    return 0
+    return 2 if failed else 0
 
 
 if __name__ == "__main__":
-    raise SystemExit(main())
+    raise SystemExit(metrics.run_main("delta_apply", main))
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+delta_incremental.py — Incremental re-application of delta ops (stdlib-only)
+
+Used by delta_apply.py --incremental. A full run records "op_tracking" in the
+output metadata (next to applied_ops):
+
+  baseline   sha256 / bytes / mtime_ns of the baseline GeoJSON
+  bbox       corridor bbox the ops were applied with
+  ops        one entry per delta op: fingerprint (sha256 of the canonical op
+             JSON), affected_osm_ids, overlays added, applied_ops entries added
+
+The next run matches ops by fingerprint. Unchanged ops are reused as recorded;
+only new or edited ops are evaluated, against the baseline's columnar sidecar
+(no JSON parse). Features touched by a removed, edited or re-ordered op are
+rebuilt from the baseline by replaying the final op list, and the previous
+output file is patched: untouched feature text is copied byte for byte, so
+the result is identical to a full run.
+
+A full recompute is used instead when there is no usable previous output,
+the baseline hash or corridor bbox changed, the baseline has no current
+sidecar, osm_ids are not unique, or an op selector reads a key that ops write
+(ops would then depend on each other's results).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, Iterator, List, Optional, Set, Tuple
+
+from columnar import INT64_ABSENT, ColumnarReader, file_sha256, sidecar_path
+from delta_apply import (
+    FeatureView,
+    LazySpatialIndex,
+    apply_delta,
+    apply_set_speed_limit,
+    output_metadata,
+    read_json,
+)
+from tag_selector import TagIndex, keys as selector_keys
+
+# Property keys written by ops; selectors must not read them for ops to be independent
+WRITTEN_KEYS = {"maxspeed_kph", "delta_applied"}
+
+# How an op's recorded effect is re-applied to a baseline copy of the features it affected
+_REPLAY = {
+    "set_speed_limit": lambda feats, op, within: apply_set_speed_limit(feats, None, int(op["value_kph"]), None, within),
+}
+
+_FEATURES_OPEN = b'{\n  "type": "FeatureCollection",\n  "features": [\n'
+_OPEN_LINE = b"    {\n"
+_FEATURE_SEP = b"\n    },\n    {\n"
+_FEATURES_CLOSE = b"\n    }\n  ]"
+
+
+def op_fingerprint(op: Any) -> str:
+    """sha256 of the canonical JSON of one delta op."""
+    text = json.dumps(op, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def baseline_fingerprint(path: str, previous: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """sha256 + size + mtime of the baseline; the hash is reused while size and mtime are unchanged."""
+    st = os.stat(path)
+    if (
+        previous
+        and previous.get("sha256")
+        and previous.get("bytes") == st.st_size
+        and previous.get("mtime_ns") == st.st_mtime_ns
+    ):
+        sha = previous["sha256"]
+    else:
+        sha = file_sha256(path)
+    return {"sha256": sha, "bytes": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def tracking_base(baseline_path: str, bbox: Tuple[float, float, float, float]) -> Dict[str, Any]:
+    """op_tracking header for a full run (see delta_apply.modified_collection)."""
+    return {"baseline": baseline_fingerprint(baseline_path), "bbox": list(bbox)}
+
+
+def reads_written_keys(op: Any) -> bool:
+    if not isinstance(op, dict):
+        return False
+    for part in (op.get("target"), op.get("where")):
+        if isinstance(part, dict) and isinstance(part.get("selector"), str):
+            try:
+                if selector_keys(part["selector"]) & WRITTEN_KEYS:
+                    return True
+            except ValueError:
+                pass
+    return False
+
+
+def feature_inner(feat: Dict[str, Any]) -> bytes:
+    """
+    A feature as delta_apply.write_geojson() lays it out inside the features array,
+    minus the "    {" / "    }" lines (see PreviousOutput).
+    """
+    text = json.dumps(feat, indent=2, ensure_ascii=False)
+    # json.dumps escapes newlines inside strings, so every "\n" here is a line break
+    return ("    " + text.replace("\n", "\n    "))[len("    {\n") : -len("\n    }")].encode("utf-8")
+
+
+class PreviousOutput:
+    """Features of a delta_apply output as raw text, plus its metadata."""
+
+    def __init__(self, inner: List[bytes], meta: Dict[str, Any]) -> None:
+        # Each feature's text without its first ("    {") and last ("    }") line
+        self.inner = inner
+        self.meta = meta
+
+    @classmethod
+    def read(cls, path: str) -> Optional["PreviousOutput"]:
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            data = f.read()
+        if not data.startswith(_FEATURES_OPEN + _OPEN_LINE):
+            return None
+        first = len(_FEATURES_OPEN) + len(_OPEN_LINE)
+        close = data.find(_FEATURES_CLOSE, first)
+        if close < 0:
+            return None
+        tail = data[close + len(_FEATURES_CLOSE) :]
+        if not tail.startswith(b","):
+            return None
+        try:
+            meta = json.loads(b"{" + tail[1:])
+        except ValueError:
+            return None
+        # Feature-level braces are the only lines indented by exactly 4 spaces
+        inner = data[first:close].split(_FEATURE_SEP)
+        return cls(inner, meta)
+
+class ReaderFeatures:
+    """Read-only feature sequence over a ColumnarReader (features materialize on access)."""
+
+    def __init__(self, reader: ColumnarReader) -> None:
+        self.reader = reader
+
+    def __len__(self) -> int:
+        return self.reader.count
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        return self.reader.feature(i)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return self.reader.iter_features()
+
+
+class ColumnarTagIndex(TagIndex):
+    """TagIndex whose postings are built from sidecar columns instead of feature dicts."""
+
+    def __init__(self, features: ReaderFeatures) -> None:
+        super().__init__(features)
+        self.reader = features.reader
+
+    def _build(self, key: str) -> None:
+        reader = self.reader
+        postings: Dict[str, List[int]] = {}
+        present: List[int] = []
+        kind = reader.prop_kind(key)
+        if kind == "int64":
+            present = [i for i, v in enumerate(reader.prop_codes(key).tolist()) if v != INT64_ABSENT]
+        elif kind is not None:
+            dictionary = reader.dictionary(key)
+            by_code: Dict[int, List[int]] = defaultdict(list)
+            for i, c in enumerate(reader.prop_codes(key).tolist()):
+                if c >= 0:
+                    by_code[c].append(i)
+            for c, positions in by_code.items():
+                v = dictionary[c]
+                if v is None:
+                    continue
+                present.extend(positions)
+                if isinstance(v, str):
+                    postings[v] = positions
+            present.sort()
+        self._postings[key] = postings
+        self._present[key] = present
+
+
+def _osm_id_positions(reader: ColumnarReader) -> Optional[Dict[int, int]]:
+    if reader.prop_kind("osm_id") == "int64":
+        ids = reader.prop_codes("osm_id").tolist()
+    elif reader.prop_kind("osm_id") is not None:
+        dictionary = reader.dictionary("osm_id")
+        ids = [dictionary[c] if c >= 0 else None for c in reader.prop_codes("osm_id").tolist()]
+    else:
+        return None
+    out = {v: i for i, v in enumerate(ids)}
+    if len(out) != len(ids) or None in out or INT64_ABSENT in out:
+        return None
+    return out
+
+
+def _write_atomic(path: str, chunks: List[bytes]) -> None:
+    d = os.path.dirname(path) or "."
+    fd, tmp = tempfile.mkstemp(dir=d, prefix=".delta-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def patch_output(
+    baseline_path: str, delta_path: str, bbox: Tuple[float, float, float, float], out_path: str
+) -> Tuple[Optional[Dict[str, Any]], str]:
+    """
+    Re-apply delta_path by patching the previous out_path.
+
+    Returns (summary, "") on success, or (None, reason) when a full recompute is needed.
+    """
+    prev = PreviousOutput.read(out_path)
+    if prev is None:
+        return None, "no previous output to patch"
+    tracked = prev.meta.get("op_tracking")
+    if not isinstance(tracked, dict) or not isinstance(tracked.get("ops"), list):
+        return None, "previous output has no op_tracking"
+    if tracked.get("bbox") != list(bbox):
+        return None, "corridor bbox changed"
+    baseline_fp = baseline_fingerprint(baseline_path, tracked.get("baseline"))
+    if baseline_fp["sha256"] != (tracked.get("baseline") or {}).get("sha256"):
+        return None, "baseline changed"
+    if not os.path.exists(delta_path):
+        return None, "delta file missing"
+    ops = read_json(delta_path).get("ops", [])
+    if not isinstance(ops, list):
+        return None, "delta.ops is not a list"
+    if any(reads_written_keys(op) for op in ops):
+        return None, f"a selector reads a key ops write ({', '.join(sorted(WRITTEN_KEYS))})"
+
+    try:
+        reader = ColumnarReader(sidecar_path(baseline_path))
+    except (OSError, ValueError):
+        return None, "baseline has no columnar sidecar"
+    with reader:
+        source = reader.header.get("source") or {}
+        if source.get("sha256") != baseline_fp["sha256"] or source.get("bytes") != baseline_fp["bytes"]:
+            return None, "baseline sidecar is stale"
+        n_base = reader.count
+        if prev.meta.get("baseline_feature_count") != n_base or prev.meta.get("modified_feature_count") != len(prev.inner):
+            return None, "previous output does not match the baseline"
+        id_pos = _osm_id_positions(reader)
+        if id_pos is None:
+            return None, "baseline osm_ids are missing or not unique"
+        return _patch(reader, id_pos, prev, tracked["ops"], ops, bbox, baseline_fp, out_path)
+
+
+def _patch(
+    reader: ColumnarReader,
+    id_pos: Dict[int, int],
+    prev: PreviousOutput,
+    old_ops: List[Dict[str, Any]],
+    ops: List[Any],
+    bbox: Tuple[float, float, float, float],
+    baseline_fp: Dict[str, Any],
+    out_path: str,
+) -> Tuple[Optional[Dict[str, Any]], str]:
+    n_base = reader.count
+
+    # Previous per-op positions and where its overlays / applied_ops entries sit
+    old_pos: List[Set[int]] = []
+    old_overlay_at: List[int] = []
+    old_applied_at: List[int] = []
+    n_overlays = n_applied = 0
+    for entry in old_ops:
+        old_overlay_at.append(n_overlays)
+        old_applied_at.append(n_applied)
+        try:
+            old_pos.append({id_pos[i] for i in entry["affected_osm_ids"]})
+            n_overlays += entry["overlays"]
+            n_applied += entry["applied"]
+        except (KeyError, TypeError):
+            return None, "previous op_tracking is incomplete or refers to unknown osm_ids"
+    old_applied = prev.meta.get("applied_ops") or []
+    if n_base + n_overlays != len(prev.inner) or n_applied != len(old_applied):
+        return None, "previous op_tracking does not match its output"
+
+    # Reuse unchanged ops (by fingerprint, first unused match), evaluate the rest
+    available: Dict[str, Deque[int]] = defaultdict(deque)
+    for i, entry in enumerate(old_ops):
+        available[entry["fingerprint"]].append(i)
+    fingerprints = [op_fingerprint(op) for op in ops]
+    reused: Dict[int, int] = {}
+    for j, fp in enumerate(fingerprints):
+        if available[fp]:
+            reused[j] = available[fp].popleft()
+
+    features = ReaderFeatures(reader)
+    index = ColumnarTagIndex(features)
+    spatial = LazySpatialIndex(features)  # type: ignore[arg-type]
+    evaluated: Dict[int, Tuple[Set[int], List[Dict[str, Any]], List[Dict[str, Any]]]] = {}
+    for j, op in enumerate(ops):
+        if j in reused:
+            continue
+        tracking: List[Dict[str, Any]] = []
+        overlays, applied = apply_delta(FeatureView(features), [op], bbox, index, spatial, tracking)
+        evaluated[j] = (set(tracking[0]["positions"]), overlays, applied)
+
+    # Features whose final properties may differ from the previous output
+    dirty: Set[int] = set()
+    used_old = set(reused.values())
+    for i, positions in enumerate(old_pos):
+        if i not in used_old:
+            dirty |= positions
+    for positions, _, _ in evaluated.values():
+        dirty |= positions
+    order = [reused[j] for j in sorted(reused)]
+    if order != sorted(order):
+        for i in order:
+            dirty |= old_pos[i]
+
+    new_pos = [old_pos[reused[j]] if j in reused else evaluated[j][0] for j in range(len(ops))]
+    for j, op in enumerate(ops):
+        if new_pos[j] and (not isinstance(op, dict) or op.get("op") not in _REPLAY):
+            return None, f"op {j} writes features but cannot be replayed"
+
+    # Rebuild dirty features from the baseline by replaying the final op list
+    sub_pos = sorted(dirty)
+    sub = [reader.feature(p) for p in sub_pos]
+    local = {p: k for k, p in enumerate(sub_pos)}
+    for j, op in enumerate(ops):
+        within = [local[p] for p in sorted(new_pos[j]) if p in local]
+        if within:
+            _REPLAY[op["op"]](sub, op, within)
+
+    # Overlays, applied_ops and tracking entries in new op order
+    overlay_chunks: List[bytes] = []
+    applied_ops: List[Dict[str, Any]] = []
+    tracking_ops: List[Dict[str, Any]] = []
+    for j, op in enumerate(ops):
+        if j in reused:
+            i = reused[j]
+            entry = old_ops[i]
+            a = old_overlay_at[i]
+            overlay_chunks.extend(prev.inner[n_base + a : n_base + a + entry["overlays"]])
+            b = old_applied_at[i]
+            applied_ops.extend(old_applied[b : b + entry["applied"]])
+            tracking_ops.append(entry)
+        else:
+            positions, overlays, applied = evaluated[j]
+            overlay_chunks.extend(feature_inner(o) for o in overlays)
+            applied_ops.extend(applied)
+            tracking_ops.append({
+                "fingerprint": fingerprints[j],
+                "affected_osm_ids": [reader.prop_value("osm_id", p) for p in sorted(positions)],
+                "overlays": len(overlays),
+                "applied": len(applied),
+            })
+
+    n_out = n_base + len(overlay_chunks)
+    if n_out == 0:
+        return None, "empty output"
+    meta = output_metadata(
+        len(ops), applied_ops, n_base, n_out,
+        {"baseline": baseline_fp, "bbox": list(bbox), "ops": tracking_ops},
+    )
+
+    # Splice: untouched features keep their previous text
+    inner = prev.inner[:n_base]
+    for p, feat in zip(sub_pos, sub):
+        inner[p] = feature_inner(feat)
+    inner.extend(overlay_chunks)
+
+    meta_text = json.dumps(meta, indent=2, ensure_ascii=False).encode("utf-8")
+    chunks = [_FEATURES_OPEN, _OPEN_LINE, _FEATURE_SEP.join(inner), _FEATURES_CLOSE, b",", meta_text[1:]]
+    _write_atomic(out_path, chunks)
+
+    # The output's sidecar no longer matches; drop it rather than re-encoding everything
+    stale = sidecar_path(out_path)
+    if os.path.exists(stale):
+        os.unlink(stale)
+
+    return {
+        "features": n_out,
+        "overlays": len(overlay_chunks),
+        "reused_ops": len(reused),
+        "evaluated_ops": len(evaluated),
+        "patched_features": len(sub_pos),
+    }, ""
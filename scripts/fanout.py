@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+fanout.py — Build one demo kit per corridor in a directory, in parallel (stdlib-only)
+
+Usage:
+  python3 scripts/fanout.py <DIR> [--jobs N] [--stage-jobs 2] [--max-requests 2] [--prefix NAME]
+
+Inputs (in DIR):
+  <name>.json         corridor file with a bbox "aoi"; each one becomes a kit
+  <name>.delta.json   delta for that corridor (optional; default: --delta)
+
+Steps:
+  1. Corridors whose bboxes overlap are grouped, and each group's enclosing bbox
+     is fetched once by osm_fetch.py (Overpass with MAKE_ONLINE=1, or OSM_EXTRACT),
+     at most --max-requests fetches at a time. The same cap is passed on as
+     OVERPASS_MAX_CONCURRENT, so tiled fetches and retries stay within it.
+     Two groups are merged only while their enclosing bbox stays within
+     --merge-slack times the sum of their areas (no city-sized box for a chain
+     of corridors). Without MAKE_ONLINE/OSM_EXTRACT nothing is fetched.
+  2. pipeline.py runs once per corridor, --jobs at a time, each as its own
+     process with RUN_ID=<prefix>-<name>, CORRIDOR/DELTA set, its own
+     PIPELINE_WORK_DIR and OSM_SHARED_DIR pointing at its group's fetch
+     (osm_fetch.py selects the corridor's ways from it). The stage cache and
+     run index are shared as usual.
+  3. A summary table of all runs is printed from artifacts/index.sqlite.
+
+Outputs:
+  artifacts/<prefix>-<name>/city_demo_kit.zip, one per corridor
+  .cache/fanout/<prefix>/   shared fetches, per-run work dirs and pipeline logs
+
+Exit codes:
+  0 = every kit built
+  1 = bad input directory
+  2 = at least one kit failed (see its log)
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import run_index
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+BBOX_KEYS = ("min_lon", "min_lat", "max_lon", "max_lat")
+
+
+def load_bbox(path: Path) -> Dict[str, float]:
+    """The corridor's bbox aoi; raises ValueError when the file has none."""
+    data = json.loads(path.read_text(encoding="utf-8"))
+    aoi = data.get("aoi") if isinstance(data, dict) else None
+    if not aoi or aoi.get("type") != "bbox":
+        raise ValueError("aoi must be type='bbox'")
+    return {k: float(aoi[k]) for k in BBOX_KEYS}
+
+
+def find_corridors(in_dir: Path, default_delta: Path) -> List[Dict[str, Any]]:
+    corridors = []
+    for path in sorted(in_dir.glob("*.json")):
+        if path.name.endswith(".delta.json"):
+            continue
+        try:
+            bbox = load_bbox(path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ fanout: skipping {path.name}: {e}", file=sys.stderr)
+            continue
+        delta = path.with_name(path.stem + ".delta.json")
+        corridors.append({
+            "name": path.stem, "corridor": path, "bbox": bbox,
+            "delta": delta if delta.exists() else default_delta,
+        })
+    return corridors
+
+
+def _union(a: Dict[str, float], b: Dict[str, float]) -> Dict[str, float]:
+    return {
+        "min_lon": min(a["min_lon"], b["min_lon"]), "min_lat": min(a["min_lat"], b["min_lat"]),
+        "max_lon": max(a["max_lon"], b["max_lon"]), "max_lat": max(a["max_lat"], b["max_lat"]),
+    }
+
+
+def _overlaps(a: Dict[str, float], b: Dict[str, float]) -> bool:
+    return (a["min_lon"] <= b["max_lon"] and b["min_lon"] <= a["max_lon"]
+            and a["min_lat"] <= b["max_lat"] and b["min_lat"] <= a["max_lat"])
+
+
+def _area(b: Dict[str, float]) -> float:
+    return (b["max_lon"] - b["min_lon"]) * (b["max_lat"] - b["min_lat"])
+
+
+def group_corridors(corridors: List[Dict[str, Any]], slack: float) -> List[Dict[str, Any]]:
+    """Merge overlapping corridors into fetch groups: {bbox, area, members}."""
+    groups = [{"bbox": c["bbox"], "area": _area(c["bbox"]), "members": [c["name"]]} for c in corridors]
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(groups)):
+            for j in range(i + 1, len(groups)):
+                a, b = groups[i], groups[j]
+                if not _overlaps(a["bbox"], b["bbox"]):
+                    continue
+                union = _union(a["bbox"], b["bbox"])
+                if _area(union) > slack * (a["area"] + b["area"]):
+                    continue
+                groups[i] = {"bbox": union, "area": a["area"] + b["area"], "members": a["members"] + b["members"]}
+                del groups[j]
+                merged = True
+                break
+            if merged:
+                break
+    return groups
+
+
+def fetch_group(group: Dict[str, Any], shared_dir: Path, env: Dict[str, str], log: Path) -> bool:
+    """osm_fetch.py for the group's enclosing bbox into shared_dir."""
+    shared_dir.mkdir(parents=True, exist_ok=True)
+    corridor = shared_dir / "corridor.json"
+    corridor.write_text(json.dumps({
+        "schema_version": "0.1",
+        "name": "fanout group: " + ", ".join(group["members"]),
+        "aoi": dict(type="bbox", **group["bbox"]),
+    }, indent=2), encoding="utf-8")
+    with open(log, "w", encoding="utf-8") as f:
+        proc = subprocess.run(
+            [sys.executable, str(ROOT_DIR / "scripts" / "osm_fetch.py")],
+            env=dict(env, CORRIDOR=str(corridor), OSM_OUT_DIR=str(shared_dir)),
+            stdout=f, stderr=subprocess.STDOUT,
+        )
+    return proc.returncode == 0
+
+
+def build_kit(c: Dict[str, Any], env: Dict[str, str]) -> Dict[str, Any]:
+    """One pipeline.py process; output goes to the corridor's log."""
+    t0 = time.perf_counter()
+    with open(c["log"], "w", encoding="utf-8") as f:
+        proc = subprocess.run(
+            [sys.executable, str(ROOT_DIR / "scripts" / "pipeline.py"), "--run-id", c["run_id"]],
+            env=env, stdout=f, stderr=subprocess.STDOUT,
+        )
+    return {"returncode": proc.returncode, "seconds": time.perf_counter() - t0}
+
+
+def print_summary(corridors: List[Dict[str, Any]], artifacts: Path) -> None:
+    con = run_index.connect(artifacts / "index.sqlite")
+    try:
+        indexed = set(run_index.ensure(con, artifacts, [c["run_id"] for c in corridors]))
+        print("✅ CityKit Fan-out Summary")
+        print("--------------------------")
+        cols = ["status", "group", "osm", "baseline", "modified", "delta ops", "actors", "viewer", "cache hits", "zip MB", "seconds"]
+        print(f"{'corridor':<24}" + "".join(f"{c:>11}" for c in cols))
+        for c in corridors:
+            s = run_index.summary_of(con, c["run_id"]) if c["run_id"] in indexed else None
+            if c["returncode"] != 0 or s is None:
+                print(f"{c['name']:<24}{'FAILED':>11}{c['group']:>11}  see {c['log']}")
+                continue
+            modified = s["modified"] or {}
+            values = [
+                "ok",
+                c["group"],
+                "yes" if s["osm_online"] else "no",
+                (s["baseline"] or {}).get("features"),
+                modified.get("features"),
+                modified.get("delta_ops_count"),
+                s["actor_count"],
+                (s["viewer"] or {}).get("mode"),
+                len(s["stage_cache_hits"]),
+                f"{s['zip_bytes'] / 1e6:.2f}",
+                f"{c['seconds']:.1f}",
+            ]
+            print(f"{c['name']:<24}" + "".join(f"{'-' if v is None else v:>11}" for v in values))
+    finally:
+        con.close()
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Build a demo kit for every corridor in a directory")
+    ap.add_argument("dir", type=Path, help="Directory of <name>.json corridors (+ optional <name>.delta.json)")
+    ap.add_argument("--delta", type=Path, default=ROOT_DIR / "inputs" / "scenario_delta.example.json",
+                    help="Delta for corridors without their own")
+    ap.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Kits built at once")
+    ap.add_argument("--stage-jobs", type=int, default=2, help="PIPELINE_JOBS for each kit")
+    ap.add_argument("--max-requests", type=int, default=int(os.environ.get("OVERPASS_MAX_CONCURRENT") or 2),
+                    help="Max OSM fetches / Overpass requests in flight")
+    ap.add_argument("--merge-slack", type=float, default=2.0,
+                    help="Merge overlapping corridors while the shared bbox is at most this many times their area")
+    ap.add_argument("--prefix", default="fanout-" + datetime.now(timezone.utc).strftime("%Y-%m-%dT%H%M%SZ"),
+                    help="Run id prefix (run ids are <prefix>-<name>)")
+    args = ap.parse_args()
+
+    if not args.dir.is_dir():
+        print(f"ERROR: not a directory: {args.dir}", file=sys.stderr)
+        return 1
+    corridors = find_corridors(args.dir, args.delta.resolve())
+    if not corridors:
+        print(f"ERROR: no corridor files (*.json with a bbox aoi) in {args.dir}", file=sys.stderr)
+        return 1
+
+    work = ROOT_DIR / ".cache" / "fanout" / args.prefix
+    (work / "logs").mkdir(parents=True, exist_ok=True)
+    env = dict(os.environ, OVERPASS_MAX_CONCURRENT=str(max(1, args.max_requests)), PIPELINE_JOBS=str(args.stage_jobs))
+    env.pop("OSM_SHARED_DIR", None)
+    fetching = env.get("MAKE_ONLINE") == "1" or bool(env.get("OSM_EXTRACT"))
+    t0 = time.perf_counter()
+
+    groups = group_corridors(corridors, args.merge_slack)
+    by_name = {c["name"]: c for c in corridors}
+    for gid, g in enumerate(groups, 1):
+        for name in g["members"]:
+            by_name[name]["group"] = f"g{gid}"
+    print(f"🗺️ fanout: {len(corridors)} corridors, {len(groups)} fetch groups, {args.jobs} kits at a time")
+
+    shared: Dict[str, Optional[Path]] = {}
+    if fetching:
+        def fetch(gid: int) -> None:
+            g = groups[gid - 1]
+            shared_dir = work / "shared" / f"g{gid}"
+            ok = fetch_group(g, shared_dir, env, work / "logs" / f"g{gid}.fetch.log")
+            shared[f"g{gid}"] = shared_dir if ok else None
+            status = "ok" if ok else f"failed, corridors fetch on their own (see logs/g{gid}.fetch.log)"
+            print(f"🌍 fetch g{gid} ({len(g['members'])} corridors): {status}\n", end="")
+
+        with ThreadPoolExecutor(max_workers=max(1, args.max_requests)) as pool:
+            list(pool.map(fetch, range(1, len(groups) + 1)))
+
+    def run(c: Dict[str, Any]) -> None:
+        c["run_id"] = f"{args.prefix}-{c['name']}"
+        c["log"] = work / "logs" / f"{c['name']}.log"
+        run_env = dict(
+            env, RUN_ID=c["run_id"], CORRIDOR=str(c["corridor"].resolve()), DELTA=str(c["delta"]),
+            PIPELINE_WORK_DIR=str(work / "runs" / c["name"]),
+        )
+        if shared.get(c["group"]):
+            run_env["OSM_SHARED_DIR"] = str(shared[c["group"]])
+        c.update(build_kit(c, run_env))
+        mark = "✅" if c["returncode"] == 0 else "❌"
+        print(f"{mark} {c['name']}: {c['run_id']} ({c['seconds']:.1f}s)\n", end="")
+
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        list(pool.map(run, corridors))
+
+    print(f"⏱️ fanout: {len(corridors)} kits in {time.perf_counter() - t0:.1f}s (logs: {work / 'logs'})")
+    print_summary(corridors, ROOT_DIR / "artifacts")
+    return 0 if all(c["returncode"] == 0 for c in corridors) else 2
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
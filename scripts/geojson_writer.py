@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+geojson_writer.py — Streaming FeatureCollection writer (stdlib-only)
+
+Features are encoded and written one at a time to a temp file next to the
+target, which is renamed into place on close(); readers never see a partial
+file and peak memory no longer depends on the output size.
+
+Two layouts, both byte-stable:
+
+  indent=2     byte-identical to json.dump(fc, f, indent=2) of the same
+               FeatureCollection (what osm_fetch.py / delta_apply.py always
+               wrote); coordinate arrays are laid out from the C encoder's
+               compact output instead of the pure-Python indenting encoder
+  indent=None  compact: json.dumps(fc, separators=(",", ":"))
+
+The sha256 of the written bytes is available after close(), so a sidecar or
+a determinism check does not have to re-read the file.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import os
+import re
+import tempfile
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# Compact JSON of a list of flat numeric lists, minus the outer "[[" / "]]" and with
+# the "],[" between items replaced by \0 (see _Indenter._numeric_rows)
+_NUMERIC_ROWS = re.compile(r"[0-9eE.+\-,\x00NaIfinty]*")
+_NUMERIC_ROW = re.compile(r"[0-9eE.+\-,NaIfinty]*")
+
+_FLUSH_BYTES = 1 << 20
+
+
+def _floatstr(o: float) -> str:
+    # json.encoder's float formatting (allow_nan=True)
+    if o != o:
+        return "NaN"
+    if o == math.inf:
+        return "Infinity"
+    if o == -math.inf:
+        return "-Infinity"
+    return float.__repr__(o)
+
+
+class _Indenter:
+    """Produces exactly json.dumps(obj, indent=n, ensure_ascii=...) for JSON-native values."""
+
+    def __init__(self, indent: int, ensure_ascii: bool) -> None:
+        self.indent = indent
+        self.ensure_ascii = ensure_ascii
+        self.encode_str: Callable[[str], str] = (
+            json.encoder.encode_basestring_ascii if ensure_ascii else json.encoder.encode_basestring  # type: ignore[attr-defined]
+        )
+        self._compact = json.JSONEncoder(separators=(",", ":"), ensure_ascii=ensure_ascii).encode
+        self._pads: List[str] = []
+
+    def pad(self, level: int) -> str:
+        while len(self._pads) <= level:
+            self._pads.append("\n" + " " * (self.indent * len(self._pads)))
+        return self._pads[level]
+
+    def encode(self, o: Any, level: int = 0) -> str:
+        out: List[str] = []
+        self._encode(o, level, out)
+        return "".join(out)
+
+    def _encode(self, o: Any, level: int, out: List[str]) -> None:
+        if isinstance(o, str):
+            out.append(self.encode_str(o))
+        elif o is None:
+            out.append("null")
+        elif o is True:
+            out.append("true")
+        elif o is False:
+            out.append("false")
+        elif isinstance(o, int):
+            out.append(int.__repr__(o))
+        elif isinstance(o, float):
+            out.append(_floatstr(o))
+        elif isinstance(o, (list, tuple)):
+            if not o:
+                out.append("[]")
+                return
+            fast = self._numeric_rows(o, level)
+            if fast is not None:
+                out.append(fast)
+                return
+            inner = self.pad(level + 1)
+            sep = "[" + inner
+            for v in o:
+                out.append(sep)
+                self._encode(v, level + 1, out)
+                sep = "," + inner
+            out.append(self.pad(level) + "]")
+        elif isinstance(o, dict) and all(isinstance(k, str) for k in o):
+            if not o:
+                out.append("{}")
+                return
+            inner = self.pad(level + 1)
+            sep = "{" + inner
+            for k, v in o.items():
+                out.append(sep + self.encode_str(k) + ": ")
+                self._encode(v, level + 1, out)
+                sep = "," + inner
+            out.append(self.pad(level) + "}")
+        else:
+            # Non-str keys, subclasses, unsupported types: let json decide (and raise)
+            text = json.dumps(o, indent=self.indent, ensure_ascii=self.ensure_ascii)
+            out.append(text.replace("\n", self.pad(level)))
+
+    def _numeric_rows(self, o: Any, level: int) -> Optional[str]:
+        """
+        Lay out a flat numeric list ([lon, lat]) or a list of them (a LineString /
+        ring) from the C encoder's compact text; None when o is anything else.
+        Numbers never contain "," "[" or "]", so splitting the compact text is exact.
+        """
+        first = o[0]
+        if isinstance(first, (list, tuple)):
+            compact = self._compact(o)
+            if not compact.startswith("[[") or not compact.endswith("]]"):
+                return None
+            body = compact[2:-2].replace("],[", "\0")
+            # Empty rows ("[]") would leave a bare \0 at an end or "\0\0"; use the slow path
+            if not body or not _NUMERIC_ROWS.fullmatch(body) or body[0] == "\0" or body[-1] == "\0" or "\0\0" in body:
+                return None
+            p1, p2 = self.pad(level + 1), self.pad(level + 2)
+            body = body.replace(",", "," + p2).replace("\0", p1 + "]," + p1 + "[" + p2)
+            return "[" + p1 + "[" + p2 + body + p1 + "]" + self.pad(level) + "]"
+        if isinstance(first, (int, float)) and not isinstance(first, bool):
+            compact = self._compact(o)
+            body = compact[1:-1]
+            if not _NUMERIC_ROW.fullmatch(body):
+                return None
+            p1 = self.pad(level + 1)
+            return "[" + p1 + body.replace(",", "," + p1) + self.pad(level) + "]"
+        return None
+
+
+class FeatureCollectionWriter:
+    """
+    Write a FeatureCollection feature by feature.
+
+        with FeatureCollectionWriter("derived/out.geojson") as w:
+            for feat in features:
+                w.write(feat)
+            w.close({"generated_by": "..."})   # metadata keys after "features"
+
+    Leaving the block without close() (e.g. on an exception) discards the temp file.
+    """
+
+    def __init__(self, path: str, indent: Optional[int] = 2, ensure_ascii: bool = False) -> None:
+        self.path = path
+        self.indent = indent
+        self.ensure_ascii = ensure_ascii
+        self.count = 0
+        self.bytes_written = 0
+        self.sha256: Optional[str] = None
+        self._hash = hashlib.sha256()
+        self._pending: List[bytes] = []
+        self._pending_bytes = 0
+        if indent is None:
+            self._dumps = json.JSONEncoder(separators=(",", ":"), ensure_ascii=ensure_ascii).encode
+            self._head, self._sep = '{"type":"FeatureCollection","features":[', ","
+        else:
+            indenter = _Indenter(indent, ensure_ascii)
+            self._dumps = lambda feat: indenter.encode(feat, 2)
+            self._indenter = indenter
+            self._head = "{" + indenter.pad(1) + '"type": "FeatureCollection",' + indenter.pad(1) + '"features": ['
+            self._sep = ","
+        d = os.path.dirname(path) or "."
+        os.makedirs(d, exist_ok=True)
+        fd, self._tmp = tempfile.mkstemp(dir=d, prefix=".geojson.", suffix=".tmp")
+        self._fp = os.fdopen(fd, "wb")
+        self._emit(self._head)
+
+    def __enter__(self) -> "FeatureCollectionWriter":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        if self._fp is not None:
+            self.abort()
+
+    def _emit(self, text: str) -> None:
+        data = text.encode("utf-8")
+        self._pending.append(data)
+        self._pending_bytes += len(data)
+        if self._pending_bytes >= _FLUSH_BYTES:
+            self._flush()
+
+    def _flush(self) -> None:
+        data = b"".join(self._pending)
+        self._pending = []
+        self._pending_bytes = 0
+        self._hash.update(data)
+        self._fp.write(data)
+        self.bytes_written += len(data)
+
+    def write(self, feature: Dict[str, Any]) -> None:
+        if self.indent is None:
+            text = self._dumps(feature)
+            self._emit(text if self.count == 0 else self._sep + text)
+        else:
+            pad = self._indenter.pad(2)
+            self._emit((pad if self.count == 0 else self._sep + pad) + self._dumps(feature))
+        self.count += 1
+
+    def write_all(self, features: Iterable[Dict[str, Any]]) -> None:
+        for feat in features:
+            self.write(feat)
+
+    def close(self, extra: Optional[Dict[str, Any]] = None) -> str:
+        """Finish the document, rename it into place and return its sha256."""
+        extra = {k: v for k, v in (extra or {}).items() if k not in ("type", "features")}
+        if self.indent is None:
+            tail = "]"
+            for k, v in extra.items():
+                tail += "," + self._dumps(k) + ":" + self._dumps(v)
+            self._emit(tail + "}")
+        else:
+            ind = self._indenter
+            tail = ind.pad(1) + "]" if self.count else "]"
+            for k, v in extra.items():
+                tail += "," + ind.pad(1) + ind.encode_str(k) + ": " + ind.encode(v, 1)
+            self._emit(tail + ind.pad(0) + "}")
+        self._flush()
+        self._fp.close()
+        self._fp = None
+        os.chmod(self._tmp, 0o644)
+        os.replace(self._tmp, self.path)
+        self.sha256 = self._hash.hexdigest()
+        return self.sha256
+
+    def abort(self) -> None:
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+        try:
+            os.unlink(self._tmp)
+        except OSError:
+            pass
+
+
+def write_feature_collection(
+    path: str,
+    features: Iterable[Dict[str, Any]],
+    extra: Optional[Dict[str, Any]] = None,
+    indent: Optional[int] = 2,
+    ensure_ascii: bool = False,
+) -> str:
+    """Stream features (any iterable) plus metadata to path atomically; returns the sha256."""
+    with FeatureCollectionWriter(path, indent=indent, ensure_ascii=ensure_ascii) as w:
+        w.write_all(features)
+        return w.close(extra)
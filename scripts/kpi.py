@@ -0,0 +1,567 @@
+#!/usr/bin/env python3
+"""
+kpi.py — Conflict, curb-dwell, pedestrian-delay and delivery KPIs from simulated trajectories (NumPy optional)
+
+Reads the actor table and trajectory chunks written by simulate.py in one
+streaming pass (one chunk in memory at a time) and aggregates:
+
+  conflicts        near misses: two actors of different types closer than
+                   --radius metres at the same step, at least one of them
+                   moving (speed over --moving m/s). Candidate pairs come
+                   from a spatial hash per step (cells of --radius metres
+                   keyed by step and cell; each cell is checked against
+                   itself and four of its neighbours), so the work grows
+                   with the rows, not with their square. An encounter that
+                   lasts several steps is one event; exposure counts every
+                   step. Per actor-type pair.
+  curb dwell       stopped cars and delivery robots inside each curb_zone
+                   overlay: dwell seconds, vehicles, peak occupancy, and
+                   dwell outside the zone's hours.
+  pedestrian delay time pedestrians lose on their way against walking at
+                   free speed (dt * (1 - speed / free speed) per slower step);
+                   their only delay in simulate.py is waiting to cross car
+                   streets, so it is n/a for a run without crossing waits.
+  deliveries       delivery trips that arrived within the simulated period
+                   at a dwell point inside their curb zone's rings, per hour
+                   and per zone; arrivals outside the rings are counted apart.
+  exposure         actors, actor-hours and kilometres per actor type.
+
+Positions are compared in a local plane at the first trajectory row
+(geodesy.meters_to_degrees), which is exact enough at conflict distances.
+With NumPy each chunk is processed as whole arrays (pairs from one
+searchsorted per neighbour offset over the sorted cell keys); without it,
+per step with a dict grid. Both give the same counts.
+
+Usage:
+  python3 scripts/kpi.py --kit KIT_DIR [--run-id ID] [--radius 2] [--moving 0.5]
+  -> KIT_DIR/derived/kpi.json and KIT_DIR/kpi_report.md
+  python3 scripts/kpi.py --sim SIM_DIR --out kpi.json [--report kpi_report.md]
+
+Environment:
+  KPI_NUMPY (default: 1) — 0 uses the pure-Python loops even when NumPy is installed
+  CITYKIT_PROFILE (default: unset) — 1 records per-chunk metrics (see metrics.py)
+
+Exit codes:
+  0 = success
+  1 = input error
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import sys
+from array import array
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import metrics
+from geodesy import meters_to_degrees
+from road_graph import default_speed_kph
+from routing import hours_allow, parse_clock
+from simulate import ACTORS_MAGIC, DELIVERY_TYPES, Columns, iter_trajectories, read_sections
+from spatial_index import _point_in_rings
+
+try:
+    import numpy as np
+except ImportError:  # pure-Python fallback
+    np = None  # type: ignore[assignment]
+
+USE_NUMPY = np is not None and os.environ.get("KPI_NUMPY", "1") != "0"
+
+CONFLICT_RADIUS_M = 2.0
+MOVING_MS = 0.5
+# Own cell plus the neighbours after it: every pair of adjacent cells is visited once
+HALF_NEIGHBOURHOOD = ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1))
+
+
+class KpiAggregator:
+    """Streaming KPI state over the trajectory chunks of one simulation; add() each chunk, then result()."""
+
+    def __init__(self, sim: Dict[str, Any], actors: Dict[str, Any], table: Columns,
+                 radius_m: float = CONFLICT_RADIUS_M, moving_ms: float = MOVING_MS) -> None:
+        self.dt = float(sim["dt_s"])
+        self.duration_s = float(sim["duration_s"])
+        self.start_minute = parse_clock(sim["start"])
+        self.radius = radius_m
+        self.moving = moving_ms
+        self.types: List[str] = actors["actor_types"]
+        self.n_types = len(self.types)
+        self.n = len(table["actor_type"])
+        self.actor_type = table["actor_type"]
+        self.delivery = table["delivery"]
+        self.zone = table["zone"]
+        self.arrive = table["arrive_s"]
+        self.pedestrian = self.types.index("pedestrian") if "pedestrian" in self.types else -1
+        self.vehicles = {self.types.index(t) for t in DELIVERY_TYPES if t in self.types}
+        self.free_walk_ms = default_speed_kph("foot", None) / 3.6
+        self.crossing_wait_s = float(sim.get("crossing_wait_s") or 0.0)
+
+        self.zones = []
+        for z in actors.get("curb_zones") or []:
+            rings = [[(float(x), float(y)) for x, y in ring] for ring in z["rings"]]
+            xs = [x for ring in rings for x, _ in ring]
+            ys = [y for ring in rings for _, y in ring]
+            self.zones.append((rings, (min(xs), min(ys), max(xs), max(ys)), str(z.get("hours") or "")))
+        self.dwell_rows = [0] * len(self.zones)
+        self.outside_rows = [0] * len(self.zones)
+        self.peak = [0] * len(self.zones)
+        self.visitors: List[Set[int]] = [set() for _ in self.zones]
+
+        self.rows = 0
+        self.type_rows = [0] * self.n_types
+        self.type_m = [0.0] * self.n_types
+        self.seen = bytearray(self.n)
+        self.arrived = bytearray(self.n)
+        self.delivered = bytearray(self.n)
+        self.ped_lost_s = 0.0
+        self.events = [0] * (self.n_types * self.n_types)
+        self.exposure = [0] * (self.n_types * self.n_types)
+        self.origin: Optional[Tuple[float, float]] = None
+        self.scale = (1.0, 1.0)  # metres per degree lon, lat
+        # Pairs in conflict at the last step seen (episode continuity across steps and chunks)
+        self.prev_step = -2
+        self.prev_pairs: Set[int] = set()
+
+    # -- helpers ---------------------------------------------------------------
+
+    def _set_origin(self, lon: float, lat: float) -> None:
+        self.origin = (lon, lat)
+        dlon, dlat = meters_to_degrees(lat, 1.0)
+        self.scale = (1.0 / dlon, 1.0 / dlat)
+
+    def _minute(self, step: int) -> int:
+        return int(self.start_minute + step * self.dt / 60.0) % (24 * 60)
+
+    def add(self, cols: Columns) -> None:
+        if not len(cols["step"]):
+            return
+        if self.origin is None:
+            self._set_origin(cols["lon"][0], cols["lat"][0])
+        self.rows += len(cols["step"])
+        (self._add_numpy if USE_NUMPY else self._add_python)(cols)
+
+    # -- NumPy -----------------------------------------------------------------
+
+    def _add_numpy(self, cols: Columns) -> None:
+        step = np.frombuffer(cols["step"], dtype=np.int32).astype(np.int64)
+        actor = np.frombuffer(cols["actor"], dtype=np.int32).astype(np.int64)
+        lon = np.frombuffer(cols["lon"], dtype=np.float64)
+        lat = np.frombuffer(cols["lat"], dtype=np.float64)
+        speed = np.frombuffer(cols["speed_ms"], dtype=np.float32)
+        edge = np.frombuffer(cols["edge"], dtype=np.int32)
+        typ = np.frombuffer(self.actor_type, dtype=np.int8).astype(np.int64)[actor]
+        dt = self.dt
+
+        self.type_rows = [a + int(b) for a, b in zip(self.type_rows, np.bincount(typ, minlength=self.n_types))]
+        self.type_m = [a + float(b) for a, b in zip(
+            self.type_m, np.bincount(typ, weights=speed.astype(np.float64) * dt, minlength=self.n_types))]
+        seen = np.frombuffer(self.seen, dtype=np.uint8)
+        seen[actor] = 1
+
+        arrive = np.frombuffer(self.arrive, dtype=np.float64)[actor]
+        done = np.flatnonzero((np.frombuffer(self.delivery, dtype=np.int8)[actor] == 1) & (step * dt >= arrive))
+        if len(done):
+            np.frombuffer(self.arrived, dtype=np.uint8)[actor[done]] = 1
+            zone = np.frombuffer(self.zone, dtype=np.int16)[actor[done]]
+            delivered = np.frombuffer(self.delivered, dtype=np.uint8)
+            for z, (rings, _, _) in enumerate(self.zones):
+                at = done[zone == z]
+                if len(at):
+                    delivered[actor[at[_np_point_in_rings(lon[at], lat[at], rings)]]] = 1
+
+        if self.pedestrian >= 0:
+            walking = (typ == self.pedestrian) & (edge >= 0)
+            lost = 1.0 - speed[walking].astype(np.float64) / self.free_walk_ms
+            self.ped_lost_s += float((dt * lost[lost > 0]).sum())
+
+        if self.zones:
+            stopped = np.flatnonzero(np.isin(typ, list(self.vehicles)) & (speed <= self.moving))
+            for z, (rings, (x0, y0, x1, y1), hours) in enumerate(self.zones):
+                px, py = lon[stopped], lat[stopped]
+                box = stopped[(px >= x0) & (px <= x1) & (py >= y0) & (py <= y1)]
+                inside = box[_np_point_in_rings(lon[box], lat[box], rings)]
+                if not len(inside):
+                    continue
+                self.dwell_rows[z] += len(inside)
+                self.visitors[z].update(actor[inside].tolist())
+                steps, counts = np.unique(step[inside], return_counts=True)
+                self.peak[z] = max(self.peak[z], int(counts.max()))
+                for s, c in zip(steps.tolist(), counts.tolist()):
+                    if not hours_allow(hours, self._minute(s)):
+                        self.outside_rows[z] += c
+
+        # Conflicts
+        ox, oy = self.origin  # type: ignore[misc]
+        mx, my = self.scale
+        x = (lon - ox) * mx
+        y = (lat - oy) * my
+        i, j = _np_near_pairs(step, x, y, self.radius)
+        keep = (typ[i] != typ[j]) & ((speed[i] > self.moving) | (speed[j] > self.moving))
+        dx, dy = x[j] - x[i], y[j] - y[i]
+        keep &= dx * dx + dy * dy <= self.radius * self.radius
+        i, j = i[keep], j[keep]
+        a, b = np.minimum(actor[i], actor[j]), np.maximum(actor[i], actor[j])
+        pair = a * self.n + b
+        s = step[i]
+        nn = self.n * self.n
+        combined = s * nn + pair
+        carry = np.array([self.prev_step * nn + p for p in self.prev_pairs], dtype=np.int64)
+        new = ~np.isin(combined - nn, np.concatenate((combined, carry)))
+        ta, tb = typ[i], typ[j]
+        code = np.minimum(ta, tb) * self.n_types + np.maximum(ta, tb)
+        size = self.n_types * self.n_types
+        self.events = [e + int(c) for e, c in zip(self.events, np.bincount(code[new], minlength=size))]
+        self.exposure = [e + int(c) for e, c in zip(self.exposure, np.bincount(code, minlength=size))]
+        last = int(step[-1])
+        self.prev_step = last
+        self.prev_pairs = set(pair[s == last].tolist())
+
+    # -- pure Python -----------------------------------------------------------
+
+    def _add_python(self, cols: Columns) -> None:
+        step, actor, lon, lat, speed, edge = (cols[c] for c in ("step", "actor", "lon", "lat", "speed_ms", "edge"))
+        actor_type, dt = self.actor_type, self.dt
+        ox, oy = self.origin  # type: ignore[misc]
+        mx, my = self.scale
+        n = len(step)
+        lo = 0
+        while lo < n:
+            s = step[lo]
+            hi = lo
+            while hi < n and step[hi] == s:
+                hi += 1
+            self._python_step(s, range(lo, hi), actor, lon, lat, speed, edge, actor_type, dt, ox, oy, mx, my)
+            lo = hi
+
+    def _python_step(self, s: int, rows: range, actor: array, lon: array, lat: array, speed: array, edge: array,
+                     actor_type: array, dt: float, ox: float, oy: float, mx: float, my: float) -> None:
+        cell, moving, r2 = self.radius, self.moving, self.radius * self.radius
+        grid: Dict[Tuple[int, int], List[int]] = {}
+        xs: Dict[int, float] = {}
+        ys: Dict[int, float] = {}
+        occupancy = [0] * len(self.zones)
+        outside = None
+        for k in rows:
+            a = actor[k]
+            t = actor_type[a]
+            v = speed[k]
+            self.type_rows[t] += 1
+            self.type_m[t] += v * dt
+            self.seen[a] = 1
+            if self.delivery[a] == 1 and s * dt >= self.arrive[a] and not self.delivered[a]:
+                self.arrived[a] = 1
+                z = self.zone[a]
+                if 0 <= z < len(self.zones) and _point_in_rings(lon[k], lat[k], self.zones[z][0]):
+                    self.delivered[a] = 1
+            if t == self.pedestrian and edge[k] >= 0:
+                lost = 1.0 - v / self.free_walk_ms
+                if lost > 0:
+                    self.ped_lost_s += dt * lost
+            if t in self.vehicles and v <= moving:
+                px, py = lon[k], lat[k]
+                for z, (rings, (x0, y0, x1, y1), hours) in enumerate(self.zones):
+                    if x0 <= px <= x1 and y0 <= py <= y1 and _point_in_rings(px, py, rings):
+                        self.dwell_rows[z] += 1
+                        self.visitors[z].add(a)
+                        occupancy[z] += 1
+                        if outside is None:
+                            outside = [not hours_allow(h, self._minute(s)) for _, _, h in self.zones]
+                        if outside[z]:
+                            self.outside_rows[z] += 1
+            x = (lon[k] - ox) * mx
+            y = (lat[k] - oy) * my
+            xs[k], ys[k] = x, y
+            grid.setdefault((math.floor(x / cell), math.floor(y / cell)), []).append(k)
+        for z, c in enumerate(occupancy):
+            if c > self.peak[z]:
+                self.peak[z] = c
+
+        pairs: Set[int] = set()
+        previous = self.prev_pairs if self.prev_step == s - 1 else set()
+        nt = self.n_types
+        for (cx, cy), members in grid.items():
+            for dx, dy in HALF_NEIGHBOURHOOD:
+                same = dx == 0 and dy == 0
+                other = members if same else grid.get((cx + dx, cy + dy))
+                if not other:
+                    continue
+                for m, i in enumerate(members):
+                    ai, ti, vi, xi, yi = actor[i], actor_type[actor[i]], speed[i], xs[i], ys[i]
+                    for j in (other[m + 1:] if same else other):
+                        aj = actor[j]
+                        tj = actor_type[aj]
+                        if ti == tj or (vi <= moving and speed[j] <= moving):
+                            continue
+                        ddx, ddy = xs[j] - xi, ys[j] - yi
+                        if ddx * ddx + ddy * ddy > r2:
+                            continue
+                        pair = min(ai, aj) * self.n + max(ai, aj)
+                        pairs.add(pair)
+                        code = min(ti, tj) * nt + max(ti, tj)
+                        self.exposure[code] += 1
+                        if pair not in previous:
+                            self.events[code] += 1
+        self.prev_step, self.prev_pairs = s, pairs
+
+    # -- result ----------------------------------------------------------------
+
+    def result(self) -> Dict[str, Any]:
+        dt, hours = self.dt, self.duration_s / 3600.0
+        actor_hours = sum(self.type_rows) * dt / 3600.0
+        events = sum(self.events)
+        by_pair = {}
+        for a in range(self.n_types):
+            for b in range(a, self.n_types):
+                code = a * self.n_types + b
+                if self.exposure[code]:
+                    by_pair[f"{self.types[a]}/{self.types[b]}"] = {
+                        "events": self.events[code], "exposure_s": round(self.exposure[code] * dt, 1),
+                    }
+        seen_by_type = [0] * self.n_types
+        for a in range(self.n):
+            if self.seen[a]:
+                seen_by_type[self.actor_type[a]] += 1
+        delivered_by_zone = [0] * len(self.zones)
+        for a in range(self.n):
+            if self.delivered[a] and 0 <= self.zone[a] < len(self.zones):
+                delivered_by_zone[self.zone[a]] += 1
+        delivered = sum(self.delivered)
+        peds = seen_by_type[self.pedestrian] if self.pedestrian >= 0 else 0
+        zones = []
+        for z, (_, _, hours_spec) in enumerate(self.zones):
+            visits = len(self.visitors[z])
+            zones.append({
+                "zone": z,
+                "hours": hours_spec,
+                "dwell_s": round(self.dwell_rows[z] * dt, 1),
+                "vehicles": visits,
+                "mean_dwell_s": round(self.dwell_rows[z] * dt / visits, 1) if visits else None,
+                "peak_occupancy": self.peak[z],
+                "outside_hours_s": round(self.outside_rows[z] * dt, 1),
+                "deliveries": delivered_by_zone[z],
+            })
+        return {
+            "format": "citykit-kpi",
+            "version": 1,
+            "parameters": {
+                "conflict_radius_m": self.radius, "moving_ms": self.moving, "dt_s": dt, "duration_s": self.duration_s,
+                "free_walk_ms": round(self.free_walk_ms, 3),
+                "origin": list(self.origin) if self.origin else None,
+            },
+            "rows": self.rows,
+            "actor_hours": round(actor_hours, 2),
+            "conflicts": {
+                "events": events,
+                "per_hour": round(events / hours, 2) if hours else None,
+                "per_1000_actor_hours": round(1000 * events / actor_hours, 1) if actor_hours else None,
+                "exposure_s": round(sum(self.exposure) * dt, 1),
+                "by_pair": by_pair,
+            },
+            "curb_zones": zones,
+            "curb_dwell_s": round(sum(self.dwell_rows) * dt, 1),
+            "pedestrian_delay": {
+                "pedestrians": peds,
+                "crossing_wait_s": self.crossing_wait_s,
+                "lost_s": round(self.ped_lost_s, 1) if self.crossing_wait_s > 0 else None,
+                "mean_s_per_pedestrian": round(self.ped_lost_s / peds, 2) if peds and self.crossing_wait_s > 0 else None,
+            },
+            "deliveries": {
+                "completed": delivered,
+                "outside_zone": sum(self.arrived) - delivered,
+                "per_hour": round(delivered / hours, 2) if hours else None,
+            },
+            "exposure": {
+                self.types[t]: {
+                    "actors": seen_by_type[t],
+                    "hours": round(self.type_rows[t] * dt / 3600.0, 2),
+                    "km": round(self.type_m[t] / 1000.0, 2),
+                }
+                for t in range(self.n_types) if seen_by_type[t]
+            },
+            "backend": "numpy" if USE_NUMPY else "python",
+        }
+
+
+def _np_point_in_rings(x: Any, y: Any, rings: Sequence[Sequence[Tuple[float, float]]]) -> Any:
+    """spatial_index._point_in_rings over arrays of points (even-odd rule)."""
+    inside = np.zeros(len(x), dtype=bool)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for ring in rings:
+            n = len(ring)
+            for k in range(n):
+                xi, yi = ring[k]
+                xj, yj = ring[k - 1]
+                if yi == yj:
+                    continue  # never crossed (the scalar test short-circuits on it)
+                inside ^= ((yi > y) != (yj > y)) & (x < (xj - xi) * (y - yi) / (yj - yi) + xi)
+    return inside
+
+
+def _np_near_pairs(step: Any, x: Any, y: Any, cell: float) -> Tuple[Any, Any]:
+    """Row index pairs (i, j) at the same step in the same or adjacent cells of size `cell` (each pair once)."""
+    if not len(step):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    cx = np.floor(x / cell).astype(np.int64)
+    cy = np.floor(y / cell).astype(np.int64)
+    cx -= cx.min() - 1  # a free column / row on each side: neighbour keys never wrap
+    cy -= cy.min() - 1
+    ny = int(cy.max()) + 2
+    nxy = (int(cx.max()) + 2) * ny
+    key = (step - step.min()) * nxy + cx * ny + cy
+    order = np.argsort(key, kind="stable")
+    ks = key[order]
+    pos = np.arange(len(ks))
+    out_i, out_j = [], []
+    for dx, dy in HALF_NEIGHBOURHOOD:
+        target = ks + (dx * ny + dy)
+        lo = pos + 1 if dx == 0 and dy == 0 else np.searchsorted(ks, target, side="left")
+        hi = np.searchsorted(ks, target, side="right")
+        count = np.maximum(hi - lo, 0)
+        total = int(count.sum())
+        if not total:
+            continue
+        src = np.repeat(pos, count)
+        dst = np.repeat(lo - (np.cumsum(count) - count), count) + np.arange(total)
+        out_i.append(order[src])
+        out_j.append(order[dst])
+    if not out_i:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(out_i), np.concatenate(out_j)
+
+
+# -----------------------------
+# Report
+# -----------------------------
+
+def compute(sim_dir: str, radius_m: float = CONFLICT_RADIUS_M, moving_ms: float = MOVING_MS) -> Dict[str, Any]:
+    """KPIs of the simulation in sim_dir (one pass over its trajectory chunks)."""
+    with open(os.path.join(sim_dir, "sim.json"), "r", encoding="utf-8") as f:
+        sim = json.load(f)
+    actors, table = read_sections(os.path.join(sim_dir, sim["actor_table"]), ACTORS_MAGIC)
+    agg = KpiAggregator(sim, actors, table, radius_m, moving_ms)
+    for header, cols in iter_trajectories(sim_dir):
+        with metrics.section("chunk", first_step=header["first_step"]) as m:
+            agg.add(cols)
+            m.update(rows=header["rows"])
+    kpi = agg.result()
+    kpi["simulation"] = {
+        "actors": sim["actors"]["simulated"], "start": sim["start"], "duration_s": sim["duration_s"],
+        "seed": sim["seed"], "graph": sim["graph"],
+    }
+    for z, zone in zip(kpi["curb_zones"], actors.get("curb_zones") or []):
+        z["zone_type"] = zone.get("zone_type")
+        z["centroid"] = zone.get("centroid")
+    return kpi
+
+
+def _fmt(value: Any, unit: str = "") -> str:
+    return "n/a" if value is None else f"{value:,}{unit}"
+
+
+def render_report(kpi: Dict[str, Any], run_id: str = "", sim_path: str = "derived/sim/sim.json",
+                  kpi_path: str = "derived/kpi.json") -> str:
+    """kpi_report.md from compute()'s result."""
+    sim, c, p = kpi["simulation"], kpi["conflicts"], kpi["parameters"]
+    ped = kpi["pedestrian_delay"]
+    zones = kpi["curb_zones"]
+    visits = sum(z["vehicles"] for z in zones)
+    lines = [
+        f"# KPI Report — {run_id}" if run_id else "# KPI Report",
+        "",
+        f"Simulated: {sim['actors']} actors over {sim['duration_s'] / 60:g} min from {sim['start']} "
+        f"({sim_path}, graph {sim['graph']}, seed {sim['seed']}); {kpi['rows']:,} trajectory rows, "
+        f"{kpi['actor_hours']:,} actor-hours. Machine-readable: {kpi_path}.",
+        "",
+        "| KPI | Value | Definition |",
+        "|---|---|---|",
+        f"| Conflict proxy rate | {_fmt(c['per_hour'])} per hour ({_fmt(c['per_1000_actor_hours'])} per 1000 actor-hours; "
+        f"{c['events']} events) | actors of different types closer than {p['conflict_radius_m']:g} m, at least one moving; "
+        "one event per continuous encounter |",
+        f"| Curb dwell time | {kpi['curb_dwell_s'] / 60:,.1f} min in {len(zones)} zone(s); "
+        f"{_fmt(round(kpi['curb_dwell_s'] / visits, 1) if visits else None, ' s')} per vehicle | "
+        "stopped cars and delivery robots inside curb_zone overlays |",
+        (f"| Pedestrian delay | {_fmt(ped['mean_s_per_pedestrian'], ' s')} per pedestrian ({ped['lost_s']:,} s in total) "
+         f"| time lost against walking at {p['free_walk_ms']:g} m/s, waiting up to {ped['crossing_wait_s']:g} s "
+         "to cross at car-street intersections |"
+         if ped["lost_s"] is not None else
+         "| Pedestrian delay | n/a (simulated without crossing waits: pedestrians always walk at free speed) "
+         f"| time lost against walking at {p['free_walk_ms']:g} m/s |"),
+        f"| Deliveries per hour | {_fmt(kpi['deliveries']['per_hour'])} ({kpi['deliveries']['completed']} completed"
+        + (f"; {kpi['deliveries']['outside_zone']} stopped outside their zone" if kpi["deliveries"]["outside_zone"] else "")
+        + ") | delivery trips that reached their curb zone (dwell point inside its rings) |",
+    ]
+    if c["by_pair"]:
+        lines += ["", "## Conflicts by actor pair", "", "| Pair | Events | Exposure (s) |", "|---|---:|---:|"]
+        lines += [f"| {pair} | {v['events']} | {v['exposure_s']:,} |"
+                  for pair, v in sorted(c["by_pair"].items(), key=lambda kv: -kv[1]["events"])]
+    if zones:
+        lines += ["", "## Curb zones", "",
+                  "| Zone | Type | Hours | Dwell (min) | Vehicles | Peak | Outside hours (min) | Deliveries |",
+                  "|---:|---|---|---:|---:|---:|---:|---:|"]
+        lines += [f"| {z['zone']} | {z.get('zone_type') or ''} | {z['hours']} | {z['dwell_s'] / 60:,.1f} | {z['vehicles']} "
+                  f"| {z['peak_occupancy']} | {z['outside_hours_s'] / 60:,.1f} | {z['deliveries']} |" for z in zones]
+    lines += ["", "## Exposure by actor type", "", "| Type | Actors | Hours | km |", "|---|---:|---:|---:|"]
+    lines += [f"| {t} | {e['actors']} | {e['hours']:,} | {e['km']:,} |" for t, e in kpi["exposure"].items()]
+    lines += [
+        "",
+        "Notes:",
+        "- Actors follow their routes at free speed and do not react to each other: conflicts are proximity",
+        "  proxies, and pedestrian delay is the seeded crossing waits at the car-street intersections on their routes.",
+        "- Training-grade ground truth comes from simulator depth/LiDAR.",
+        "- v0.x does not claim metric accuracy.",
+        "",
+    ]
+    return "\n".join(lines)
+
+
+def _write(path: str, text: str) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="KPIs from simulated trajectories")
+    ap.add_argument("--kit", default="", help="Kit directory (reads derived/sim/, writes derived/kpi.json + kpi_report.md)")
+    ap.add_argument("--sim", default="", help="Simulation directory (default: KIT/derived/sim)")
+    ap.add_argument("--out", default="", help="KPI JSON (default: KIT/derived/kpi.json)")
+    ap.add_argument("--report", default="", help="Markdown report (default: KIT/kpi_report.md)")
+    ap.add_argument("--run-id", default="", help="Shown in the report title")
+    ap.add_argument("--radius", type=float, default=CONFLICT_RADIUS_M, help="Conflict distance in metres")
+    ap.add_argument("--moving", type=float, default=MOVING_MS, help="Speed (m/s) above which an actor is moving")
+    args = ap.parse_args()
+
+    sim_dir = args.sim or (os.path.join(args.kit, "derived", "sim") if args.kit else "")
+    out = args.out or (os.path.join(args.kit, "derived", "kpi.json") if args.kit else "")
+    report = args.report or (os.path.join(args.kit, "kpi_report.md") if args.kit else "")
+    if not sim_dir or not out:
+        print("ERROR: give --kit, or --sim and --out", file=sys.stderr)
+        return 1
+    if not os.path.exists(os.path.join(sim_dir, "sim.json")):
+        print(f"ERROR: missing {os.path.join(sim_dir, 'sim.json')}", file=sys.stderr)
+        return 1
+    if args.radius <= 0:
+        print("ERROR: --radius must be positive", file=sys.stderr)
+        return 1
+    try:
+        kpi = compute(sim_dir, args.radius, args.moving)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 1
+    _write(out, json.dumps(kpi, indent=2) + "\n")
+    if report:
+        base = os.path.dirname(os.path.abspath(report))
+        _write(report, render_report(kpi, args.run_id, os.path.relpath(os.path.join(sim_dir, "sim.json"), base),
+                                     os.path.relpath(out, base)))
+    c = kpi["conflicts"]
+    print(f"✅ kpi: {kpi['rows']:,} rows, {c['events']} conflicts ({c['per_hour']}/h), "
+          f"curb dwell {kpi['curb_dwell_s'] / 60:.1f} min, {kpi['deliveries']['completed']} deliveries -> {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(metrics.run_main("kpi", main))
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+metrics.py — Opt-in run metrics and profiles for the kit scripts (stdlib-only)
+
+Off unless CITYKIT_PROFILE is set; every call is then a cheap no-op. When on,
+osm_fetch.py, delta_apply.py, build_viz.py and pipeline.py record, per section
+(and per delta op):
+
+  wall_s, cpu_s         elapsed and CPU seconds
+  peak_rss_mb           peak resident set size of the process so far
+  read_bytes,           bytes passed through read()/write() calls (/proc rchar/wchar,
+  written_bytes           page-cache hits included; None where /proc is unavailable)
+  ...                   counts the script adds (features, overlays, tiles)
+
+A script's record is appended as one JSON line to CITYKIT_METRICS_OUT when set
+(pipeline.py sets it per stage and folds the records into the kit's
+provenance/timings.json); otherwise it is printed to stderr as ⏱️ lines.
+
+Environment:
+  CITYKIT_PROFILE (default: unset) — 1 records metrics; cprofile also writes a
+      cProfile dump per script (and per in-process pipeline stage)
+  CITYKIT_METRICS_OUT (default: unset) — JSON lines file for script records
+  CITYKIT_PROFILE_DIR (default: profile) — directory for <script>.prof dumps
+
+Usage (in a script):
+  with metrics.section("load") as m:
+      fc = load(...)
+      m["features"] = len(fc["features"])
+  ...
+  if __name__ == "__main__":
+      raise SystemExit(metrics.run_main("osm_fetch", main))
+"""
+
+from __future__ import annotations
+
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # not on Windows
+    resource = None  # type: ignore[assignment]
+
+PROFILE = os.environ.get("CITYKIT_PROFILE", "")
+ENABLED = PROFILE not in ("", "0")
+CPROFILE = PROFILE == "cprofile"
+
+# ru_maxrss is in KiB on Linux, bytes on macOS
+_RSS_UNIT = 1024 * 1024 if sys.platform == "darwin" else 1024
+
+
+def io_counters(thread: bool = False) -> Optional[Tuple[int, int]]:
+    """(bytes read, bytes written) so far by this process or the calling thread; None without /proc.
+
+    Reads of the /proc file by this function are not counted.
+    """
+    try:
+        with open("/proc/thread-self/io" if thread else "/proc/self/io", "rb") as f:
+            raw = f.read()
+        fields = dict(line.split(b":", 1) for line in raw.splitlines() if b":" in line)
+        rchar, wchar = int(fields[b"rchar"]), int(fields[b"wchar"])
+    except (OSError, KeyError, ValueError):
+        return None
+    # The counters do not include this read yet; they include every earlier one
+    with _probe_lock:
+        own = _probe_total[0] if not thread else getattr(_probe, "n", 0)
+        _probe_total[0] += len(raw)
+    _probe.n = getattr(_probe, "n", 0) + len(raw)
+    return rchar - own, wchar
+
+
+_probe = threading.local()  # .n: bytes io_counters() read from /proc on this thread
+_probe_total = [0]  # ... on all threads
+_probe_lock = threading.Lock()
+
+
+def peak_rss_mb(children: bool = False) -> Optional[float]:
+    """Peak RSS of this process (or of its largest waited-for child) in MB."""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    return round(usage.ru_maxrss * _RSS_UNIT / 1e6, 1)
+
+
+def rusage_record(ru: Any) -> Dict[str, Any]:
+    """cpu_s and peak_rss_mb from a child's struct rusage (os.wait4)."""
+    return {"cpu_s": round(ru.ru_utime + ru.ru_stime, 3), "peak_rss_mb": round(ru.ru_maxrss * _RSS_UNIT / 1e6, 1)}
+
+
+class Meter:
+    """Counters between construction and stop(), for the process or (thread=True) the calling thread."""
+
+    def __init__(self, thread: bool = False) -> None:
+        self.thread = thread
+        self._wall = time.perf_counter()
+        self._cpu = time.thread_time() if thread else time.process_time()
+        self._io = io_counters(thread)
+
+    def stop(self) -> Dict[str, Any]:
+        cpu = time.thread_time() if self.thread else time.process_time()
+        io = io_counters(self.thread)
+        read = written = None
+        if io is not None and self._io is not None:
+            read, written = io[0] - self._io[0], io[1] - self._io[1]
+        return {
+            "wall_s": round(time.perf_counter() - self._wall, 4),
+            "cpu_s": round(cpu - self._cpu, 4),
+            "peak_rss_mb": peak_rss_mb(),
+            "read_bytes": read,
+            "written_bytes": written,
+        }
+
+
+class Recorder:
+    """Sections and per-op records of one script run."""
+
+    def __init__(self, script: str) -> None:
+        self.script = script
+        self.sections: List[Dict[str, Any]] = []
+        self.ops: List[Dict[str, Any]] = []
+        self.counts: Dict[str, Any] = {}
+        self.profile: Optional[str] = None
+        self._meter = Meter()
+        self._lock = threading.Lock()
+
+    def add(self, bucket: str, rec: Dict[str, Any]) -> None:
+        with self._lock:
+            getattr(self, bucket).append(rec)
+
+    def record(self, exit_code: int) -> Dict[str, Any]:
+        rec: Dict[str, Any] = {"script": self.script, "exit_code": exit_code, **self._meter.stop()}
+        rec.update(self.counts)
+        rec["sections"] = self.sections
+        if self.ops:
+            rec["ops"] = self.ops
+        if self.profile:
+            rec["profile"] = self.profile
+        return rec
+
+    def emit(self, exit_code: int) -> None:
+        rec = self.record(exit_code)
+        out = os.environ.get("CITYKIT_METRICS_OUT")
+        if out:
+            os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+            with open(out, "a", encoding="utf-8") as f:
+                f.write(json.dumps(rec) + "\n")
+            return
+        for r in [rec, *self.sections, *self.ops]:
+            print(f"⏱️ {r.get('script') or r.get('name')}: {format_record(r)}", file=sys.stderr)
+
+
+_RECORDER: Optional[Recorder] = None
+
+
+def format_record(r: Dict[str, Any]) -> str:
+    parts = [f"{r['wall_s']:.3f}s wall", f"{r['cpu_s']:.3f}s cpu"]
+    if r.get("peak_rss_mb") is not None:
+        parts.append(f"{r['peak_rss_mb']:.0f} MB peak")
+    if r.get("read_bytes") is not None:
+        parts.append(f"{r['read_bytes'] / 1e6:.1f} MB read, {r['written_bytes'] / 1e6:.1f} MB written")
+    skip = {"name", "script", "exit_code", "wall_s", "cpu_s", "peak_rss_mb", "read_bytes", "written_bytes", "sections", "ops", "profile"}
+    parts += [f"{k}={v}" for k, v in r.items() if k not in skip]
+    if r.get("exit_code"):
+        parts.append(f"exit code {r['exit_code']}")
+    return ", ".join(parts)
+
+
+@contextmanager
+def section(name: str, bucket: str = "sections", **fields: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Measure a block; yields the record so the block can add counts.
+    bucket is "sections" or "ops". Outside run_main (or when disabled) nothing is kept.
+    """
+    rec: Dict[str, Any] = {"name": name, **fields}
+    if _RECORDER is None:
+        yield rec
+        return
+    meter = Meter(thread=threading.current_thread() is not threading.main_thread())
+    try:
+        yield rec
+    finally:
+        counts = {k: v for k, v in rec.items() if k not in ("name", *fields)}
+        rec.clear()
+        rec.update({"name": name, **fields, **meter.stop(), **counts})
+        _RECORDER.add(bucket, rec)
+
+
+def count(**counts: Any) -> None:
+    """Script-level counts (e.g. features written)."""
+    if _RECORDER is not None:
+        _RECORDER.counts.update(counts)
+
+
+def profile_path(name: str) -> str:
+    directory = os.environ.get("CITYKIT_PROFILE_DIR") or "profile"
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{name}.prof")
+
+
+def run_main(script: str, main: Callable[[], Optional[int]]) -> Optional[int]:
+    """Call main(), recording the script's metrics (and cProfile) when CITYKIT_PROFILE is set."""
+    global _RECORDER
+    if not ENABLED:
+        return main()
+    _RECORDER = Recorder(script)
+    prof = cProfile.Profile() if CPROFILE else None
+    code: Any = 1
+    try:
+        if prof is not None:
+            prof.enable()
+        code = main()
+        return code
+    except SystemExit as e:
+        code = e.code
+        raise
+    finally:
+        if prof is not None:
+            prof.disable()
+            _RECORDER.profile = profile_path(script)
+            prof.dump_stats(_RECORDER.profile)
+        _RECORDER.emit(code if isinstance(code, int) else (0 if code is None else 1))
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+noderefs.py — OSM node ids of each way's vertices, next to the baseline GeoJSON (stdlib-only)
+
+osm_fetch.build_features() keeps only coordinates in the GeoJSON; the node
+ids behind them are what tells road_graph.py where two ways share a node.
+osm_fetch.py writes them to <name>.noderefs next to derived/osm_baseline.geojson
+(keyed by way osm_id, so the file also serves osm_modified.geojson) and
+road_graph.py memory-maps it.
+
+Layout (the container of columnar.py, magic b"CKNREF"):
+  way_ids    int64  way osm_id, sorted
+  offsets    int64  per way + 1, into node_ids
+  node_ids   int64  OSM node id of each coordinate, in way order
+
+The source GeoJSON's path and sha256 are recorded in the header;
+open_node_refs() ignores a file written for another GeoJSON.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Sequence
+
+from columnar import SectionReader, file_sha256, write_sections
+
+NODEREFS_MAGIC = b"CKNREF"
+NODEREFS_SUFFIX = ".noderefs"
+VERSION = 1
+
+
+def noderefs_path(geojson_path: str) -> str:
+    """derived/osm_baseline.geojson -> derived/osm_baseline.noderefs"""
+    return os.path.splitext(geojson_path)[0] + NODEREFS_SUFFIX
+
+
+def write_node_refs(path: str, refs: Dict[int, Sequence[int]], source: Optional[Dict[str, Any]] = None) -> str:
+    """OSM node ids of each way's coordinates, keyed by way osm_id."""
+    way_ids, offsets, node_ids = array("q"), array("q", [0]), array("q")
+    for osm_id in sorted(refs):
+        way_ids.append(osm_id)
+        node_ids.extend(refs[osm_id])
+        offsets.append(len(node_ids))
+    header: Dict[str, Any] = {"format": "citykit-noderefs", "version": VERSION, "count": len(way_ids)}
+    if source:
+        header["source"] = source
+    write_sections(path, header, {"way_ids": way_ids, "offsets": offsets, "node_ids": node_ids}, NODEREFS_MAGIC, VERSION)
+    return path
+
+
+class NodeRefs(SectionReader):
+    """Memory-mapped node refs; lookup(osm_id) is a bisect over the sorted way ids."""
+
+    def __init__(self, path: str) -> None:
+        super().__init__(path, NODEREFS_MAGIC, VERSION)
+        self.way_ids = self.column("way_ids")
+        self.offsets = self.column("offsets")
+        self.node_ids = self.column("node_ids")
+
+    def close(self) -> None:
+        del self.way_ids, self.offsets, self.node_ids
+        super().close()
+
+    def lookup(self, osm_id: int) -> Optional[List[int]]:
+        i = bisect_left(self.way_ids, osm_id)
+        if i == len(self.way_ids) or self.way_ids[i] != osm_id:
+            return None
+        return self.node_ids[self.offsets[i] : self.offsets[i + 1]].tolist()
+
+
+def open_node_refs(path: str) -> Optional[NodeRefs]:
+    """Reader for path, or None when missing, unreadable or older than the GeoJSON next to it."""
+    if not os.path.exists(path):
+        return None
+    try:
+        refs = NodeRefs(path)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ noderefs: ignoring {path}: {e}", file=sys.stderr)
+        return None
+    source = refs.header.get("source") or {}
+    geojson = os.path.join(os.path.dirname(path), source.get("path") or "")
+    if source.get("path") and os.path.exists(geojson) and file_sha256(geojson) != source.get("sha256"):
+        print(f"⚠️ noderefs: ignoring {path}: written for another {source['path']}", file=sys.stderr)
+        refs.close()
+        return None
+    return refs
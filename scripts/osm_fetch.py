@@ -1,36 +1,88 @@
 #!/usr/bin/env python3
 """
-osm_fetch.py — Fetch OSM baseline from Overpass API for AOI bbox.
+osm_fetch.py — Fetch OSM baseline from Overpass API (or a local extract) for AOI bbox.
 
-Reads: inputs/corridor.example.json (bbox)
-Writes:
+Reads: CORRIDOR (default: inputs/corridor.example.json) for the bbox
+       OSM_EXTRACT file/dir when set (offline mode, see osm_xml.py)
+       OSM_SHARED_DIR when set (an earlier osm_fetch.py output for an enclosing bbox)
+Writes (under OSM_OUT_DIR, default: repo root):
   - derived/osm_baseline.geojson (FeatureCollection)
+  - derived/osm_baseline.ckcol (columnar sidecar, see columnar.py)
+  - derived/osm_baseline.noderefs (OSM node ids of each way's vertices, see noderefs.py)
   - provenance/osm_query.json (metadata + query)
 
 Environment:
   OVERPASS_ENDPOINT (default: https://overpass-api.de/api/interpreter)
   OVERPASS_TIMEOUT (default: 30 seconds)
+  OVERPASS_TILES (default: 1x1) — "ROWSxCOLS" grid; >1 tile fetches sub-bboxes in parallel
+  OVERPASS_WORKERS (default: 4) — max concurrent tile requests
+  OVERPASS_RETRIES (default: 3) — retries per tile after the first attempt
+  OVERPASS_BACKOFF (default: 2.0 seconds) — base delay, doubled per retry
+  OVERPASS_CACHE_DIR (default: .cache/overpass) — on-disk response cache
+  OVERPASS_CACHE_TTL (default: 86400 seconds) — max entry age; 0 disables the cache
+  OVERPASS_CACHE_MAX_MB (default: 512) — cache size bound; least recently used entries are evicted
+  OVERPASS_STREAM (default: 0) — 1 parses responses incrementally (see osm_stream.py) to bound peak memory
+  OVERPASS_MAX_CONCURRENT (default: 0 = unlimited) — max Overpass requests in flight across all
+      processes sharing OVERPASS_CACHE_DIR (lock files under <cache dir>/slots)
+  OSM_EXTRACT (default: unset) — .osm/.osm.gz/.osm.bz2 file or directory; replaces Overpass entirely
+  OSM_EXTRACT_MARGIN_M (default: 250) — extra node margin around the bbox when reading extracts
+  OSM_SHARED_DIR (default: unset) — select the corridor's ways from <dir>/derived/osm_baseline.geojson
+      instead of fetching (same "touches bbox" rule as Overpass; used by fanout.py)
+  GEOJSON_COMPACT (default: 0) — 1 writes the baseline GeoJSON without indentation
+  CORRIDOR (default: inputs/corridor.example.json) — corridor file with a bbox aoi
+  OSM_OUT_DIR (default: repo root) — where derived/ and provenance/ are written
+  CITYKIT_PROFILE (default: unset) — 1 records load/write metrics (see metrics.py)
 
 Exit codes:
   0 = success
-  1 = input parsing error
+  1 = input parsing error (including unreadable OSM_EXTRACT)
   2 = network error
   3 = insufficient features returned
 """
 
+import fcntl
+import hashlib
 import json
+import queue
 import sys
 import os
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
 from urllib import request, parse
 from datetime import datetime
 
+import metrics
+from columnar import load_feature_collection, write_sidecar
+from geojson_writer import write_feature_collection
+from osm_stream import FeatureBuilder, iter_elements
+from osm_xml import coords_touch_bbox, read_extract
+from noderefs import noderefs_path, open_node_refs, write_node_refs
+
 OVERPASS_ENDPOINT = os.environ.get("OVERPASS_ENDPOINT", "https://overpass-api.de/api/interpreter")
 OVERPASS_TIMEOUT = int(os.environ.get("OVERPASS_TIMEOUT", "30"))
+OVERPASS_TILES = os.environ.get("OVERPASS_TILES", "1x1")
+OVERPASS_WORKERS = int(os.environ.get("OVERPASS_WORKERS", "4"))
+OVERPASS_RETRIES = int(os.environ.get("OVERPASS_RETRIES", "3"))
+OVERPASS_BACKOFF = float(os.environ.get("OVERPASS_BACKOFF", "2.0"))
+OVERPASS_CACHE_DIR = Path(os.environ.get("OVERPASS_CACHE_DIR", Path(__file__).parent.parent / ".cache" / "overpass"))
+OVERPASS_CACHE_TTL = int(os.environ.get("OVERPASS_CACHE_TTL", "86400"))
+OVERPASS_CACHE_MAX_MB = int(os.environ.get("OVERPASS_CACHE_MAX_MB", "512"))
+OVERPASS_STREAM = os.environ.get("OVERPASS_STREAM", "0") == "1"
+OSM_EXTRACT = os.environ.get("OSM_EXTRACT", "")
+OSM_EXTRACT_MARGIN_M = float(os.environ.get("OSM_EXTRACT_MARGIN_M", "250"))
+OVERPASS_MAX_CONCURRENT = int(os.environ.get("OVERPASS_MAX_CONCURRENT", "0"))
+OSM_SHARED_DIR = os.environ.get("OSM_SHARED_DIR", "")
+GEOJSON_COMPACT = os.environ.get("GEOJSON_COMPACT", "0") == "1"
+CORRIDOR = Path(os.environ.get("CORRIDOR") or Path(__file__).parent.parent / "inputs" / "corridor.example.json")
+OSM_OUT_DIR = Path(os.environ.get("OSM_OUT_DIR") or Path(__file__).parent.parent)
 
 def load_corridor_bbox():
-    """Load bbox from inputs/corridor.example.json."""
-    corridor_path = Path(__file__).parent.parent / "inputs" / "corridor.example.json"
+    """Load bbox from CORRIDOR (default: inputs/corridor.example.json)."""
+    corridor_path = CORRIDOR
     
     if not corridor_path.exists():
         print(f"ERROR: {corridor_path} not found", file=sys.stderr)
@@ -54,13 +106,13 @@ def load_corridor_bbox():
         print(f"ERROR parsing {corridor_path}: {e}", file=sys.stderr)
         sys.exit(1)
 
-def fetch_osm(bbox):
-    """Fetch highways + footways + cycleways from Overpass."""
+def build_query(bbox):
+    """Build the Overpass query for highways + footways + cycleways in bbox."""
     min_lat, min_lon = bbox["min_lat"], bbox["min_lon"]
     max_lat, max_lon = bbox["max_lat"], bbox["max_lon"]
     
     # Overpass query: highways, footways, cycleways
-    query = f"""[out:json][timeout:{OVERPASS_TIMEOUT}];
+    return f"""[out:json][timeout:{OVERPASS_TIMEOUT}];
 (
   way["highway"]({min_lat},{min_lon},{max_lat},{max_lon});
   way["footway"]({min_lat},{min_lon},{max_lat},{max_lon});
@@ -69,6 +121,141 @@ def fetch_osm(bbox):
 (._;>;);
 out body;
 """
+
+def cache_key(query):
+    """Content address for a response: sha256 over endpoint + exact query text."""
+    return hashlib.sha256(f"{OVERPASS_ENDPOINT}\n{query}".encode("utf-8")).hexdigest()
+
+def _utc_iso(ts):
+    return datetime.utcfromtimestamp(int(ts)).isoformat() + "Z"
+
+def cache_lookup(key):
+    """Return (path, stored_at epoch) for a fresh entry, else (None, None).
+    
+    Entry mtime is the time it was stored (TTL); atime is bumped on every hit
+    and drives LRU eviction.
+    """
+    path = OVERPASS_CACHE_DIR / f"{key}.json"
+    try:
+        st = path.stat()
+        if time.time() - st.st_mtime > OVERPASS_CACHE_TTL:
+            return None, None
+        os.utime(path, (time.time(), st.st_mtime))
+        return path, st.st_mtime
+    except OSError:
+        return None, None
+
+def cache_evict(keep=None):
+    """Drop least recently used entries until the cache fits OVERPASS_CACHE_MAX_MB."""
+    limit = OVERPASS_CACHE_MAX_MB * 1024 * 1024
+    entries = []
+    for p in OVERPASS_CACHE_DIR.glob("*.json"):
+        try:
+            st = p.stat()
+        except OSError:
+            continue  # removed by a concurrent run
+        entries.append((st.st_atime, st.st_size, p))
+    
+    total = sum(size for _, size, _ in entries)
+    for _, size, p in sorted(entries, key=lambda e: e[0]):
+        if total <= limit:
+            break
+        if p == keep:
+            continue
+        try:
+            p.unlink()
+        except OSError:
+            pass
+        total -= size
+
+def cache_store(key, fp):
+    """Copy a response stream into the cache and return the entry path.
+    
+    Writes go to a temp file that is renamed into place, so concurrent runs
+    never see partial data.
+    """
+    fd, tmp = tempfile.mkstemp(dir=OVERPASS_CACHE_DIR, prefix=f".{key}.", suffix=".tmp")
+    path = OVERPASS_CACHE_DIR / f"{key}.json"
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                chunk = fp.read(1 << 16)
+                if not chunk:
+                    break
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    cache_evict(keep=path)
+    return path
+
+def cache_discard(cache_info):
+    """Remove an entry that turned out to be unusable (corrupt or truncated)."""
+    if cache_info.get("status") in ("hit", "miss"):
+        try:
+            (OVERPASS_CACHE_DIR / f"{cache_info['key']}.json").unlink()
+        except OSError:
+            pass
+        cache_info["stored"] = False
+
+def is_runtime_error(remark):
+    # Overpass reports server-side timeouts as HTTP 200 + a "runtime error" remark
+    # with truncated elements; such responses must never be cached.
+    return "runtime error" in str(remark or "")
+
+@contextmanager
+def request_slot():
+    """Hold one of OVERPASS_MAX_CONCURRENT request slots shared by every process using this cache dir.
+    
+    Slots are flock()ed files, so a crashed process never leaks one.
+    """
+    if OVERPASS_MAX_CONCURRENT < 1:
+        yield
+        return
+    slot_dir = OVERPASS_CACHE_DIR / "slots"
+    slot_dir.mkdir(parents=True, exist_ok=True)
+    while True:
+        for i in range(OVERPASS_MAX_CONCURRENT):
+            f = open(slot_dir / f"{i}.lock", "a")
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                f.close()
+                continue
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+                f.close()
+            return
+        time.sleep(random.uniform(0.1, 0.3))
+
+def open_overpass(query):
+    """Open the raw response for query as a binary stream, through the response cache.
+    
+    Returns (stream, cache_info); the caller closes the stream. Raises on network failure.
+    """
+    key = cache_key(query)
+    use_cache = OVERPASS_CACHE_TTL > 0
+    
+    if use_cache:
+        path, stored_at = cache_lookup(key)
+        if path is not None:
+            try:
+                return open(path, "rb"), {"status": "hit", "key": key, "stored_at_utc": _utc_iso(stored_at)}
+            except OSError:
+                pass  # evicted by a concurrent run between stat and open
+        try:
+            OVERPASS_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        except OSError as e:
+            print(f"WARN: Overpass cache disabled: {e}", file=sys.stderr)
+            use_cache = False
     
     data = parse.urlencode({"data": query}).encode("utf-8")
     req = request.Request(
@@ -76,17 +263,216 @@ out body;
         data=data,
         headers={"User-Agent": "urbanability-citykit/0.2 (osm_fetch)"}
     )
+    with request_slot():
+        resp = request.urlopen(req, timeout=OVERPASS_TIMEOUT)
+        
+        if not use_cache:
+            # Streamed by the caller; the slot only covers the request itself
+            return resp, {"status": "disabled"}
+        
+        with resp:
+            path = cache_store(key, resp)
+    return open(path, "rb"), {"status": "miss", "key": key, "stored": True}
+
+def overpass_request(query, _retry_corrupt=True):
+    """POST a query to Overpass (through the response cache) and return the parsed JSON.
+    
+    Returns (osm_data, cache_info); raises on network or decode failure.
+    """
+    fp, cache_info = open_overpass(query)
+    with fp:
+        raw = fp.read()
+    
+    try:
+        osm_data = json.loads(raw.decode("utf-8"))
+    except ValueError:
+        cache_discard(cache_info)
+        if cache_info["status"] == "hit" and _retry_corrupt:
+            return overpass_request(query, _retry_corrupt=False)
+        raise
+    
+    if is_runtime_error(osm_data.get("remark")):
+        cache_discard(cache_info)
+    return osm_data, cache_info
+
+def fetch_osm(bbox):
+    """Fetch highways + footways + cycleways from Overpass."""
+    query = build_query(bbox)
+    
+    try:
+        osm_data, cache_info = overpass_request(query)
+        return osm_data, query, cache_info
+    except Exception as e:
+        print(f"ERROR fetching Overpass: {e}", file=sys.stderr)
+        sys.exit(2)
+
+def fetch_osm_stream(bbox, node_refs=None):
+    """Fetch and parse incrementally: nodes go into a compact array store and
+    ways become features as soon as their nodes are known.
+    
+    Returns (features, query, cache_info).
+    """
+    query = build_query(bbox)
+    builder = FeatureBuilder(node_refs)
+    header = {}
+    cache_info = {}
     
     try:
-        with request.urlopen(req, timeout=OVERPASS_TIMEOUT) as resp:
-            raw = resp.read().decode("utf-8")
-            return json.loads(raw), query
+        fp, cache_info = open_overpass(query)
+        with fp:
+            for el in iter_elements(fp, header):
+                builder.add(el)
     except Exception as e:
+        cache_discard(cache_info)
         print(f"ERROR fetching Overpass: {e}", file=sys.stderr)
         sys.exit(2)
+    
+    if is_runtime_error(header.get("remark")):
+        cache_discard(cache_info)
+    return builder.finish(), query, cache_info
 
-def build_features(osm_data):
-    """Convert OSM elements to GeoJSON LineString features."""
+def parse_tile_grid(spec):
+    """Parse an OVERPASS_TILES spec such as "3x4" into (rows, cols)."""
+    try:
+        rows, cols = (int(part) for part in spec.lower().split("x", 1))
+    except ValueError:
+        print(f"ERROR: OVERPASS_TILES must look like ROWSxCOLS, got {spec!r}", file=sys.stderr)
+        sys.exit(1)
+    if rows < 1 or cols < 1:
+        print(f"ERROR: OVERPASS_TILES must be at least 1x1, got {spec!r}", file=sys.stderr)
+        sys.exit(1)
+    return rows, cols
+
+def split_bbox(bbox, rows, cols):
+    """Split bbox into a rows x cols grid of sub-bboxes (row-major, south-west first).
+    
+    Edges are shared between neighbours so the union covers the bbox exactly;
+    ways crossing a shared edge are returned by both tiles and deduplicated on merge.
+    """
+    lat_edges = [bbox["min_lat"] + (bbox["max_lat"] - bbox["min_lat"]) * i / rows for i in range(rows)]
+    lon_edges = [bbox["min_lon"] + (bbox["max_lon"] - bbox["min_lon"]) * j / cols for j in range(cols)]
+    lat_edges.append(bbox["max_lat"])
+    lon_edges.append(bbox["max_lon"])
+    
+    tiles = []
+    for i in range(rows):
+        for j in range(cols):
+            tiles.append({
+                "min_lat": lat_edges[i],
+                "min_lon": lon_edges[j],
+                "max_lat": lat_edges[i + 1],
+                "max_lon": lon_edges[j + 1],
+            })
+    return tiles
+
+def fetch_tile(tile_bbox, abort=None):
+    """Fetch one tile with retry + exponential backoff. Returns (osm_data, attempts, cache_info).
+    
+    When the abort event is set (another tile failed), no further attempt is made.
+    """
+    query = build_query(tile_bbox)
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            osm_data, cache_info = overpass_request(query)
+            return osm_data, attempt, cache_info
+        except Exception as e:
+            if attempt > OVERPASS_RETRIES:
+                raise RuntimeError(f"tile {tile_bbox} failed after {attempt} attempts: {e}") from e
+            delay = OVERPASS_BACKOFF * (2 ** (attempt - 1))
+            # Jitter keeps parallel tiles from retrying in lockstep against a busy server
+            pause = delay + random.uniform(0, delay / 2)
+            if abort is None:
+                time.sleep(pause)
+            elif abort.wait(pause):
+                raise RuntimeError(f"tile {tile_bbox} abandoned after {attempt} attempts: {e}") from e
+
+def merge_osm(results):
+    """Merge Overpass responses, deduplicating nodes and ways by OSM id."""
+    nodes = {}
+    ways = {}
+    for osm_data in results:
+        for el in osm_data.get("elements", []):
+            el_type = el.get("type")
+            if el_type == "node":
+                nodes.setdefault(el["id"], el)
+            elif el_type == "way":
+                ways.setdefault(el["id"], el)
+    
+    # Same ordering as an Overpass "out body": nodes, then ways, each by id
+    elements = [nodes[k] for k in sorted(nodes)] + [ways[k] for k in sorted(ways)]
+    return {"elements": elements}
+
+def fetch_osm_tiled(bbox, rows, cols, builder=None):
+    """Fetch bbox as a rows x cols grid of tiles on OVERPASS_WORKERS worker threads.
+    
+    Returns (merged osm_data, per-tile provenance records). When a FeatureBuilder
+    is passed, each tile is fed into it as soon as it arrives instead of being
+    kept, and merged osm_data is None. Any tile that still fails after its
+    retries aborts the run with exit code 2 at once: the workers are daemon
+    threads, so requests still in flight are not waited for, and they start no
+    further attempts.
+    """
+    tiles = split_bbox(bbox, rows, cols)
+    results = [None] * len(tiles)
+    records = [None] * len(tiles)
+    pending = queue.SimpleQueue()
+    for i in range(len(tiles)):
+        pending.put(i)
+    done = queue.SimpleQueue()
+    abort = threading.Event()
+    
+    def work():
+        while not abort.is_set():
+            try:
+                i = pending.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                done.put((i, fetch_tile(tiles[i], abort), None))
+            except Exception as e:
+                done.put((i, None, e))
+    
+    for n in range(max(1, min(OVERPASS_WORKERS, len(tiles)))):
+        threading.Thread(target=work, name=f"overpass-tile-{n}", daemon=True).start()
+    for _ in tiles:
+        i, fetched, error = done.get()
+        if error is not None:
+            abort.set()
+            print(f"ERROR fetching Overpass: {error}", file=sys.stderr)
+            sys.exit(2)
+        osm_data, attempts, cache_info = fetched
+        if builder is None:
+            results[i] = osm_data
+        else:
+            for el in osm_data.get("elements", []):
+                builder.add(el)
+        records[i] = {
+            "bbox": tiles[i],
+            "attempts": attempts,
+            "elements": len(osm_data.get("elements", [])),
+            "cache": cache_info,
+        }
+    
+    if builder is not None:
+        return None, records
+    return merge_osm(results), records
+
+def load_extract(bbox):
+    """Read highways + footways + cycleways for bbox from OSM_EXTRACT. Returns (osm_data, file records)."""
+    try:
+        return read_extract(OSM_EXTRACT, bbox, OSM_EXTRACT_MARGIN_M)
+    except Exception as e:
+        print(f"ERROR reading OSM extract {OSM_EXTRACT}: {e}", file=sys.stderr)
+        sys.exit(1)
+
+def build_features(osm_data, node_refs=None):
+    """Convert OSM elements to GeoJSON LineString features.
+    
+    With a node_refs dict, the node ids behind each feature's coordinates are
+    recorded there by way osm_id (see road_graph.py).
+    """
     elements = osm_data.get("elements", [])
     
     # Build node lookup
@@ -101,11 +487,13 @@ def build_features(osm_data):
         if el.get("type") != "way":
             continue
         
-        nds = el.get("nodes", [])
-        coords = [nodes[n] for n in nds if n in nodes]
+        nds = [n for n in el.get("nodes", []) if n in nodes]
+        coords = [nodes[n] for n in nds]
         
         if len(coords) < 2:
             continue
+        if node_refs is not None:
+            node_refs[el["id"]] = nds
         
         tags = el.get("tags", {})
         feature = {
@@ -130,23 +518,82 @@ def build_features(osm_data):
     features.sort(key=lambda f: f["properties"]["osm_id"])
     return features
 
+def load_shared(bbox, node_refs=None):
+    """Select the ways touching bbox from the baseline in OSM_SHARED_DIR.
+    
+    Returns (features, provenance of the shared fetch). The shared bbox must enclose bbox.
+    The selected ways' node ids go into node_refs when the shared fetch has them.
+    """
+    shared = Path(OSM_SHARED_DIR)
+    try:
+        shared_provenance = json.loads((shared / "provenance" / "osm_query.json").read_text(encoding="utf-8"))
+        outer = shared_provenance["bbox"]
+        fc = load_feature_collection(str(shared / "derived" / "osm_baseline.geojson"))
+    except Exception as e:
+        print(f"ERROR reading shared OSM baseline {shared}: {e}", file=sys.stderr)
+        sys.exit(1)
+    
+    if not (outer["min_lat"] <= bbox["min_lat"] and outer["min_lon"] <= bbox["min_lon"]
+            and bbox["max_lat"] <= outer["max_lat"] and bbox["max_lon"] <= outer["max_lon"]):
+        print(f"ERROR: bbox {bbox} is not inside the shared fetch bbox {outer}", file=sys.stderr)
+        sys.exit(1)
+    
+    aoi = (bbox["min_lon"], bbox["min_lat"], bbox["max_lon"], bbox["max_lat"])
+    features = [f for f in fc["features"] if coords_touch_bbox(f["geometry"]["coordinates"], aoi)]
+    refs = open_node_refs(noderefs_path(str(shared / "derived" / "osm_baseline.geojson")))
+    if refs is not None and node_refs is not None:
+        with refs:
+            for f in features:
+                ids = refs.lookup(f["properties"]["osm_id"])
+                if ids is not None:
+                    node_refs[f["properties"]["osm_id"]] = ids
+    return features, shared_provenance
+
 def main():
     # Load bbox
     bbox = load_corridor_bbox()
     
-    # Fetch from Overpass
-    osm_data, query_used = fetch_osm(bbox)
-    
-    # Build features
-    features = build_features(osm_data)
+    # Fetch from Overpass (single query, or a grid of tiles merged by osm_id),
+    # or read the same selection from a local extract
+    rows, cols = parse_tile_grid(OVERPASS_TILES)
+    node_refs = {}
+    with metrics.section("load", source="shared" if OSM_SHARED_DIR else "extract" if OSM_EXTRACT else "overpass") as m:
+        tile_records = None
+        extract_records = None
+        shared_provenance = None
+        if OSM_SHARED_DIR:
+            features, shared_provenance = load_shared(bbox, node_refs)
+            query_used = build_query(bbox)
+        elif OSM_EXTRACT:
+            osm_data, extract_records = load_extract(bbox)
+            features = build_features(osm_data, node_refs)
+            query_used = build_query(bbox)
+        elif rows * cols == 1 and OVERPASS_STREAM:
+            features, query_used, cache_info = fetch_osm_stream(bbox, node_refs)
+        elif rows * cols == 1:
+            osm_data, query_used, cache_info = fetch_osm(bbox)
+            features = build_features(osm_data, node_refs)
+        else:
+            builder = FeatureBuilder(node_refs) if OVERPASS_STREAM else None
+            osm_data, tile_records = fetch_osm_tiled(bbox, rows, cols, builder)
+            features = builder.finish() if builder is not None else build_features(osm_data, node_refs)
+            query_used = build_query(bbox)
+            statuses = [t["cache"]["status"] for t in tile_records]
+            cache_info = {
+                "status": statuses[0] if len(set(statuses)) == 1 else "partial",
+                "hits": statuses.count("hit"),
+                "misses": statuses.count("miss"),
+            }
+        m["features"] = len(features)
     
     if len(features) < 1:
-        print("ERROR: Overpass returned 0 features", file=sys.stderr)
+        source = "Shared OSM baseline" if OSM_SHARED_DIR else "OSM extract" if OSM_EXTRACT else "Overpass"
+        print(f"ERROR: {source} returned 0 features", file=sys.stderr)
         sys.exit(3)
     
     # Prepare output directories
-    derived_dir = Path(__file__).parent.parent / "derived"
-    provenance_dir = Path(__file__).parent.parent / "provenance"
+    derived_dir = OSM_OUT_DIR / "derived"
+    provenance_dir = OSM_OUT_DIR / "provenance"
     
     derived_dir.mkdir(parents=True, exist_ok=True)
     provenance_dir.mkdir(parents=True, exist_ok=True)
@@ -158,23 +605,74 @@ def main():
     }
     
     geojson_path = derived_dir / "osm_baseline.geojson"
-    geojson_path.write_text(json.dumps(geojson, indent=2), encoding="utf-8")
+    with metrics.section("write"):
+        # Streamed feature by feature and renamed into place; same bytes as json.dumps(indent=2)
+        geojson_sha256 = write_feature_collection(
+            str(geojson_path), features, indent=None if GEOJSON_COMPACT else 2, ensure_ascii=True
+        )
+        
+        # Columnar sidecar (derived/osm_baseline.ckcol) so later stages can skip JSON parsing
+        write_sidecar(str(geojson_path), geojson, geojson_sha256)
+        
+        # Node ids behind the coordinates, so road_graph.py can join ways at shared nodes
+        refs_path = noderefs_path(str(geojson_path))
+        if node_refs:
+            write_node_refs(refs_path, node_refs, {"path": geojson_path.name, "sha256": geojson_sha256})
+        elif os.path.exists(refs_path):
+            os.unlink(refs_path)  # never leave another fetch's node ids behind
     
     # Write provenance
-    provenance = {
-        "source": "Overpass API",
-        "endpoint": OVERPASS_ENDPOINT,
-        "query": query_used,
-        "timestamp_utc": datetime.utcnow().replace(microsecond=0).isoformat() + "Z",
-        "bbox": bbox,
-        "features_count": len(features)
-    }
+    if shared_provenance is not None:
+        # Source details (endpoint/extract, cache, tiling) are those of the shared fetch
+        provenance = dict(shared_provenance)
+        provenance["shared_fetch"] = {
+            "dir": OSM_SHARED_DIR,
+            "bbox": shared_provenance["bbox"],
+            "features_count": shared_provenance.get("features_count"),
+            "query": shared_provenance.get("query"),
+        }
+        provenance.update({
+            "query": query_used,
+            "query_note": "Overpass query equivalent to the selection applied to the shared fetch",
+            "timestamp_utc": datetime.utcnow().replace(microsecond=0).isoformat() + "Z",
+            "bbox": bbox,
+            "features_count": len(features),
+        })
+    elif extract_records is not None:
+        provenance = {
+            "source": "OSM extract",
+            "extract": OSM_EXTRACT,
+            "files": extract_records,
+            "query": query_used,
+            "query_note": "Overpass query equivalent to the selection applied to the extract",
+            "margin_m": OSM_EXTRACT_MARGIN_M,
+            "timestamp_utc": datetime.utcnow().replace(microsecond=0).isoformat() + "Z",
+            "bbox": bbox,
+            "features_count": len(features),
+        }
+    else:
+        provenance = {
+            "source": "Overpass API",
+            "endpoint": OVERPASS_ENDPOINT,
+            "query": query_used,
+            "timestamp_utc": datetime.utcnow().replace(microsecond=0).isoformat() + "Z",
+            "bbox": bbox,
+            "features_count": len(features),
+            "cache": dict(cache_info, ttl_s=OVERPASS_CACHE_TTL),
+        }
+    if tile_records is not None:
+        provenance["tiling"] = {
+            "grid": f"{rows}x{cols}",
+            "workers": max(1, min(OVERPASS_WORKERS, rows * cols)),
+            "tiles": tile_records,
+        }
     
     provenance_path = provenance_dir / "osm_query.json"
     provenance_path.write_text(json.dumps(provenance, indent=2), encoding="utf-8")
     
+    metrics.count(features=len(features))
     print(f"✅ osm_fetch: wrote {len(features)} features to {geojson_path}")
     return 0
 
 if __name__ == "__main__":
-    sys.exit(main())
+    sys.exit(metrics.run_main("osm_fetch", main))
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+osm_stream.py — Incremental Overpass JSON parsing (stdlib-only)
+
+Used by osm_fetch.py when OVERPASS_STREAM=1.
+
+- iter_elements(): reads an Overpass JSON response from a binary stream in
+  chunks and yields one element dict at a time, so neither the raw payload
+  nor the full element list is ever held in memory.
+- NodeStore: array-backed node coordinates (int64 ids + float64 lon/lat,
+  ~24 bytes per node instead of a dict of tuples).
+- FeatureBuilder: turns a stream of elements into the same LineString
+  features as osm_fetch.build_features(), emitting each way as soon as all
+  of its nodes are known.
+"""
+
+from __future__ import annotations
+
+import codecs
+import json
+from array import array
+from bisect import bisect_left
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+CHUNK_SIZE = 1 << 16
+
+_WS = " \t\n\r"
+_DELIMS = _WS + ",]}"
+
+
+class _Reader:
+    """Chunked UTF-8 text buffer over a binary stream."""
+
+    def __init__(self, fp: BinaryIO, chunk_size: int = CHUNK_SIZE) -> None:
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """Append one more chunk; returns False at end of stream."""
+        if self.eof:
+            return False
+        chunk = self.fp.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            self.buf = self.buf[self.pos:] + self.decoder.decode(b"", final=True)
+            self.pos = 0
+            return False
+        # Drop consumed text so the buffer stays around one chunk in size
+        self.buf = self.buf[self.pos:] + self.decoder.decode(chunk)
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Return the next non-whitespace character ('' at end of stream)."""
+        while True:
+            buf, pos, n = self.buf, self.pos, len(self.buf)
+            while pos < n and buf[pos] in _WS:
+                pos += 1
+            self.pos = pos
+            if pos < n:
+                return buf[pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, ch: str) -> None:
+        got = self.peek()
+        if got != ch:
+            raise ValueError(f"Overpass JSON: expected {ch!r}, got {got!r}")
+        self.pos += 1
+
+    def value(self, decoder: json.JSONDecoder) -> Any:
+        """Decode one JSON value at the cursor, reading more chunks if it is incomplete."""
+        self.peek()
+        while True:
+            try:
+                obj, end = decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # A bare number/literal is only complete once a delimiter follows it;
+            # "52." at the buffer edge may continue as "52.52" in the next chunk
+            if (
+                not self.eof
+                and not isinstance(obj, (dict, list, str))
+                and (end == len(self.buf) or self.buf[end] not in _DELIMS)
+            ):
+                self.fill()
+                continue
+            self.pos = end
+            return obj
+
+
+def iter_elements(
+    fp: BinaryIO, header: Optional[Dict[str, Any]] = None, chunk_size: int = CHUNK_SIZE
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the entries of the top-level "elements" array one at a time.
+
+    Every other top-level key (version, osm3s, remark, ...) is collected into
+    `header` when a dict is passed, including keys that follow the array.
+    """
+    reader = _Reader(fp, chunk_size)
+    decoder = json.JSONDecoder()
+
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+    while True:
+        key = reader.value(decoder)
+        reader.expect(":")
+        if key == "elements":
+            reader.expect("[")
+            if reader.peek() == "]":
+                reader.pos += 1
+            else:
+                while True:
+                    yield reader.value(decoder)
+                    sep = reader.peek()
+                    reader.pos += 1
+                    if sep == "]":
+                        break
+                    if sep != ",":
+                        raise ValueError(f"Overpass JSON: unexpected {sep!r} in elements")
+        else:
+            val = reader.value(decoder)
+            if header is not None:
+                header[key] = val
+
+        sep = reader.peek()
+        reader.pos += 1
+        if sep == "}":
+            return
+        if sep != ",":
+            raise ValueError(f"Overpass JSON: unexpected {sep!r} after key {key!r}")
+
+
+class NodeStore:
+    """
+    Compact node id -> (lon, lat) store backed by parallel arrays.
+
+    Overpass emits nodes in ascending id order, so appends normally keep the
+    arrays sorted and lookups are a bisect. Out-of-order or duplicate ids
+    (e.g. merged tiles) mark the store dirty; it is re-sorted and deduplicated
+    lazily on the next lookup.
+    """
+
+    def __init__(self) -> None:
+        self.ids = array("q")
+        self.lon = array("d")
+        self.lat = array("d")
+        self._dirty = False
+
+    def __len__(self) -> int:
+        if self._dirty:
+            self._sort()
+        return len(self.ids)
+
+    def add(self, node_id: int, lon: float, lat: float) -> None:
+        ids = self.ids
+        if ids and node_id <= ids[-1]:
+            self._dirty = True
+        ids.append(node_id)
+        self.lon.append(lon)
+        self.lat.append(lat)
+
+    def _sort(self) -> None:
+        ids, lon, lat = self.ids, self.lon, self.lat
+        order = sorted(range(len(ids)), key=ids.__getitem__)
+        new_ids, new_lon, new_lat = array("q"), array("d"), array("d")
+        last = None
+        for i in order:
+            node_id = ids[i]
+            if node_id == last:
+                continue  # first occurrence wins, as in osm_fetch.merge_osm()
+            last = node_id
+            new_ids.append(node_id)
+            new_lon.append(lon[i])
+            new_lat.append(lat[i])
+        self.ids, self.lon, self.lat = new_ids, new_lon, new_lat
+        self._dirty = False
+
+    def get(self, node_id: int) -> Optional[Tuple[float, float]]:
+        if self._dirty:
+            self._sort()
+        ids = self.ids
+        i = bisect_left(ids, node_id)
+        if i < len(ids) and ids[i] == node_id:
+            return (self.lon[i], self.lat[i])
+        return None
+
+
+class FeatureBuilder:
+    """
+    Incremental equivalent of osm_fetch.build_features().
+
+    Feed elements with add(); ways whose nodes are already stored are turned
+    into features immediately, the rest wait until finish(). Ways are
+    deduplicated by id so several (tile) responses can be fed in sequence.
+    With a node_refs dict, each feature's node ids are recorded there by way
+    osm_id, as build_features() does.
+    """
+
+    def __init__(self, node_refs: Optional[Dict[int, List[int]]] = None) -> None:
+        self.nodes = NodeStore()
+        self.node_refs = node_refs
+        self.features: List[Dict[str, Any]] = []
+        self._pending: List[Dict[str, Any]] = []
+        self._seen_ways: set = set()
+
+    def add(self, el: Dict[str, Any]) -> None:
+        el_type = el.get("type")
+        if el_type == "node":
+            self.nodes.add(el["id"], el["lon"], el["lat"])
+        elif el_type == "way":
+            if el["id"] in self._seen_ways:
+                return
+            self._seen_ways.add(el["id"])
+            coords = self._resolve(el, strict=True)
+            if coords is None:
+                self._pending.append(el)
+            else:
+                self._emit(el, coords)
+
+    def _resolve(self, el: Dict[str, Any], strict: bool) -> Optional[List[Tuple[float, float]]]:
+        get = self.nodes.get
+        coords = []
+        for n in el.get("nodes", []):
+            c = get(n)
+            if c is None:
+                if strict:
+                    return None
+                continue
+            coords.append(c)
+        return coords
+
+    def _emit(self, el: Dict[str, Any], coords: List[Tuple[float, float]]) -> None:
+        if len(coords) < 2:
+            return
+        if self.node_refs is not None:
+            get = self.nodes.get
+            self.node_refs[el["id"]] = [n for n in el.get("nodes", []) if get(n) is not None]
+        tags = el.get("tags", {})
+        self.features.append({
+            "type": "Feature",
+            "properties": {
+                "osm_id": el["id"],
+                "highway": tags.get("highway"),
+                "footway": tags.get("footway"),
+                "cycleway": tags.get("cycleway"),
+                "name": tags.get("name"),
+                "surface": tags.get("surface"),
+                "oneway": tags.get("oneway"),
+            },
+            "geometry": {
+                "type": "LineString",
+                "coordinates": coords
+            }
+        })
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """Resolve waiting ways (missing nodes are skipped) and return features sorted by osm_id."""
+        for el in self._pending:
+            self._emit(el, self._resolve(el, strict=False))
+        self._pending = []
+        self.features.sort(key=lambda f: f["properties"]["osm_id"])
+        return self.features
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+osm_xml.py — Offline OSM ingest from local .osm XML extracts (stdlib-only)
+
+Used by osm_fetch.py when OSM_EXTRACT is set. Accepts a single .osm /
+.osm.gz / .osm.bz2 file or a directory of them, and returns Overpass-shaped
+data ({"elements": [...]}) for the same selection as the Overpass query:
+ways tagged highway/footway/cycleway that touch the bbox, plus all of their
+nodes. osm_fetch.build_features() turns that into the usual baseline.
+
+Files are read with iterparse in three streaming passes so memory is bounded
+by the AOI, not by the extract:
+
+  1. keep coordinates of nodes inside the bbox grown by a margin
+  2. keep filtered ways with a vertex inside the bbox, or a segment
+     (between two kept nodes) crossing it
+  3. resolve the remaining node refs of kept ways
+
+Limitation: a segment that crosses the bbox while both of its endpoints
+lie outside the margin is not detected (Overpass would return that way).
+Widen OSM_EXTRACT_MARGIN_M for AOIs crossed by very long segments.
+"""
+
+from __future__ import annotations
+
+import bz2
+import gzip
+import os
+import xml.etree.ElementTree as ET
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from geodesy import meters_to_degrees
+
+EXTRACT_SUFFIXES = (".osm", ".osm.gz", ".osm.bz2", ".xml")
+FILTER_KEYS = ("highway", "footway", "cycleway")
+
+BBox = Tuple[float, float, float, float]  # min_lon, min_lat, max_lon, max_lat
+
+
+def list_extract_files(path: str) -> List[str]:
+    """Return the extract file(s) at path (sorted, for deterministic passes)."""
+    if os.path.isdir(path):
+        files = [
+            os.path.join(path, name)
+            for name in sorted(os.listdir(path))
+            if name.endswith(EXTRACT_SUFFIXES)
+        ]
+        if not files:
+            raise ValueError(f"no OSM extract files ({', '.join(EXTRACT_SUFFIXES)}) in {path}")
+        return files
+    if not os.path.exists(path):
+        raise ValueError(f"OSM extract not found: {path}")
+    return [path]
+
+
+def _open(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    return open(path, "rb")
+
+
+def _iter_top_level(path: str, tags: Tuple[str, ...]) -> Iterator[ET.Element]:
+    """Yield completed top-level <node>/<way>/<relation> elements, freeing each one after use."""
+    with _open(path) as fp:
+        context = ET.iterparse(fp, events=("start", "end"))
+        _, root = next(context)
+        depth = 0
+        for event, elem in context:
+            if event == "start":
+                depth += 1
+                continue
+            depth -= 1
+            if depth != 0:
+                continue
+            if elem.tag in tags:
+                yield elem
+            # Drop the finished element (and its <tag>/<nd> children) from the tree
+            root.clear()
+
+
+def _in_bbox(lon: float, lat: float, bbox: BBox) -> bool:
+    return bbox[0] <= lon <= bbox[2] and bbox[1] <= lat <= bbox[3]
+
+
+def _segment_crosses_bbox(a: Tuple[float, float], b: Tuple[float, float], bbox: BBox) -> bool:
+    """Liang–Barsky clip test: does segment a-b intersect the (closed) bbox?"""
+    x0, y0 = a
+    dx, dy = b[0] - x0, b[1] - y0
+    t0, t1 = 0.0, 1.0
+    for p, q in (
+        (-dx, x0 - bbox[0]),
+        (dx, bbox[2] - x0),
+        (-dy, y0 - bbox[1]),
+        (dy, bbox[3] - y0),
+    ):
+        if p == 0:
+            if q < 0:
+                return False
+            continue
+        r = q / p
+        if p < 0:
+            t0 = max(t0, r)
+        else:
+            t1 = min(t1, r)
+        if t0 > t1:
+            return False
+    return True
+
+
+def read_extract(path: str, bbox: Dict[str, float], margin_m: float = 250.0) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    Select highway/footway/cycleway ways touching bbox from local extract(s).
+
+    Returns (osm_data, file records) where osm_data mirrors an Overpass
+    "out body" response: nodes by id, then ways by id.
+    """
+    files = list_extract_files(path)
+    aoi: BBox = (bbox["min_lon"], bbox["min_lat"], bbox["max_lon"], bbox["max_lat"])
+    dlon, dlat = meters_to_degrees((aoi[1] + aoi[3]) / 2.0, margin_m)
+    grown: BBox = (aoi[0] - dlon, aoi[1] - dlat, aoi[2] + dlon, aoi[3] + dlat)
+
+    # Pass 1: nodes near the AOI
+    near: Dict[int, Tuple[float, float]] = {}
+    for f in files:
+        for elem in _iter_top_level(f, ("node",)):
+            lon, lat = float(elem.get("lon")), float(elem.get("lat"))
+            if _in_bbox(lon, lat, grown):
+                near.setdefault(int(elem.get("id")), (lon, lat))
+
+    # Pass 2: filtered ways touching the AOI
+    ways: Dict[int, Dict[str, Any]] = {}
+    for f in files:
+        for elem in _iter_top_level(f, ("way",)):
+            way_id = int(elem.get("id"))
+            if way_id in ways:
+                continue
+            tags = {t.get("k"): t.get("v") for t in elem.iter("tag")}
+            if not any(k in tags for k in FILTER_KEYS):
+                continue
+            refs = [int(nd.get("ref")) for nd in elem.iter("nd")]
+            if _touches(refs, near, aoi):
+                way: Dict[str, Any] = {"type": "way", "id": way_id, "nodes": refs}
+                if tags:
+                    way["tags"] = tags
+                ways[way_id] = way
+
+    # Pass 3: remaining nodes of kept ways (possibly far outside the margin)
+    needed: Set[int] = {n for w in ways.values() for n in w["nodes"]}
+    coords: Dict[int, Tuple[float, float]] = {n: near[n] for n in needed if n in near}
+    missing = needed - coords.keys()
+    del near
+    for f in files:
+        if not missing:
+            break
+        for elem in _iter_top_level(f, ("node",)):
+            node_id = int(elem.get("id"))
+            if node_id in missing:
+                coords[node_id] = (float(elem.get("lon")), float(elem.get("lat")))
+                missing.discard(node_id)
+                if not missing:
+                    break
+
+    elements: List[Dict[str, Any]] = [
+        {"type": "node", "id": n, "lat": coords[n][1], "lon": coords[n][0]} for n in sorted(coords)
+    ]
+    elements.extend(ways[w] for w in sorted(ways))
+
+    records = [{"path": f, "bytes": os.path.getsize(f)} for f in files]
+    return {"elements": elements}, records
+
+
+def _touches(refs: List[int], near: Dict[int, Tuple[float, float]], aoi: BBox) -> bool:
+    prev: Optional[Tuple[float, float]] = None
+    for n in refs:
+        c = near.get(n)
+        if c is not None:
+            if _in_bbox(c[0], c[1], aoi):
+                return True
+            if prev is not None and _segment_crosses_bbox(prev, c, aoi):
+                return True
+        prev = c
+    return False
+
+
+def coords_touch_bbox(coords: List[Tuple[float, float]], aoi: BBox) -> bool:
+    """The same way selection on resolved coordinates (used to cut a corridor out of a shared fetch)."""
+    prev: Optional[Tuple[float, float]] = None
+    for c in coords:
+        if _in_bbox(c[0], c[1], aoi):
+            return True
+        if prev is not None and _segment_crosses_bbox(prev, c, aoi):
+            return True
+        prev = c
+    return False
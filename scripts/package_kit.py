@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+package_kit.py — Deterministic, parallel zip packager for city_demo_kit (stdlib-only)
+
+Usage:
+  python3 scripts/package_kit.py <KIT_DIR> [--out <zip>] [--workers N] [--level 6]
+
+Writes <KIT_DIR>/SHA256SUMS (sha256sum format, every other file in the kit) and
+then <KIT_DIR>.zip (or --out) with the kit directory as the top-level folder:
+
+  - entries in sorted path order, directories included (empty reserved dirs survive)
+  - fixed timestamps (1980-01-01 00:00) and normalised permissions (644/755),
+    so the same kit contents always give a byte-identical zip
+  - already-compressed members (mp4, images, archives) are stored, the rest deflated
+  - deflate runs on a thread pool in fixed-size chunks: each chunk is compressed
+    independently, primed with the previous 32 KiB as dictionary, and the
+    pieces are concatenated into one deflate stream (as pigz does). Output
+    does not depend on the worker count, and memory is bounded by the chunks
+    in flight, not by member size.
+  - zip64 records are written only where sizes/offsets need them
+
+Files are read once for packing; digests for SHA256SUMS come from a caller
+supplied function (pipeline.py passes the stage cache's inode-memoised digest,
+so files restored from the cache are not re-hashed).
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import struct
+import sys
+import time
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Deque, List, Optional, Tuple
+
+CHUNK = 1 << 22  # 4 MiB per deflate job
+WINDOW = 1 << 15  # deflate dictionary carried between chunks
+CHECKSUMS = "SHA256SUMS"
+STORED_SUFFIXES = (".mp4", ".mov", ".webm", ".png", ".jpg", ".jpeg", ".webp", ".zip", ".gz", ".bz2", ".xz", ".zst", ".laz")
+
+# 1980-01-01 00:00:00, the earliest DOS timestamp
+DOS_TIME = 0
+DOS_DATE = (0 << 9) | (1 << 5) | 1
+ZIP64_LIMIT = (1 << 32) - 1  # sizes/offsets above this need zip64 records
+ZIP64_MARK = 0xFFFFFFFF  # 32-bit field value meaning "see the zip64 extra"
+
+
+def sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def kit_entries(kit_dir: Path) -> List[Tuple[str, Optional[Path]]]:
+    """(relative name, path) in sorted order; directories end with '/' and have path None."""
+    entries: List[Tuple[str, Optional[Path]]] = []
+    for dirpath, dirnames, filenames in os.walk(kit_dir):
+        rel = Path(dirpath).relative_to(kit_dir).as_posix()
+        prefix = "" if rel == "." else rel + "/"
+        if prefix:
+            entries.append((prefix, None))
+        dirnames.sort()
+        for name in filenames:
+            entries.append((prefix + name, Path(dirpath) / name))
+    entries.sort(key=lambda e: e[0])
+    return entries
+
+
+def write_checksums(kit_dir: Path, entries: List[Tuple[str, Optional[Path]]], digest: Callable[[Path], str], pool: ThreadPoolExecutor) -> Path:
+    """Write <kit>/SHA256SUMS over every file except itself (hashed in parallel)."""
+    files = [(name, p) for name, p in entries if p is not None and name != CHECKSUMS]
+    digests = pool.map(lambda e: digest(e[1]), files)
+    lines = [f"{d}  {name}\n" for (name, _), d in zip(files, digests)]
+    path = kit_dir / CHECKSUMS
+    tmp = path.with_name(f".{CHECKSUMS}.tmp")
+    tmp.write_text("".join(lines), encoding="utf-8")
+    os.replace(tmp, path)
+    return path
+
+
+def _deflate(data: bytes, zdict: bytes, level: int, last: bool) -> bytes:
+    if zdict:
+        c = zlib.compressobj(level, zlib.DEFLATED, -15, zdict=zdict)
+    else:
+        c = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return c.compress(data) + c.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+class _Member:
+    def __init__(self, name: str, is_dir: bool, method: int, mode: int, zip64: bool) -> None:
+        self.name = name.encode("utf-8")
+        self.flags = 0 if name.isascii() else 0x800
+        self.is_dir = is_dir
+        self.method = method
+        self.external = ((0o40755 << 16) | 0x10) if is_dir else (mode << 16)
+        self.zip64 = zip64
+        self.crc = 0
+        self.size = 0
+        self.csize = 0
+        self.offset = 0
+
+
+class _ZipWriter:
+    """Minimal sequential zip writer: local header, data, header patch; central directory at close."""
+
+    def __init__(self, f) -> None:
+        self.f = f
+        self.members: List[_Member] = []
+
+    def begin(self, m: _Member) -> None:
+        m.offset = self.f.tell()
+        extra = struct.pack("<HHQQ", 1, 16, 0, 0) if m.zip64 else b""
+        self.f.write(struct.pack(
+            "<IHHHHHIIIHH", 0x04034B50, 45 if m.zip64 else 20, m.flags, m.method, DOS_TIME, DOS_DATE,
+            0, ZIP64_MARK if m.zip64 else 0, ZIP64_MARK if m.zip64 else 0, len(m.name), len(extra),
+        ))
+        self.f.write(m.name + extra)
+        self.members.append(m)
+
+    def end(self, m: _Member) -> None:
+        if m.size > ZIP64_LIMIT or m.csize > ZIP64_LIMIT:
+            if not m.zip64:
+                raise ValueError(f"{m.name.decode()}: grew past 4 GiB while packing")
+        pos = self.f.tell()
+        self.f.seek(m.offset + 14)
+        if m.zip64:
+            self.f.write(struct.pack("<I", m.crc))
+            self.f.seek(m.offset + 30 + len(m.name) + 4)
+            self.f.write(struct.pack("<QQ", m.size, m.csize))
+        else:
+            self.f.write(struct.pack("<III", m.crc, m.csize, m.size))
+        self.f.seek(pos)
+
+    def close(self) -> None:
+        cd_offset = self.f.tell()
+        for m in self.members:
+            fields = []
+            size, csize, offset = m.size, m.csize, m.offset
+            if size > ZIP64_LIMIT or m.zip64:
+                fields.append(size)
+                size = ZIP64_MARK
+            if csize > ZIP64_LIMIT or m.zip64:
+                fields.append(csize)
+                csize = ZIP64_MARK
+            if offset > ZIP64_LIMIT:
+                fields.append(offset)
+                offset = ZIP64_MARK
+            extra = struct.pack(f"<HH{len(fields)}Q", 1, 8 * len(fields), *fields) if fields else b""
+            version = 45 if fields else 20
+            self.f.write(struct.pack(
+                "<IHHHHHHIIIHHHHHII", 0x02014B50, (3 << 8) | version, version, m.flags, m.method,
+                DOS_TIME, DOS_DATE, m.crc, csize, size, len(m.name), len(extra), 0, 0, 0, m.external, offset,
+            ))
+            self.f.write(m.name + extra)
+        cd_end = self.f.tell()
+        count, cd_size = len(self.members), cd_end - cd_offset
+        if count > 0xFFFF or cd_offset > ZIP64_LIMIT or cd_size > ZIP64_LIMIT:
+            self.f.write(struct.pack("<IQHHIIQQQQ", 0x06064B50, 44, (3 << 8) | 45, 45, 0, 0, count, count, cd_size, cd_offset))
+            self.f.write(struct.pack("<IIQI", 0x07064B50, 0, cd_end, 1))
+            count = min(count, 0xFFFF)
+            cd_size = cd_size if cd_size <= ZIP64_LIMIT else ZIP64_MARK
+            cd_offset = cd_offset if cd_offset <= ZIP64_LIMIT else ZIP64_MARK
+        self.f.write(struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, count, count, cd_size, cd_offset, 0))
+
+
+def pack_kit(
+    kit_dir: str,
+    zip_path: Optional[str] = None,
+    workers: Optional[int] = None,
+    level: int = 6,
+    digest: Optional[Callable[[Path], str]] = None,
+) -> dict:
+    """
+    Write SHA256SUMS into kit_dir, then the deterministic zip (atomic rename).
+    Returns {path, entries, bytes, stored, deflated}.
+    """
+    kit = Path(kit_dir).resolve()
+    out = Path(zip_path) if zip_path else kit.with_suffix(".zip")
+    workers = workers or os.cpu_count() or 1
+    top = kit.name + "/"
+    stats = {"path": str(out), "entries": 0, "bytes": 0, "stored": 0, "deflated": 0}
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        write_checksums(kit, kit_entries(kit), digest or sha256_file, pool)
+        entries = [(top, None)] + [(top + name, p) for name, p in kit_entries(kit)]
+
+        tmp = out.with_name(f".{out.name}.tmp")
+        out.parent.mkdir(parents=True, exist_ok=True)
+        # Queue of pending writes, processed in order: ("begin", m), ("data", m, bytes|Future), ("end", m)
+        queue: Deque[tuple] = deque()
+
+        def drain(zw: _ZipWriter, keep: int) -> None:
+            while len(queue) > keep:
+                item = queue.popleft()
+                if item[0] == "begin":
+                    zw.begin(item[1])
+                elif item[0] == "data":
+                    data = item[2].result() if isinstance(item[2], Future) else item[2]
+                    item[1].csize += len(data)
+                    zw.f.write(data)
+                else:
+                    zw.end(item[1])
+
+        try:
+            with open(tmp, "wb") as f:
+                zw = _ZipWriter(f)
+                for name, path in entries:
+                    if path is None:
+                        m = _Member(name, True, 0, 0, False)
+                        queue.append(("begin", m))
+                        queue.append(("end", m))
+                        continue
+                    st = path.stat()
+                    stored = name.lower().endswith(STORED_SUFFIXES)
+                    mode = 0o100755 if st.st_mode & 0o111 else 0o100644
+                    m = _Member(name, False, 0 if stored else 8, mode, st.st_size * 1.05 > ZIP64_LIMIT)
+                    stats["stored" if stored else "deflated"] += 1
+                    queue.append(("begin", m))
+                    with open(path, "rb") as src:
+                        tail = b""
+                        chunk = src.read(CHUNK)
+                        while True:
+                            nxt = src.read(CHUNK) if len(chunk) == CHUNK else b""
+                            last = not nxt
+                            m.crc = zlib.crc32(chunk, m.crc)
+                            m.size += len(chunk)
+                            if stored:
+                                queue.append(("data", m, chunk))
+                            else:
+                                queue.append(("data", m, pool.submit(_deflate, chunk, tail, level, last)))
+                                tail = chunk[-WINDOW:]
+                            drain(zw, 4 * workers)
+                            if last:
+                                break
+                            chunk = nxt
+                    queue.append(("end", m))
+                drain(zw, 0)
+                zw.close()
+                stats["entries"] = len(zw.members)
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, out)
+        except BaseException:
+            for item in queue:
+                if item[0] == "data" and isinstance(item[2], Future):
+                    item[2].cancel()
+            if tmp.exists():
+                tmp.unlink()
+            raise
+    stats["bytes"] = out.stat().st_size
+    return stats
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Deterministic zip of a city_demo_kit directory")
+    ap.add_argument("kit", help="Kit directory (becomes the zip's top-level folder)")
+    ap.add_argument("--out", default="", help="Zip path (default: <kit>.zip)")
+    ap.add_argument("--workers", type=int, default=0, help="Compression threads (default: CPU count)")
+    ap.add_argument("--level", type=int, default=6, help="Deflate level 1-9")
+    args = ap.parse_args()
+
+    if not os.path.isdir(args.kit):
+        print(f"ERROR: kit directory not found: {args.kit}", file=sys.stderr)
+        return 1
+    t0 = time.perf_counter()
+    stats = pack_kit(args.kit, args.out or None, args.workers or None, args.level)
+    print(
+        f"✅ package_kit: wrote {stats['entries']} entries ({stats['deflated']} deflated, {stats['stored']} stored, "
+        f"{stats['bytes'] / 1e6:.1f} MB) to {stats['path']} in {time.perf_counter() - t0:.2f}s"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,883 @@
+#!/usr/bin/env python3
+"""
+pipeline.py — Demo kit stage runner (stdlib-only)
+
+Builds artifacts/<RUN_ID>/city_demo_kit(.zip) exactly like scripts/demo.sh used to,
+but as declared stages. Each stage names its inputs and outputs; a stage runs once
+every stage producing one of its inputs has finished, so independent stages
+(placeholder videos, map/actors stubs) run alongside OSM fetch and delta apply.
+Per-stage timings are printed at the end. The kit is packed by package_kit.py
+(deterministic zip + SHA256SUMS).
+
+Stages that declare a cache key are skipped when an earlier run (any RUN_ID)
+produced their outputs from the same inputs, parameters and scripts: the cached
+outputs are hardlinked into place (see stage_cache.py). Cache hits are recorded
+in dataset_manifest.json under stage_cache.
+
+Artifact names:
+  root:<path>   relative to the repo root (inputs/zone.geojson, artifacts/index.sqlite)
+  input:<name>  the run's corridor or delta file (CORRIDOR / DELTA)
+  work:<path>   relative to PIPELINE_WORK_DIR (intermediate derived/ and provenance/)
+  kit:<path>    relative to artifacts/<RUN_ID>/city_demo_kit
+  run:<path>    relative to artifacts/<RUN_ID>
+
+Environment (same as demo.sh):
+  RUN_ID (default: UTC timestamp), MAKE_ONLINE=1, OSM_EXTRACT=<file|dir>,
+  VIZ_MODE=embed|tiles, OVERPASS_* and OSM_SHARED_DIR (passed through to osm_fetch.py)
+  CORRIDOR (default: inputs/corridor.example.json), DELTA (default: inputs/scenario_delta.example.json)
+  PIPELINE_WORK_DIR (default: repo root) — separate per run when several build at once (fanout.py)
+  PIPELINE_JOBS (default: 4) — max stages running at once
+  PIPELINE_CACHE=0, PIPELINE_CACHE_DIR, PIPELINE_CACHE_MAX_MB (see stage_cache.py)
+  SIM_ACTORS (default: 500), SIM_DURATION (default: 3600 s) — actors and simulated seconds (see simulate.py);
+  the KPI report is computed from them (kpi.py) and is the stub when no simulation ran
+
+With CITYKIT_PROFILE=1 (see metrics.py) each stage also records CPU time, peak
+RSS, bytes read/written and the per-section / per-op records of the scripts it
+runs; they are written to provenance/timings.json in the kit (package and index
+run after it) and shown in the timings table. CITYKIT_PROFILE=cprofile adds
+cProfile dumps under artifacts/<RUN_ID>/profile/<stage>/.
+
+Fallbacks: optional stages (OSM fetch, delta apply, road graph, routing, simulate, viewer) warn and the kit is
+built without them, as before; any other failing stage fails the run (exit 1).
+"""
+
+from __future__ import annotations
+
+import argparse
+import cProfile
+import hashlib
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set
+
+import metrics
+import run_index
+import stage_cache
+from osm_xml import list_extract_files
+from package_kit import pack_kit
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+CAMERAS = ["robot_front", "cyclist_pov", "birds_eye"]
+RESERVED_DIRS = ["pcd_groundtruth", "pcd_pseudo", "labels"]
+
+
+class StageError(Exception):
+    """A stage could not produce its outputs."""
+
+
+class Context:
+    """Paths + state shared by the stages of one run."""
+
+    # Attributes stages may set for later stages; cached with their outputs
+    STATE = ("osm_online", "delta_applied", "map_provenance")
+
+    def __init__(self, run_id: str, env: Dict[str, str], cache: Optional[stage_cache.StageCache] = None) -> None:
+        self.run_id = run_id
+        self.env = env
+        self.root = ROOT_DIR
+        self.out_dir = ROOT_DIR / "artifacts" / run_id
+        self.kit_dir = self.out_dir / "city_demo_kit"
+        self.zip_path = self.out_dir / "city_demo_kit.zip"
+        self.make_online = env.get("MAKE_ONLINE", "0")
+        self.osm_extract = env.get("OSM_EXTRACT", "")
+        self.osm_shared = env.get("OSM_SHARED_DIR", "")
+        self.viz_mode = env.get("VIZ_MODE", "embed")
+        self.sim_actors = env.get("SIM_ACTORS", "500")
+        self.sim_duration = env.get("SIM_DURATION", "3600")
+        self.inputs = {
+            "corridor": Path(env.get("CORRIDOR") or ROOT_DIR / "inputs" / "corridor.example.json"),
+            "delta": Path(env.get("DELTA") or ROOT_DIR / "inputs" / "scenario_delta.example.json"),
+        }
+        self.work_dir = Path(env.get("PIPELINE_WORK_DIR") or ROOT_DIR)
+        # Filled in by stages (read by later stages only)
+        self.osm_online = "no"
+        self.delta_applied = "no"
+        self.map_provenance = "Zone polygon stub (default offline mode)."
+        self.cache = cache
+        self.results: Dict[str, Dict[str, Any]] = {}  # stage name -> result, as stages finish
+        self._tool_version: Optional[str] = None
+
+    def path(self, artifact: str) -> Path:
+        scope, _, rel = artifact.partition(":")
+        if scope == "input" and rel in self.inputs:
+            return self.inputs[rel]
+        base = {"root": self.root, "work": self.work_dir, "kit": self.kit_dir, "run": self.out_dir}.get(scope)
+        if base is None or not rel:
+            raise ValueError(f"bad artifact name: {artifact}")
+        return base / rel
+
+    def display(self, artifact: str) -> str:
+        """Path for messages and provenance: repo-relative when inside the repo."""
+        p = self.path(artifact)
+        try:
+            return p.resolve().relative_to(self.root).as_posix()
+        except ValueError:
+            return str(p)
+
+    def tool_version(self) -> str:
+        """sha256 over the scripts' source: any code change invalidates cached stages."""
+        if self._tool_version is None:
+            h = hashlib.sha256()
+            for p in sorted((self.root / "scripts").glob("*.py")):
+                h.update(p.name.encode("utf-8") + b"\0" + p.read_bytes())
+            self._tool_version = h.hexdigest()
+        return self._tool_version
+
+
+class Stage:
+    """
+    One pipeline step: run(ctx) produces (some of) outputs from inputs.
+    cache_key(ctx) returns the parameters the outputs depend on besides the inputs'
+    content (None: not cacheable this run); stages without one always run.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        run: Callable[[Context], None],
+        inputs: Sequence[str] = (),
+        outputs: Sequence[str] = (),
+        when: Optional[Callable[[Context], bool]] = None,
+        optional: bool = False,
+        cache_key: Optional[Callable[[Context], Optional[Dict[str, Any]]]] = None,
+    ) -> None:
+        self.name = name
+        self.run = run
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.when = when
+        self.optional = optional
+        self.cache_key = cache_key
+
+
+# Keys of a script record (metrics.py) that are not counts
+SCRIPT_RECORD_KEYS = {
+    "script", "exit_code", "wall_s", "cpu_s", "peak_rss_mb", "read_bytes", "written_bytes", "sections", "ops", "profile",
+}
+_CURRENT = threading.local()  # .meter: the _StageMeter of the stage running on this thread
+
+
+class _StageMeter:
+    """CITYKIT_PROFILE metrics of one running stage: its own thread plus the processes it starts."""
+
+    def __init__(self, ctx: Context, stage: str) -> None:
+        self.ctx = ctx
+        self.stage = stage
+        self.scripts_out = ctx.out_dir / f".metrics.{stage}.jsonl"
+        self.profile_dir = ctx.path(f"run:profile/{stage}")
+        self.children: List[Dict[str, Any]] = []
+        self.prof = cProfile.Profile() if metrics.CPROFILE else None
+        self.meter = metrics.Meter(thread=True)
+        _CURRENT.meter = self
+        if self.prof is not None:
+            self.prof.enable()
+
+    def stop(self) -> Dict[str, Any]:
+        rec = self.meter.stop()
+        _CURRENT.meter = None
+        if self.prof is not None:
+            self.prof.disable()
+            self.profile_dir.mkdir(parents=True, exist_ok=True)
+            self.prof.dump_stats(str(self.profile_dir / "pipeline.prof"))
+            rec["profile"] = (self.profile_dir / "pipeline.prof").relative_to(self.ctx.out_dir).as_posix()
+        scripts: List[Dict[str, Any]] = []
+        if self.scripts_out.exists():
+            scripts = [json.loads(line) for line in self.scripts_out.read_text(encoding="utf-8").splitlines() if line]
+            self.scripts_out.unlink()
+        # Child CPU/RSS come from wait4(); bytes and counts from the scripts' own records
+        rec["cpu_s"] = round(rec["cpu_s"] + sum(c["cpu_s"] for c in self.children), 4)
+        if self.children:
+            rec["peak_rss_mb"] = max(c["peak_rss_mb"] for c in self.children)
+        for s in scripts:
+            for k in ("read_bytes", "written_bytes"):
+                if rec[k] is not None and s.get(k) is not None:
+                    rec[k] += s[k]
+            rec.update({k: v for k, v in s.items() if k not in SCRIPT_RECORD_KEYS})
+            if s.get("profile"):
+                s["profile"] = os.path.relpath(s["profile"], self.ctx.out_dir)
+        if scripts:
+            rec["scripts"] = scripts
+        return rec
+
+
+
+def _run(cmd: List[str], env: Optional[Dict[str, str]] = None) -> int:
+    """subprocess.run(cmd).returncode; while profiling, the child's rusage goes to the current stage."""
+    meter: Optional[_StageMeter] = getattr(_CURRENT, "meter", None)
+    if meter is None:
+        return subprocess.run(cmd, env=env).returncode
+    proc = subprocess.Popen(cmd, env=env)
+    try:
+        _, status, ru = os.wait4(proc.pid, 0)
+    except BaseException:
+        proc.kill()
+        proc.wait()
+        raise
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    meter.children.append(metrics.rusage_record(ru))
+    return proc.returncode
+
+
+def _python(ctx: Context, script: str, *args: str, env: Optional[Dict[str, str]] = None) -> bool:
+    cmd = [sys.executable, str(ctx.root / "scripts" / script), *args]
+    run_env = dict(ctx.env, **(env or {}))
+    meter: Optional[_StageMeter] = getattr(_CURRENT, "meter", None)
+    if meter is not None:
+        run_env.update(CITYKIT_METRICS_OUT=str(meter.scripts_out), CITYKIT_PROFILE_DIR=str(meter.profile_dir))
+    return _run(cmd, run_env) == 0
+
+
+def _copy(src: Path, dst: Path, required: bool = True) -> None:
+    if not src.exists():
+        if required:
+            raise StageError(f"missing {src}")
+        return
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copy2(src, dst)
+
+
+# -----------------------------
+# Stages
+# -----------------------------
+
+def stage_osm_fetch(ctx: Context) -> None:
+    if ctx.osm_shared:
+        print(f"🔗 OSM_SHARED_DIR set: selecting the corridor from the shared fetch in {ctx.osm_shared}")
+    elif ctx.osm_extract:
+        print(f"🗂️ OSM_EXTRACT set: reading OSM baseline from {ctx.osm_extract} via scripts/osm_fetch.py")
+    else:
+        print("🌍 MAKE_ONLINE=1: attempting OSM fetch via scripts/osm_fetch.py")
+    if not _python(ctx, "osm_fetch.py", env={"CORRIDOR": str(ctx.path("input:corridor")), "OSM_OUT_DIR": str(ctx.work_dir)}):
+        raise StageError("OSM fetch failed; continuing with stub polygon fallback.")
+    baseline = ctx.path("work:derived/osm_baseline.geojson")
+    if not baseline.exists():
+        raise StageError("osm_fetch.py succeeded but derived/osm_baseline.geojson not found.")
+    _copy(baseline, ctx.path("kit:derived/osm_baseline.geojson"))
+    _copy(ctx.path("work:provenance/osm_query.json"), ctx.path("kit:provenance/osm_query.json"))
+    # Columnar sidecar (optional; build_viz.py memory-maps it when current)
+    _copy(ctx.path("work:derived/osm_baseline.ckcol"), ctx.path("kit:derived/osm_baseline.ckcol"), required=False)
+    ctx.osm_online = "yes"
+    corridor = ctx.display("input:corridor")
+    if ctx.osm_extract:
+        ctx.map_provenance = (
+            f"OSM highways + footways + cycleways from local extract {ctx.osm_extract} "
+            f"(bbox from {corridor})."
+        )
+    else:
+        ctx.map_provenance = f"OSM highways + footways + cycleways via Overpass API (bbox from {corridor})."
+
+
+def fetch_cache_key(ctx: Context) -> Optional[Dict[str, Any]]:
+    """
+    Extract runs are reproducible; live Overpass runs are not (osm_fetch.py caches responses itself).
+    A selection from a shared fetch depends only on the shared baseline's content.
+    """
+    if ctx.cache is None:
+        return None
+    if ctx.osm_shared:
+        shared = Path(ctx.osm_shared)
+        if not (shared / "derived" / "osm_baseline.geojson").exists():
+            return None  # let osm_fetch.py report it
+        return {
+            "shared_sha256": ctx.cache.file_digest(shared / "derived" / "osm_baseline.geojson"),
+            "shared_provenance_sha256": ctx.cache.digest(shared / "provenance" / "osm_query.json"),
+            "shared_noderefs_sha256": ctx.cache.digest(shared / "derived" / "osm_baseline.noderefs"),
+            "compact": ctx.env.get("GEOJSON_COMPACT", "0"),
+        }
+    if not ctx.osm_extract:
+        return None
+    try:
+        files = list_extract_files(ctx.osm_extract)
+    except ValueError:
+        return None  # let osm_fetch.py report it
+    return {
+        "extract": ctx.osm_extract,
+        "extract_sha256": [ctx.cache.file_digest(Path(f)) for f in files],
+        "margin_m": ctx.env.get("OSM_EXTRACT_MARGIN_M", "250"),
+        "compact": ctx.env.get("GEOJSON_COMPACT", "0"),
+    }
+
+
+def stage_delta_apply(ctx: Context) -> None:
+    print("📝 OSM_ONLINE: applying delta ops...")
+    ok = _python(
+        ctx, "delta_apply.py",
+        "--baseline", str(ctx.path("work:derived/osm_baseline.geojson")),
+        "--delta", str(ctx.path("input:delta")),
+        "--corridor", str(ctx.path("input:corridor")),
+        "--out", str(ctx.path("work:derived/osm_modified.geojson")),
+    )
+    if not ok:
+        raise StageError("Delta apply failed; continuing with baseline only.")
+    modified = ctx.path("work:derived/osm_modified.geojson")
+    if not modified.exists():
+        raise StageError("delta_apply.py succeeded but osm_modified.geojson not found.")
+    _copy(modified, ctx.path("kit:derived/osm_modified.geojson"))
+    _copy(ctx.path("work:derived/osm_modified.ckcol"), ctx.path("kit:derived/osm_modified.ckcol"), required=False)
+    # Also copy scenario_delta.json for reference
+    _copy(ctx.path("input:delta"), ctx.path("kit:scenario_delta.json"))
+    ctx.delta_applied = "yes"
+
+
+def stage_road_graph(ctx: Context) -> None:
+    """derived/osm_*.ckgraph next to the kit's layers (see road_graph.py)."""
+    print("🛣️ Building road graphs...")
+    layers = [ctx.path(a) for a in ("kit:derived/osm_baseline.geojson", "kit:derived/osm_modified.geojson")]
+    ok = _python(
+        ctx, "road_graph.py", *[str(p) for p in layers if p.exists()],
+        "--noderefs", str(ctx.path("work:derived/osm_baseline.noderefs")),
+    )
+    if not ok:
+        raise StageError("road_graph failed; continuing without road graphs.")
+
+
+def stage_routing(ctx: Context) -> None:
+    """derived/routing_comparison.json: baseline vs modified travel times (see routing.py)."""
+    print("🧭 Comparing travel times on the baseline and modified networks...")
+    if not _python(ctx, "routing.py", "compare", "--kit", str(ctx.kit_dir)):
+        raise StageError("routing comparison failed; continuing without it.")
+
+
+def stage_simulate(ctx: Context) -> None:
+    """derived/sim/: trajectories of SIM_ACTORS actors on the modified network (see simulate.py)."""
+    print(f"🚦 Simulating {ctx.sim_actors} actors for {ctx.sim_duration} s...")
+    ok = _python(
+        ctx, "simulate.py", "--kit", str(ctx.kit_dir),
+        "--actors", ctx.sim_actors, "--duration", ctx.sim_duration,
+    )
+    if not ok:
+        raise StageError("simulation failed; continuing without trajectories.")
+
+
+def stage_viewer(ctx: Context) -> None:
+    print(f"🎨 Building viewer ({ctx.viz_mode})...")
+    ctx.path("kit:viz").mkdir(parents=True, exist_ok=True)
+    if not _python(ctx, "build_viz.py", "--kit", str(ctx.kit_dir), f"--{ctx.viz_mode}"):
+        raise StageError("build_viz failed; continuing")
+
+
+def stage_map(ctx: Context) -> None:
+    # Always include stub for compatibility
+    _copy(ctx.path("root:inputs/zone.geojson"), ctx.path("kit:map.geojson"))
+
+
+ACTORS_JSON = """{
+  "schema_version": "0.1",
+  "actors": [
+    {"id":"robot_001","type":"delivery_robot","modality":"sidewalk","notes":"stub actor; routing/simulation comes later"},
+    {"id":"cyclist_001","type":"cyclist","modality":"bike_lane","notes":"stub actor; for POV + conflicts later"},
+    {"id":"ped_001","type":"pedestrian","modality":"crosswalk","notes":"stub actor"},
+    {"id":"car_001","type":"car","modality":"road","notes":"stub actor"}
+  ]
+}
+"""
+
+
+def stage_actors(ctx: Context) -> None:
+    """actors.json: the stub, with simulated counts per type when derived/sim/sim.json exists."""
+    sim = ctx.path("kit:derived/sim/sim.json")
+    if not sim.exists():
+        ctx.path("kit:actors.json").write_text(ACTORS_JSON, encoding="utf-8")
+        return
+    by_type = json.loads(sim.read_text(encoding="utf-8"))["actors"]["by_type"]
+    actors = json.loads(ACTORS_JSON)
+    for actor in actors["actors"]:
+        counts = by_type.get(actor["type"]) or {}
+        actor["count"] = counts.get("simulated", 0)
+        if actor["type"] in ("car", "delivery_robot"):
+            actor["deliveries"] = counts.get("deliveries", 0)
+        actor["notes"] = "simulated fleet; trajectories in derived/sim/"
+    actors["simulation"] = "derived/sim/sim.json"
+    with open(ctx.path("kit:actors.json"), "w", encoding="utf-8") as f:
+        json.dump(actors, f, indent=2)
+        f.write("\n")
+
+
+def stage_scenario_manifest(ctx: Context) -> None:
+    """scenario.json + dataset_manifest.json; records OSM_ONLINE status truthfully."""
+    kit_dir = ctx.kit_dir
+    created_at = datetime.now(timezone.utc).replace(microsecond=0, tzinfo=None).isoformat() + "Z"
+
+    scenario: Dict[str, Any] = {
+        "schema_version": "0.2",
+        "run_id": ctx.run_id,
+        "zone": {
+            "source": "inputs/zone.geojson",
+            "map_artifact": "map.geojson",
+            "osm_baseline_enabled": ctx.osm_online == "yes",
+        },
+        "actors_artifact": "actors.json",
+        "cameras": [
+            {"id": "robot_front", "type": "pov"},
+            {"id": "cyclist_pov", "type": "pov"},
+            {"id": "birds_eye", "type": "birdseye"},
+        ],
+        "truth_vs_appearance": {
+            "truth_layer": "simulator depth/LiDAR (planned)",
+            "appearance_layer": "video outputs (placeholders allowed in v0.x)",
+        },
+    }
+
+    # Optional: enrich with AOI and delta_present if example files exist
+    corridor_path = ctx.path("input:corridor")
+    delta_path = ctx.path("input:delta")
+    if corridor_path.exists():
+        try:
+            corridor_data = json.loads(corridor_path.read_text(encoding="utf-8"))
+            if "aoi" in corridor_data:
+                scenario["aoi"] = corridor_data["aoi"]
+        except Exception as e:
+            print(f"Warning: could not read {corridor_path.name}: {e}", file=sys.stderr)
+    scenario["delta_present"] = delta_path.exists()
+
+    # Build outputs list (including OSM files if present)
+    outputs: Dict[str, Any] = {
+        "scenario": "scenario.json",
+        "manifest": "dataset_manifest.json",
+        "checksums": "SHA256SUMS",
+        "map": "map.geojson",
+        "actors": "actors.json",
+        "multiview": [f"multiview/{cam}.mp4" for cam in CAMERAS],
+        "labels": "labels/ (empty in v0.x)",
+        "pcd_groundtruth": "pcd_groundtruth/ (empty in v0.x)",
+        "pcd_pseudo": "pcd_pseudo/ (empty in v0.x)",
+    }
+
+    # Add OSM outputs if online mode succeeded
+    if ctx.osm_online == "yes":
+        if (kit_dir / "derived" / "osm_baseline.geojson").exists() and (kit_dir / "provenance" / "osm_query.json").exists():
+            outputs["derived"] = {"osm_baseline": "derived/osm_baseline.geojson"}
+            outputs["provenance"] = {"osm_query": "provenance/osm_query.json"}
+            # Add modified if delta was applied
+            if ctx.delta_applied == "yes" and (kit_dir / "derived" / "osm_modified.geojson").exists():
+                outputs["derived"]["osm_modified"] = "derived/osm_modified.geojson"
+            graphs = {
+                layer: f"derived/osm_{layer}.ckgraph"
+                for layer in ("baseline", "modified") if (kit_dir / "derived" / f"osm_{layer}.ckgraph").exists()
+            }
+            if graphs:
+                outputs["derived"]["road_graph"] = graphs
+            if (kit_dir / "derived" / "routing_comparison.json").exists():
+                outputs["derived"]["routing_comparison"] = "derived/routing_comparison.json"
+            if (kit_dir / "derived" / "sim" / "sim.json").exists():
+                outputs["derived"]["simulation"] = "derived/sim/sim.json"
+            if (kit_dir / "derived" / "kpi.json").exists():
+                outputs["derived"]["kpi"] = "derived/kpi.json"
+            # Add scenario_delta.json if present
+            if (kit_dir / "scenario_delta.json").exists():
+                outputs["scenario_delta"] = "scenario_delta.json"
+
+    if metrics.ENABLED:
+        outputs["timings"] = "provenance/timings.json"
+
+    # Add viewer if present
+    viewer_embedded = False
+    if (kit_dir / "viz" / "overview.html").exists():
+        outputs["viz"] = "viz/overview.html"
+        viewer_embedded = True
+
+    manifest: Dict[str, Any] = {
+        "schema_version": "0.2",
+        "dataset_id": f"urbanability-citykit::{ctx.run_id}",
+        "created_at_utc": created_at,
+        "provenance": {
+            "map": ctx.map_provenance,
+            "attribution": "See ATTRIBUTION.md in repo root.",
+        },
+        "outputs": outputs,
+        "notes": [
+            "Default (MAKE_ONLINE=0) is offline and reproducible with stub polygon.",
+            "MAKE_ONLINE=1 fetches real OSM baseline via Overpass API; fallback to stub is automatic on failure.",
+            "Training-grade ground truth is not part of v0.2.",
+            "Ground-truth geometry and metrics come from simulator depth/LiDAR later.",
+        ],
+    }
+    if viewer_embedded:
+        manifest["viewer_embedded_geojson"] = True
+    cached = {name: r["cache"] for name, r in sorted(list(ctx.results.items())) if r["cache"]}
+    manifest["stage_cache"] = {
+        "enabled": ctx.cache is not None,
+        "hits": [name for name, c in cached.items() if c == "hit"],
+        "misses": [name for name, c in cached.items() if c == "miss"],
+    }
+
+    with open(kit_dir / "scenario.json", "w", encoding="utf-8") as f:
+        json.dump(scenario, f, indent=2)
+    with open(kit_dir / "dataset_manifest.json", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+
+KPI_STUB = """# KPI Report (stub) — {run_id}
+
+This is a v0.x placeholder. Planned KPIs (later):
+- conflict proxy rate
+- curb dwell time
+- pedestrian delay
+- deliveries per hour
+
+Notes:
+- Training-grade ground truth comes from simulator depth/LiDAR.
+- v0.x does not claim metric accuracy.
+"""
+
+
+def stage_kpi(ctx: Context) -> None:
+    """kpi_report.md + derived/kpi.json from the trajectories (see kpi.py); the stub without them."""
+    if ctx.path("kit:derived/sim/sim.json").exists():
+        print("📊 Computing KPIs from the simulation...")
+        if _python(ctx, "kpi.py", "--kit", str(ctx.kit_dir), "--run-id", ctx.run_id):
+            return
+        print("Warning: KPI computation failed; writing the stub report.", file=sys.stderr)
+    ctx.path("kit:kpi_report.md").write_text(KPI_STUB.format(run_id=ctx.run_id), encoding="utf-8")
+
+
+_FFMPEG_VERSION: List[Optional[str]] = []
+
+
+def video_cache_key(ctx: Context) -> Dict[str, Any]:
+    if not _FFMPEG_VERSION:
+        version = None
+        if shutil.which("ffmpeg"):
+            out = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True).stdout
+            version = out.splitlines()[0] if out else "unknown"
+        _FFMPEG_VERSION.append(version)
+    return {"ffmpeg": _FFMPEG_VERSION[0]}
+
+
+def stage_video(cam: str) -> Callable[[Context], None]:
+    """
+    Placeholder multiview video for one camera (text file when ffmpeg is missing).
+    The frame text carries no run id, so a render is reusable across runs.
+    """
+
+    def run(ctx: Context) -> None:
+        mp4 = ctx.path(f"kit:multiview/{cam}.mp4")
+        if shutil.which("ffmpeg"):
+            cmd = [
+                "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+                "-f", "lavfi", "-i", "color=c=black:s=1280x720:d=3",
+                "-vf", f"drawtext=text='{cam} (placeholder)':fontcolor=white:fontsize=48:x=(w-text_w)/2:y=(h-text_h)/2",
+                str(mp4),
+            ]
+            if _run(cmd) != 0:
+                raise StageError(f"ffmpeg failed for {cam}")
+        else:
+            if cam == CAMERAS[0]:
+                print("ffmpeg missing; writing placeholder text files.", file=sys.stderr)
+            Path(f"{mp4}.txt").write_text(f"{cam} placeholder (install ffmpeg for mp4)\n", encoding="utf-8")
+
+    return run
+
+
+def stage_timings(ctx: Context) -> None:
+    """provenance/timings.json: metrics of the stages finished so far, in completion order."""
+    timings = {
+        "schema_version": "0.1",
+        "run_id": ctx.run_id,
+        "generated_at_utc": datetime.now(timezone.utc).replace(microsecond=0, tzinfo=None).isoformat() + "Z",
+        "profile": metrics.PROFILE,
+        "host": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "stages": [dict(r, seconds=round(r["seconds"], 4)) for r in list(ctx.results.values())],
+        "notes": [
+            "package and index run after this file is written; see the pipeline's timings table.",
+            "cpu_s counts the stage's thread and the processes it ran; peak_rss_mb is the largest of those "
+            "processes, or the pipeline's own peak for in-process stages.",
+            "read_bytes/written_bytes are read()/write() volumes (page-cache hits included).",
+            "Cache hits and skipped stages carry no metrics.",
+        ],
+    }
+    path = ctx.path("kit:provenance/timings.json")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(timings, indent=2) + "\n", encoding="utf-8")
+
+
+def stage_package(ctx: Context) -> None:
+    """SHA256SUMS + deterministic zip of the kit (see package_kit.py)."""
+    digest = ctx.cache.file_digest if ctx.cache is not None else None
+    stats = pack_kit(str(ctx.kit_dir), str(ctx.zip_path), digest=digest)
+    print(f"📦 Packed {stats['entries']} entries ({stats['bytes'] / 1e6:.2f} MB, {stats['stored']} stored uncompressed)")
+
+
+def stage_index(ctx: Context) -> None:
+    """Record the packed run in artifacts/index.sqlite (see run_index.py)."""
+    con = run_index.connect(ctx.path("root:artifacts/index.sqlite"))
+    try:
+        run_index.record(con, ctx.zip_path)
+    except (sqlite3.Error, zipfile.BadZipFile) as e:
+        raise StageError(f"run index not updated: {e}")
+    finally:
+        con.close()
+
+
+def demo_stages() -> List[Stage]:
+    """The demo kit DAG (dependencies follow from inputs/outputs)."""
+    fetch_out = [
+        "work:derived/osm_baseline.geojson", "work:derived/osm_baseline.ckcol", "work:derived/osm_baseline.noderefs",
+        "work:provenance/osm_query.json", "kit:derived/osm_baseline.geojson", "kit:derived/osm_baseline.ckcol", "kit:provenance/osm_query.json",
+    ]
+    delta_out = [
+        "work:derived/osm_modified.geojson", "work:derived/osm_modified.ckcol",
+        "kit:derived/osm_modified.geojson", "kit:derived/osm_modified.ckcol", "kit:scenario_delta.json",
+    ]
+    video_out = {cam: [f"kit:multiview/{cam}.mp4", f"kit:multiview/{cam}.mp4.txt"] for cam in CAMERAS}
+    stages = [
+        Stage(
+            "osm_fetch", stage_osm_fetch,
+            inputs=["input:corridor"], outputs=fetch_out,
+            when=lambda ctx: ctx.make_online == "1" or bool(ctx.osm_extract) or bool(ctx.osm_shared), optional=True,
+            cache_key=fetch_cache_key,
+        ),
+        Stage(
+            "delta_apply", stage_delta_apply,
+            inputs=["work:derived/osm_baseline.geojson", "input:delta", "input:corridor"],
+            outputs=delta_out,
+            when=lambda ctx: ctx.osm_online == "yes" and ctx.path("work:derived/osm_baseline.geojson").exists(),
+            optional=True, cache_key=lambda ctx: {},
+        ),
+        Stage(
+            "viewer", stage_viewer,
+            inputs=[
+                "kit:derived/osm_baseline.geojson", "kit:derived/osm_baseline.ckcol",
+                "kit:derived/osm_modified.geojson", "kit:derived/osm_modified.ckcol",
+            ],
+            outputs=["kit:viz/overview.html", "kit:viz/tiles"],
+            when=lambda ctx: any(ctx.kit_dir.glob("derived/osm_*.geojson")), optional=True,
+            cache_key=lambda ctx: {"mode": ctx.viz_mode},
+        ),
+        Stage(
+            "road_graph", stage_road_graph,
+            inputs=[
+                "kit:derived/osm_baseline.geojson", "kit:derived/osm_baseline.ckcol",
+                "kit:derived/osm_modified.geojson", "kit:derived/osm_modified.ckcol",
+                "work:derived/osm_baseline.noderefs",
+            ],
+            outputs=["kit:derived/osm_baseline.ckgraph", "kit:derived/osm_modified.ckgraph"],
+            when=lambda ctx: ctx.path("kit:derived/osm_baseline.geojson").exists(), optional=True,
+            cache_key=lambda ctx: {},
+        ),
+        Stage(
+            "routing", stage_routing,
+            inputs=[
+                "kit:derived/osm_baseline.ckgraph", "kit:derived/osm_modified.ckgraph",
+                "kit:derived/osm_baseline.geojson", "kit:derived/osm_baseline.ckcol",
+                "kit:derived/osm_modified.geojson", "kit:derived/osm_modified.ckcol",
+            ],
+            outputs=["kit:derived/routing_comparison.json"],
+            when=lambda ctx: all(ctx.path(f"kit:derived/osm_{layer}.ckgraph").exists() for layer in ("baseline", "modified")),
+            optional=True, cache_key=lambda ctx: {},
+        ),
+        Stage(
+            "simulate", stage_simulate,
+            inputs=[
+                "kit:derived/osm_baseline.ckgraph", "kit:derived/osm_modified.ckgraph",
+                "kit:derived/osm_baseline.geojson", "kit:derived/osm_baseline.ckcol",
+                "kit:derived/osm_modified.geojson", "kit:derived/osm_modified.ckcol",
+            ],
+            outputs=["kit:derived/sim"],
+            when=lambda ctx: any(ctx.path(f"kit:derived/osm_{layer}.ckgraph").exists() for layer in ("baseline", "modified")),
+            optional=True, cache_key=lambda ctx: {"actors": ctx.sim_actors, "duration": ctx.sim_duration},
+        ),
+        Stage("map", stage_map, inputs=["root:inputs/zone.geojson"], outputs=["kit:map.geojson"]),
+        Stage("actors", stage_actors, inputs=["kit:derived/sim"], outputs=["kit:actors.json"]),
+        Stage(
+            "scenario_manifest", stage_scenario_manifest,
+            inputs=[
+                "input:corridor", "input:delta",
+                "kit:derived/osm_baseline.geojson", "kit:provenance/osm_query.json",
+                "kit:derived/osm_modified.geojson", "kit:scenario_delta.json", "kit:viz/overview.html",
+                "kit:derived/osm_baseline.ckgraph", "kit:derived/osm_modified.ckgraph", "kit:derived/routing_comparison.json",
+                "kit:derived/sim", "kit:derived/kpi.json",
+                # after the cacheable stages, to record their cache status
+                *[o for cam in CAMERAS for o in video_out[cam]],
+            ],
+            outputs=["kit:scenario.json", "kit:dataset_manifest.json"],
+        ),
+        Stage("kpi", stage_kpi, inputs=["kit:derived/sim"], outputs=["kit:kpi_report.md", "kit:derived/kpi.json"]),
+    ]
+    stages += [
+        Stage(f"video_{cam}", stage_video(cam), outputs=video_out[cam], cache_key=video_cache_key)
+        for cam in CAMERAS
+    ]
+    kit_outputs = [o for s in stages for o in s.outputs if o.startswith("kit:")]
+    stages.append(Stage(
+        "timings", stage_timings, inputs=kit_outputs, outputs=["kit:provenance/timings.json"],
+        when=lambda ctx: metrics.ENABLED,
+    ))
+    kit_outputs.append("kit:provenance/timings.json")
+    stages.append(Stage("package", stage_package, inputs=kit_outputs, outputs=["kit:SHA256SUMS", "run:city_demo_kit.zip"]))
+    stages.append(Stage(
+        "index", stage_index,
+        inputs=["run:city_demo_kit.zip"], outputs=["root:artifacts/index.sqlite"], optional=True,
+    ))
+    return stages
+
+
+# -----------------------------
+# Runner
+# -----------------------------
+
+def dependencies(stages: List[Stage]) -> Dict[str, Set[str]]:
+    """Stage name -> names of stages producing its inputs; raises ValueError on duplicates or cycles."""
+    producers: Dict[str, str] = {}
+    for s in stages:
+        for out in s.outputs:
+            if out in producers:
+                raise ValueError(f"{out} is produced by both {producers[out]} and {s.name}")
+            producers[out] = s.name
+    deps = {s.name: {producers[i] for i in s.inputs if i in producers and producers[i] != s.name} for s in stages}
+    done: Set[str] = set()
+    while len(done) < len(deps):
+        ready = [n for n, d in deps.items() if n not in done and d <= done]
+        if not ready:
+            raise ValueError(f"dependency cycle among: {', '.join(sorted(set(deps) - done))}")
+        done.update(ready)
+    return deps
+
+
+def cache_key(stage: Stage, ctx: Context) -> Optional[str]:
+    """Stage cache key: name + tool version + input content + parameters (None: run it)."""
+    if ctx.cache is None or stage.cache_key is None:
+        return None
+    params = stage.cache_key(ctx)
+    if params is None:
+        return None
+    inputs = {a: ctx.cache.digest(ctx.path(a)) for a in stage.inputs}
+    return ctx.cache.key({"stage": stage.name, "tool": ctx.tool_version(), "inputs": inputs, "params": params})
+
+
+def run_stages(stages: List[Stage], ctx: Context, jobs: int) -> List[Dict[str, Any]]:
+    """
+    Run stages as their dependencies finish, up to `jobs` at a time.
+    Returns one {stage, status, cache, seconds, note} record per stage, in declaration order;
+    status is ok, skipped, failed (optional stage, run continues) or error; cache is
+    hit, miss or "" (not cached).
+    """
+    deps = dependencies(stages)
+    by_name = {s.name: s for s in stages}
+    results = ctx.results
+    running: Dict[Future, str] = {}
+
+    def execute(stage: Stage) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        if stage.when is not None and not stage.when(ctx):
+            return {"stage": stage.name, "status": "skipped", "cache": "", "seconds": 0.0, "note": ""}
+        key = cache_key(stage, ctx)
+        if key is not None:
+            meta = ctx.cache.lookup(stage.name, key)
+            if meta is not None:
+                ctx.cache.restore(meta, {a: ctx.path(a) for a in meta["outputs"]})
+                for attr, value in meta["state"].items():
+                    setattr(ctx, attr, value)
+                print(f"♻️ {stage.name}: reusing cached outputs ({key[:12]})\n", end="")  # one write: stages run concurrently
+                return {"stage": stage.name, "status": "ok", "cache": "hit", "seconds": time.perf_counter() - t0, "note": ""}
+        for a in stage.outputs:
+            # Never write through a hardlink into the cache
+            p = ctx.path(a)
+            if p.is_file() and p.stat().st_nlink > 1:
+                p.unlink()
+        before = {attr: getattr(ctx, attr) for attr in Context.STATE}
+        meter = _StageMeter(ctx, stage.name) if metrics.ENABLED else None
+        try:
+            stage.run(ctx)
+            status, note = "ok", ""
+        except (StageError, OSError) as e:
+            status, note = ("failed" if stage.optional else "error"), str(e)
+            print(f"⚠️ {e}" if stage.optional else f"ERROR: stage {stage.name}: {e}", file=sys.stderr)
+        finally:
+            stage_metrics = meter.stop() if meter is not None else None
+        if status == "ok" and key is not None:
+            produced = {a: ctx.path(a) for a in stage.outputs if ctx.path(a).exists()}
+            state = {attr: getattr(ctx, attr) for attr in Context.STATE if getattr(ctx, attr) != before[attr]}
+            try:
+                ctx.cache.store(stage.name, key, produced, state)
+            except OSError as e:
+                print(f"⚠️ stage cache: could not store {stage.name}: {e}", file=sys.stderr)
+        result = {
+            "stage": stage.name, "status": status, "cache": "miss" if key is not None else "",
+            "seconds": time.perf_counter() - t0, "note": note,
+        }
+        if stage_metrics is not None:
+            result["metrics"] = stage_metrics
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        aborted = False
+        while True:
+            if not aborted:
+                for name, d in deps.items():
+                    if name not in results and name not in running.values() and d <= results.keys():
+                        running[pool.submit(execute, by_name[name])] = name
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                res = fut.result()
+                results[running.pop(fut)] = res
+                aborted = aborted or res["status"] == "error"
+    return [results[s.name] for s in stages if s.name in results]
+
+
+def print_timings(results: List[Dict[str, Any]], wall: float) -> None:
+    print(f"⏱️ pipeline: {len(results)} stages in {wall:.2f}s")
+    if metrics.ENABLED:
+        print(f"   {'':<37}{'wall':>8}{'cpu':>8}{'peak MB':>9}{'read MB':>9}{'write MB':>9}")
+    for r in results:
+        note = f"  ({r['note']})" if r["note"] else ""
+        m = r.get("metrics")
+        if m is not None:
+            mb = ["-" if m[k] is None else f"{m[k] / 1e6:.1f}" for k in ("read_bytes", "written_bytes")]
+            peak = "-" if m["peak_rss_mb"] is None else f"{m['peak_rss_mb']:.0f}"
+            note = f"{m['cpu_s']:>7.2f}s{peak:>9}{mb[0]:>9}{mb[1]:>9}" + note
+        print(f"   {r['stage']:<22}{r['status']:<9}{r['cache']:<6}{r['seconds']:>7.2f}s{note}")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Build the city demo kit (stage DAG)")
+    ap.add_argument("--run-id", default=os.environ.get("RUN_ID") or datetime.now(timezone.utc).strftime("%Y-%m-%dT%H%M%SZ"))
+    ap.add_argument("--jobs", type=int, default=int(os.environ.get("PIPELINE_JOBS", "4")), help="Max concurrent stages")
+    ap.add_argument("--list", action="store_true", help="Print stages with their dependencies and exit")
+    args = ap.parse_args()
+
+    stages = demo_stages()
+    if args.list:
+        for name, d in dependencies(stages).items():
+            print(f"{name}: {', '.join(sorted(d)) or '-'}")
+        return 0
+
+    env = dict(os.environ, RUN_ID=args.run_id)
+    ctx = Context(args.run_id, env, stage_cache.from_env(ROOT_DIR))
+    for sub in ["multiview", *RESERVED_DIRS, "derived", "provenance"]:
+        (ctx.kit_dir / sub).mkdir(parents=True, exist_ok=True)
+
+    t0 = time.perf_counter()
+    try:
+        results = run_stages(stages, ctx, args.jobs)
+    finally:
+        if ctx.cache is not None:
+            ctx.cache.close()
+    wall = time.perf_counter() - t0
+    if any(r["status"] == "error" for r in results) or len(results) < len(stages):
+        print_timings(results, wall)
+        print(f"❌ Build failed: {ctx.zip_path}", file=sys.stderr)
+        return 1
+
+    print(f"✅ Built: {ctx.zip_path}")
+    print(f" MAKE_ONLINE: {ctx.make_online}")
+    print(f" OSM_ONLINE: {ctx.osm_online}")
+    print_timings(results, wall)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
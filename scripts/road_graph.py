@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""
+road_graph.py — Routable road graph from the OSM baseline / modified network (stdlib-only)
+
+osm_fetch.build_features() keeps every way as a standalone LineString. This
+restores the topology: each way is split at the OSM nodes it shares with
+other ways (and at its ends), and every piece becomes an edge between two
+graph vertices. Per modality the edges are stored as a CSR adjacency
+(outgoing arcs of vertex v are targets[offsets[v]:offsets[v + 1]]).
+
+Vertex identity comes from <name>.noderefs, the OSM node ids of each way's
+vertices written next to the baseline by osm_fetch.py (noderefs.py; keyed by osm_id, so
+it also serves osm_modified.geojson). Ways without node refs (GeoJSON from
+elsewhere, older kits) are joined where their vertices have exactly the
+same coordinates, which is what a shared OSM node looks like in GeoJSON.
+
+Modalities (actors.json types):
+  car    car             road classes; honours oneway
+  bike   cyclist         road classes except motorway/trunk, cycleway/path/track; honours oneway
+  foot   pedestrian      road classes except motorway/trunk, footway/path/pedestrian/steps/track
+  robot  delivery_robot  as foot, without steps
+Speeds (used for travel times) are not baked in: edges carry maxspeed_kph
+from the delta (0 = none) and default_speed_kph() supplies the rest.
+
+Layout (.ckgraph; the container of columnar.py, magic b"CKGRPH"):
+  vertex_node        int64    OSM node id, -1 where the vertex was joined by coordinates
+  vertex_coords      float64  interleaved lon,lat
+  edge_from/edge_to  int32    vertices at the piece's first / last point (way direction)
+  edge_feature       int32    position of the way in the source GeoJSON
+  edge_first/last    int32    the piece's vertex range within that way
+  edge_osm_id        int64
+  edge_length_m      float64  length along the piece on the WGS84 ellipsoid (geodesy.py)
+  edge_maxspeed_kph  int16    maxspeed_kph property (set_speed_limit), 0 = none
+  edge_highway       int16    code into header["highways"]
+  <mode>.offsets     int64    per vertex + 1
+  <mode>.targets     int32    arc target vertex
+  <mode>.edges       int32    arc edge (reversed arcs: edge_to[e] is the source)
+
+Build is two linear passes over the vertices with flat arrays; peak memory
+is one dict entry per OSM node plus the output arrays.
+
+Usage:
+  python3 scripts/road_graph.py derived/osm_baseline.geojson [derived/osm_modified.geojson ...]
+      [--noderefs derived/osm_baseline.noderefs]   # default: osm_baseline.noderefs next to each input
+  -> derived/osm_baseline.ckgraph, derived/osm_modified.ckgraph
+  python3 scripts/road_graph.py --info derived/osm_modified.ckgraph
+
+Environment:
+  CITYKIT_PROFILE (default: unset) — 1 records load/build/write metrics (see metrics.py)
+
+Exit codes:
+  0 = success
+  1 = input error
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import metrics
+from columnar import INT64_ABSENT, SectionReader, file_sha256, open_sidecar, write_sections
+from geodesy import segment_lengths
+from noderefs import NODEREFS_SUFFIX, NodeRefs, open_node_refs
+
+GRAPH_MAGIC = b"CKGRPH"
+GRAPH_SUFFIX = ".ckgraph"
+VERSION = 1
+
+_ROADS = {
+    "primary", "primary_link", "secondary", "secondary_link", "tertiary", "tertiary_link",
+    "unclassified", "residential", "living_street", "service", "road",
+}
+_FAST = {"motorway", "motorway_link", "trunk", "trunk_link"}
+MODES: Dict[str, Dict[str, Any]] = {
+    "car": {"actor": "car", "highways": _ROADS | _FAST, "oneway": True},
+    "bike": {"actor": "cyclist", "highways": _ROADS | {"cycleway", "path", "track"}, "oneway": True},
+    "foot": {"actor": "pedestrian", "highways": _ROADS | {"footway", "path", "pedestrian", "steps", "track"}, "oneway": False},
+    "robot": {"actor": "delivery_robot", "highways": _ROADS | {"footway", "path", "pedestrian", "track"}, "oneway": False},
+}
+CAR_SPEED_KPH = {
+    "motorway": 100, "motorway_link": 60, "trunk": 80, "trunk_link": 50,
+    "primary": 50, "primary_link": 40, "secondary": 50, "secondary_link": 40, "tertiary": 40, "tertiary_link": 30,
+    "unclassified": 40, "residential": 30, "road": 30, "living_street": 7, "service": 20,
+}
+MODE_SPEED_KPH = {"bike": 15, "foot": 5, "robot": 6}
+ONEWAY_FORWARD = {"yes", "true", "1"}
+ONEWAY_REVERSE = {"-1", "reverse"}
+
+
+def default_speed_kph(mode: str, highway: Optional[str], maxspeed_kph: int = 0) -> float:
+    """Travel speed of mode on an edge: the mode's own pace, capped by the edge's maxspeed_kph when set."""
+    speed = float(CAR_SPEED_KPH.get(highway or "", 30)) if mode == "car" else float(MODE_SPEED_KPH[mode])
+    if maxspeed_kph > 0 and (mode == "car" or mode == "bike"):
+        speed = float(maxspeed_kph) if mode == "car" else min(speed, float(maxspeed_kph))
+    return speed
+
+
+def graph_path(geojson_path: str) -> str:
+    """derived/osm_modified.geojson -> derived/osm_modified.ckgraph"""
+    return os.path.splitext(geojson_path)[0] + GRAPH_SUFFIX
+
+
+# -----------------------------
+# Build
+# -----------------------------
+
+Way = Tuple[int, int, Optional[str], Optional[str], int, List[float]]  # pos, osm_id, highway, oneway, maxspeed, flat coords
+
+
+def iter_ways(geojson_path: str) -> Iterator[Way]:
+    """LineString features as (position, osm_id, highway, oneway, maxspeed_kph, flat [lon, lat, ...])."""
+    reader = open_sidecar(geojson_path)
+    if reader is None:
+        with open(geojson_path, "r", encoding="utf-8") as f:
+            features = json.load(f).get("features") or []
+        for pos, feat in enumerate(features):
+            geom = feat.get("geometry") or {}
+            if geom.get("type") != "LineString" or len(geom.get("coordinates") or []) < 2:
+                continue
+            props = feat.get("properties") or {}
+            speed = props.get("maxspeed_kph")
+            flat = [v for c in geom["coordinates"] for v in (float(c[0]), float(c[1]))]
+            yield (pos, props.get("osm_id"), props.get("highway"), props.get("oneway"),
+                   int(speed) if isinstance(speed, (int, float)) else 0, flat)
+        return
+    with reader:
+        yield from _iter_sidecar(reader)
+
+
+def _iter_sidecar(reader: Any) -> Iterator[Way]:
+    # Own frame: its column views are gone by the time the caller closes the reader
+    gtypes = reader.header["geom_types"]
+    line = gtypes.index("LineString") if "LineString" in gtypes else -2
+    gcode, coff, poff, coords = (reader.column(c) for c in ("geom_type", "coord_offsets", "part_offsets", "coords"))
+    props = reader.header["props"]
+
+    def column(key: str) -> Tuple[Any, Optional[List[Any]]]:
+        meta = props.get(key)
+        if meta is None:
+            return None, None
+        return reader.prop_codes(key), meta.get("dictionary")
+
+    osm_id, _ = column("osm_id")
+    highway, highway_dict = column("highway")
+    oneway, oneway_dict = column("oneway")
+    speed, speed_dict = column("maxspeed_kph")
+
+    def value(col: Any, dictionary: Optional[List[Any]], pos: int) -> Any:
+        if col is None:
+            return None
+        v = col[pos]
+        if dictionary is None:
+            return None if v == INT64_ABSENT else v
+        return None if v < 0 else dictionary[v]
+
+    for pos in range(reader.count):
+        if gcode[pos] != line:
+            continue
+        a, b = coff[poff[pos]], coff[poff[pos] + 1]
+        if b - a < 2:
+            continue
+        s = value(speed, speed_dict, pos)
+        yield (pos, value(osm_id, None, pos), value(highway, highway_dict, pos), value(oneway, oneway_dict, pos),
+               int(s) if isinstance(s, (int, float)) else 0, coords[2 * a : 2 * b].tolist())
+
+
+def _coord_key(lon: float, lat: float) -> int:
+    """Negative int64 key of a position at 1e-7° (OSM's precision); node ids are positive."""
+    return -1 - ((round(lon * 1e7) + 1_800_000_000) * 1_800_000_001 + (round(lat * 1e7) + 900_000_000))
+
+
+def _csr(n: int, src: array, dst: array, eid: array) -> Tuple[array, array, array]:
+    """Counting sort of arcs by source vertex (stable)."""
+    offsets = array("q", bytes(8 * (n + 1)))
+    for u in src:
+        offsets[u + 1] += 1
+    for v in range(n):
+        offsets[v + 1] += offsets[v]
+    fill = array("q", offsets[:-1])
+    targets = array("i", bytes(4 * len(src)))
+    edges = array("i", bytes(4 * len(src)))
+    for k in range(len(src)):
+        u = src[k]
+        p = fill[u]
+        targets[p] = dst[k]
+        edges[p] = eid[k]
+        fill[u] = p + 1
+    return offsets, targets, edges
+
+
+def build_graph(geojson_path: str, refs: Optional[NodeRefs] = None) -> Tuple[Dict[str, Any], Dict[str, array]]:
+    """(header, columns) of the graph of geojson_path; see the module docstring for the layout."""
+    # Pass 1: a key per way vertex (OSM node id, or position) and how many times each key occurs
+    keys = array("q")
+    starts = array("q", [0])
+    joined_by_coords = 0
+    counts: Dict[int, int] = {}
+    for _pos, osm_id, _hw, _ow, _speed, flat in iter_ways(geojson_path):
+        n = len(flat) // 2
+        ids = refs.lookup(osm_id) if refs is not None and osm_id is not None else None
+        if ids is not None and len(ids) == n:
+            keys.extend(ids)
+        else:
+            joined_by_coords += 1
+            keys.extend(_coord_key(flat[2 * j], flat[2 * j + 1]) for j in range(n))
+        for k in keys[starts[-1]:]:
+            counts[k] = counts.get(k, 0) + 1
+        starts.append(len(keys))
+
+    # Pass 2: split at shared nodes and way ends; one edge per piece
+    vid: Dict[int, int] = {}
+    vertex_node, vertex_coords = array("q"), array("d")
+    cols = {name: array(tc) for name, tc in (
+        ("edge_from", "i"), ("edge_to", "i"), ("edge_feature", "i"), ("edge_first", "i"), ("edge_last", "i"),
+        ("edge_osm_id", "q"), ("edge_length_m", "d"), ("edge_maxspeed_kph", "h"), ("edge_highway", "h"),
+    )}
+    highways: List[Optional[str]] = []
+    highway_code: Dict[Optional[str], int] = {}
+    arcs = {m: (array("i"), array("i"), array("i")) for m in MODES}
+
+    def vertex(k: int, lon: float, lat: float) -> int:
+        v = vid.get(k)
+        if v is None:
+            v = vid[k] = len(vertex_node)
+            vertex_node.append(k if k >= 0 else -1)
+            vertex_coords.append(lon)
+            vertex_coords.append(lat)
+        return v
+
+    for w, (pos, osm_id, highway, oneway, speed, flat) in enumerate(iter_ways(geojson_path)):
+        base, n = starts[w], len(flat) // 2
+        code = highway_code.get(highway)
+        if code is None:
+            code = highway_code[highway] = len(highways)
+            highways.append(highway)
+        forward = oneway not in ONEWAY_REVERSE
+        backward = oneway not in ONEWAY_FORWARD
+        modes = [(m, arcs[m], forward or not spec["oneway"], backward or not spec["oneway"])
+                 for m, spec in MODES.items() if highway in spec["highways"]]
+        speed = max(0, min(speed, 32767))
+
+        u = vertex(keys[base], flat[0], flat[1])
+        first = 0
+        length = 0.0
+        seg_lengths = segment_lengths(flat)
+        for j in range(1, n):
+            length += seg_lengths[j - 1]
+            k = keys[base + j]
+            if j < n - 1 and counts[k] < 2:
+                continue
+            v = vertex(k, flat[2 * j], flat[2 * j + 1])
+            e = len(cols["edge_from"])
+            for name, val in (
+                ("edge_from", u), ("edge_to", v), ("edge_feature", pos), ("edge_first", first), ("edge_last", j),
+                ("edge_osm_id", osm_id if osm_id is not None else -1), ("edge_length_m", length),
+                ("edge_maxspeed_kph", speed), ("edge_highway", code),
+            ):
+                cols[name].append(val)
+            for _m, (src, dst, eid), fwd, bwd in modes:
+                if fwd:
+                    src.append(u)
+                    dst.append(v)
+                    eid.append(e)
+                if bwd:
+                    src.append(v)
+                    dst.append(u)
+                    eid.append(e)
+            u, first, length = v, j, 0.0
+    del counts, keys, vid
+
+    columns: Dict[str, array] = {"vertex_node": vertex_node, "vertex_coords": vertex_coords, **cols}
+    n_vertices = len(vertex_node)
+    mode_meta: Dict[str, Any] = {}
+    for m, (src, dst, eid) in arcs.items():
+        offsets, targets, edges = _csr(n_vertices, src, dst, eid)
+        columns.update({f"{m}.offsets": offsets, f"{m}.targets": targets, f"{m}.edges": edges})
+        mode_meta[m] = {"actor": MODES[m]["actor"], "arcs": len(targets), "oneway": MODES[m]["oneway"]}
+    header = {
+        "format": "citykit-road-graph",
+        "version": VERSION,
+        "vertices": n_vertices,
+        "edges": len(cols["edge_from"]),
+        "ways": len(starts) - 1,
+        "ways_joined_by_coordinates": joined_by_coords,
+        "highways": highways,
+        "modes": mode_meta,
+    }
+    return header, columns
+
+
+def write_graph(path: str, header: Dict[str, Any], columns: Dict[str, array], source: Optional[Dict[str, Any]] = None) -> None:
+    if source:
+        header["source"] = source
+    write_sections(path, header, columns, GRAPH_MAGIC, VERSION)
+
+
+class RoadGraph(SectionReader):
+    """Memory-mapped .ckgraph; adjacency(mode) -> (offsets, targets, edges) memoryviews."""
+
+    def __init__(self, path: str) -> None:
+        super().__init__(path, GRAPH_MAGIC, VERSION)
+        self.vertices: int = self.header["vertices"]
+        self.edges: int = self.header["edges"]
+        self.highways: List[Optional[str]] = self.header["highways"]
+
+    @property
+    def modes(self) -> List[str]:
+        return list(self.header["modes"])
+
+    def adjacency(self, mode: str) -> Tuple[memoryview, memoryview, memoryview]:
+        if mode not in self.header["modes"]:
+            raise ValueError(f"unknown mode {mode!r} (graph has {', '.join(self.modes)})")
+        return self.column(f"{mode}.offsets"), self.column(f"{mode}.targets"), self.column(f"{mode}.edges")
+
+    def vertex_coord(self, v: int) -> Tuple[float, float]:
+        coords = self.column("vertex_coords")
+        return coords[2 * v], coords[2 * v + 1]
+
+    def components(self, mode: str) -> List[int]:
+        """Sizes of the weakly connected components (vertices with an arc of mode), largest first."""
+        parent = list(range(self.vertices))
+
+        def find(x: int) -> int:
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        offsets, targets, _ = self.adjacency(mode)
+        used = bytearray(self.vertices)
+        for u in range(self.vertices):
+            for p in range(offsets[u], offsets[u + 1]):
+                v = targets[p]
+                used[u] = used[v] = 1
+                ru, rv = find(u), find(v)
+                if ru != rv:
+                    parent[ru] = rv
+        sizes: Dict[int, int] = {}
+        for v in range(self.vertices):
+            if used[v]:
+                r = find(v)
+                sizes[r] = sizes.get(r, 0) + 1
+        return sorted(sizes.values(), reverse=True)
+
+
+def build(geojson_path: str, refs_path: Optional[str] = None) -> Dict[str, Any]:
+    """Build and write <geojson>.ckgraph; returns its header."""
+    refs_path = refs_path or os.path.join(os.path.dirname(geojson_path), "osm_baseline" + NODEREFS_SUFFIX)
+    with metrics.section("load", geojson=os.path.basename(geojson_path)):
+        refs = open_node_refs(refs_path)
+    try:
+        with metrics.section("build", geojson=os.path.basename(geojson_path)) as m:
+            header, columns = build_graph(geojson_path, refs)
+            m.update(vertices=header["vertices"], edges=header["edges"])
+    finally:
+        if refs is not None:
+            refs.close()
+    out = graph_path(geojson_path)
+    with metrics.section("write", out=os.path.basename(out)):
+        source = {
+            "path": os.path.basename(geojson_path),
+            "bytes": os.path.getsize(geojson_path),
+            "sha256": file_sha256(geojson_path),
+            "noderefs": os.path.basename(refs_path) if refs is not None else None,
+        }
+        write_graph(out, header, columns, source)
+    return header
+
+
+def describe(path: str, header: Dict[str, Any]) -> str:
+    modes = ", ".join(f"{m} {meta['arcs']} arcs" for m, meta in header["modes"].items())
+    return f"{path}: {header['vertices']} vertices, {header['edges']} edges ({modes})"
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Build routable road graphs from OSM GeoJSON")
+    ap.add_argument("geojson", nargs="*", help="osm_baseline.geojson / osm_modified.geojson")
+    ap.add_argument("--noderefs", default="", help="Node refs file (default: osm_baseline.noderefs next to each input)")
+    ap.add_argument("--info", metavar="CKGRAPH", help="Print a graph's summary and connected components instead")
+    args = ap.parse_args()
+
+    if args.info:
+        try:
+            graph = RoadGraph(args.info)
+        except (OSError, ValueError) as e:
+            print(f"ERROR: {e}", file=sys.stderr)
+            return 1
+        with graph:
+            print(describe(args.info, graph.header))
+            print(f"  source: {graph.header.get('source')}")
+            print(f"  ways joined by coordinates: {graph.header['ways_joined_by_coordinates']} of {graph.header['ways']}")
+            for m in graph.modes:
+                sizes = graph.components(m)
+                largest = sizes[0] if sizes else 0
+                print(f"  {m:<6} components: {len(sizes)}, largest {largest} vertices")
+        return 0
+
+    if not args.geojson:
+        ap.error("give at least one GeoJSON file (or --info)")
+    for path in args.geojson:
+        if not os.path.exists(path):
+            print(f"ERROR: missing {path}", file=sys.stderr)
+            return 1
+        try:
+            header = build(path, args.noderefs or None)
+        except (OSError, ValueError) as e:
+            print(f"ERROR building road graph for {path}: {e}", file=sys.stderr)
+            return 1
+        print(f"✅ road_graph: {describe(graph_path(path), header)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(metrics.run_main("road_graph", main))
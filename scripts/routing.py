@@ -0,0 +1,804 @@
+#!/usr/bin/env python3
+"""
+routing.py — Shortest paths, travel-time matrices and isochrones on a road graph (stdlib-only)
+
+Queries run on a .ckgraph (road_graph.py) for one modality. Arc weights are
+travel times in seconds: edge length over road_graph.default_speed_kph(), so a
+set_speed_limit delta (edge maxspeed_kph) changes car and bike times. Given a
+time of day (--at HH:MM), geofence overlays of the graph's source GeoJSON
+(add_geofence, allowed_hours) close every edge touching a vertex inside a
+fence that is shut at that time, for the vehicle modes (car, robot).
+
+  route      bidirectional A* with averaged potentials (both searches share
+             one reduced graph, so the search stops as soon as the two queue
+             minima add up to the best meeting cost). The potential is the
+             ellipsoidal distance over the fastest arc speed, tightened with
+             ALT landmark bounds when landmarks > 0 (farthest-point selection
+             by round-trip time, one forward + one reverse Dijkstra each; the
+             4 landmarks with the best s-t bound are used per query).
+  matrix     many-to-many: one early-stopping Dijkstra per origin (or per
+             destination on the reverse graph, whichever side is smaller);
+             bidirectional A* per pair for 1-2 targets.
+  isochrone  one Dijkstra up to the largest budget; per budget the reached
+             vertices, reachable street length (partly reached edges count
+             pro rata) and their convex hull.
+  compare    the same seeded origin/destination sample routed on the baseline
+             and modified graphs per mode and time of day.
+
+Usage:
+  python3 scripts/routing.py route GRAPH --from LON,LAT --to LON,LAT [--mode car] [--at HH:MM] [--landmarks 8]
+  python3 scripts/routing.py isochrone GRAPH --from LON,LAT [--mode foot] [--budgets 300,600,900]
+      [--at HH:MM] [--out isochrones.geojson]
+  python3 scripts/routing.py compare --kit KIT_DIR [--modes car,bike,foot,robot] [--at 08:00,23:00]
+      [--origins 20] [--destinations 20] [--seed 1] [--out KIT_DIR/derived/routing_comparison.json]
+  (or compare --baseline G --modified G --out FILE)
+
+Environment:
+  CITYKIT_PROFILE (default: unset) — 1 records per-mode matrix metrics (see metrics.py)
+
+Exit codes:
+  0 = success
+  1 = input error
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import json
+import math
+import os
+import random
+import statistics
+import sys
+from array import array
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import metrics
+from columnar import open_sidecar
+from geodesy import distance_m
+from road_graph import MODES, RoadGraph, _csr, default_speed_kph, graph_path
+from spatial_index import _point_in_rings
+
+INF = math.inf
+GEOFENCE_MODES = {"car", "robot"}
+ACTIVE_LANDMARKS = 4
+PAIRWISE_MAX_TARGETS = 2
+SNAP_CELL_DEG = 0.002
+# distance_m() is not exactly the geodesic; shaving this much keeps the A* bound below any path length
+BOUND_SLACK = 1.0 - 1e-5
+
+Rings = List[List[Tuple[float, float]]]
+Geofence = Tuple[Rings, str]  # rings, allowed_hours
+Overlay = Tuple[Rings, Dict[str, Any]]  # rings, selected properties
+
+
+# -----------------------------
+# Geofences
+# -----------------------------
+
+def parse_clock(text: str) -> int:
+    """'06:30' -> minute of day."""
+    h, _, m = text.strip().partition(":")
+    minute = int(h) * 60 + int(m or 0)
+    if not 0 <= minute <= 24 * 60:
+        raise ValueError(f"bad time of day {text!r}")
+    return minute
+
+
+def hours_allow(allowed_hours: str, minute: int) -> bool:
+    """Whether minute of day falls in allowed_hours ("06:00-22:00", comma-separated ranges, may wrap midnight).
+
+    Specs that do not parse (delta_apply.py writes "unspecified" when none was given) do not restrict.
+    """
+    try:
+        ranges = [tuple(parse_clock(t) for t in part.split("-", 1)) for part in allowed_hours.split(",")]
+    except ValueError:
+        return True
+    if any(len(r) != 2 for r in ranges):
+        return True
+    for start, end in ranges:
+        if start <= end and start <= minute < end:
+            return True
+        if start > end and (minute >= start or minute < end):
+            return True
+    return False
+
+
+def _polygon_rings(geom: Optional[Dict[str, Any]]) -> Rings:
+    if not geom:
+        return []
+    if geom.get("type") == "Polygon":
+        polys = [geom.get("coordinates") or []]
+    elif geom.get("type") == "MultiPolygon":
+        polys = geom.get("coordinates") or []
+    else:
+        return []
+    return [[(float(c[0]), float(c[1])) for c in ring] for poly in polys for ring in poly]
+
+
+def load_overlays(geojson_path: str, feature_type: str, keys: Sequence[str] = ()) -> List[Overlay]:
+    """(rings, {key: value}) of every polygon overlay of feature_type in geojson_path (see delta_apply.py)."""
+    if not os.path.exists(geojson_path):
+        return []
+    overlays: List[Overlay] = []
+    reader = open_sidecar(geojson_path)
+    if reader is not None:
+        with reader:
+            if "feature_type" not in reader.header["props"]:
+                return []
+            dictionary = reader.dictionary("feature_type")
+            if feature_type not in dictionary:
+                return []
+            code = dictionary.index(feature_type)
+            for pos, c in enumerate(reader.prop_codes("feature_type").tolist()):
+                if c == code:
+                    rings = _polygon_rings(reader.geometry(pos))
+                    if rings:
+                        overlays.append((rings, {k: reader.prop_value(k, pos) for k in keys}))
+        return overlays
+    with open(geojson_path, "r", encoding="utf-8") as f:
+        features = json.load(f).get("features") or []
+    for feat in features:
+        props = feat.get("properties") or {}
+        if props.get("feature_type") == feature_type:
+            rings = _polygon_rings(feat.get("geometry"))
+            if rings:
+                overlays.append((rings, {k: props.get(k) for k in keys}))
+    return overlays
+
+
+def load_geofences(geojson_path: str) -> List[Geofence]:
+    """(rings, allowed_hours) of every geofence overlay in geojson_path."""
+    return [(rings, str(props["allowed_hours"] or "")) for rings, props in load_overlays(geojson_path, "geofence", ("allowed_hours",))]
+
+
+def graph_geofences(path: str, graph: RoadGraph) -> List[Geofence]:
+    """Geofences of the GeoJSON a .ckgraph was built from (next to it)."""
+    source = (graph.header.get("source") or {}).get("path")
+    return load_geofences(os.path.join(os.path.dirname(path), source)) if source else []
+
+
+# -----------------------------
+# Router
+# -----------------------------
+
+class Router:
+    """Travel-time queries for one mode on a RoadGraph (optionally at a time of day, with ALT landmarks)."""
+
+    def __init__(
+        self,
+        graph: RoadGraph,
+        mode: str,
+        at: Optional[str] = None,
+        geofences: Sequence[Geofence] = (),
+        landmarks: int = 0,
+    ) -> None:
+        self.graph = graph
+        self.mode = mode
+        self.n = graph.vertices
+        offsets, targets, edges = graph.adjacency(mode)
+        self.offsets, self.targets, self.edges = offsets, targets, edges
+        self.coords = graph.column("vertex_coords")
+        self.edge_length = graph.column("edge_length_m")
+
+        closed = self._closed_vertices(geofences, at) if mode in GEOFENCE_MODES else None
+        self.closed_vertices = sum(closed) if closed is not None else 0
+        self.weights, self.max_speed_ms = self._arc_weights(closed)
+
+        if graph.header["modes"][mode]["oneway"]:
+            sources = array("i", bytes(4 * len(targets)))
+            for u in range(self.n):
+                for p in range(offsets[u], offsets[u + 1]):
+                    sources[p] = u
+            self.r_offsets, self.r_targets, r_pos = _csr(self.n, targets, sources, array("i", range(len(targets))))
+            self.r_edges = array("i", (edges[p] for p in r_pos))
+            self.r_weights = array("d", (self.weights[p] for p in r_pos))
+        else:
+            # Every edge has both arcs with the same weight: the reverse graph is the graph
+            self.r_offsets, self.r_targets, self.r_edges, self.r_weights = offsets, targets, edges, self.weights
+
+        self._grid: Optional[Dict[Tuple[int, int], List[int]]] = None
+        self._grid_extent = (0, 0, 0, 0)
+        self.landmarks: List[int] = []
+        self._from_l: List[array] = []
+        self._to_l: List[array] = []
+        if landmarks > 0:
+            self._select_landmarks(landmarks)
+
+    # -- setup ---------------------------------------------------------------
+
+    def _closed_vertices(self, geofences: Sequence[Geofence], at: Optional[str]) -> Optional[bytearray]:
+        if at is None:
+            return None
+        minute = parse_clock(at)
+        shut = [rings for rings, hours in geofences if not hours_allow(hours, minute)]
+        if not shut:
+            return None
+        boxes = []
+        for rings in shut:
+            xs = [x for ring in rings for x, _ in ring]
+            ys = [y for ring in rings for _, y in ring]
+            boxes.append((min(xs), min(ys), max(xs), max(ys), rings))
+        closed = bytearray(self.n)
+        coords = self.coords
+        for v in range(self.n):
+            x, y = coords[2 * v], coords[2 * v + 1]
+            for x0, y0, x1, y1, rings in boxes:
+                if x0 <= x <= x1 and y0 <= y <= y1 and _point_in_rings(x, y, rings):
+                    closed[v] = 1
+                    break
+        return closed
+
+    def _arc_weights(self, closed: Optional[bytearray]) -> Tuple[array, float]:
+        g = self.graph
+        length = self.edge_length
+        speed = g.column("edge_maxspeed_kph")
+        highway = g.column("edge_highway")
+        efrom, eto = g.column("edge_from"), g.column("edge_to")
+        sec_per_m: Dict[Tuple[int, int], float] = {}
+        fastest = 0.0
+        weights = array("d", bytes(8 * len(self.targets)))
+        for p, e in enumerate(self.edges):
+            if closed is not None and (closed[efrom[e]] or closed[eto[e]]):
+                weights[p] = INF
+                continue
+            key = (highway[e], speed[e])
+            spm = sec_per_m.get(key)
+            if spm is None:
+                kph = default_speed_kph(self.mode, g.highways[key[0]], key[1])
+                spm = sec_per_m[key] = 3.6 / kph
+                fastest = max(fastest, kph / 3.6)
+            weights[p] = length[e] * spm
+        return weights, fastest
+
+    def _select_landmarks(self, k: int) -> None:
+        """Farthest-point landmarks within the largest strongly connected part found from a few start vertices.
+
+        Round-trip distance (to + from) is the spread measure, so one-way dead ends are never picked.
+        """
+        used = [v for v in range(self.n) if self.offsets[v + 1] > self.offsets[v]]
+        score = array("d")
+        core: List[int] = []
+        for start in used[:: max(1, len(used) // 8)][:8]:
+            fwd, rev = self._sssp(start, reverse=False), self._sssp(start, reverse=True)
+            reach = [v for v in used if fwd[v] != INF and rev[v] != INF]
+            if len(reach) > len(core):
+                core, score = reach, array("d", (a + b for a, b in zip(fwd, rev)))
+            if 2 * len(core) >= len(used):
+                break
+        for _ in range(k):
+            best, far = -1, -1.0
+            for v in core:
+                if score[v] > far and v not in self.landmarks:
+                    best, far = v, score[v]
+            if best < 0:
+                break
+            self.landmarks.append(best)
+            from_l = self._sssp(best, reverse=False)
+            to_l = self._sssp(best, reverse=True) if self.r_offsets is not self.offsets else from_l
+            self._from_l.append(from_l)
+            self._to_l.append(to_l)
+            for v in core:
+                d = from_l[v] + to_l[v]
+                if d < score[v]:
+                    score[v] = d
+
+    def _sssp(self, source: int, reverse: bool) -> array:
+        """Distances from source to every vertex (to source from every vertex when reverse)."""
+        dist = array("d", [INF]) * self.n
+        for v, d in self._dijkstra(source, reverse=reverse).items():
+            dist[v] = d
+        return dist
+
+    # -- queries -------------------------------------------------------------
+
+    def _adjacency(self, reverse: bool) -> Tuple[Any, Any, Any]:
+        if reverse:
+            return self.r_offsets, self.r_targets, self.r_weights
+        return self.offsets, self.targets, self.weights
+
+    def _dijkstra(
+        self, source: int, targets: Optional[Iterable[int]] = None, cutoff: float = INF, reverse: bool = False,
+    ) -> Dict[int, float]:
+        """Settled distances from source; stops once every target is settled or past cutoff."""
+        offsets, arcs, weights = self._adjacency(reverse)
+        remaining = set(targets) if targets is not None else None
+        dist: Dict[int, float] = {source: 0.0}
+        settled: Dict[int, float] = {}
+        heap = [(0.0, source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if u in settled:
+                continue
+            if d > cutoff:
+                break
+            settled[u] = d
+            if remaining is not None:
+                remaining.discard(u)
+                if not remaining:
+                    break
+            for p in range(offsets[u], offsets[u + 1]):
+                nd = d + weights[p]
+                v = arcs[p]
+                if nd < dist.get(v, INF):
+                    dist[v] = nd
+                    heapq.heappush(heap, (nd, v))
+        return settled
+
+    def _potential(self, s: int, t: int) -> Callable[[int], Optional[float]]:
+        """Feasible forward potential for s -> t: (bound to t - bound from s) / 2; None where t is unreachable."""
+        coords = self.coords
+        inv = BOUND_SLACK / self.max_speed_ms if self.max_speed_ms > 0 else 0.0
+        slon, slat, tlon, tlat = coords[2 * s], coords[2 * s + 1], coords[2 * t], coords[2 * t + 1]
+        active: List[Tuple[array, array, float, float, float, float]] = []
+        if self.landmarks:
+            ranked = []
+            for fl, tl in zip(self._from_l, self._to_l):
+                bound = max(tl[s] - tl[t], fl[t] - fl[s])
+                ranked.append((bound if bound == bound else -INF, len(ranked)))
+            for _, i in sorted(ranked, reverse=True)[:ACTIVE_LANDMARKS]:
+                fl, tl = self._from_l[i], self._to_l[i]
+                active.append((fl, tl, fl[s], tl[s], fl[t], tl[t]))
+        cache: Dict[int, Optional[float]] = {}
+
+        def potential(v: int) -> Optional[float]:
+            if v in cache:
+                return cache[v]
+            lon, lat = coords[2 * v], coords[2 * v + 1]
+            to_t = distance_m(lon, lat, tlon, tlat) * inv
+            from_s = distance_m(slon, slat, lon, lat) * inv
+            for fl, tl, fls, tls, flt, tlt in active:
+                # d(v,t) >= d(v,L) - d(t,L), d(L,t) - d(L,v); d(s,v) >= d(s,L) - d(v,L), d(L,v) - d(L,s)
+                # (inf - inf is nan and never compares greater)
+                b = tl[v] - tlt
+                if b > to_t:
+                    to_t = b
+                b = flt - fl[v]
+                if b > to_t:
+                    to_t = b
+                b = tls - tl[v]
+                if b > from_s:
+                    from_s = b
+                b = fl[v] - fls
+                if b > from_s:
+                    from_s = b
+            p = None if to_t == INF or from_s == INF else (to_t - from_s) / 2.0
+            cache[v] = p
+            return p
+
+        return potential
+
+    def route(self, s: int, t: int) -> Optional[Dict[str, Any]]:
+        """Fastest s -> t path: {"seconds", "meters", "vertices", "edges", "edge_seconds"}, or None when t is unreachable.
+
+        edges[i] joins vertices[i] and vertices[i + 1]; edge_seconds[i] is its travel time.
+        """
+        if s == t:
+            return {"seconds": 0.0, "meters": 0.0, "vertices": [s], "edges": [], "edge_seconds": []}
+        potential = self._potential(s, t)
+        ps, pt = potential(s), potential(t)
+        if ps is None or pt is None:
+            return None
+        dist_f: Dict[int, float] = {s: 0.0}
+        dist_r: Dict[int, float] = {t: 0.0}
+        pred_f: Dict[int, Tuple[int, int]] = {}  # vertex -> (previous vertex, arc position)
+        pred_r: Dict[int, Tuple[int, int]] = {}
+        heap_f, heap_r = [(ps, s)], [(-pt, t)]
+        # Forward keys are dist + p(v), reverse keys dist - p(v)
+        sides = (
+            (self.offsets, self.targets, self.weights, dist_f, pred_f, set(), heap_f, 1.0, dist_r),
+            (self.r_offsets, self.r_targets, self.r_weights, dist_r, pred_r, set(), heap_r, -1.0, dist_f),
+        )
+        best, meet = INF, -1
+        while heap_f and heap_r:
+            if heap_f[0][0] + heap_r[0][0] >= best:
+                break
+            offsets, arcs, weights, dist, pred, settled, heap, sign, other = sides[0 if heap_f[0][0] <= heap_r[0][0] else 1]
+            _, u = heapq.heappop(heap)
+            if u in settled:
+                continue
+            settled.add(u)
+            d = dist[u]
+            for p in range(offsets[u], offsets[u + 1]):
+                nd = d + weights[p]
+                v = arcs[p]
+                if nd < dist.get(v, INF):
+                    pv = potential(v)
+                    if pv is None:
+                        continue
+                    dist[v] = nd
+                    pred[v] = (u, p)
+                    heapq.heappush(heap, (nd + sign * pv, v))
+                    o = other.get(v)
+                    if o is not None and nd + o < best:
+                        best, meet = nd + o, v
+        if meet < 0:
+            return None
+        head: List[int] = []
+        head_arcs: List[int] = []
+        v = meet
+        while v != s:
+            u, p = pred_f[v]
+            head.append(u)
+            head_arcs.append(p)
+            v = u
+        tail: List[int] = []
+        tail_arcs: List[int] = []
+        v = meet
+        while v != t:
+            u, p = pred_r[v]
+            tail.append(u)
+            tail_arcs.append(p)
+            v = u
+        edges = [self.edges[p] for p in reversed(head_arcs)] + [self.r_edges[p] for p in tail_arcs]
+        edge_seconds = [self.weights[p] for p in reversed(head_arcs)] + [self.r_weights[p] for p in tail_arcs]
+        return {
+            "seconds": best,
+            "meters": sum(self.edge_length[e] for e in edges),
+            "vertices": head[::-1] + [meet] + tail,
+            "edges": edges,
+            "edge_seconds": edge_seconds,
+        }
+
+    def matrix(self, origins: Sequence[int], destinations: Sequence[int], cutoff: float = INF) -> List[List[float]]:
+        """Travel seconds origins x destinations (inf = unreachable or beyond cutoff)."""
+        if len(destinations) <= PAIRWISE_MAX_TARGETS and cutoff == INF:
+            rows = []
+            for s in origins:
+                row = []
+                for t in destinations:
+                    r = self.route(s, t)
+                    row.append(r["seconds"] if r is not None else INF)
+                rows.append(row)
+            return rows
+        if len(destinations) < len(origins):
+            cols = [self._dijkstra(t, origins, cutoff, reverse=True) for t in destinations]
+            return [[col.get(s, INF) for col in cols] for s in origins]
+        return [[dist.get(t, INF) for t in destinations] for dist in (self._dijkstra(s, destinations, cutoff) for s in origins)]
+
+    def isochrone(self, s: int, budgets: Sequence[float]) -> List[Dict[str, Any]]:
+        """Per budget (seconds): reached vertices, reachable street length and convex hull [[lon, lat], ...]."""
+        if not budgets:
+            return []
+        dist = self._dijkstra(s, cutoff=max(budgets))
+        coords, edges, length = self.coords, self.edges, self.edge_length
+        out = []
+        for budget in sorted(budgets):
+            reached = [v for v, d in dist.items() if d <= budget]
+            # Street length: each edge's reached share over both directions, capped at the whole edge
+            share: Dict[int, float] = {}
+            for u in reached:
+                left = budget - dist[u]
+                for p in range(self.offsets[u], self.offsets[u + 1]):
+                    w = self.weights[p]
+                    if w == INF:
+                        continue
+                    e = edges[p]
+                    share[e] = min(1.0, share.get(e, 0.0) + (1.0 if w <= left else left / w))
+            out.append({
+                "budget_s": budget,
+                "vertices": len(reached),
+                "length_m": sum(length[e] * f for e, f in share.items()),
+                "hull": _convex_hull([(coords[2 * v], coords[2 * v + 1]) for v in reached]),
+            })
+        return out
+
+    # -- snapping ------------------------------------------------------------
+
+    def nearest_vertex(self, lon: float, lat: float) -> Optional[int]:
+        """Closest vertex with an arc of this mode, or None on an empty graph."""
+        if self._grid is None:
+            self._grid = {}
+            for v in range(self.n):
+                if self.offsets[v + 1] > self.offsets[v] or self.r_offsets[v + 1] > self.r_offsets[v]:
+                    key = (math.floor(self.coords[2 * v] / SNAP_CELL_DEG), math.floor(self.coords[2 * v + 1] / SNAP_CELL_DEG))
+                    self._grid.setdefault(key, []).append(v)
+            xs, ys = [x for x, _ in self._grid], [y for _, y in self._grid]
+            self._grid_extent = (min(xs), min(ys), max(xs), max(ys)) if self._grid else (0, 0, 0, 0)
+        if not self._grid:
+            return None
+        cx, cy = math.floor(lon / SNAP_CELL_DEG), math.floor(lat / SNAP_CELL_DEG)
+        x0, y0, x1, y1 = self._grid_extent
+        max_r = max(abs(x0 - cx), abs(x1 - cx), abs(y0 - cy), abs(y1 - cy))
+        # Rings closer than the grid's extent are empty (far-away queries start at its edge)
+        min_r = max(x0 - cx, cx - x1, y0 - cy, cy - y1, 0)
+        best, best_d, found_at = None, INF, None
+        for r in range(min_r, max_r + 1):
+            for x, y in _ring_cells(cx, cy, r, self._grid_extent):
+                for v in self._grid.get((x, y), ()):
+                    d = distance_m(lon, lat, self.coords[2 * v], self.coords[2 * v + 1])
+                    if d < best_d:
+                        best, best_d = v, d
+            # A hit in ring r can still be beaten by one in ring r + 1 (cells are not circles)
+            if best is not None:
+                if found_at is None:
+                    found_at = r
+                elif r > found_at:
+                    break
+        return best
+
+
+def _ring_cells(cx: int, cy: int, r: int, extent: Tuple[int, int, int, int]) -> Iterable[Tuple[int, int]]:
+    """Cells at Chebyshev distance r from (cx, cy), within extent (x0, y0, x1, y1)."""
+    x0, y0, x1, y1 = extent
+    if r == 0:
+        return [(cx, cy)]
+    cells = []
+    for y in (cy - r, cy + r):
+        if y0 <= y <= y1:
+            cells.extend((x, y) for x in range(max(cx - r, x0), min(cx + r, x1) + 1))
+    for x in (cx - r, cx + r):
+        if x0 <= x <= x1:
+            cells.extend((x, y) for y in range(max(cy - r + 1, y0), min(cy + r - 1, y1) + 1))
+    return cells
+
+
+def _convex_hull(points: List[Tuple[float, float]]) -> List[List[float]]:
+    """Monotone chain; closed ring, counter-clockwise."""
+    pts = sorted(set(points))
+    if len(pts) < 3:
+        return [list(p) for p in pts]
+
+    def cross(o: Tuple[float, float], a: Tuple[float, float], b: Tuple[float, float]) -> float:
+        return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+    lower: List[Tuple[float, float]] = []
+    for p in pts:
+        while len(lower) >= 2 and cross(lower[-2], lower[-1], p) <= 0:
+            lower.pop()
+        lower.append(p)
+    upper: List[Tuple[float, float]] = []
+    for p in reversed(pts):
+        while len(upper) >= 2 and cross(upper[-2], upper[-1], p) <= 0:
+            upper.pop()
+        upper.append(p)
+    ring = lower[:-1] + upper[:-1]
+    return [list(p) for p in ring + ring[:1]]
+
+
+# -----------------------------
+# Baseline vs modified
+# -----------------------------
+
+def _vertex_key(graph: RoadGraph, v: int) -> Tuple[Any, ...]:
+    node = graph.column("vertex_node")[v]
+    if node >= 0:
+        return ("n", node)
+    coords = graph.column("vertex_coords")
+    return ("c", round(coords[2 * v] * 1e7), round(coords[2 * v + 1] * 1e7))
+
+
+def _summary(times: List[float]) -> Dict[str, Any]:
+    finite = [t for t in times if t != INF]
+    return {
+        "reachable": len(finite),
+        "median_s": round(statistics.median(finite), 1) if finite else None,
+        "mean_s": round(statistics.fmean(finite), 1) if finite else None,
+    }
+
+
+def compare(
+    baseline_path: str,
+    modified_path: str,
+    modes: Sequence[str],
+    times: Sequence[str],
+    origins: int = 20,
+    destinations: int = 20,
+    seed: int = 1,
+) -> Dict[str, Any]:
+    """
+    Route one seeded OD sample per mode on both graphs at each time of day; summary per (mode, time).
+    Pairs whose origin is their destination are left out.
+    """
+    with RoadGraph(baseline_path) as base, RoadGraph(modified_path) as mod:
+        fences = {"baseline": graph_geofences(baseline_path, base), "modified": graph_geofences(modified_path, mod)}
+        mod_index: Optional[Dict[Tuple[Any, ...], int]] = None
+        results = []
+        for mode in modes:
+            if mode not in base.header["modes"] or mode not in mod.header["modes"]:
+                raise ValueError(f"unknown mode {mode!r}")
+            # One sample per mode from the baseline's vertices that have arcs of that mode
+            offsets = base.column(f"{mode}.offsets")
+            used = [v for v in range(base.vertices) if offsets[v + 1] > offsets[v]]
+            del offsets
+            rng = random.Random(f"{seed}:{mode}")
+            src = rng.sample(used, min(origins, len(used)))
+            dst = rng.sample(used, min(destinations, len(used)))
+            if mod_index is None:
+                mod_index = {_vertex_key(mod, v): v for v in range(mod.vertices)}
+            src_m = [mod_index.get(_vertex_key(base, v), -1) for v in src]
+            dst_m = [mod_index.get(_vertex_key(base, v), -1) for v in dst]
+
+            cache: Dict[Tuple[str, Optional[str]], List[List[float]]] = {}
+
+            def times_for(layer: str, graph: RoadGraph, at: str, s: List[int], t: List[int]) -> List[List[float]]:
+                restricted = mode in GEOFENCE_MODES and bool(fences[layer])
+                key = (layer, at if restricted else None)
+                if key not in cache:
+                    with metrics.section("matrix", layer=layer, mode=mode, at=key[1]) as m:
+                        router = Router(graph, mode, at=key[1], geofences=fences[layer])
+                        # Vertices missing from this layer's graph are unreachable
+                        ok_s = [v for v in s if v >= 0]
+                        ok_t = [v for v in t if v >= 0]
+                        rows = iter(router.matrix(ok_s, ok_t))
+                        full = []
+                        for v in s:
+                            row = iter(next(rows)) if v >= 0 else None
+                            full.append([next(row) if row is not None and w >= 0 else INF for w in t])
+                        cache[key] = full
+                        m.update(pairs=len(s) * len(t), closed_vertices=router.closed_vertices)
+                return cache[key]
+
+            # An origin drawn again as destination is no trip (0 s, always reachable)
+            distinct = [s != t for s in src for t in dst]
+            for at in times:
+                b = [x for row in times_for("baseline", base, at, src, dst) for x in row]
+                mo = [x for row in times_for("modified", mod, at, src_m, dst_m) for x in row]
+                b = [x for x, keep in zip(b, distinct) if keep]
+                mo = [x for x, keep in zip(mo, distinct) if keep]
+                both = [(x, y) for x, y in zip(b, mo) if x != INF and y != INF]
+                ratios = [y / x for x, y in both if x > 0]
+                results.append({
+                    "mode": mode,
+                    "actor": MODES[mode]["actor"],
+                    "at": at,
+                    "pairs": len(b),
+                    "baseline": _summary(b),
+                    "modified": _summary(mo),
+                    "slower_pairs": sum(1 for x, y in both if y > x + 1e-6),
+                    "faster_pairs": sum(1 for x, y in both if y < x - 1e-6),
+                    "lost_pairs": sum(1 for x, y in zip(b, mo) if x != INF and y == INF),
+                    "gained_pairs": sum(1 for x, y in zip(b, mo) if x == INF and y != INF),
+                    "median_ratio": round(statistics.median(ratios), 3) if ratios else None,
+                })
+    return {
+        "format": "citykit-routing-comparison",
+        "version": 1,
+        "baseline": os.path.basename(baseline_path),
+        "modified": os.path.basename(modified_path),
+        "seed": seed,
+        "origins": origins,
+        "destinations": destinations,
+        "geofences": {layer: [hours for _, hours in f] for layer, f in fences.items()},
+        "results": results,
+    }
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+
+def _lonlat(text: str) -> Tuple[float, float]:
+    lon, _, lat = text.partition(",")
+    return float(lon), float(lat)
+
+
+def _open_router(args: argparse.Namespace) -> Tuple[RoadGraph, Router]:
+    graph = RoadGraph(args.graph)
+    return graph, Router(graph, args.mode, at=args.at, geofences=graph_geofences(args.graph, graph),
+                         landmarks=getattr(args, "landmarks", 0))
+
+
+def cmd_route(args: argparse.Namespace) -> int:
+    graph, router = _open_router(args)
+    with graph:
+        s, t = router.nearest_vertex(*_lonlat(args.origin)), router.nearest_vertex(*_lonlat(args.to))
+        if s is None or t is None:
+            print(f"ERROR: no {args.mode} arcs in {args.graph}", file=sys.stderr)
+            return 1
+        r = router.route(s, t)
+        del router
+    if r is None:
+        print(f"✅ routing: no {args.mode} route from vertex {s} to {t}" + (f" at {args.at}" if args.at else ""))
+        return 0
+    print(f"✅ routing: {args.mode} {r['seconds']:.0f} s, {r['meters']:.0f} m, {len(r['vertices'])} vertices")
+    return 0
+
+
+def cmd_isochrone(args: argparse.Namespace) -> int:
+    budgets = [float(b) for b in args.budgets.split(",") if b.strip()]
+    graph, router = _open_router(args)
+    with graph:
+        s = router.nearest_vertex(*_lonlat(args.origin))
+        if s is None:
+            print(f"ERROR: no {args.mode} arcs in {args.graph}", file=sys.stderr)
+            return 1
+        isos = router.isochrone(s, budgets)
+        del router
+    for iso in isos:
+        print(f"✅ routing: {args.mode} {iso['budget_s']:.0f} s: {iso['vertices']} vertices, {iso['length_m']:.0f} m of street")
+    if args.out:
+        features = [{
+            "type": "Feature",
+            "geometry": {"type": "Polygon", "coordinates": [iso["hull"]]} if len(iso["hull"]) >= 4 else None,
+            "properties": {"feature_type": "isochrone", "mode": args.mode, "at": args.at, "budget_s": iso["budget_s"],
+                           "vertices": iso["vertices"], "length_m": round(iso["length_m"], 1)},
+        } for iso in isos]
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"type": "FeatureCollection", "features": features}, f, indent=2)
+            f.write("\n")
+    return 0
+
+
+def _fmt(value: Any, unit: str = "") -> str:
+    return "n/a" if value is None else f"{value}{unit}"
+
+
+def cmd_compare(args: argparse.Namespace) -> int:
+    if args.kit:
+        derived = os.path.join(args.kit, "derived")
+        baseline = args.baseline or graph_path(os.path.join(derived, "osm_baseline.geojson"))
+        modified = args.modified or graph_path(os.path.join(derived, "osm_modified.geojson"))
+        out = args.out or os.path.join(derived, "routing_comparison.json")
+    else:
+        baseline, modified, out = args.baseline, args.modified, args.out
+    if not baseline or not modified or not out:
+        print("ERROR: give --kit, or --baseline, --modified and --out", file=sys.stderr)
+        return 1
+    for path in (baseline, modified):
+        if not os.path.exists(path):
+            print(f"ERROR: missing {path}", file=sys.stderr)
+            return 1
+    modes = [m for m in args.modes.split(",") if m]
+    times = [t for t in args.at.split(",") if t]
+    report = compare(baseline, modified, modes, times, args.origins, args.destinations, args.seed)
+    tmp = out + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+        f.write("\n")
+    os.replace(tmp, out)
+    print(f"✅ routing: compared {args.origins}x{args.destinations} trips per mode -> {out}")
+    for r in report["results"]:
+        b, m = r["baseline"], r["modified"]
+        print(f"   {r['mode']:<6} {r['at']:>5}  reachable {b['reachable']:>4} -> {m['reachable']:<4} "
+              f"median {_fmt(b['median_s'], ' s')} -> {_fmt(m['median_s'], ' s')}  "
+              f"(ratio {_fmt(r['median_ratio'])}, {r['slower_pairs']} slower)")
+    return 0
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Shortest paths, matrices and isochrones on a citykit road graph")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("route", help="Fastest path between two points")
+    p.add_argument("graph")
+    p.add_argument("--from", dest="origin", required=True, metavar="LON,LAT")
+    p.add_argument("--to", required=True, metavar="LON,LAT")
+    p.add_argument("--landmarks", type=int, default=0, help="ALT landmarks to precompute (default: 0 = distance bound only)")
+
+    p = sub.add_parser("isochrone", help="Reachable area within travel-time budgets")
+    p.add_argument("graph")
+    p.add_argument("--from", dest="origin", required=True, metavar="LON,LAT")
+    p.add_argument("--budgets", default="300,600,900", help="Seconds, comma-separated")
+    p.add_argument("--out", default="", help="Write the hulls as GeoJSON")
+
+    for name in ("route", "isochrone"):
+        sp = sub.choices[name]
+        sp.add_argument("--mode", default="car", choices=list(MODES))
+        sp.add_argument("--at", default=None, metavar="HH:MM", help="Time of day for geofence allowed_hours")
+
+    p = sub.add_parser("compare", help="Travel times on the baseline vs the modified graph")
+    p.add_argument("--kit", default="", help="Kit directory (graphs in derived/)")
+    p.add_argument("--baseline", default="")
+    p.add_argument("--modified", default="")
+    p.add_argument("--out", default="")
+    p.add_argument("--modes", default=",".join(MODES))
+    p.add_argument("--at", default="08:00,23:00", help="Times of day, comma-separated")
+    p.add_argument("--origins", type=int, default=20)
+    p.add_argument("--destinations", type=int, default=20)
+    p.add_argument("--seed", type=int, default=1)
+
+    args = ap.parse_args()
+    try:
+        if args.at:
+            for t in args.at.split(","):
+                parse_clock(t)
+        return {"route": cmd_route, "isochrone": cmd_isochrone, "compare": cmd_compare}[args.cmd](args)
+    except (OSError, ValueError) as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(metrics.run_main("routing", main))
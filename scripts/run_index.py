@@ -0,0 +1,528 @@
+#!/usr/bin/env python3
+"""
+run_index.py — SQLite index of demo kit runs (stdlib-only)
+
+Each artifacts/<RUN_ID>/city_demo_kit.zip is summarised once into
+artifacts/index.sqlite: the fields inspect_latest.sh / compare.sh print (schema,
+AOI, feature/actor counts, delta ops, viewer mode, ...) and the offset of every
+zip member, so queries never parse zips and single members can be read without
+the central directory. pipeline.py records each run as it is packed; runs that
+are missing from the index (or whose zip changed size/mtime) are indexed lazily
+the first time a query touches them, and rows for deleted zips are dropped.
+
+Feature counts come from the .ckcol sidecar headers (a few KB each) when the
+sidecar belongs to the GeoJSON next to it; the GeoJSON is only parsed otherwise.
+
+Usage:
+  python3 scripts/run_index.py list [--limit N]
+  python3 scripts/run_index.py compare [RUN_ID ...] [--last N]
+  python3 scripts/run_index.py inspect [RUN_ID] [--verify]     (default: latest run)
+  python3 scripts/run_index.py cat RUN_ID MEMBER               (e.g. scenario.json)
+  python3 scripts/run_index.py rebuild
+Options: --db PATH (default: artifacts/index.sqlite), --artifacts DIR (default: artifacts)
+
+Exit codes: 0 ok, 2 no runs / unknown run, 3 kit misses required files, 4 SHA256SUMS mismatch
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import struct
+import sys
+import time
+import zipfile
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+ARTIFACTS_DIR = ROOT_DIR / "artifacts"
+ZIP_NAME = "city_demo_kit.zip"
+TOP = "city_demo_kit/"
+SCHEMA_VERSION = 2
+
+REQUIRED_FILES = ["scenario.json", "dataset_manifest.json", "map.geojson", "kpi_report.md", "actors.json"]
+REQUIRED_DIRS = ["pcd_groundtruth/", "pcd_pseudo/", "labels/", "multiview/"]
+CAMERAS = ["robot_front", "cyclist_pov", "birds_eye"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+  run_id TEXT PRIMARY KEY,
+  zip_path TEXT NOT NULL,
+  zip_bytes INTEGER NOT NULL,
+  zip_mtime_ns INTEGER NOT NULL,
+  indexed_at_utc TEXT NOT NULL,
+  created_at_utc TEXT,
+  osm_online INTEGER,
+  delta_present INTEGER,
+  map_features INTEGER,
+  actor_count INTEGER,
+  baseline_features INTEGER,
+  modified_features INTEGER,
+  delta_ops INTEGER,
+  viewer_mode TEXT,
+  summary TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS members (
+  run_id TEXT NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+  name TEXT NOT NULL,
+  data_offset INTEGER NOT NULL,
+  compress_size INTEGER NOT NULL,
+  file_size INTEGER NOT NULL,
+  method INTEGER NOT NULL,
+  crc INTEGER NOT NULL,
+  PRIMARY KEY (run_id, name)
+);
+"""
+
+
+def connect(db_path: Path) -> sqlite3.Connection:
+    """Open (creating if needed) the index; an index from another schema version is rebuilt."""
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(str(db_path), timeout=30)
+    con.execute("PRAGMA foreign_keys = ON")
+    if con.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+        con.executescript("DROP TABLE IF EXISTS members; DROP TABLE IF EXISTS runs;")
+        con.executescript(SCHEMA)
+        con.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        con.commit()
+    return con
+
+
+# -----------------------------
+# Summaries (one pass over the zip, at index time)
+# -----------------------------
+
+def _json_member(z: zipfile.ZipFile, name: str) -> Any:
+    try:
+        return json.loads(z.read(TOP + name))
+    except (KeyError, ValueError):
+        return None
+
+
+def _sidecar_header(z: zipfile.ZipFile, name: str) -> Optional[Dict[str, Any]]:
+    """Header JSON of a .ckcol member (decompresses only the header bytes)."""
+    try:
+        with z.open(TOP + name) as f:
+            head = f.read(16)
+            if len(head) < 16 or head[:6] != b"CKCOL\x00":
+                return None
+            (header_len,) = struct.unpack("<Q", head[8:16])
+            return json.loads(f.read(header_len).decode("utf-8"))
+    except (KeyError, ValueError, zipfile.BadZipFile):
+        return None
+
+
+def _layer_summary(z: zipfile.ZipFile, names: set, layer: str, sums: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    """Feature count + top-level metadata of derived/<layer>.geojson, from its sidecar when current."""
+    geojson = f"derived/{layer}.geojson"
+    if TOP + geojson not in names:
+        return None
+    header = _sidecar_header(z, f"derived/{layer}.ckcol") if TOP + f"derived/{layer}.ckcol" in names else None
+    source = (header or {}).get("source") or {}
+    current = (
+        header is not None
+        and source.get("bytes") == z.getinfo(TOP + geojson).file_size
+        and (geojson not in sums or source.get("sha256") == sums[geojson])
+    )
+    if current:
+        meta = dict(header.get("collection") or {})
+        meta["features"] = header["count"]
+        return meta
+    data = _json_member(z, geojson) or {}
+    meta = {k: v for k, v in data.items() if k not in ("type", "features")}
+    features = data.get("features")
+    meta["features"] = len(features) if isinstance(features, list) else 0
+    return meta
+
+
+def summarize(zip_path: Path) -> Tuple[Dict[str, Any], List[Tuple[str, int, int, int, int, int]]]:
+    """(summary, members) for one kit zip; members are (name, data_offset, csize, size, method, crc)."""
+    members = []
+    with zipfile.ZipFile(zip_path) as z, open(zip_path, "rb") as raw:
+        infos = z.infolist()
+        names = {i.filename for i in infos}
+        for info in infos:
+            raw.seek(info.header_offset)
+            local = raw.read(30)
+            name_len, extra_len = struct.unpack("<HH", local[26:30])
+            data_offset = info.header_offset + 30 + name_len + extra_len
+            members.append((info.filename, data_offset, info.compress_size, info.file_size, info.compress_type, info.CRC))
+
+        sums: Dict[str, str] = {}
+        if TOP + "SHA256SUMS" in names:
+            for line in z.read(TOP + "SHA256SUMS").decode("utf-8").splitlines():
+                digest, _, rel = line.partition("  ")
+                sums[rel] = digest
+
+        scenario = _json_member(z, "scenario.json") or {}
+        manifest = _json_member(z, "dataset_manifest.json") or {}
+        geo = _json_member(z, "map.geojson") or {}
+        actors = _json_member(z, "actors.json") or {}
+        delta_spec = _json_member(z, "scenario_delta.json") or {}
+
+        actor_list = actors.get("actors", []) if isinstance(actors, dict) else []
+        actor_list = [a for a in actor_list if isinstance(a, dict)] if isinstance(actor_list, list) else []
+        features = geo.get("features", [])
+        zone = scenario.get("zone", {}) or {}
+
+        baseline = _layer_summary(z, names, "osm_baseline", sums)
+        modified = _layer_summary(z, names, "osm_modified", sums)
+
+        viewer: Optional[Dict[str, Any]] = None
+        if TOP + "viz/overview.html" in names:
+            viewer = {"embedded": "unknown", "mode": "unknown"}
+            try:
+                html = z.read(TOP + "viz/overview.html").decode("utf-8", errors="ignore")
+                viewer["embedded"] = "true" if "__BASELINE_GEOJSON" in html else "false"
+                if 'const VIEWER_MODE = "' in html:
+                    viewer["mode"] = html.split('const VIEWER_MODE = "', 1)[1].split('"', 1)[0]
+            except Exception:
+                pass
+            viewer["tiles"] = sum(1 for n in names if n.startswith(TOP + "viz/tiles/") and n.endswith(".js"))
+
+    ops = delta_spec.get("ops", []) if isinstance(delta_spec, dict) else []
+    # actors.json entries are single stub actors or, after a simulation, fleets with a "count"
+    counts: Dict[str, int] = {}
+    for a in actor_list:
+        kind, n = str(a.get("type", "?")), a.get("count", 1)
+        counts[kind] = counts.get(kind, 0) + (n if isinstance(n, int) else 1)
+    summary = {
+        "run_id": scenario.get("run_id", zip_path.parent.name),
+        "schema_version": scenario.get("schema_version"),
+        "map_mode": zone.get("map_mode"),
+        "osm_online": bool(zone.get("osm_baseline_enabled")),
+        "aoi": scenario.get("aoi"),
+        "delta_present": scenario.get("delta_present"),
+        "cameras": scenario.get("cameras", []) or [],
+        "map_features": len(features) if isinstance(features, list) else 0,
+        "actor_count": sum(counts.values()),
+        "actor_types": sorted(counts),
+        "actor_counts": counts,
+        "baseline": baseline,
+        "modified": None if modified is None else {
+            "features": modified["features"],
+            "delta_ops_count": modified.get("delta_ops_count", 0),
+            "applied_ops": [op.get("op", "?") for op in modified.get("applied_ops", []) or []],
+        },
+        "scenario_delta_ops": [op.get("op", "?") for op in ops if isinstance(op, dict)] if isinstance(ops, list) else [],
+        "viewer": viewer,
+        "multiview": sorted(n[len(TOP):] for n in names if n.startswith(TOP + "multiview/") and not n.endswith("/")),
+        "dataset_id": manifest.get("dataset_id"),
+        "created_at_utc": manifest.get("created_at_utc"),
+        "stage_cache_hits": ((manifest.get("stage_cache") or {}).get("hits")) or [],
+        "entries": len(members),
+        "checksums": len(sums),
+    }
+    if summary["baseline"] is not None:
+        summary["baseline"] = {"features": baseline["features"]}
+    return summary, members
+
+
+def record(con: sqlite3.Connection, zip_path: Path) -> Dict[str, Any]:
+    """(Re)index one run; returns its summary."""
+    st = zip_path.stat()
+    summary, members = summarize(zip_path)
+    run_id = zip_path.parent.name
+    modified = summary["modified"] or {}
+    with con:
+        con.execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+        con.execute(
+            "INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                run_id, str(zip_path), st.st_size, st.st_mtime_ns,
+                time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                summary["created_at_utc"], int(summary["osm_online"]),
+                None if summary["delta_present"] is None else int(summary["delta_present"]),
+                summary["map_features"], summary["actor_count"],
+                (summary["baseline"] or {}).get("features"), modified.get("features"), modified.get("delta_ops_count"),
+                (summary["viewer"] or {}).get("mode"), json.dumps(summary, sort_keys=True),
+            ),
+        )
+        con.executemany("INSERT INTO members VALUES (?, ?, ?, ?, ?, ?, ?)", [(run_id, *m) for m in members])
+    return summary
+
+
+def ensure(con: sqlite3.Connection, artifacts: Path, run_ids: Optional[List[str]] = None) -> List[str]:
+    """
+    Bring the index up to date for run_ids (default: every run under artifacts/) by
+    stat()ing zips; returns the indexed run ids (sorted) among those requested.
+    """
+    known = {r[0]: (r[1], r[2]) for r in con.execute("SELECT run_id, zip_bytes, zip_mtime_ns FROM runs")}
+    if run_ids is None:
+        candidates = sorted(p.parent.name for p in artifacts.glob(f"*/{ZIP_NAME}"))
+        for gone in set(known) - set(candidates):
+            with con:
+                con.execute("DELETE FROM runs WHERE run_id = ?", (gone,))
+    else:
+        candidates = run_ids
+    present = []
+    for run_id in candidates:
+        zip_path = artifacts / run_id / ZIP_NAME
+        try:
+            st = zip_path.stat()
+        except OSError:
+            if run_id in known:
+                with con:
+                    con.execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+            continue
+        if known.get(run_id) != (st.st_size, st.st_mtime_ns):
+            try:
+                record(con, zip_path)
+            except (zipfile.BadZipFile, OSError) as e:
+                print(f"WARN: cannot index {zip_path}: {e}", file=sys.stderr)
+                continue
+        present.append(run_id)
+    return sorted(present)
+
+
+def summary_of(con: sqlite3.Connection, run_id: str) -> Optional[Dict[str, Any]]:
+    row = con.execute("SELECT summary, zip_path, zip_bytes FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+    if row is None:
+        return None
+    summary = json.loads(row[0])
+    summary["zip_path"], summary["zip_bytes"] = row[1], row[2]
+    return summary
+
+
+def read_member(con: sqlite3.Connection, run_id: str, name: str) -> bytes:
+    """One kit member by name, read at its recorded offset (no central directory parse)."""
+    row = con.execute(
+        "SELECT r.zip_path, m.data_offset, m.compress_size, m.file_size, m.method, m.crc "
+        "FROM members m JOIN runs r USING (run_id) WHERE m.run_id = ? AND m.name = ?",
+        (run_id, TOP + name),
+    ).fetchone()
+    if row is None:
+        raise KeyError(name)
+    zip_path, offset, csize, size, method, crc = row
+    with open(zip_path, "rb") as f:
+        f.seek(offset)
+        data = f.read(csize)
+    if method == zipfile.ZIP_DEFLATED:
+        data = zlib.decompress(data, -15)
+    elif method != zipfile.ZIP_STORED:
+        raise ValueError(f"{name}: unsupported compression method {method}")
+    if len(data) != size or zlib.crc32(data) != crc:
+        raise ValueError(f"{name}: CRC mismatch (zip changed since it was indexed?)")
+    return data
+
+
+# -----------------------------
+# Commands
+# -----------------------------
+
+def _fmt(v: Any) -> str:
+    return "-" if v is None else str(v)
+
+
+def cmd_list(con: sqlite3.Connection, args: argparse.Namespace) -> int:
+    run_ids = ensure(con, args.artifacts)
+    if not run_ids:
+        print(f"❌ No demo kit found at {args.artifacts}/*/{ZIP_NAME}")
+        return 2
+    rows = con.execute(
+        "SELECT run_id, created_at_utc, osm_online, baseline_features, modified_features, viewer_mode, zip_bytes "
+        "FROM runs ORDER BY run_id DESC LIMIT ?", (args.limit,),
+    ).fetchall()
+    print(f"{'run_id':<34}{'created_at_utc':<22}{'osm':<5}{'baseline':>9}{'modified':>9}  {'viewer':<9}{'zip MB':>8}")
+    for run_id, created, osm, base, mod, viewer, size in rows:
+        print(f"{run_id:<34}{_fmt(created):<22}{'yes' if osm else 'no':<5}{_fmt(base):>9}{_fmt(mod):>9}  {_fmt(viewer):<9}{size / 1e6:>8.2f}")
+    print(f"({len(rows)} of {len(run_ids)} runs)")
+    return 0
+
+
+def cmd_compare(con: sqlite3.Connection, args: argparse.Namespace) -> int:
+    if args.runs:
+        run_ids = args.runs
+        indexed = set(ensure(con, args.artifacts, run_ids))
+    else:
+        run_ids = ensure(con, args.artifacts)[-args.last:]
+        indexed = set(run_ids)
+    if not run_ids:
+        print(f"❌ No demo kit found at {args.artifacts}/*/{ZIP_NAME}")
+        return 2
+    print("✅ CityKit Compare Summary")
+    print("-------------------------")
+    cols = ["osm", "map", "baseline", "modified", "delta ops", "actors", "viewer", "cache hits", "zip MB"]
+    print(f"{'run_id':<34}" + "".join(f"{c:>11}" for c in cols))
+    for run_id in run_ids:
+        if run_id not in indexed:
+            print(f"{run_id:<34} ERROR: zip missing")
+            continue
+        s = summary_of(con, run_id)
+        modified = s["modified"] or {}
+        values = [
+            "yes" if s["osm_online"] else "no",
+            s["map_features"],
+            (s["baseline"] or {}).get("features"),
+            modified.get("features"),
+            modified.get("delta_ops_count"),
+            s["actor_count"],
+            (s["viewer"] or {}).get("mode"),
+            len(s["stage_cache_hits"]),
+            f"{s['zip_bytes'] / 1e6:.2f}",
+        ]
+        print(f"{run_id:<34}" + "".join(f"{_fmt(v):>11}" for v in values))
+    return 0
+
+
+def _verify_checksums(con: sqlite3.Connection, run_id: str) -> Tuple[int, List[str]]:
+    bad = []
+    lines = read_member(con, run_id, "SHA256SUMS").decode("utf-8").splitlines()
+    for line in lines:
+        digest, _, rel = line.partition("  ")
+        try:
+            ok = hashlib.sha256(read_member(con, run_id, rel)).hexdigest() == digest
+        except (KeyError, ValueError):
+            ok = False
+        if not ok:
+            bad.append(rel)
+    return len(lines), bad
+
+
+def cmd_inspect(con: sqlite3.Connection, args: argparse.Namespace) -> int:
+    """Same report as the original inspect_latest.sh, from the index."""
+    if args.run:
+        run_ids = ensure(con, args.artifacts, [args.run])
+    else:
+        run_ids = ensure(con, args.artifacts)[-1:]
+    if not run_ids:
+        print(f"❌ No demo kit found at artifacts/*/{ZIP_NAME}")
+        print("Run: make demo")
+        return 2
+    run_id = run_ids[-1]
+    s = summary_of(con, run_id)
+    names = {r[0][len(TOP):] for r in con.execute("SELECT name FROM members WHERE run_id = ?", (run_id,))}
+    print(f"📦 Inspecting: {os.path.relpath(s['zip_path'])}")
+
+    missing = [f"city_demo_kit/{p}" for p in REQUIRED_FILES if p not in names]
+    missing += [f"city_demo_kit/{d}" for d in REQUIRED_DIRS if d not in names and not any(n.startswith(d) for n in names)]
+    missing += [
+        f"multiview/{cam} (mp4 or mp4.txt)" for cam in CAMERAS
+        if f"multiview/{cam}.mp4" not in names and f"multiview/{cam}.mp4.txt" not in names
+    ]
+    if missing:
+        print("❌ Missing required files/dirs:")
+        for m in missing:
+            print(f" - {m}")
+        return 3
+
+    print(f"✅ scenario.schema_version: {s['schema_version'] or '(missing)'}")
+    print(f"✅ scenario.run_id: {s['run_id']}")
+    print(f"🗺️ scenario.map_mode: {s['map_mode'] or '(missing)'}")
+    aoi = s["aoi"]
+    if aoi:
+        aoi_type = aoi.get("type", "?")
+        if aoi_type == "bbox":
+            print(
+                f"🧭 scenario.aoi: bbox ({aoi.get('min_lon', '?')}, {aoi.get('min_lat', '?')}) → "
+                f"({aoi.get('max_lon', '?')}, {aoi.get('max_lat', '?')})"
+            )
+        elif aoi_type == "polygon":
+            print(f"🧭 scenario.aoi: polygon ({len(aoi.get('coordinates') or [])} rings)")
+        else:
+            print(f"🧭 scenario.aoi: {aoi_type}")
+    if s["delta_present"] is not None:
+        print(f"📋 scenario.delta_present: {'✅ present' if s['delta_present'] else '❌ absent'}")
+
+    print("🎥 Cameras:")
+    for c in s["cameras"]:
+        print(f" - {c.get('id', '?')} ({c.get('type', '?')})")
+    if not s["cameras"]:
+        print(" - (none)")
+    print(f"🗺️ map.geojson features: {s['map_features']}")
+    print(f"🧍 actors.json actors: {s['actor_count']}")
+    counts = s.get("actor_counts") or {}
+    print(f"🧩 actor types: {', '.join(f'{t} ({counts[t]})' if t in counts else t for t in s['actor_types']) or '(none)'}")
+
+    if s["baseline"] is not None:
+        print(f"🌍 osm_baseline.geojson features: {s['baseline']['features']}")
+    if s["modified"] is not None:
+        m = s["modified"]
+        print(f"✏️ osm_modified.geojson features: {m['features']} (delta ops: {m['delta_ops_count']})")
+        if m["applied_ops"]:
+            print(f"   ops applied: {', '.join(m['applied_ops'])}")
+    if s["scenario_delta_ops"]:
+        print(f"📝 scenario_delta.json ops: {len(s['scenario_delta_ops'])}")
+        print(f"   ops defined: {', '.join(s['scenario_delta_ops'])}")
+
+    viewer = s["viewer"]
+    if viewer is not None:
+        print(f"🗺️ viewer: present (embedded={viewer['embedded']}, mode={viewer['mode']})")
+        if viewer["mode"] == "tiled":
+            print(f"   tiles: {viewer['tiles']} files under viz/tiles/")
+    else:
+        print("🗺️ viewer: (absent)")
+
+    print("📁 multiview contents:")
+    for n in s["multiview"]:
+        print(f" - {n}")
+
+    if args.verify and "SHA256SUMS" in names:
+        count, bad = _verify_checksums(con, run_id)
+        if bad:
+            print(f"❌ SHA256SUMS mismatch: {', '.join(bad)}")
+            return 4
+        print(f"🔐 SHA256SUMS: {count} files verified")
+
+    print(f"🧾 manifest.dataset_id: {s['dataset_id'] or '(missing)'}")
+    print(f"🕒 manifest.created_at: {s['created_at_utc'] or '(missing)'}")
+    print("✅ Inspect OK")
+    return 0
+
+
+def cmd_cat(con: sqlite3.Connection, args: argparse.Namespace) -> int:
+    if not ensure(con, args.artifacts, [args.run]):
+        print(f"ERROR: no kit for run {args.run}", file=sys.stderr)
+        return 2
+    try:
+        data = read_member(con, args.run, args.member)
+    except KeyError:
+        print(f"ERROR: {args.member} not in run {args.run}", file=sys.stderr)
+        return 2
+    sys.stdout.buffer.write(data)
+    return 0
+
+
+def cmd_rebuild(con: sqlite3.Connection, args: argparse.Namespace) -> int:
+    with con:
+        con.execute("DELETE FROM runs")
+    t0 = time.perf_counter()
+    run_ids = ensure(con, args.artifacts)
+    print(f"✅ run_index: indexed {len(run_ids)} runs in {time.perf_counter() - t0:.2f}s")
+    return 0
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Query the demo kit run index")
+    ap.add_argument("--db", default="", help="Index path (default: <artifacts>/index.sqlite)")
+    ap.add_argument("--artifacts", default=str(ARTIFACTS_DIR), help="Artifacts directory")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("list", help="Most recent runs")
+    p.add_argument("--limit", type=int, default=20)
+    p = sub.add_parser("compare", help="Side-by-side summary of runs")
+    p.add_argument("runs", nargs="*", help="Run ids (default: the last --last runs)")
+    p.add_argument("--last", type=int, default=2)
+    p = sub.add_parser("inspect", help="Full report for one run (default: latest)")
+    p.add_argument("run", nargs="?", default="")
+    p.add_argument("--verify", action="store_true", help="Check SHA256SUMS (decompresses the kit)")
+    p = sub.add_parser("cat", help="Print one member of a run's kit")
+    p.add_argument("run")
+    p.add_argument("member", help="Path inside city_demo_kit/, e.g. scenario.json")
+    sub.add_parser("rebuild", help="Re-index every run")
+    args = ap.parse_args()
+
+    args.artifacts = Path(args.artifacts)
+    con = connect(Path(args.db) if args.db else args.artifacts / "index.sqlite")
+    try:
+        return {"list": cmd_list, "compare": cmd_compare, "inspect": cmd_inspect, "cat": cmd_cat, "rebuild": cmd_rebuild}[args.cmd](con, args)
+    finally:
+        con.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,787 @@
+#!/usr/bin/env python3
+"""
+simulate.py — Time-stepped actor simulation on the corridor's road graph (NumPy optional)
+
+Actors (the actors.json types; each moves on one road_graph.py mode) depart
+at seeded times over the simulated period and follow their fastest route
+(routing.py, geofences evaluated at the departure's time of day) along the
+street geometry. A share of the car and delivery_robot trips are deliveries:
+they stop on a street of their mode inside a curb_zone overlay (the point of
+it nearest the zone's centroid, reached along the edge from its nearer
+open end) and dwell there. Only when no such street crosses the zone do they
+stop at the vertex nearest its centroid; header["curb_zones"][i]["stops"]
+records which, per mode.
+Pedestrians wait to cross the car streets: at each vertex of their route
+where three or more car streets meet (not at its ends) they stand for a
+seeded uniform 0..--crossing-wait seconds, on the edge they continue along,
+before walking on.
+Trips are local: the destination is the vertex nearest a random point within
+TRIP_MINUTES of straight-line travel at the mode's residential speed.
+
+State is struct-of-arrays. Planning flattens every route into one set of
+point columns (lon, lat, time, edge, speed of the segment that starts
+there) with per-actor offsets; a dwell is one more point at the same spot.
+Each step only the active actors are touched: their current point is found
+and the position interpolated between it and the next one, as whole-array
+NumPy operations (one searchsorted over all points keyed by actor and time),
+or as one loop advancing each actor's point pointer without NumPy.
+Trajectory rows are buffered and written every --chunk-steps steps.
+
+Output (--out, default KIT/derived/sim; the container of columnar.py):
+  actors.cksim          magic b"CKSIMA", one row per simulated actor
+    actor_type      int8     code into header["actor_types"]
+    delivery        int8     1 = ends at a curb zone
+    zone            int16    curb zone index (header["curb_zones"]: centroid, rings, zone_type, hours, stops), -1 = none
+    origin/destination int32 graph vertices (a delivery's destination is the vertex its last, partial edge starts at)
+    depart_s/arrive_s/end_s float64  seconds after the start (end = arrival + dwell)
+    route_m         float64  route length
+    point_offsets   int64    per actor + 1, into the point columns
+    point_lon/lat   float64  route geometry
+    point_t         float64  scheduled time at the point
+    point_edge      int32    graph edge of the segment starting at the point (its speed 0 while waiting to
+                             cross), -1 = dwell / last
+  traj-NNNNN.cktraj     magic b"CKTRAJ", one row per active actor per step
+    step int32, actor int32, lon/lat float64, speed_ms float32, edge int32
+  sim.json              parameters, counts per actor type and the chunk list
+
+Usage:
+  python3 scripts/simulate.py --kit KIT_DIR [--actors 10000] [--duration 3600] [--dt 1] [--start 08:00]
+      [--mix pedestrian=0.4,cyclist=0.25,car=0.25,delivery_robot=0.1] [--delivery-share 0.5]
+      [--dwell 300] [--crossing-wait 30] [--chunk-steps 300] [--landmarks 4] [--seed 1] [--out KIT_DIR/derived/sim]
+  (or --graph G --out DIR)
+
+Environment:
+  SIMULATE_NUMPY (default: 1) — 0 steps with the pure-Python loop even when NumPy is installed
+  CITYKIT_PROFILE (default: unset) — 1 records plan/step metrics (see metrics.py)
+
+Exit codes:
+  0 = success
+  1 = input error
+"""
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import glob
+import json
+import math
+import os
+import random
+import sys
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import metrics
+from columnar import SectionReader, write_sections
+from geodesy import distance_m, meters_to_degrees, segment_lengths
+from road_graph import MODES, RoadGraph, default_speed_kph, graph_path, iter_ways
+from routing import GEOFENCE_MODES, INF, Overlay, Router, graph_geofences, hours_allow, load_overlays, parse_clock
+from spatial_index import _point_in_rings
+
+try:
+    import numpy as np
+except ImportError:  # pure-Python fallback
+    np = None  # type: ignore[assignment]
+
+USE_NUMPY = np is not None and os.environ.get("SIMULATE_NUMPY", "1") != "0"
+
+ACTORS_MAGIC = b"CKSIMA"
+TRAJ_MAGIC = b"CKTRAJ"
+VERSION = 1
+ACTOR_MODES = {spec["actor"]: mode for mode, spec in MODES.items()}  # actors.json type -> graph mode
+DELIVERY_TYPES = ("car", "delivery_robot")
+DEFAULT_MIX = "pedestrian=0.4,cyclist=0.25,car=0.25,delivery_robot=0.1"
+TRIP_MINUTES = 15
+CROSSING_WAIT_S = 30.0
+MAX_TRIES = 8
+
+Columns = Dict[str, array]
+
+
+def parse_mix(text: str) -> List[Tuple[str, float]]:
+    """'car=0.3,pedestrian=0.7' -> [(actor type, weight)]."""
+    mix = []
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ACTOR_MODES:
+            raise ValueError(f"unknown actor type {name!r} (one of {', '.join(ACTOR_MODES)})")
+        mix.append((name, float(weight or 1)))
+    if not mix or sum(w for _, w in mix) <= 0:
+        raise ValueError(f"empty actor mix {text!r}")
+    return mix
+
+
+def _clock(minute: float) -> str:
+    m = int(minute) % (24 * 60)
+    return f"{m // 60:02d}:{m % 60:02d}"
+
+
+def _centroid(rings: Sequence[Sequence[Tuple[float, float]]]) -> Tuple[float, float]:
+    ring = rings[0][:-1] if len(rings[0]) > 1 and rings[0][0] == rings[0][-1] else rings[0]
+    return sum(x for x, _ in ring) / len(ring), sum(y for _, y in ring) / len(ring)
+
+
+def _segment_in_rings(
+    a: Tuple[float, float], b: Tuple[float, float], rings: Sequence[Sequence[Tuple[float, float]]],
+    c: Tuple[float, float], scale: Tuple[float, float],
+) -> Optional[Tuple[float, float]]:
+    """(squared metres to c, t) of the point a + t (b - a) inside rings nearest c, or None when the segment stays outside."""
+    (ax, ay), (bx, by) = a, b
+    dx, dy = bx - ax, by - ay
+    cuts = {0.0, 1.0}
+    for ring in rings:
+        for (px, py), (qx, qy) in zip(ring, ring[1:]):
+            denom = dx * (qy - py) - dy * (qx - px)
+            if denom == 0:
+                continue
+            t = ((px - ax) * (qy - py) - (py - ay) * (qx - px)) / denom
+            u = ((px - ax) * dy - (py - ay) * dx) / denom
+            if 0.0 < t < 1.0 and 0.0 <= u <= 1.0:
+                cuts.add(t)
+    mx, my = scale
+    ex, ey = dx * mx, dy * my
+    length2 = ex * ex + ey * ey
+    best: Optional[Tuple[float, float]] = None
+    ts = sorted(cuts)
+    for t0, t1 in zip(ts, ts[1:]):
+        mid = 0.5 * (t0 + t1)
+        if t1 - t0 < 1e-12 or not _point_in_rings(ax + mid * dx, ay + mid * dy, rings):
+            continue
+        # Nearest to c within the inside stretch, kept off its ends (the ring itself)
+        t = ((c[0] - ax) * mx * ex + (c[1] - ay) * my * ey) / length2 if length2 > 0 else mid
+        inset = 1e-3 * (t1 - t0)
+        t = min(max(t, t0 + inset), t1 - inset)
+        ox, oy = (ax + t * dx - c[0]) * mx, (ay + t * dy - c[1]) * my
+        if best is None or ox * ox + oy * oy < best[0]:
+            best = (ox * ox + oy * oy, t)
+    return best
+
+
+# -----------------------------
+# Planning
+# -----------------------------
+
+class _Planner:
+    """Routes and expands trips on one graph into the flat actor / point columns."""
+
+    def __init__(self, graph: RoadGraph, path: str, start: str, landmarks: int) -> None:
+        self.graph = graph
+        self.start_minute = parse_clock(start)
+        self.landmarks = landmarks
+        self.fences = graph_geofences(path, graph)
+        source = os.path.join(os.path.dirname(path), (graph.header.get("source") or {}).get("path") or "")
+        self.zones: List[Overlay] = load_overlays(source, "curb_zone", ("zone_type", "hours")) if os.path.isfile(source) else []
+        self.ways: Dict[int, List[float]] = {way[0]: way[5] for way in iter_ways(source)} if os.path.isfile(source) else {}
+        self.routers: Dict[Tuple[str, Tuple[int, ...]], Router] = {}
+        self.used: Dict[str, List[int]] = {}
+        self.zone_stops: Dict[Tuple[str, int], Optional[Dict[str, Any]]] = {}
+        self.shapes: Dict[int, Tuple[List[float], List[float], array]] = {}
+        self._crossings: Optional[bytearray] = None
+        coords = graph.column("vertex_coords")
+        xs, ys = coords[0::2], coords[1::2]
+        self.extent = (min(xs), min(ys), max(xs), max(ys)) if len(xs) else (0.0, 0.0, 0.0, 0.0)
+        del coords, xs, ys
+
+    def router(self, mode: str, depart_s: float) -> Router:
+        minute = self.start_minute + depart_s / 60.0
+        shut: Tuple[int, ...] = ()
+        if mode in GEOFENCE_MODES:
+            shut = tuple(i for i, (_, hours) in enumerate(self.fences) if not hours_allow(hours, int(minute) % (24 * 60)))
+        key = (mode, shut)
+        router = self.routers.get(key)
+        if router is None:
+            with metrics.section("router", mode=mode, at=_clock(minute) if shut else None) as m:
+                router = self.routers[key] = Router(
+                    self.graph, mode, at=_clock(minute) if shut else None, geofences=self.fences, landmarks=self.landmarks,
+                )
+                m.update(closed_vertices=router.closed_vertices)
+        if mode not in self.used:
+            self.used[mode] = [v for v in range(router.n) if router.offsets[v + 1] > router.offsets[v]]
+        return router
+
+    def points(self, e: int) -> List[float]:
+        """Edge e's points (flat lon, lat, way direction)."""
+        g = self.graph
+        flat = self.ways.get(g.column("edge_feature")[e])
+        first, last = g.column("edge_first")[e], g.column("edge_last")[e]
+        if flat is None or 2 * last + 2 > len(flat):
+            # No way geometry (source GeoJSON missing): straight between the vertices
+            return [*g.vertex_coord(g.column("edge_from")[e]), *g.vertex_coord(g.column("edge_to")[e])]
+        return flat[2 * first : 2 * last + 2]
+
+    def crossings(self) -> bytearray:
+        """1 per vertex where three or more car streets meet: a pedestrian passing it crosses one."""
+        if self._crossings is None:
+            g = self.graph
+            degree = array("i", bytes(4 * g.vertices))
+            if "car" in g.modes:
+                efrom, eto = g.column("edge_from"), g.column("edge_to")
+                for e in set(g.adjacency("car")[2]):
+                    degree[efrom[e]] += 1
+                    degree[eto[e]] += 1
+            self._crossings = bytearray(d >= 3 for d in degree)
+        return self._crossings
+
+    def shape(self, e: int) -> Tuple[List[float], List[float], array]:
+        """Edge e's points (flat, way direction), cumulative share of its length per point, segment lengths."""
+        cached = self.shapes.get(e)
+        if cached is not None:
+            return cached
+        pts = self.points(e)
+        seg = segment_lengths(pts)
+        total = sum(seg)
+        share = [0.0]
+        acc = 0.0
+        for d in seg:
+            acc += d
+            share.append(acc / total if total > 0 else len(share) / len(seg))
+        self.shapes[e] = (pts, share, seg)
+        return self.shapes[e]
+
+    def zone_stop(self, mode: str, router: Router, zone: int) -> Optional[Dict[str, Any]]:
+        """
+        Where mode's deliveries to curb zone `zone` dwell: the point inside the zone nearest its
+        centroid on an edge with mode arcs ({"edge", "share" along the way, "lon", "lat"}), else the
+        vertex nearest the centroid ({"vertex", "lon", "lat"}); "in_zone" tells which. None without arcs.
+        """
+        key = (mode, zone)
+        if key in self.zone_stops:
+            return self.zone_stops[key]
+        rings = self.zones[zone][0]
+        c = _centroid(rings)
+        xs = [x for ring in rings for x, _ in ring]
+        ys = [y for ring in rings for _, y in ring]
+        dlon, dlat = meters_to_degrees(c[1], 1.0)
+        best: Optional[Tuple[float, int, int, float]] = None  # (squared metres, edge, segment, t)
+        for e in sorted(set(router.edges)):
+            pts = self.points(e)
+            ex, ey = pts[0::2], pts[1::2]
+            if max(ex) < min(xs) or min(ex) > max(xs) or max(ey) < min(ys) or min(ey) > max(ys):
+                continue
+            for k in range(len(ex) - 1):
+                found = _segment_in_rings((ex[k], ey[k]), (ex[k + 1], ey[k + 1]), rings, c, (1 / dlon, 1 / dlat))
+                if found is not None and (best is None or found[0] < best[0]):
+                    best = (found[0], e, k, found[1])
+        stop: Optional[Dict[str, Any]] = None
+        if best is not None:
+            _, e, k, t = best
+            pts, share, _ = self.shape(e)
+            stop = {
+                "in_zone": True, "edge": e, "share": share[k] + t * (share[k + 1] - share[k]),
+                "lon": pts[2 * k] + t * (pts[2 * k + 2] - pts[2 * k]),
+                "lat": pts[2 * k + 1] + t * (pts[2 * k + 3] - pts[2 * k + 1]),
+            }
+        else:
+            v = router.nearest_vertex(*c)
+            if v is not None:
+                lon, lat = self.graph.vertex_coord(v)
+                stop = {"in_zone": False, "vertex": v, "lon": lon, "lat": lat}
+                print(f"⚠️ simulate: no {mode} street crosses curb zone {zone}; its deliveries stop at vertex {v}, "
+                      f"{distance_m(lon, lat, *c):.0f} m from the zone's centroid", file=sys.stderr)
+        self.zone_stops[key] = stop
+        return stop
+
+    def _entries(self, router: Router, e: int) -> Iterator[Tuple[int, bool, float]]:
+        """(vertex, forward, seconds) of each open arc along edge e."""
+        efrom, eto = self.graph.column("edge_from")[e], self.graph.column("edge_to")[e]
+        for u, v, forward in ((efrom, eto, True), (eto, efrom, False)):
+            for p in range(router.offsets[u], router.offsets[u + 1]):
+                if router.edges[p] == e and router.targets[p] == v and router.weights[p] != INF:
+                    yield u, forward, router.weights[p]
+                    break
+
+    def trip(
+        self, rng: random.Random, mode: str, router: Router, zone: int,
+    ) -> Optional[Tuple[int, int, Dict[str, Any], Optional[Tuple[int, bool, float, float]]]]:
+        """
+        (origin, destination, route, last leg) of one trip, to curb zone `zone` when >= 0; None when nothing
+        routes. The last leg (edge, forward, edge seconds, share of it) runs from the destination to a zone stop.
+        """
+        used = self.used[mode]
+        if not used:
+            return None
+        reach_m = default_speed_kph(mode, "residential") / 3.6 * TRIP_MINUTES * 60
+        coords = router.coords
+        stop = self.zone_stop(mode, router, zone) if zone >= 0 else None
+        if zone >= 0 and stop is None:
+            return None
+        for _ in range(MAX_TRIES):
+            if stop is not None:
+                origin = self._near(rng, router, stop["lon"], stop["lat"], reach_m)
+                if origin is None:
+                    continue
+                if not stop["in_zone"]:
+                    dest = stop["vertex"]
+                    r = router.route(origin, dest) if origin != dest else None
+                    if r is not None and r["edges"]:
+                        return origin, dest, r, None
+                    continue
+                # Enter the stop's edge from whichever open end is reached first
+                best = None
+                for u, forward, seconds in self._entries(router, stop["edge"]):
+                    share = stop["share"] if forward else 1.0 - stop["share"]
+                    r = router.route(origin, u)
+                    if r is not None and (r["edges"] or share > 0) and (best is None or r["seconds"] + seconds * share < best[0]):
+                        best = (r["seconds"] + seconds * share, u, r, (stop["edge"], forward, seconds, share))
+                if best is not None:
+                    return origin, best[1], best[2], best[3]
+                continue
+            origin = rng.choice(used)
+            dest = self._near(rng, router, coords[2 * origin], coords[2 * origin + 1], reach_m)
+            if dest is None or origin == dest:
+                continue
+            r = router.route(origin, dest)
+            if r is not None and r["edges"]:
+                return origin, dest, r, None
+        return None
+
+    def _near(self, rng: random.Random, router: Router, lon: float, lat: float, reach_m: float) -> Optional[int]:
+        """Vertex nearest a random point within reach_m (and within the graph's extent) of lon, lat."""
+        x0, y0, x1, y1 = self.extent
+        reach_m = min(reach_m, distance_m(x0, y0, x1, y1) / 2)
+        for _ in range(MAX_TRIES):
+            d = reach_m * math.sqrt(rng.uniform(0.04, 1.0))  # uniform over the disc, not too close
+            b = rng.uniform(0.0, 2 * math.pi)
+            dlon, dlat = meters_to_degrees(lat, d)
+            x, y = lon + dlon * math.sin(b), lat + dlat * math.cos(b)
+            if x0 <= x <= x1 and y0 <= y <= y1:
+                break
+        return router.nearest_vertex(min(max(x, x0), x1), min(max(y, y0), y1))
+
+    def _walk(self, points: Columns, e: int, forward: bool, seconds: float, clock: float, upto: float = 1.0) -> None:
+        """Append edge e's points after its entry end, travelled in `seconds`, up to share `upto` of it from that end."""
+        lon, lat, t, edge, speed = (points[c] for c in ("point_lon", "point_lat", "point_t", "point_edge", "point_speed_ms"))
+        pts, share, seg = self.shape(e)
+        n = len(share)
+        done = 0.0
+        for k in range(1, n):
+            j = k if forward else n - 1 - k  # point index along the way
+            s = share[j] if forward else 1.0 - share[j]
+            seg_m = seg[j - 1] if forward else seg[j]
+            seg_s = seconds * (s - done)
+            edge[-1] = e
+            speed[-1] = seg_m / seg_s if seg_s > 0 else 0.0
+            if s >= upto and upto < 1.0:
+                # Stop part-way along this segment
+                f = (upto - done) / (s - done) if s > done else 1.0
+                x0, y0 = pts[2 * (j - 1 if forward else j + 1)], pts[2 * (j - 1 if forward else j + 1) + 1]
+                lon.append(x0 + f * (pts[2 * j] - x0))
+                lat.append(y0 + f * (pts[2 * j + 1] - y0))
+                t.append(clock + seconds * upto)
+                edge.append(-1)
+                speed.append(0.0)
+                return
+            lon.append(pts[2 * j])
+            lat.append(pts[2 * j + 1])
+            t.append(clock + seconds * s)
+            edge.append(-1)
+            speed.append(0.0)
+            done = s
+
+    def expand(
+        self, points: Columns, origin: int, route: Dict[str, Any], depart_s: float, dwell_s: float,
+        leg: Optional[Tuple[int, bool, float, float]] = None, stop: Optional[Tuple[float, float]] = None,
+        waits: Optional[Tuple[random.Random, float]] = None,
+    ) -> float:
+        """
+        Append the route's points (from depart_s), then the last leg's up to stop (lon, lat) when given,
+        to the point columns; returns the arrival time. With waits (rng, max seconds), the actor waits
+        at each crossing() it passes.
+        """
+        lon, lat, t, edge, speed = (points[c] for c in ("point_lon", "point_lat", "point_t", "point_edge", "point_speed_ms"))
+        efrom, eto = self.graph.column("edge_from"), self.graph.column("edge_to")
+        clock = depart_s
+        x, y = self.graph.vertex_coord(origin)
+        lon.append(x)
+        lat.append(y)
+        t.append(clock)
+        edge.append(-1)
+        speed.append(0.0)
+        u = origin
+        crossings = self.crossings() if waits is not None else None
+        for e, seconds in zip(route["edges"], route["edge_seconds"]):
+            if crossings is not None and u != origin and crossings[u]:
+                wait = waits[0].uniform(0.0, waits[1])
+                if wait > 0:
+                    # Standing at the vertex, already on the next edge
+                    edge[-1] = e
+                    clock += wait
+                    lon.append(lon[-1])
+                    lat.append(lat[-1])
+                    t.append(clock)
+                    edge.append(-1)
+                    speed.append(0.0)
+            forward = efrom[e] == u
+            self._walk(points, e, forward, seconds, clock)
+            clock += seconds
+            t[-1] = clock  # no drift from the shares
+            u = eto[e] if forward else efrom[e]
+        if leg is not None:
+            e, forward, seconds, share = leg
+            self._walk(points, e, forward, seconds, clock, share)
+            clock += seconds * share
+            t[-1] = clock
+            if stop is not None:
+                lon[-1], lat[-1] = stop  # exactly the zone stop, not a re-interpolation of it
+        if dwell_s > 0:
+            lon.append(lon[-1])
+            lat.append(lat[-1])
+            t.append(clock + dwell_s)
+            edge.append(-1)
+            speed.append(0.0)
+        return clock
+
+
+def plan(
+    graph: RoadGraph,
+    path: str,
+    actors: int,
+    mix: Sequence[Tuple[str, float]],
+    duration_s: float,
+    start: str = "08:00",
+    delivery_share: float = 0.5,
+    dwell_s: float = 300.0,
+    landmarks: int = 4,
+    seed: int = 1,
+    crossing_wait_s: float = CROSSING_WAIT_S,
+) -> Tuple[Dict[str, Any], Columns]:
+    """(header, columns) of the actor table: seeded trips routed on graph (see the module docstring)."""
+    planner = _Planner(graph, path, start, landmarks)
+    rng = random.Random(seed)
+    types = [name for name, _ in mix]
+    weights = [w for _, w in mix]
+    requests = sorted((rng.uniform(0.0, duration_s), rng.choices(types, weights)[0], rng.random()) for _ in range(actors))
+    cols: Columns = {name: array(tc) for name, tc in (
+        ("actor_type", "b"), ("delivery", "b"), ("zone", "h"), ("origin", "i"), ("destination", "i"),
+        ("depart_s", "d"), ("arrive_s", "d"), ("end_s", "d"), ("route_m", "d"), ("point_offsets", "q"),
+        ("point_lon", "d"), ("point_lat", "d"), ("point_t", "d"), ("point_edge", "i"), ("point_speed_ms", "f"),
+    )}
+    cols["point_offsets"].append(0)
+    type_codes = {name: i for i, name in enumerate(ACTOR_MODES)}
+    counts = {name: {"requested": 0, "simulated": 0, "deliveries": 0} for name in ACTOR_MODES}
+    for depart, actor_type, draw in requests:
+        mode = ACTOR_MODES[actor_type]
+        counts[actor_type]["requested"] += 1
+        delivery = actor_type in DELIVERY_TYPES and bool(planner.zones) and draw < delivery_share
+        zone = rng.randrange(len(planner.zones)) if delivery else -1
+        router = planner.router(mode, depart)
+        found = planner.trip(rng, mode, router, zone)
+        if found is None:
+            continue
+        origin, dest, route, leg = found
+        stop = planner.zone_stops[(mode, zone)] if leg is not None else None
+        arrive = planner.expand(cols, origin, route, depart, dwell_s if delivery else 0.0,
+                                leg, (stop["lon"], stop["lat"]) if stop is not None else None,
+                                (rng, crossing_wait_s) if mode == "foot" and crossing_wait_s > 0 else None)
+        route_m = route["meters"] + (graph.column("edge_length_m")[leg[0]] * leg[3] if leg is not None else 0.0)
+        for name, value in (
+            ("actor_type", type_codes[actor_type]), ("delivery", int(delivery)), ("zone", zone), ("origin", origin),
+            ("destination", dest), ("depart_s", depart), ("arrive_s", arrive), ("end_s", cols["point_t"][-1]),
+            ("route_m", route_m), ("point_offsets", len(cols["point_t"])),
+        ):
+            cols[name].append(value)
+        counts[actor_type]["simulated"] += 1
+        counts[actor_type]["deliveries"] += int(delivery)
+    header = {
+        "format": "citykit-sim-actors",
+        "version": VERSION,
+        "actors": len(cols["depart_s"]),
+        "points": len(cols["point_t"]),
+        "actor_types": list(ACTOR_MODES),
+        "modes": ACTOR_MODES,
+        "by_type": counts,
+        "curb_zones": [
+            {"centroid": list(_centroid(rings)), "rings": rings, **props,
+             "stops": {m: {k: v for k, v in stop.items() if k != "share"}
+                       for (m, z), stop in sorted(planner.zone_stops.items()) if z == i and stop is not None}}
+            for i, (rings, props) in enumerate(planner.zones)
+        ],
+        "geofences": [hours for _, hours in planner.fences],
+        "start": start,
+        "duration_s": duration_s,
+        "dwell_s": dwell_s,
+        "crossing_wait_s": crossing_wait_s,
+        "delivery_share": delivery_share,
+        "seed": seed,
+    }
+    return header, cols
+
+
+# -----------------------------
+# Stepping
+# -----------------------------
+
+def _np_column(values: Any, typecode: str) -> array:
+    out = array(typecode)
+    out.frombytes(np.ascontiguousarray(values, dtype=np.dtype(typecode)).tobytes())
+    return out
+
+
+class _ChunkWriter:
+    """Buffers trajectory rows and writes a traj-NNNNN.cktraj every chunk_steps steps."""
+
+    COLUMNS = (("step", "i"), ("actor", "i"), ("lon", "d"), ("lat", "d"), ("speed_ms", "f"), ("edge", "i"))
+
+    def __init__(self, out_dir: str, dt: float, chunk_steps: int) -> None:
+        self.out_dir = out_dir
+        self.dt = dt
+        self.chunk_steps = chunk_steps
+        self.chunks: List[Dict[str, Any]] = []
+        self.rows = 0
+        self.first_step = 0
+        self._parts: List[Tuple[Any, ...]] = []  # NumPy: one tuple of column arrays per step
+        self._cols: Columns = {name: array(tc) for name, tc in self.COLUMNS}
+
+    def add(self, step: int, actor: Any, lon: Any, lat: Any, speed: Any, edge: Any) -> None:
+        """One step's rows as NumPy arrays."""
+        if len(actor):
+            self._parts.append((np.full(len(actor), step, dtype=np.int32), actor, lon, lat, speed, edge))
+
+    def columns(self) -> Columns:
+        """The pure-Python buffers, appended to directly."""
+        return self._cols
+
+    def step_done(self, step: int) -> None:
+        if step + 1 - self.first_step >= self.chunk_steps:
+            self.flush(step)
+
+    def flush(self, last_step: int) -> None:
+        if last_step < self.first_step:
+            return
+        cols = self._cols
+        if self._parts:
+            cols = {name: _np_column(np.concatenate([p[i] for p in self._parts]), tc)
+                    for i, (name, tc) in enumerate(self.COLUMNS)}
+            self._parts = []
+        rows = len(cols["step"])
+        path = os.path.join(self.out_dir, f"traj-{len(self.chunks):05d}.cktraj")
+        header = {
+            "format": "citykit-trajectories",
+            "version": VERSION,
+            "dt_s": self.dt,
+            "first_step": self.first_step,
+            "last_step": last_step,
+            "rows": rows,
+        }
+        write_sections(path, header, cols, TRAJ_MAGIC, VERSION)
+        self.chunks.append({"path": os.path.basename(path), "first_step": self.first_step, "last_step": last_step, "rows": rows})
+        self.rows += rows
+        self.first_step = last_step + 1
+        self._cols = {name: array(tc) for name, tc in self.COLUMNS}
+
+
+def _step_numpy(cols: Columns, steps: int, dt: float, writer: _ChunkWriter) -> None:
+    depart = np.frombuffer(cols["depart_s"], dtype=np.float64)
+    end = np.frombuffer(cols["end_s"], dtype=np.float64)
+    offsets = np.frombuffer(cols["point_offsets"], dtype=np.int64)
+    p_lon, p_lat, p_t = (np.frombuffer(cols[c], dtype=np.float64) for c in ("point_lon", "point_lat", "point_t"))
+    p_edge = np.frombuffer(cols["point_edge"], dtype=np.int32)
+    p_speed = np.frombuffer(cols["point_speed_ms"], dtype=np.float32)
+    last = offsets[1:] - 1
+    # One sorted key over all points: actor * span + time (span exceeds every schedule)
+    span = math.ceil(float(p_t.max()) if len(p_t) else 0.0) + 1.0
+    owner = np.repeat(np.arange(len(depart), dtype=np.float64), np.diff(offsets))
+    key = owner * span + p_t
+    order = np.argsort(depart, kind="stable").astype(np.int32)
+    depart_sorted = depart[order]
+    active = np.empty(0, dtype=np.int32)
+    joined = 0
+    for step in range(steps):
+        now = step * dt
+        upto = int(np.searchsorted(depart_sorted, now, side="right"))
+        if upto > joined:
+            active = np.concatenate((active, order[joined:upto]))
+            joined = upto
+        active = active[end[active] > now]
+        if len(active):
+            i = np.searchsorted(key, active * span + now, side="right") - 1
+            j = np.minimum(i + 1, last[active])
+            t0 = p_t[i]
+            seg = p_t[j] - t0
+            f = np.where(seg > 0, (now - t0) / np.where(seg > 0, seg, 1.0), 0.0)
+            writer.add(
+                step, active,
+                p_lon[i] + f * (p_lon[j] - p_lon[i]), p_lat[i] + f * (p_lat[j] - p_lat[i]),
+                p_speed[i], p_edge[i],
+            )
+        writer.step_done(step)
+
+
+def _step_python(cols: Columns, steps: int, dt: float, writer: _ChunkWriter) -> None:
+    depart, end, offsets = cols["depart_s"], cols["end_s"], cols["point_offsets"]
+    p_lon, p_lat, p_t, p_edge, p_speed = (cols[c] for c in ("point_lon", "point_lat", "point_t", "point_edge", "point_speed_ms"))
+    order = sorted(range(len(depart)), key=depart.__getitem__)
+    current = array("q", offsets[:-1])  # point pointer per actor
+    active: List[int] = []
+    joined = 0
+    for step in range(steps):
+        now = step * dt
+        while joined < len(order) and depart[order[joined]] <= now:
+            active.append(order[joined])
+            joined += 1
+        out = writer.columns()
+        o_step, o_actor, o_lon, o_lat, o_speed, o_edge = (out[name] for name, _ in _ChunkWriter.COLUMNS)
+        still: List[int] = []
+        for a in active:
+            if end[a] <= now:
+                continue
+            still.append(a)
+            i, last = current[a], offsets[a + 1] - 1
+            while i < last and p_t[i + 1] <= now:
+                i += 1
+            current[a] = i
+            j = i + 1 if i < last else i
+            t0, seg = p_t[i], p_t[j] - p_t[i]
+            f = (now - t0) / seg if seg > 0 else 0.0
+            o_step.append(step)
+            o_actor.append(a)
+            o_lon.append(p_lon[i] + f * (p_lon[j] - p_lon[i]))
+            o_lat.append(p_lat[i] + f * (p_lat[j] - p_lat[i]))
+            o_speed.append(p_speed[i])
+            o_edge.append(p_edge[i])
+        active = still
+        writer.step_done(step)
+
+
+def simulate(cols: Columns, out_dir: str, duration_s: float, dt: float, chunk_steps: int) -> Dict[str, Any]:
+    """Step the planned actors over duration_s and write the trajectory chunks; returns the chunk summary."""
+    steps = max(1, math.ceil(duration_s / dt))
+    for stale in glob.glob(os.path.join(out_dir, "traj-*.cktraj")):
+        os.unlink(stale)
+    writer = _ChunkWriter(out_dir, dt, max(1, chunk_steps))
+    (_step_numpy if USE_NUMPY else _step_python)(cols, steps, dt, writer)
+    writer.flush(steps - 1)
+    return {"steps": steps, "rows": writer.rows, "chunks": writer.chunks, "backend": "numpy" if USE_NUMPY else "python"}
+
+
+def write_index(sim_dir: str, index: Dict[str, Any]) -> None:
+    tmp = os.path.join(sim_dir, "sim.json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2)
+        f.write("\n")
+    os.replace(tmp, os.path.join(sim_dir, "sim.json"))
+
+
+def trajectory_chunks(sim_dir: str) -> List[str]:
+    """Paths of the trajectory chunks listed in sim_dir/sim.json, in step order."""
+    with open(os.path.join(sim_dir, "sim.json"), "r", encoding="utf-8") as f:
+        index = json.load(f)
+    return [os.path.join(sim_dir, c["path"]) for c in index["chunks"]]
+
+
+def read_sections(path: str, magic: bytes) -> Tuple[Dict[str, Any], Columns]:
+    """Header and columns (copied; the file is closed on return) of actors.cksim or a trajectory chunk."""
+    with SectionReader(path, magic, VERSION) as reader:
+        cols: Columns = {}
+        for name in reader.header["columns"]:
+            col = array(reader.header["columns"][name]["typecode"])
+            col.frombytes(reader.column(name).cast("B"))
+            cols[name] = col
+        return reader.header, cols
+
+
+def iter_trajectories(sim_dir: str) -> Iterator[Tuple[Dict[str, Any], Columns]]:
+    """(header, columns) of each trajectory chunk of sim_dir, in step order — one chunk in memory at a time."""
+    for path in trajectory_chunks(sim_dir):
+        yield read_sections(path, TRAJ_MAGIC)
+
+
+def position_at(cols: Columns, actor: int, t: float) -> Optional[Tuple[float, float]]:
+    """Scheduled (lon, lat) of actor at t seconds, or None outside [depart, end) — the stepping reference."""
+    if not cols["depart_s"][actor] <= t < cols["end_s"][actor]:
+        return None
+    lo, hi = cols["point_offsets"][actor], cols["point_offsets"][actor + 1]
+    p_t = cols["point_t"]
+    i = bisect.bisect_right(p_t, t, lo, hi) - 1
+    j = min(i + 1, hi - 1)
+    seg = p_t[j] - p_t[i]
+    f = (t - p_t[i]) / seg if seg > 0 else 0.0
+    lon, lat = cols["point_lon"], cols["point_lat"]
+    return lon[i] + f * (lon[j] - lon[i]), lat[i] + f * (lat[j] - lat[i])
+
+
+def run(graph_file: str, out_dir: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """Plan, step and write everything under out_dir; returns sim.json's content."""
+    mix = parse_mix(args.mix)
+    os.makedirs(out_dir, exist_ok=True)
+    with RoadGraph(graph_file) as graph:
+        with metrics.section("plan", actors=args.actors) as m:
+            header, cols = plan(graph, graph_file, args.actors, mix, args.duration, args.start,
+                                args.delivery_share, args.dwell, args.landmarks, args.seed, args.crossing_wait)
+            m.update(simulated=header["actors"], points=header["points"])
+    write_sections(os.path.join(out_dir, "actors.cksim"), dict(header), cols, ACTORS_MAGIC, VERSION)
+    with metrics.section("step", actors=header["actors"]) as m:
+        stepped = simulate(cols, out_dir, args.duration, args.dt, args.chunk_steps)
+        m.update(steps=stepped["steps"], rows=stepped["rows"], backend=stepped["backend"])
+    index = {
+        "format": "citykit-simulation",
+        "version": VERSION,
+        "graph": os.path.basename(graph_file),
+        "start": args.start,
+        "duration_s": args.duration,
+        "dt_s": args.dt,
+        "seed": args.seed,
+        "crossing_wait_s": args.crossing_wait,
+        "actors": {"requested": args.actors, "simulated": header["actors"], "by_type": header["by_type"]},
+        "curb_zones": header["curb_zones"],
+        "actor_table": "actors.cksim",
+        **stepped,
+    }
+    write_index(out_dir, index)
+    return index
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Time-stepped actor simulation on a citykit road graph")
+    ap.add_argument("--kit", default="", help="Kit directory (derived/osm_modified.ckgraph)")
+    ap.add_argument("--graph", default="", help="Road graph (default: the kit's modified graph, else its baseline)")
+    ap.add_argument("--out", default="", help="Output directory (default: KIT/derived/sim)")
+    ap.add_argument("--actors", type=int, default=1000)
+    ap.add_argument("--mix", default=DEFAULT_MIX, help="Actor type weights")
+    ap.add_argument("--duration", type=float, default=3600.0, help="Simulated seconds")
+    ap.add_argument("--dt", type=float, default=1.0, help="Step in seconds")
+    ap.add_argument("--start", default="08:00", help="Time of day at step 0 (geofence allowed_hours)")
+    ap.add_argument("--delivery-share", type=float, default=0.5, help="Share of car/robot trips ending at a curb zone")
+    ap.add_argument("--dwell", type=float, default=300.0, help="Seconds a delivery stays at its curb zone")
+    ap.add_argument("--crossing-wait", type=float, default=CROSSING_WAIT_S,
+                    help="Most seconds a pedestrian waits to cross at a car-street intersection (0 = never)")
+    ap.add_argument("--chunk-steps", type=int, default=300, help="Steps per trajectory chunk")
+    ap.add_argument("--landmarks", type=int, default=4, help="ALT landmarks per router")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    graph_file = args.graph
+    if not graph_file and args.kit:
+        derived = os.path.join(args.kit, "derived")
+        for layer in ("modified", "baseline"):
+            graph_file = graph_path(os.path.join(derived, f"osm_{layer}.geojson"))
+            if os.path.exists(graph_file):
+                break
+    out_dir = args.out or (os.path.join(args.kit, "derived", "sim") if args.kit else "")
+    if not graph_file or not out_dir:
+        print("ERROR: give --kit, or --graph and --out", file=sys.stderr)
+        return 1
+    if not os.path.exists(graph_file):
+        print(f"ERROR: missing {graph_file}", file=sys.stderr)
+        return 1
+    if args.dt <= 0 or args.duration <= 0 or args.actors < 0 or args.crossing_wait < 0:
+        print("ERROR: --dt and --duration must be positive, --actors and --crossing-wait not negative", file=sys.stderr)
+        return 1
+    try:
+        parse_clock(args.start)
+        index = run(graph_file, out_dir, args)
+    except (OSError, ValueError) as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 1
+    print(f"✅ simulate: {index['actors']['simulated']}/{args.actors} actors, {index['steps']} steps of {args.dt:g} s, "
+          f"{index['rows']} trajectory rows in {len(index['chunks'])} chunks -> {out_dir}")
+    for name, c in index["actors"]["by_type"].items():
+        if c["requested"]:
+            print(f"   {name:<15} {c['simulated']:>6}/{c['requested']:<6} deliveries {c['deliveries']}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(metrics.run_main("simulate", main))
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+spatial_index.py — Uniform-grid segment index over baseline LineStrings (stdlib-only)
+
+Coordinates are projected once to a local equirectangular plane (metres,
+centred on the network) and every LineString segment is registered in the
+grid cells its bounding box covers. Queries only visit nearby cells, then
+run exact point/segment distance tests:
+
+  - near_point(lon, lat, radius_m)     features with a segment within radius_m
+  - near_polygon(rings, radius_m)      features intersecting the polygon or within radius_m of it
+  - nearest(lon, lat, ...)             closest eligible feature + snapped point on it
+
+Positions returned are indexes into the features list the index was built
+from, so they compose directly with tag_selector.TagIndex results.
+"""
+
+from __future__ import annotations
+
+import math
+from array import array
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from geodesy import meters_to_degrees
+
+Point = Tuple[float, float]
+
+
+def _seg_dist2(px: float, py: float, ax: float, ay: float, bx: float, by: float) -> Tuple[float, float]:
+    """Squared distance from p to segment a-b, and the clamped projection parameter t."""
+    dx, dy = bx - ax, by - ay
+    den = dx * dx + dy * dy
+    t = 0.0 if den == 0.0 else max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / den))
+    qx, qy = ax + t * dx - px, ay + t * dy - py
+    return qx * qx + qy * qy, t
+
+
+def _segments_intersect(a: Point, b: Point, c: Point, d: Point) -> bool:
+    def orient(p: Point, q: Point, r: Point) -> float:
+        return (q[0] - p[0]) * (r[1] - p[1]) - (q[1] - p[1]) * (r[0] - p[0])
+
+    o1, o2, o3, o4 = orient(a, b, c), orient(a, b, d), orient(c, d, a), orient(c, d, b)
+    if ((o1 > 0) != (o2 > 0)) and ((o3 > 0) != (o4 > 0)) and o1 and o2 and o3 and o4:
+        return True
+    # Collinear / touching cases
+    def on_seg(p: Point, q: Point, r: Point) -> bool:
+        return min(p[0], q[0]) <= r[0] <= max(p[0], q[0]) and min(p[1], q[1]) <= r[1] <= max(p[1], q[1])
+
+    return (
+        (o1 == 0 and on_seg(a, b, c))
+        or (o2 == 0 and on_seg(a, b, d))
+        or (o3 == 0 and on_seg(c, d, a))
+        or (o4 == 0 and on_seg(c, d, b))
+    )
+
+
+def _seg_seg_dist2(a: Point, b: Point, c: Point, d: Point) -> float:
+    if _segments_intersect(a, b, c, d):
+        return 0.0
+    return min(
+        _seg_dist2(a[0], a[1], c[0], c[1], d[0], d[1])[0],
+        _seg_dist2(b[0], b[1], c[0], c[1], d[0], d[1])[0],
+        _seg_dist2(c[0], c[1], a[0], a[1], b[0], b[1])[0],
+        _seg_dist2(d[0], d[1], a[0], a[1], b[0], b[1])[0],
+    )
+
+
+def _point_in_rings(x: float, y: float, rings: Sequence[Sequence[Point]]) -> bool:
+    """Even-odd rule over all rings (outer ring + holes)."""
+    inside = False
+    for ring in rings:
+        n = len(ring)
+        j = n - 1
+        for i in range(n):
+            xi, yi = ring[i]
+            xj, yj = ring[j]
+            if (yi > y) != (yj > y) and x < (xj - xi) * (y - yi) / (yj - yi) + xi:
+                inside = not inside
+            j = i
+    return inside
+
+
+class SpatialIndex:
+    """Uniform grid over the segments of every LineString feature."""
+
+    # Auto cell size aims for this many segments per occupied cell on average
+    TARGET_PER_CELL = 4
+
+    def __init__(self, features: Sequence[Dict[str, Any]], cell_m: Optional[float] = None) -> None:
+        lines: List[Tuple[int, List[Any]]] = []
+        min_lon = min_lat = math.inf
+        max_lon = max_lat = -math.inf
+        for pos, feat in enumerate(features):
+            geom = feat.get("geometry") or {}
+            if geom.get("type") != "LineString":
+                continue
+            coords = geom.get("coordinates") or ()
+            if len(coords) < 2:
+                continue
+            lines.append((pos, coords))
+            for c in coords:
+                if c[0] < min_lon:
+                    min_lon = c[0]
+                if c[0] > max_lon:
+                    max_lon = c[0]
+                if c[1] < min_lat:
+                    min_lat = c[1]
+                if c[1] > max_lat:
+                    max_lat = c[1]
+        if lines:
+            self.lon0 = (min_lon + max_lon) / 2.0
+            self.lat0 = (min_lat + max_lat) / 2.0
+        else:
+            self.lon0 = self.lat0 = 0.0
+        dlon, dlat = meters_to_degrees(self.lat0, 1.0)
+        self._mx = 1.0 / dlon  # metres per degree lon at lat0
+        self._my = 1.0 / dlat  # metres per degree lat
+
+        if cell_m is None:
+            n_segs = sum(len(c) - 1 for _, c in lines)
+            if n_segs:
+                area = max(1.0, (max_lon - min_lon) * self._mx) * max(1.0, (max_lat - min_lat) * self._my)
+                cell_m = math.sqrt(area * self.TARGET_PER_CELL / n_segs)
+            cell_m = min(500.0, max(5.0, cell_m or 50.0))
+        self.cell_m = float(cell_m)
+
+        # Flat segment arrays: owning feature + endpoints in metres
+        self.seg_feature = array("i")
+        self.ax, self.ay, self.bx, self.by = array("d"), array("d"), array("d"), array("d")
+        self.cells: Dict[Tuple[int, int], List[int]] = {}
+
+        for pos, coords in lines:
+            pts = [self.project(c[0], c[1]) for c in coords]
+            for (x0, y0), (x1, y1) in zip(pts, pts[1:]):
+                self._add_segment(pos, x0, y0, x1, y1)
+
+        # Cell extent, bounds the ring search in nearest()
+        if self.cells:
+            self._cx_range = (min(k[0] for k in self.cells), max(k[0] for k in self.cells))
+            self._cy_range = (min(k[1] for k in self.cells), max(k[1] for k in self.cells))
+        else:
+            self._cx_range = self._cy_range = (0, 0)
+
+    # -- projection -------------------------------------------------------
+
+    def project(self, lon: float, lat: float) -> Point:
+        return (lon - self.lon0) * self._mx, (lat - self.lat0) * self._my
+
+    def unproject(self, x: float, y: float) -> Point:
+        return self.lon0 + x / self._mx, self.lat0 + y / self._my
+
+    # -- build --------------------------------------------------------------
+
+    def _cell(self, v: float) -> int:
+        return math.floor(v / self.cell_m)
+
+    def _add_segment(self, pos: int, x0: float, y0: float, x1: float, y1: float) -> None:
+        seg = len(self.seg_feature)
+        self.seg_feature.append(pos)
+        self.ax.append(x0)
+        self.ay.append(y0)
+        self.bx.append(x1)
+        self.by.append(y1)
+        cells = self.cells
+        for cx in range(self._cell(min(x0, x1)), self._cell(max(x0, x1)) + 1):
+            for cy in range(self._cell(min(y0, y1)), self._cell(max(y0, y1)) + 1):
+                lst = cells.get((cx, cy))
+                if lst is None:
+                    cells[(cx, cy)] = [seg]
+                else:
+                    lst.append(seg)
+
+    def _segments_in_box(self, x0: float, y0: float, x1: float, y1: float) -> Set[int]:
+        out: Set[int] = set()
+        cells = self.cells
+        for cx in range(self._cell(x0), self._cell(x1) + 1):
+            for cy in range(self._cell(y0), self._cell(y1) + 1):
+                lst = cells.get((cx, cy))
+                if lst:
+                    out.update(lst)
+        return out
+
+    # -- queries --------------------------------------------------------------
+
+    def near_point(self, lon: float, lat: float, radius_m: float) -> List[int]:
+        """Sorted positions of features with any segment within radius_m of (lon, lat)."""
+        px, py = self.project(lon, lat)
+        r2 = radius_m * radius_m
+        ax, ay, bx, by, owner = self.ax, self.ay, self.bx, self.by, self.seg_feature
+        cells, cell = self.cells, self._cell
+        hits: Set[int] = set()
+        for cx in range(cell(px - radius_m), cell(px + radius_m) + 1):
+            for cy in range(cell(py - radius_m), cell(py + radius_m) + 1):
+                for s in cells.get((cx, cy), ()):
+                    pos = owner[s]
+                    if pos in hits:
+                        continue
+                    # _seg_dist2 inlined: this loop is the hot path of every radius query
+                    x0, y0 = ax[s], ay[s]
+                    dx, dy = bx[s] - x0, by[s] - y0
+                    den = dx * dx + dy * dy
+                    t = 0.0 if den == 0.0 else ((px - x0) * dx + (py - y0) * dy) / den
+                    t = 0.0 if t < 0.0 else (1.0 if t > 1.0 else t)
+                    qx, qy = x0 + t * dx - px, y0 + t * dy - py
+                    if qx * qx + qy * qy <= r2:
+                        hits.add(pos)
+        return sorted(hits)
+
+    def near_polygon(self, rings: Sequence[Sequence[Sequence[float]]], radius_m: float = 0.0) -> List[int]:
+        """Sorted positions of features intersecting the polygon or within radius_m of its boundary."""
+        prings = [[self.project(c[0], c[1]) for c in ring] for ring in rings if ring]
+        if not prings:
+            return []
+        xs = [p[0] for p in prings[0]]
+        ys = [p[1] for p in prings[0]]
+        x_lo, y_lo = min(xs) - radius_m, min(ys) - radius_m
+        x_hi, y_hi = max(xs) + radius_m, max(ys) + radius_m
+        edges = [
+            (c, d, min(c[0], d[0]) - radius_m, max(c[0], d[0]) + radius_m, min(c[1], d[1]) - radius_m, max(c[1], d[1]) + radius_m)
+            for ring in prings
+            for c, d in zip(ring, ring[1:])
+        ]
+        r2 = radius_m * radius_m
+        ax, ay, bx, by, owner = self.ax, self.ay, self.bx, self.by, self.seg_feature
+        hits: Set[int] = set()
+        for s in self._segments_in_box(x_lo, y_lo, x_hi, y_hi):
+            pos = owner[s]
+            if pos in hits:
+                continue
+            a, b = (ax[s], ay[s]), (bx[s], by[s])
+            sx_lo, sx_hi = (a[0], b[0]) if a[0] <= b[0] else (b[0], a[0])
+            sy_lo, sy_hi = (a[1], b[1]) if a[1] <= b[1] else (b[1], a[1])
+            # Cells are coarse: drop segments whose bbox misses the grown polygon bbox
+            if sx_hi < x_lo or sx_lo > x_hi or sy_hi < y_lo or sy_lo > y_hi:
+                continue
+            # Fully inside -> a is inside; partly inside -> it crosses an edge (distance 0)
+            if _point_in_rings(a[0], a[1], prings):
+                hits.add(pos)
+                continue
+            for c, d, ex_lo, ex_hi, ey_lo, ey_hi in edges:
+                if sx_hi < ex_lo or sx_lo > ex_hi or sy_hi < ey_lo or sy_lo > ey_hi:
+                    continue
+                if _seg_seg_dist2(a, b, c, d) <= r2:
+                    hits.add(pos)
+                    break
+        return sorted(hits)
+
+    def nearest(
+        self,
+        lon: float,
+        lat: float,
+        eligible: Optional[Callable[[int], bool]] = None,
+        max_radius_m: Optional[float] = None,
+    ) -> Optional[Tuple[int, float, Point]]:
+        """
+        Closest eligible feature to (lon, lat).
+
+        Returns (position, distance_m, (lon, lat) of the snapped point), or
+        None when nothing eligible lies within max_radius_m (default: anywhere).
+        Searches outward ring by ring and stops once no unvisited cell can be closer.
+        """
+        if not self.cells:
+            return None
+        px, py = self.project(lon, lat)
+        cx, cy = self._cell(px), self._cell(py)
+        if max_radius_m is None:
+            (x_lo, x_hi), (y_lo, y_hi) = self._cx_range, self._cy_range
+            max_ring = max(abs(x_lo - cx), abs(x_hi - cx), abs(y_lo - cy), abs(y_hi - cy))
+        else:
+            max_ring = int(math.ceil(max_radius_m / self.cell_m)) + 1
+
+        ax, ay, bx, by, owner = self.ax, self.ay, self.bx, self.by, self.seg_feature
+        best: Optional[Tuple[float, int, int, float]] = None  # (d2, seg, pos, t)
+        seen: Set[int] = set()
+        for ring in range(max_ring + 1):
+            # Any point in ring r is at least (r - 1) * cell_m away from p
+            if best is not None and ((ring - 1) * self.cell_m) ** 2 > best[0]:
+                break
+            for key in _ring_cells(cx, cy, ring):
+                for s in self.cells.get(key, ()):
+                    if s in seen:
+                        continue
+                    seen.add(s)
+                    pos = owner[s]
+                    if eligible is not None and not eligible(pos):
+                        continue
+                    d2, t = _seg_dist2(px, py, ax[s], ay[s], bx[s], by[s])
+                    if best is None or d2 < best[0] or (d2 == best[0] and pos < best[2]):
+                        best = (d2, s, pos, t)
+        if best is None:
+            return None
+        d2, s, pos, t = best
+        dist = math.sqrt(d2)
+        if max_radius_m is not None and dist > max_radius_m:
+            return None
+        sx = ax[s] + t * (bx[s] - ax[s])
+        sy = ay[s] + t * (by[s] - ay[s])
+        return pos, dist, self.unproject(sx, sy)
+
+
+def _ring_cells(cx: int, cy: int, r: int) -> Iterable[Tuple[int, int]]:
+    if r == 0:
+        yield (cx, cy)
+        return
+    for dx in range(-r, r + 1):
+        yield (cx + dx, cy - r)
+        yield (cx + dx, cy + r)
+    for dy in range(-r + 1, r):
+        yield (cx - r, cy + dy)
+        yield (cx + r, cy + dy)
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+stage_cache.py — Content-addressed cache of pipeline stage outputs (stdlib-only)
+
+Used by pipeline.py. A stage's key is sha256 over its name, the tool version
+(the scripts' source), the content hashes of its declared inputs and any
+parameters it reads from the environment. An entry is a directory
+
+  .cache/stages/<stage>/<key>/
+      meta.json                    outputs (artifact -> relative file list), state, sizes
+      <scope>/<path>               the cached files, e.g. kit/derived/osm_modified.geojson
+
+Outputs are hardlinked in both directions (copy fallback across filesystems),
+so a hit costs a few link() calls regardless of file size. Files produced by
+the pipeline are only ever replaced, never rewritten in place: pipeline.py
+unlinks a linked output before re-running its stage.
+
+File digests are memoised in .cache/stages/digests.json by (device, inode,
+size, mtime), so restored or untouched inputs are not re-read on the next run.
+
+Environment:
+  PIPELINE_CACHE (default: 1) — 0 disables the stage cache
+  PIPELINE_CACHE_DIR (default: .cache/stages)
+  PIPELINE_CACHE_MAX_MB (default: 2048) — least recently used entries are evicted past this
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+FORMAT = "ck-stage-cache-1"
+MAX_DIGESTS = 4096
+
+
+def link_or_copy(src: Path, dst: Path) -> None:
+    """Hardlink src to dst (replacing dst); copy when linking is not possible."""
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    if dst.exists() or dst.is_symlink():
+        dst.unlink()
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _tree_files(path: Path) -> List[str]:
+    return sorted(p.relative_to(path).as_posix() for p in path.rglob("*") if p.is_file())
+
+
+class StageCache:
+    def __init__(self, cache_dir: Path, max_mb: int = 2048) -> None:
+        self.dir = Path(cache_dir)
+        self.max_bytes = max_mb * 1024 * 1024
+        self._digests_path = self.dir / "digests.json"
+        self._lock = threading.Lock()
+        try:
+            self._digests: Dict[str, str] = json.loads(self._digests_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self._digests = {}
+        self._digests_dirty = False
+        self._digests_used: set = set()
+
+    # -- hashing --------------------------------------------------------
+
+    def file_digest(self, path: Path) -> str:
+        st = path.stat()
+        memo = f"{st.st_dev}:{st.st_ino}:{st.st_size}:{st.st_mtime_ns}"
+        with self._lock:
+            known = self._digests.get(memo)
+            self._digests_used.add(memo)
+        if known:
+            return known
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        with self._lock:
+            self._digests[memo] = digest
+            self._digests_dirty = True
+        return digest
+
+    def digest(self, path: Path) -> Optional[str]:
+        """sha256 of a file, or of (name, digest) pairs for a directory; None if missing."""
+        if path.is_file():
+            return self.file_digest(path)
+        if path.is_dir():
+            h = hashlib.sha256()
+            for rel in _tree_files(path):
+                h.update(f"{rel}\0{self.file_digest(path / rel)}\n".encode("utf-8"))
+            return h.hexdigest()
+        return None
+
+    @staticmethod
+    def key(material: Dict[str, Any]) -> str:
+        blob = json.dumps({"format": FORMAT, **material}, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    # -- entries --------------------------------------------------------
+
+    def _entry(self, stage: str, key: str) -> Path:
+        return self.dir / stage / key
+
+    def lookup(self, stage: str, key: str) -> Optional[Dict[str, Any]]:
+        """meta.json of a complete entry (files present, sizes unchanged), else None."""
+        entry = self._entry(stage, key)
+        try:
+            meta = json.loads((entry / "meta.json").read_text(encoding="utf-8"))
+            for rel, size in meta["sizes"].items():
+                if (entry / rel).stat().st_size != size:
+                    return None
+            now = time.time()
+            os.utime(entry / "meta.json", (now, now))  # LRU
+        except (OSError, ValueError, KeyError):
+            return None
+        meta["dir"] = str(entry)
+        return meta
+
+    def restore(self, meta: Dict[str, Any], targets: Dict[str, Path]) -> None:
+        """Link an entry's outputs into place; directory outputs are replaced wholesale."""
+        entry = Path(meta["dir"])
+        for artifact, files in meta["outputs"].items():
+            dst = targets[artifact]
+            stored = entry / artifact.replace(":", "/", 1)
+            if files is None:
+                link_or_copy(stored, dst)
+                continue
+            if dst.is_dir():
+                shutil.rmtree(dst)
+            for rel in files:
+                link_or_copy(stored / rel, dst / rel)
+
+    def store(self, stage: str, key: str, produced: Dict[str, Path], state: Dict[str, Any]) -> None:
+        """Add an entry from produced outputs (artifact -> existing file or directory)."""
+        stage_dir = self.dir / stage
+        stage_dir.mkdir(parents=True, exist_ok=True)
+        tmp = Path(tempfile.mkdtemp(dir=stage_dir, prefix=f".{key}."))
+        try:
+            outputs: Dict[str, Optional[List[str]]] = {}
+            sizes: Dict[str, int] = {}
+            for artifact, src in sorted(produced.items()):
+                rel = artifact.replace(":", "/", 1)
+                if src.is_dir():
+                    files = _tree_files(src)
+                    for f in files:
+                        link_or_copy(src / f, tmp / rel / f)
+                        sizes[f"{rel}/{f}"] = (tmp / rel / f).stat().st_size
+                    outputs[artifact] = files
+                else:
+                    link_or_copy(src, tmp / rel)
+                    sizes[rel] = (tmp / rel).stat().st_size
+                    outputs[artifact] = None
+            meta = {"format": FORMAT, "stage": stage, "key": key, "outputs": outputs, "sizes": sizes, "state": state}
+            (tmp / "meta.json").write_text(json.dumps(meta, indent=2, sort_keys=True), encoding="utf-8")
+            try:
+                os.replace(tmp, self._entry(stage, key))
+            except OSError:
+                shutil.rmtree(tmp, ignore_errors=True)  # a concurrent run stored it first
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+    def close(self) -> None:
+        """Persist digests and evict least recently used entries past the size bound."""
+        with self._lock:
+            if len(self._digests) > MAX_DIGESTS:
+                self._digests = {k: v for k, v in self._digests.items() if k in self._digests_used}
+                self._digests_dirty = True
+            if self._digests_dirty:
+                self.dir.mkdir(parents=True, exist_ok=True)
+                fd, tmp = tempfile.mkstemp(dir=self.dir, prefix=".digests.", suffix=".tmp")
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(self._digests, f)
+                os.replace(tmp, self._digests_path)
+                self._digests_dirty = False
+        entries = []
+        for meta_path in self.dir.glob("*/*/meta.json"):
+            try:
+                meta = json.loads(meta_path.read_text(encoding="utf-8"))
+                entries.append((meta_path.stat().st_mtime, sum(meta["sizes"].values()), meta_path.parent))
+            except (OSError, ValueError, KeyError):
+                continue
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+
+def from_env(root_dir: Path) -> Optional[StageCache]:
+    """The cache configured by PIPELINE_CACHE*, or None when disabled."""
+    if os.environ.get("PIPELINE_CACHE", "1") == "0":
+        return None
+    cache_dir = Path(os.environ.get("PIPELINE_CACHE_DIR", root_dir / ".cache" / "stages"))
+    return StageCache(cache_dir, int(os.environ.get("PIPELINE_CACHE_MAX_MB", "2048")))
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+tag_selector.py — Tag selectors + inverted index for delta ops (stdlib-only)
+
+Selector grammar (clauses joined with '&' must all match):
+
+  highway=residential               value equals
+  highway=residential|living_street value is one of
+  surface!=paved                    value differs (absent counts as different)
+  oneway=*                          key present with a non-null value
+  maxspeed_kph!=*                   key absent or null
+  highway=residential&oneway!=yes   conjunction
+
+Values compare as strings, exactly like the original single key=value
+selector in delta_apply.py.
+
+TagIndex maps (key, value) -> feature positions. Postings for a key are
+built on first use (one pass over the features) and reused by every later
+op; ops that write a key call invalidate() so the next lookup rebuilds it.
+
+An index over a copy-on-write view of the baseline can take the baseline's
+index as `parent`: keys the view never invalidated are answered from the
+parent's postings, so a batch of deltas builds each baseline key only once.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+Clause = Tuple[str, bool, Optional[Tuple[str, ...]]]  # (key, negated, values or None for '*')
+
+
+def parse(selector: str) -> List[Clause]:
+    """Parse a selector string into clauses; raises ValueError when malformed."""
+    if not isinstance(selector, str) or not selector.strip():
+        raise ValueError(f"Invalid selector: {selector!r}")
+    clauses: List[Clause] = []
+    for term in selector.split("&"):
+        term = term.strip()
+        if "!=" in term:
+            k, v = term.split("!=", 1)
+            negated = True
+        elif "=" in term:
+            k, v = term.split("=", 1)
+            negated = False
+        else:
+            raise ValueError(f"Unsupported selector (expected key=value): {selector}")
+        k, v = k.strip(), v.strip()
+        if not k or not v:
+            raise ValueError(f"Invalid selector: {selector}")
+        if v == "*":
+            clauses.append((k, negated, None))
+        else:
+            values = tuple(x.strip() for x in v.split("|"))
+            if not all(values):
+                raise ValueError(f"Invalid selector: {selector}")
+            clauses.append((k, negated, values))
+    return clauses
+
+
+def keys(selector: str) -> Set[str]:
+    """Tag keys a selector reads."""
+    return {k for k, _, _ in parse(selector)}
+
+
+def matches(clauses: Sequence[Clause], props: Dict[str, Any]) -> bool:
+    """Evaluate parsed clauses against one feature's properties (no index)."""
+    for k, negated, values in clauses:
+        v = props.get(k)
+        hit = v is not None if values is None else (isinstance(v, str) and v in values)
+        if hit == negated:
+            return False
+    return True
+
+
+class TagIndex:
+    """Lazily built inverted index from (tag key, value) to feature positions."""
+
+    def __init__(self, features: Sequence[Dict[str, Any]], parent: Optional["TagIndex"] = None) -> None:
+        self.features = features
+        self.parent = parent
+        self._postings: Dict[str, Dict[str, List[int]]] = {}
+        self._present: Dict[str, List[int]] = {}
+        self._dirty: Set[str] = set()
+
+    def _build(self, key: str) -> None:
+        postings: Dict[str, List[int]] = {}
+        present: List[int] = []
+        for i, feat in enumerate(self.features):
+            v = (feat.get("properties") or {}).get(key)
+            if v is None:
+                continue
+            present.append(i)
+            if isinstance(v, str):
+                lst = postings.get(v)
+                if lst is None:
+                    postings[v] = [i]
+                else:
+                    lst.append(i)
+        self._postings[key] = postings
+        self._present[key] = present
+
+    def invalidate(self, *keys: str) -> None:
+        """Drop postings for keys whose values were just written."""
+        for k in keys:
+            self._postings.pop(k, None)
+            self._present.pop(k, None)
+            self._dirty.add(k)
+
+    def warm(self, keys: Iterable[str]) -> None:
+        """Build postings for keys ahead of time (e.g. before forking workers)."""
+        for k in keys:
+            if k not in self._postings:
+                self._build(k)
+
+    def _positions(self, key: str, values: Optional[Tuple[str, ...]]) -> Set[int]:
+        if key not in self._postings:
+            if self.parent is not None and key not in self._dirty:
+                return self.parent._positions(key, values)
+            self._build(key)
+        if values is None:
+            return set(self._present[key])
+        postings = self._postings[key]
+        out: Set[int] = set()
+        for v in values:
+            out.update(postings.get(v, ()))
+        return out
+
+    def select(self, selector: str) -> List[int]:
+        """Return sorted positions of features matching selector."""
+        clauses = parse(selector)
+        positive = [c for c in clauses if not c[1]]
+        negative = [c for c in clauses if c[1]]
+
+        # Intersect smallest posting sets first
+        sets = sorted((self._positions(k, values) for k, _, values in positive), key=len)
+        if sets:
+            result = sets[0]
+            for other in sets[1:]:
+                if not result:
+                    return []
+                result = result & other
+        else:
+            result = set(range(len(self.features)))
+        for k, _, values in negative:
+            result -= self._positions(k, values)
+        return sorted(result)
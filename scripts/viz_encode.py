@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+viz_encode.py — Compact viewer encoding for FeatureCollections (stdlib-only)
+
+Used by build_viz.py --embed (default --encoding compact). The viewer decodes it
+client-side (ckDecode in the HTML template) back into GeoJSON.
+
+Geometry (LineStrings):
+  - Per-zoom simplification without storing a copy per zoom: a Douglas–Peucker
+    pass in Web Mercator records, for every vertex, the lowest zoom at which it
+    deviates more than TOLERANCE_PX from the simplified line (tolerances nest,
+    so the vertex set of zoom z is exactly DP at 0.5 px of z). The viewer keeps
+    vertices whose zoom is <= the map zoom.
+  - Topology: way endpoints and every vertex shared with another way (or
+    repeated in the same way) are pinned to MIN_ZOOM, so junctions survive at
+    every zoom and connected ways stay connected.
+  - Vertices below TOLERANCE_PX even at MAX_ZOOM are dropped.
+  - Coordinates quantized to 10^-precision degrees, delta-coded and written
+    as (dlon, dlat, zoom - MIN_ZOOM) triples in the polyline varint alphabet
+    (ASCII 63..126, 5 bits per char).
+  Other geometry types (overlay polygons) are kept as GeoJSON.
+
+Properties are stored as columns: integer columns present on every feature
+(osm_id) delta-coded, everything else as a value dictionary plus per-feature
+indexes (0 = key absent).
+
+Payload:
+  {"format": "ck-viz-1", "precision": 6, "min_zoom": 10, "max_zoom": 20,
+   "count": N, "props": [...columns], "geoms": [...], "meta": {...}}
+
+Modified layers are stored as a diff against the baseline (diff_collection), since
+delta_apply.py only changes properties and appends overlays:
+  {"format": "ck-viz-diff-1",
+   "patch": {"osm_id": deltas, "props": [...columns of changed keys]},
+   "unset": [[osm_id, [keys]], ...],        # keys the modified way no longer has
+   "drop": deltas,                          # baseline ways not in the modified layer as-is
+   "extra": ck-viz-1 payload}               # appended: new / re-shaped ways, overlays; + meta
+The viewer rebuilds the modified layer from the decoded baseline (ckApplyDiff),
+reusing its geometry objects.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+FORMAT = "ck-viz-1"
+DIFF_FORMAT = "ck-viz-diff-1"
+MIN_ZOOM = 10
+MAX_ZOOM = 20
+TOLERANCE_PX = 0.5
+TILE_PX = 256
+EARTH_CIRCUMFERENCE_M = 40075016.686
+
+_MISSING = object()
+
+
+def encode_ints(values: Iterable[int]) -> str:
+    """Signed integers in the polyline varint alphabet (zigzag, 5 bits per char, ASCII 63..126)."""
+    out: List[str] = []
+    for v in values:
+        v = -2 * v - 1 if v < 0 else 2 * v
+        while v >= 0x20:
+            out.append(chr((0x20 | (v & 0x1F)) + 63))
+            v >>= 5
+        out.append(chr(v + 63))
+    return "".join(out)
+
+
+def decode_ints(text: str) -> List[int]:
+    """Inverse of encode_ints (mirrors ckDecodeInts in the viewer)."""
+    out: List[int] = []
+    r = s = 0
+    for ch in text:
+        b = ord(ch) - 63
+        r |= (b & 0x1F) << s
+        s += 5
+        if b < 0x20:
+            out.append(-(r + 1) // 2 if r & 1 else r // 2)
+            r = s = 0
+    return out
+
+
+def _world(lon: float, lat: float) -> Tuple[float, float]:
+    lat = max(-85.0511287798, min(85.0511287798, lat))
+    s = math.sin(math.radians(lat))
+    return (lon + 180.0) / 360.0, 0.5 - math.log((1 + s) / (1 - s)) / (4 * math.pi)
+
+
+def _seg_dist(px: float, py: float, ax: float, ay: float, bx: float, by: float) -> float:
+    dx, dy = bx - ax, by - ay
+    l2 = dx * dx + dy * dy
+    if l2 == 0:
+        return math.hypot(px - ax, py - ay)
+    t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / l2))
+    return math.hypot(px - ax - t * dx, py - ay - t * dy)
+
+
+def _significance(world: List[Tuple[float, float]], pinned: List[bool]) -> List[float]:
+    """
+    Per-vertex Douglas–Peucker significance (world units), capped by the parent
+    split so that keeping {v: sig[v] > tol} equals DP at tolerance tol.
+    """
+    n = len(world)
+    sig = [math.inf if p else 0.0 for p in pinned]
+    anchors = [i for i in range(n) if pinned[i]]
+    stack = [(a, b, math.inf) for a, b in zip(anchors, anchors[1:])]
+    while stack:
+        i, j, cap = stack.pop()
+        if j - i < 2:
+            continue
+        ax, ay = world[i]
+        bx, by = world[j]
+        best, k = -1.0, i + 1
+        for m in range(i + 1, j):
+            d = _seg_dist(world[m][0], world[m][1], ax, ay, bx, by)
+            if d > best:
+                best, k = d, m
+        d = min(best, cap)
+        sig[k] = d
+        stack.append((i, k, d))
+        stack.append((k, j, d))
+    return sig
+
+
+def _min_zoom(sig: float) -> Optional[int]:
+    """Lowest zoom where sig exceeds TOLERANCE_PX, MIN_ZOOM for pinned vertices, None to drop."""
+    if sig == math.inf:
+        return MIN_ZOOM
+    if sig <= 0:
+        return None
+    z = max(MIN_ZOOM, math.floor(math.log2(TOLERANCE_PX / (TILE_PX * sig))) + 1)
+    # Guard the float boundary: the vertex must really exceed the tolerance at z
+    while z <= MAX_ZOOM and sig <= TOLERANCE_PX / (TILE_PX * 2 ** z):
+        z += 1
+    return z if z <= MAX_ZOOM else None
+
+
+def vertex_zooms(features: List[Dict[str, Any]]) -> List[Optional[List[Optional[int]]]]:
+    """Per LineString feature, the zoom from which each vertex is drawn (None = never); None for other features."""
+    seen: Dict[Tuple[float, float], int] = {}
+    for feat in features:
+        geom = feat.get("geometry") or {}
+        if geom.get("type") == "LineString":
+            for c in geom.get("coordinates") or []:
+                key = (c[0], c[1])
+                seen[key] = seen.get(key, 0) + 1
+    out: List[Optional[List[Optional[int]]]] = []
+    for feat in features:
+        geom = feat.get("geometry") or {}
+        coords = geom.get("coordinates") or []
+        if geom.get("type") != "LineString" or len(coords) < 2:
+            out.append(None)
+            continue
+        last = len(coords) - 1
+        pinned = [i in (0, last) or seen[(c[0], c[1])] > 1 for i, c in enumerate(coords)]
+        sig = _significance([_world(c[0], c[1]) for c in coords], pinned)
+        out.append([_min_zoom(s) for s in sig])
+    return out
+
+
+def _encode_props(features: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    keys: Dict[str, None] = {}
+    for feat in features:
+        for k in feat.get("properties") or {}:
+            keys.setdefault(k, None)
+    cols: List[Dict[str, Any]] = []
+    for k in keys:
+        vals = [(feat.get("properties") or {}).get(k, _MISSING) for feat in features]
+        if all(type(v) is int for v in vals):
+            cols.append({"k": k, "delta": encode_ints(b - a for a, b in zip([0] + vals, vals))})
+            continue
+        table: List[Any] = []
+        ids: Dict[str, int] = {}
+        idx: List[int] = []
+        for v in vals:
+            if v is _MISSING:
+                idx.append(0)
+                continue
+            vk = json.dumps(v, sort_keys=True)
+            if vk not in ids:
+                ids[vk] = len(table) + 1
+                table.append(v)
+            idx.append(ids[vk])
+        cols.append({"k": k, "values": table, "idx": encode_ints(idx)})
+    return cols
+
+
+def encode_collection(fc: Dict[str, Any], precision: int = 6) -> Dict[str, Any]:
+    """FeatureCollection -> compact payload (see module docstring)."""
+    features = fc.get("features") or []
+    scale = 10 ** precision
+    geoms: List[Any] = []
+    for feat, zooms in zip(features, vertex_zooms(features)):
+        if zooms is None:
+            geoms.append(feat.get("geometry"))
+            continue
+        ints: List[int] = []
+        px = py = 0
+        for c, z in zip(feat["geometry"]["coordinates"], zooms):
+            if z is None:
+                continue
+            x, y = round(c[0] * scale), round(c[1] * scale)
+            ints += (x - px, y - py, z - MIN_ZOOM)
+            px, py = x, y
+        geoms.append(encode_ints(ints))
+    return {
+        "format": FORMAT,
+        "precision": precision,
+        "min_zoom": MIN_ZOOM,
+        "max_zoom": MAX_ZOOM,
+        "count": len(features),
+        "props": _encode_props(features),
+        "geoms": geoms,
+        "meta": {k: v for k, v in fc.items() if k not in ("type", "features")},
+    }
+
+
+def _same(a: Any, b: Any) -> bool:
+    return type(a) is type(b) and a == b
+
+
+def diff_collection(baseline: Dict[str, Any], modified: Dict[str, Any], precision: int = 6) -> Optional[Dict[str, Any]]:
+    """
+    Modified layer as a property patch over baseline (see module docstring), or None
+    when ways cannot be matched (osm_ids missing or not unique in the baseline).
+    """
+    by_id: Dict[Any, Dict[str, Any]] = {}
+    for feat in baseline.get("features") or []:
+        oid = (feat.get("properties") or {}).get("osm_id")
+        if type(oid) is not int or oid in by_id:
+            return None
+        by_id[oid] = feat
+    patched: List[int] = []
+    patches: List[Dict[str, Any]] = []
+    unset: List[List[Any]] = []
+    extra: List[Dict[str, Any]] = []
+    kept = set()
+    for feat in modified.get("features") or []:
+        props = feat.get("properties") or {}
+        oid = props.get("osm_id")
+        base = by_id.get(oid) if type(oid) is int and oid not in kept and not props.get("feature_type") else None
+        if base is None or base.get("geometry") != feat.get("geometry"):
+            extra.append(feat)
+            continue
+        kept.add(oid)
+        bprops = base.get("properties") or {}
+        change = {k: v for k, v in props.items() if k not in bprops or not _same(bprops[k], v)}
+        if change:
+            patched.append(oid)
+            patches.append({"properties": change})
+        gone = [k for k in bprops if k not in props]
+        if gone:
+            unset.append([oid, gone])
+    drop = [oid for oid in by_id if oid not in kept]
+    extra_fc = {"type": "FeatureCollection", "features": extra}
+    extra_fc.update({k: v for k, v in modified.items() if k not in ("type", "features")})
+    return {
+        "format": DIFF_FORMAT,
+        "patch": {"osm_id": encode_ints(b - a for a, b in zip([0] + patched, patched)), "props": _encode_props(patches)},
+        "unset": unset,
+        "drop": encode_ints(b - a for a, b in zip([0] + drop, drop)),
+        "extra": encode_collection(extra_fc, precision),
+    }
+
+
+def apply_diff(baseline: Dict[str, Any], diff: Dict[str, Any]) -> Dict[str, Any]:
+    """Rebuild the modified FeatureCollection from a decoded baseline (mirrors ckApplyDiff)."""
+
+    def ids(text: str) -> List[int]:
+        out, v = [], 0
+        for d in decode_ints(text):
+            v += d
+            out.append(v)
+        return out
+
+    patch_ids = ids(diff["patch"]["osm_id"])
+    n = len(patch_ids)
+    changes = decode_collection({"count": n, "props": diff["patch"]["props"], "geoms": [None] * n, "precision": 0, "min_zoom": 0})
+    patch = {oid: f["properties"] for oid, f in zip(patch_ids, changes["features"])}
+    unset = {oid: keys for oid, keys in diff["unset"]}
+    drop = set(ids(diff["drop"]))
+    features = []
+    for feat in baseline["features"]:
+        oid = feat["properties"]["osm_id"]
+        if oid in drop:
+            continue
+        props = dict(feat["properties"])
+        props.update(patch.get(oid, {}))
+        for k in unset.get(oid, []):
+            props.pop(k, None)
+        features.append({"type": "Feature", "properties": props, "geometry": feat["geometry"]})
+    extra = decode_collection(diff["extra"])
+    extra["features"] = features + extra["features"]
+    return extra
+
+
+def decode_collection(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Payload -> FeatureCollection at full stored detail (mirrors ckDecode). LineStrings
+    carry "ck_zooms" next to their coordinates.
+    """
+    n, scale = payload["count"], 10 ** payload["precision"]
+    props: List[Dict[str, Any]] = [{} for _ in range(n)]
+    for col in payload["props"]:
+        k = col["k"]
+        if "delta" in col:
+            v = 0
+            for i, d in enumerate(decode_ints(col["delta"])):
+                v += d
+                props[i][k] = v
+        else:
+            for i, j in enumerate(decode_ints(col["idx"])):
+                if j:
+                    props[i][k] = col["values"][j - 1]
+    features = []
+    for p, g in zip(props, payload["geoms"]):
+        if isinstance(g, str):
+            ints = decode_ints(g)
+            coords, zooms = [], []
+            x = y = 0
+            for i in range(0, len(ints), 3):
+                x += ints[i]
+                y += ints[i + 1]
+                coords.append([x / scale, y / scale])
+                zooms.append(payload["min_zoom"] + ints[i + 2])
+            g = {"type": "LineString", "coordinates": coords, "ck_zooms": zooms}
+        features.append({"type": "Feature", "properties": p, "geometry": g})
+    fc: Dict[str, Any] = {"type": "FeatureCollection", "features": features}
+    fc.update(payload.get("meta") or {})
+    return fc
+
+
+def measure_error(features: List[Dict[str, Any]], payload: Dict[str, Any]) -> Dict[int, Dict[str, float]]:
+    """
+    Measured visual error per zoom: the largest distance from an original vertex
+    to the line the viewer draws at that zoom (decoded, quantized, simplified),
+    in screen pixels and in metres.
+    """
+    decoded = decode_collection(payload)["features"]
+    worst = {z: {"px": 0.0, "m": 0.0} for z in range(payload["min_zoom"], payload["max_zoom"] + 1)}
+    for feat, dec, zooms in zip(features, decoded, vertex_zooms(features)):
+        if zooms is None:
+            continue
+        coords = feat["geometry"]["coordinates"]
+        world = [_world(c[0], c[1]) for c in coords]
+        kept_world = [_world(c[0], c[1]) for c in dec["geometry"]["coordinates"]]
+        stored = [i for i, z in enumerate(zooms) if z is not None]
+        m_per_unit = EARTH_CIRCUMFERENCE_M * math.cos(math.radians(coords[0][1]))
+        for z, w in worst.items():
+            # Stored vertices drawn at z, as (original index, decoded world point)
+            drawn = [(i, kept_world[s]) for s, i in enumerate(stored) if zooms[i] <= z]
+            err = 0.0
+            for (i, a), (j, b) in zip(drawn, drawn[1:]):
+                for m in range(i, j + 1):
+                    err = max(err, _seg_dist(world[m][0], world[m][1], a[0], a[1], b[0], b[1]))
+            w["px"] = max(w["px"], err * TILE_PX * 2 ** z)
+            w["m"] = max(w["m"], err * m_per_unit)
+    return worst
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+viz_tiles.py — Cut viewer layers into a z/x/y tile pyramid (stdlib-only)
+
+Used by build_viz.py --tiles. Writes, under <KIT_DIR>/viz/tiles/:
+
+  index.js                          __ckTileIndex({...}): zoom range, bounds, tile keys per layer
+  overlays.js                       __ckTile("overlays", FeatureCollection) — overlays are few, never tiled
+  <layer>/<z>/<x>/<y>.js            __ckTile("<layer>/<z>/<x>/<y>", FeatureCollection)
+
+Tiles are JSONP scripts rather than .json so the viewer still works from file://.
+Ways are clipped to each tile in Web Mercator tile space (the space Leaflet draws
+in), so every tile is self-contained: a way crossing tiles becomes one
+(Multi)LineString piece per tile with the same properties. Vertices inside a tile
+keep their original coordinates; cut points are rounded to 7 decimals. Levels
+below the top of the pyramid only carry the vertices viz_encode.py's per-zoom
+simplification keeps at that zoom (the top level keeps all the viewer may need
+when overzoomed).
+Output is deterministic: features keep input order, tiles are keyed and listed sorted.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import shutil
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from viz_encode import MAX_ZOOM, vertex_zooms
+
+Point = Tuple[float, float]
+TileKey = Tuple[int, int, int]
+
+MAX_LAT = 85.0511287798
+
+
+def lonlat_to_world(lon: float, lat: float) -> Point:
+    """Web Mercator world coordinates in [0, 1) x [0, 1), y growing south (tile convention)."""
+    lat = max(-MAX_LAT, min(MAX_LAT, lat))
+    s = math.sin(math.radians(lat))
+    return (lon + 180.0) / 360.0, 0.5 - math.log((1 + s) / (1 - s)) / (4 * math.pi)
+
+
+def world_to_lonlat(x: float, y: float) -> List[float]:
+    lon = x * 360.0 - 180.0
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y))))
+    return [round(lon, 7), round(lat, 7)]
+
+
+def parse_zooms(text: str) -> Tuple[int, int]:
+    """'12-16' or '15' -> (min_zoom, max_zoom)."""
+    lo, _, hi = text.partition("-")
+    zmin, zmax = int(lo), int(hi or lo)
+    if not 0 <= zmin <= zmax <= 22:
+        raise ValueError(f"tile zooms must satisfy 0 <= min <= max <= 22: {text}")
+    return zmin, zmax
+
+
+def _clip(ax: float, ay: float, bx: float, by: float, x0: float, y0: float, x1: float, y1: float) -> Optional[Tuple[float, float]]:
+    """Liang–Barsky: parameter range [t0, t1] of segment a->b inside the box, or None."""
+    t0, t1 = 0.0, 1.0
+    dx, dy = bx - ax, by - ay
+    for p, q in ((-dx, ax - x0), (dx, x1 - ax), (-dy, ay - y0), (dy, y1 - ay)):
+        if p == 0:
+            if q < 0:
+                return None
+        else:
+            r = q / p
+            if p < 0:
+                if r > t1:
+                    return None
+                t0 = max(t0, r)
+            else:
+                if r < t0:
+                    return None
+                t1 = min(t1, r)
+    if t0 > t1 or (t0 == t1 and (dx or dy)):
+        return None
+    return t0, t1
+
+
+def _line_pieces(coords: List[List[float]], world: List[Point], z: int) -> Dict[TileKey, List[List[List[float]]]]:
+    """Split one LineString into per-tile pieces at zoom z."""
+    n = 1 << z
+    pieces: Dict[TileKey, List[List[List[float]]]] = {}
+    # Per tile: index of the last vertex appended to its open piece (to continue it)
+    last: Dict[TileKey, int] = {}
+    for i in range(len(coords) - 1):
+        ax, ay = world[i][0] * n, world[i][1] * n
+        bx, by = world[i + 1][0] * n, world[i + 1][1] * n
+        tax, tay, tbx, tby = int(ax), int(ay), int(bx), int(by)
+        if tax == tbx and tay == tby:
+            # Common case at city zooms: the whole segment is in one tile
+            key = (z, tax, tay)
+            if last.get(key) == i:
+                pieces[key][-1].append(coords[i + 1])
+            else:
+                pieces.setdefault(key, []).append([coords[i], coords[i + 1]])
+            last[key] = i + 1
+            continue
+        for tx in range(max(0, min(tax, tbx)), min(n - 1, max(tax, tbx)) + 1):
+            for ty in range(max(0, min(tay, tby)), min(n - 1, max(tay, tby)) + 1):
+                hit = _clip(ax, ay, bx, by, tx, ty, tx + 1, ty + 1)
+                if hit is None:
+                    continue
+                t0, t1 = hit
+                key = (z, tx, ty)
+                start = coords[i] if t0 == 0.0 else world_to_lonlat((ax + (bx - ax) * t0) / n, (ay + (by - ay) * t0) / n)
+                end = coords[i + 1] if t1 == 1.0 else world_to_lonlat((ax + (bx - ax) * t1) / n, (ay + (by - ay) * t1) / n)
+                if t0 == 0.0 and last.get(key) == i:
+                    pieces[key][-1].append(end)
+                else:
+                    pieces.setdefault(key, []).append([start, end])
+                last[key] = i + 1 if t1 == 1.0 else -1
+    return pieces
+
+
+def cut_tiles(features: List[Dict[str, Any]], zmin: int, zmax: int) -> Dict[TileKey, List[Dict[str, Any]]]:
+    """LineString features, simplified per zoom and clipped into per-tile feature lists for zmin..zmax."""
+    tiles: Dict[TileKey, List[Dict[str, Any]]] = {}
+    for feat, zooms in zip(features, vertex_zooms(features)):
+        if zooms is None:
+            continue
+        all_coords = feat["geometry"]["coordinates"]
+        all_world = [lonlat_to_world(c[0], c[1]) for c in all_coords]
+        props = feat.get("properties")
+        for z in range(zmin, zmax + 1):
+            detail = z if z < zmax else MAX_ZOOM
+            keep = [i for i, vz in enumerate(zooms) if vz is not None and vz <= detail]
+            coords = [all_coords[i] for i in keep]
+            world = [all_world[i] for i in keep]
+            for key, parts in _line_pieces(coords, world, z).items():
+                if len(parts) == 1:
+                    g = {"type": "LineString", "coordinates": parts[0]}
+                else:
+                    g = {"type": "MultiLineString", "coordinates": parts}
+                tiles.setdefault(key, []).append({"type": "Feature", "properties": props, "geometry": g})
+    return tiles
+
+
+def _jsonp(path: str, callback: str, *args: Any) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    body = ",".join(json.dumps(a, separators=(",", ":"), ensure_ascii=False) for a in args)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"{callback}({body});\n")
+
+
+def _bounds(features: Iterable[Dict[str, Any]]) -> Optional[List[float]]:
+    lons: List[float] = []
+    lats: List[float] = []
+    for feat in features:
+        stack = [(feat.get("geometry") or {}).get("coordinates")]
+        while stack:
+            c = stack.pop()
+            if isinstance(c, list) and c and isinstance(c[0], (int, float)):
+                lons.append(c[0])
+                lats.append(c[1])
+            elif isinstance(c, list):
+                stack.extend(c)
+    if not lons:
+        return None
+    return [min(lons), min(lats), max(lons), max(lats)]
+
+
+def write_tiles(
+    tiles_dir: str,
+    layers: Dict[str, List[Dict[str, Any]]],
+    overlays: List[Dict[str, Any]],
+    zmin: int,
+    zmax: int,
+) -> Dict[str, int]:
+    """
+    Replace tiles_dir with a fresh pyramid for each layer (name -> features).
+    Returns tile counts per layer.
+    """
+    if os.path.isdir(tiles_dir):
+        shutil.rmtree(tiles_dir)  # never mix tiles from an older build
+    os.makedirs(tiles_dir)
+    index: Dict[str, Any] = {
+        "min_zoom": zmin,
+        "max_zoom": zmax,
+        "bounds": _bounds(f for feats in layers.values() for f in feats) or _bounds(overlays),
+        "tiles": {},
+    }
+    counts: Dict[str, int] = {}
+    for name, feats in layers.items():
+        tiles = cut_tiles(feats, zmin, zmax)
+        for (z, x, y), tile_feats in sorted(tiles.items()):
+            key = f"{name}/{z}/{x}/{y}"
+            _jsonp(os.path.join(tiles_dir, name, str(z), str(x), f"{y}.js"), "__ckTile", key,
+                   {"type": "FeatureCollection", "features": tile_feats})
+        index["tiles"][name] = [f"{z}/{x}/{y}" for z, x, y in sorted(tiles)]
+        counts[name] = len(tiles)
+    _jsonp(os.path.join(tiles_dir, "overlays.js"), "__ckTile", "overlays", {"type": "FeatureCollection", "features": overlays})
+    _jsonp(os.path.join(tiles_dir, "index.js"), "__ckTileIndex", index)
+    return counts